@@ -10,6 +10,14 @@ backtesting — HK股票多因子风险回测引擎
     python -m backtesting.run_backtest --all
 """
 
-from backtesting.run_backtest import run_backtest
-
 __all__ = ["run_backtest"]
+
+
+def __getattr__(name):
+    # 按需导入：`python -m backtesting.run_backtest` 不会先经包初始化把自己导入一遍，
+    # 只用 backtesting.config_bt 等子模块时也不加载 matplotlib
+    if name == "run_backtest":
+        from backtesting.run_backtest import run_backtest
+        globals()["run_backtest"] = run_backtest  # 覆盖子模块导入时写入的同名包属性
+        return run_backtest
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -15,9 +15,6 @@ from __future__ import annotations
 import sys
 import json
 import pandas as pd
-import matplotlib
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional, Dict, Any
@@ -148,8 +145,11 @@ def _plot_backtest(
     config: BacktestConfig,
     out_dir: Path,
 ):
-    """生成回测可视化图表（3个子图）。"""
-    matplotlib.use('Agg')  # 非交互模式
+    """生成回测可视化图表（3个子图）。matplotlib 在此才导入（导入慢且可选），未安装时由调用方捕获 ImportError。"""
+    import matplotlib
+    matplotlib.use('Agg')  # 非交互模式，须在导入 pyplot 之前设置
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
 
     fig, axes = plt.subplots(3, 1, figsize=(14, 12),
                               gridspec_kw={'height_ratios': [3, 1.5, 1]})
@@ -17,8 +17,8 @@ run_backtest.py — CLI 入口点
     # 其他策略
     python -m backtesting.run_backtest --ticker 0700.HK --strategy composite
 
-    # 运行所有可用股票
-    python -m backtesting.run_backtest --all
+    # 运行所有可用股票（--quiet 去掉进度输出，适合批量 / 计时）
+    python -m backtesting.run_backtest --all --quiet
 
 也可作为函数调用：
     from backtesting.run_backtest import run_backtest
@@ -35,6 +35,7 @@ from typing import Optional, Dict, Any
 _BASE = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(_BASE))
 
+import telemetry
 from backtesting.config_bt import BacktestConfig
 from backtesting.data_loader import load_ohlcv, load_index_ohlcv, load_financials, list_available_tickers, load_board_lot
 from backtesting.signal_engine import SignalEngine
@@ -124,29 +125,31 @@ def run_backtest(
     print(f"  Board Lot: {board_lot} 股/手")
 
     # ---- 加载数据 ----
-    print(f"\n[1/5] 加载数据...")
-    df_ohlcv = load_ohlcv(ticker, config.ohlcv_dir)
-    if df_ohlcv is None:
-        print(f"  ❌ 找不到 {ticker} 的 OHLCV 数据，终止回测")
-        return {}
+    telemetry.echo(f"\n[1/5] 加载数据...")
+    with telemetry.span("bt.load"):
+        df_ohlcv = load_ohlcv(ticker, config.ohlcv_dir)
+        if df_ohlcv is None:
+            print(f"  ❌ 找不到 {ticker} 的 OHLCV 数据，终止回测")
+            return {}
 
-    eps_series, bvps_series = load_financials(ticker, config.financials_dir)
+        eps_series, bvps_series = load_financials(ticker, config.financials_dir)
 
-    # 基准指数（用于 alpha 计算）
-    df_bench = load_index_ohlcv(config.benchmark, config.ohlcv_dir)
+        # 基准指数（用于 alpha 计算）
+        df_bench = load_index_ohlcv(config.benchmark, config.ohlcv_dir)
 
-    # 指数数据（用于 SignalEngine 内的市场相关性，如有需要）
-    if _load_index_data is not None:
-        index_data = _load_index_data()
-    else:
-        index_data = {}
+        # 指数数据（用于 SignalEngine 内的市场相关性，如有需要）
+        if _load_index_data is not None:
+            index_data = _load_index_data()
+        else:
+            index_data = {}
 
     # ---- 初始化信号引擎 ----
-    print(f"\n[2/5] 初始化信号引擎...")
-    engine = SignalEngine(df_ohlcv, eps_series, bvps_series, index_data)
+    telemetry.echo(f"\n[2/5] 初始化信号引擎...")
+    with telemetry.span("bt.signals"):
+        engine = SignalEngine(df_ohlcv, eps_series, bvps_series, index_data)
 
     # ---- 创建策略 ----
-    print(f"\n[3/5] 创建策略: {strategy_name}")
+    telemetry.echo(f"\n[3/5] 创建策略: {strategy_name}")
     strategy = create_strategy(strategy_name, config.strategy_params)
 
     # 信号确认过滤器
@@ -154,12 +157,13 @@ def run_backtest(
         strategy = SignalConfirmationFilter(
             strategy, confirmation_periods=config.signal_confirmation_periods
         )
-        print(f"  信号确认: 需连续 {config.signal_confirmation_periods} 个决策日")
+        telemetry.echo(f"  信号确认: 需连续 {config.signal_confirmation_periods} 个决策日")
 
     # ---- 运行模拟 ----
-    print(f"\n[4/5] 运行 Walk-Forward 模拟...")
-    sim = Simulator(config, engine, strategy, df_ohlcv, board_lot=board_lot)
-    sim_results = sim.run()
+    telemetry.echo(f"\n[4/5] 运行 Walk-Forward 模拟...")
+    with telemetry.span("bt.simulate"):
+        sim = Simulator(config, engine, strategy, df_ohlcv, board_lot=board_lot)
+        sim_results = sim.run()
 
     equity_df = sim_results["equity_curve"]
     trades = sim_results["trades"]
@@ -170,13 +174,15 @@ def run_backtest(
         return {"error": "no trades", "ticker": ticker}
 
     # ---- 计算绩效 ----
-    print(f"\n[5/5] 计算绩效指标...")
-    metrics = calculate_performance(
-        equity_df, trades, df_bench, config.risk_free_rate
-    )
+    telemetry.echo(f"\n[5/5] 计算绩效指标...")
+    with telemetry.span("bt.performance"):
+        metrics = calculate_performance(
+            equity_df, trades, df_bench, config.risk_free_rate
+        )
 
     # ---- 生成报告 ----
-    out_dir = generate_report(config, metrics, equity_df, trades, plot=plot)
+    with telemetry.span("bt.report"):
+        out_dir = generate_report(config, metrics, equity_df, trades, plot=plot)
 
     # ---- 打印摘要 ----
     _print_summary(ticker, strategy_name, metrics)
@@ -268,8 +274,20 @@ def main():
     parser.add_argument("--z-sell", type=float, default=1.5,
                         help="估值回归策略：卖出Z-score阈值（默认 1.5）")
     parser.add_argument("--plot", action="store_true", help="生成可视化图表")
+    parser.add_argument("--quiet", action="store_true",
+                        help="只输出结果与错误，关闭逐日进度等过程输出（埋点日志照常写入）")
 
     args = parser.parse_args()
+    telemetry.start_run("backtest", quiet=args.quiet)
+    try:
+        _run_cli(parser, args)
+    finally:
+        summary_path = telemetry.finish_run()
+        if summary_path:
+            telemetry.echo(f"📈 运行埋点汇总: {summary_path}")
+
+
+def _run_cli(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
 
     if args.all:
         # 批量运行所有可用股票
@@ -278,28 +296,29 @@ def main():
         all_metrics = {}
         for t in tickers:
             try:
-                m = run_backtest(
-                    ticker=t,
-                    strategy_name=args.strategy,
-                    start_date=args.start,
-                    end_date=args.end,
-                    initial_capital=args.capital,
-                    fixed_fraction=args.fraction,
-                    max_tranches=args.max_tranches,
-                    buy_threshold=args.buy_threshold,
-                    sell_threshold=args.sell_threshold,
-                    stop_loss_pct=args.stop_loss,
-                    rebalance_freq=args.freq,
-                    warmup_days=args.warmup,
-                    plot=args.plot,
-                    board_lot=args.board_lot,
-                    pyramid=args.pyramid,
-                    confirmation_weeks=args.confirmation_weeks,
-                    dynamic_stop=args.dynamic_stop,
-                    stock_type=args.stock_type,
-                    z_buy=args.z_buy,
-                    z_sell=args.z_sell,
-                )
+                with telemetry.span("ticker", ticker=t):
+                    m = run_backtest(
+                        ticker=t,
+                        strategy_name=args.strategy,
+                        start_date=args.start,
+                        end_date=args.end,
+                        initial_capital=args.capital,
+                        fixed_fraction=args.fraction,
+                        max_tranches=args.max_tranches,
+                        buy_threshold=args.buy_threshold,
+                        sell_threshold=args.sell_threshold,
+                        stop_loss_pct=args.stop_loss,
+                        rebalance_freq=args.freq,
+                        warmup_days=args.warmup,
+                        plot=args.plot,
+                        board_lot=args.board_lot,
+                        pyramid=args.pyramid,
+                        confirmation_weeks=args.confirmation_weeks,
+                        dynamic_stop=args.dynamic_stop,
+                        stock_type=args.stock_type,
+                        z_buy=args.z_buy,
+                        z_sell=args.z_sell,
+                    )
                 all_metrics[t] = {
                     "annualized_return_pct": m.get("annualized_return_pct"),
                     "sharpe_ratio": m.get("sharpe_ratio"),
@@ -315,28 +334,29 @@ def main():
         print(json.dumps(all_metrics, ensure_ascii=False, indent=2))
 
     elif args.ticker:
-        run_backtest(
-            ticker=args.ticker,
-            strategy_name=args.strategy,
-            start_date=args.start,
-            end_date=args.end,
-            initial_capital=args.capital,
-            fixed_fraction=args.fraction,
-            max_tranches=args.max_tranches,
-            buy_threshold=args.buy_threshold,
-            sell_threshold=args.sell_threshold,
-            stop_loss_pct=args.stop_loss,
-            rebalance_freq=args.freq,
-            warmup_days=args.warmup,
-            plot=args.plot,
-            board_lot=args.board_lot,
-            pyramid=args.pyramid,
-            confirmation_weeks=args.confirmation_weeks,
-            dynamic_stop=args.dynamic_stop,
-            stock_type=args.stock_type,
-            z_buy=args.z_buy,
-            z_sell=args.z_sell,
-        )
+        with telemetry.span("ticker", ticker=args.ticker):
+            run_backtest(
+                ticker=args.ticker,
+                strategy_name=args.strategy,
+                start_date=args.start,
+                end_date=args.end,
+                initial_capital=args.capital,
+                fixed_fraction=args.fraction,
+                max_tranches=args.max_tranches,
+                buy_threshold=args.buy_threshold,
+                sell_threshold=args.sell_threshold,
+                stop_loss_pct=args.stop_loss,
+                rebalance_freq=args.freq,
+                warmup_days=args.warmup,
+                plot=args.plot,
+                board_lot=args.board_lot,
+                pyramid=args.pyramid,
+                confirmation_weeks=args.confirmation_weeks,
+                dynamic_stop=args.dynamic_stop,
+                stock_type=args.stock_type,
+                z_buy=args.z_buy,
+                z_sell=args.z_sell,
+            )
     else:
         parser.print_help()
         sys.exit(1)
@@ -25,6 +25,7 @@ from pathlib import Path
 _BASE = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(_BASE))
 
+import telemetry
 from processors.technical_indicators import (
     _add_technical_indicators,
     _calc_trend_signals,
@@ -119,9 +120,9 @@ class SignalEngine:
         self._index_data = index_data
 
         # 预计算全量技术指标（因果指标，无前视偏差）
-        print("  [SignalEngine] 预计算技术指标...", end=" ", flush=True)
+        telemetry.echo("  [SignalEngine] 预计算技术指标...", end=" ", flush=True)
         self._df = _add_technical_indicators(df_ohlcv.copy())
-        print(f"完成，共 {len(self._df)} 行，{len(self._df.columns)} 列")
+        telemetry.echo(f"完成，共 {len(self._df)} 行，{len(self._df.columns)} 列")
 
     def _calc_valuation_zscores(
         self, df_slice: pd.DataFrame, window: int = 756
@@ -31,6 +31,7 @@ from pathlib import Path
 _BASE = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(_BASE))
 
+import telemetry
 from backtesting.config_bt import BacktestConfig
 from backtesting.signal_engine import SignalEngine, SignalSnapshot
 from backtesting.strategy import BaseStrategy, Action, TranchInfo, TradeSignal
@@ -195,11 +196,14 @@ class Simulator:
     def run(self) -> dict:
         decision_dates = self._get_decision_dates()
         total = len(decision_dates)
-        print(f"  [Simulator] 决策日共 {total} 个 "
-              f"({decision_dates[0].date()} ~ {decision_dates[-1].date()})")
+        telemetry.echo(f"  [Simulator] 决策日共 {total} 个 "
+                       f"({decision_dates[0].date()} ~ {decision_dates[-1].date()})")
+
+        # quiet 模式下进度行整段跳过（循环内连取模判断都不做）
+        progress_every = 0 if telemetry.is_quiet() else 100
 
         for i, date in enumerate(decision_dates):
-            if (i + 1) % 100 == 0 or i == total - 1:
+            if progress_every and ((i + 1) % progress_every == 0 or i == total - 1):
                 print(f"  [Simulator] 进度 {i+1}/{total} ({date.date()})", end="\r")
 
             # 获取当日收盘价
@@ -284,8 +288,10 @@ class Simulator:
             # 记录权益
             self._record_equity(date, close)
 
-        print()  # 换行
-        print(f"  [Simulator] 完成，共成交 {len(self.trades)} 笔")
+        telemetry.echo()  # 换行
+        telemetry.echo(f"  [Simulator] 完成，共成交 {len(self.trades)} 笔")
+        telemetry.count("backtest.decision_days", total)
+        telemetry.count("backtest.trades", len(self.trades))
 
         equity_df = pd.DataFrame(self.equity_records)
         if not equity_df.empty:
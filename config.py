@@ -1,10 +1,10 @@
 import os
 from datetime import datetime
-from dotenv import load_dotenv
 from pathlib import Path
 
-# 加载 .env 文件中的敏感信息
-load_dotenv()
+# import config 本身没有任何副作用（不读 .env、不建目录），webview / 回测等只读入口启动更快：
+#   - .env 在第一次访问 §5 的环境变量配置（或调用 load_env()）时才加载
+#   - 数据目录由各写入方在第一次写文件前自行 mkdir
 
 # === 1. 基础路径配置 ===
 BASE_DIR = Path(__file__).resolve().parent
@@ -31,6 +31,8 @@ OUTPUT_ROOT = DATA_DIR / "output"
 # 按日分区的流式数据 (每天生成新文件或覆写文件)
 PORTFOLIO_DIR = INPUT_ROOT / "portfolio"                      # 持仓快照
 TRANSACTIONS_DIR = INPUT_ROOT / "transactions"                # 交易流水
+TRANSACTIONS_LEDGER_DIR = TRANSACTIONS_DIR / "ledger"          # 已解析交易总账：part-*.parquet（强类型）+ _keys.idx 唯一键索引
+TRANSACTIONS_MANIFEST = TRANSACTIONS_LEDGER_DIR / "_manifest.json"  # 已导入流水文件清单（路径 / 大小 / mtime / sha256），只解析新增或变更的文件
 
 # 平铺覆盖的历史主数据 (直接覆写文件，无须按日建文件夹)
 OHLCV_DIR = INPUT_ROOT / "ohlcv"                              # 历史日K线量价数据
@@ -39,6 +41,7 @@ SENTIMENT_DIR = INPUT_ROOT / "sentiment"                      # 沽空与情绪
 
 # 3.2 输出层 (Output: 熟数据 JSON 与分析报告)
 ARCHIVE_DIR = OUTPUT_ROOT / "_archive"                        # 滚动冷备份，防止最新 JSON 损坏
+PAYLOAD_ARCHIVE_DIR = ARCHIVE_DIR / "payloads"                # 按日归档的个股 payload (<ticker>_YYYYMMDD.json)，供增量比对
 LATEST_DIR = OUTPUT_ROOT / "latest"                           # [核心] 永远存放最新、最全的单股 JSON (如 0700_HK_yyyymmdd.json)
 FINAL_REPORTS_DIR = OUTPUT_ROOT / "final_reports"             # LLM 生成的最终 Markdown 报告 (如 GEMINI_MODEL_ID_VERSION_yyyymmdd.md 或 GROK_MODEL_ID_VERSION_yyyymmdd.md)
 
@@ -46,44 +49,137 @@ FINAL_REPORTS_DIR = OUTPUT_ROOT / "final_reports"             # LLM 生成的最
 DERIVED_ROOT = OUTPUT_ROOT / "derived"
 DERIVED_TECHNICAL_DIR = DERIVED_ROOT / "technical"            # <ticker>_{daily,weekly,monthly}.parquet
 DERIVED_VALUATION_DIR = DERIVED_ROOT / "valuation"            # <ticker>_daily.parquet（PE/PB/PS_TTM 时序）
-DERIVED_SENTIMENT_DIR = DERIVED_ROOT / "sentiment"            # sentiment_master.parquet（按 url_hash 累积去重）
-SENTIMENT_MASTER_PARQUET = DERIVED_SENTIMENT_DIR / "sentiment_master.parquet"
-
-# === 4. 自动创建所有目录 ===
-# 将所有路径放入列表，批量创建
-ALL_DIRS = [
-    PORTFOLIO_DIR, TRANSACTIONS_DIR,
-    OHLCV_DIR, FINANCIALS_DIR, SENTIMENT_DIR,
-    ARCHIVE_DIR, LATEST_DIR, FINAL_REPORTS_DIR,
-    DERIVED_TECHNICAL_DIR, DERIVED_VALUATION_DIR, DERIVED_SENTIMENT_DIR,
-]
-
-for folder in ALL_DIRS:
-    # parents=True: 如果父目录(比如 data/portfolio)不存在，也会一起创建
-    # exist_ok=True: 如果文件夹已经存在(比如今天运行了两次)，不会报错
-    folder.mkdir(parents=True, exist_ok=True)
+DERIVED_SENTIMENT_DIR = DERIVED_ROOT / "sentiment"            # 舆情归档（按 ticker/月份分区，按 url_hash 累积去重）
+SENTIMENT_ARCHIVE_DIR = DERIVED_SENTIMENT_DIR / "archive"     # ticker=<t>/month=<YYYY-MM>/part-*.parquet + _keys.idx
+SENTIMENT_MASTER_PARQUET = DERIVED_SENTIMENT_DIR / "sentiment_master.parquet"  # 旧版单文件 master，首次运行自动迁移进分区
+SENTIMENT_SCORE_CACHE = DERIVED_SENTIMENT_DIR / "headline_scores.parquet"      # 标题词典打分缓存（按 url_hash，只给新标题打分）
+# 聚合结果：DERIVED_SENTIMENT_DIR / <ticker>_sentiment_{daily,weekly,monthly}.parquet
 
-# === 5. 账户与API配置 ===
-# 优先从环境变量获取
-ACCOUNT_ID = os.getenv("IBKR_ACCOUNT_ID")
-IBKR_HOST = os.getenv("IBKR_HOST", "127.0.0.1") # 给个默认值兜底
-IBKR_PORT = int(os.getenv("IBKR_PORT", 7496))   # 默认模拟交易端口 7497，实盘是 7496
-CLIENT_ID = int(os.getenv("IBKR_CLIENT_ID", 1))
+# 3.4 离线回放层 (Replay: 录制 IBKR/yfinance/AkShare/RSS 原始响应，供离线基准测试)
+REPLAY_DIR = DATA_DIR / "replay"                              # <vendor>/<method>__<key_hash>.pkl
+
+# 3.5 HTTP 响应缓存层 (所有 vendor 共用的 SQLite 响应缓存)
+CACHE_DIR = DATA_DIR / "cache"
+HTTP_CACHE_DB = CACHE_DIR / "http_cache.sqlite"
+REPORT_INDEX_DB = CACHE_DIR / "report_index.sqlite"           # Web Viewer 报告预渲染 HTML + 全文检索索引
+
+# 3.6 运行埋点层 (Telemetry: 每次运行的 JSONL 事件日志 + 汇总)
+TELEMETRY_DIR = OUTPUT_ROOT / "telemetry"                     # <run>_YYYYmmdd_HHMMSS.jsonl + _summary.json
 
-CLAUDE_API_KEY = os.getenv("CLAUDE_API_KEY")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GROK_API_KEY = os.getenv("GROK_API_KEY")
-FMP_API_KEY = os.getenv("FMP_API_KEY")
+# === 4. 目录创建 ===
+# 不再在 import 时批量 mkdir：写入方在落盘前 `<DIR>.mkdir(parents=True, exist_ok=True)`，
+# 只读入口（webview / 回测）遇到缺失目录按「无数据」处理。
+
+# === 5. 账户与API配置 ===
+# 优先从环境变量获取（含 .env）；首次访问这些名字时才加载 .env，结果缓存为模块属性
+_ENV_SETTINGS = {
+    "ACCOUNT_ID": lambda: os.getenv("IBKR_ACCOUNT_ID"),
+    "IBKR_HOST": lambda: os.getenv("IBKR_HOST", "127.0.0.1"),      # 给个默认值兜底
+    "IBKR_PORT": lambda: int(os.getenv("IBKR_PORT", 7496)),        # 默认模拟交易端口 7497，实盘是 7496
+    "CLIENT_ID": lambda: int(os.getenv("IBKR_CLIENT_ID", 1)),
+    "CLAUDE_API_KEY": lambda: os.getenv("CLAUDE_API_KEY"),
+    "GEMINI_API_KEY": lambda: os.getenv("GEMINI_API_KEY"),
+    "GROK_API_KEY": lambda: os.getenv("GROK_API_KEY"),
+    "FMP_API_KEY": lambda: os.getenv("FMP_API_KEY"),
+    "HTTP_OFFLINE": lambda: os.getenv("HTTP_OFFLINE", "0") == "1",  # 离线模式：只读缓存，未命中直接报错，不发任何请求
+}
+_ENV_LOADED = False
+
+
+def load_env() -> None:
+    """把 .env 加载进 os.environ（幂等）。在导入时直接读 os.getenv 的模块应先调用一次。"""
+    global _ENV_LOADED
+    if _ENV_LOADED:
+        return
+    _ENV_LOADED = True
+    try:
+        from dotenv import load_dotenv
+    except ImportError:  # 没装 python-dotenv 时只用进程环境变量
+        return
+    load_dotenv(BASE_DIR / ".env")
+
+
+def __getattr__(name: str):
+    factory = _ENV_SETTINGS.get(name)
+    if factory is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    load_env()
+    value = globals()[name] = factory()
+    return value
 
 # === 6. 全局业务参数配置 ===
 # 控制数据抓取的深度和逻辑
 LOOKBACK_YEARS = 15  # 默认回溯 15 年的数据，以覆盖完整宏观牛熊周期
 FINANCIAL_REPORT_YEARS = 4  # 喂给 LLM 的财报年度限制，避免 JSON 过于庞大浪费 token
 FINANCIAL_REPORT_QTERS = 8  # 喂给 LLM 的财报季度限制，避免 JSON 过于庞大浪费 token
+PROMPT_TOKEN_BUDGET_PER_STOCK = 8000    # 单只股票 quantitative_payload 的 token 预算（超出时按优先级规则裁剪）
+PROMPT_TOKEN_BUDGET_PER_RUN = 60000     # 单次运行全部个股 payload 的 token 总预算（按股票数均分后与单股预算取小）
+SENTIMENT_TOP_K_HEADLINES = 5  # 喂给 LLM 的舆情标题条数：只保留情绪得分绝对值最大的 k 条，其余以聚合分数呈现
+PAYLOAD_ARCHIVE_KEEP = 30            # 每只股票保留的历史 payload 归档份数
+PAYLOAD_DELTA_REL_TOL = 0.005        # 增量比对：数值相对变化低于 0.5% 视为未变化
+PAYLOAD_DELTA_MAX_FIELDS = 30        # 增量段最多列出的变化字段数（按变化幅度排序）
+PAYLOAD_DELTA_MATERIAL_PRICE_PCT = 0.03  # 收盘价变动 ≥ 3%（或出现阈值穿越/新交易/新财报/强情绪新闻）即视为重大变化，增量模式下仍做完整分析
+DERIVED_ARROW_MIRROR = True  # 派生 parquet 旁同时写未压缩 Arrow IPC（.arrow），供 Web Viewer 多 worker 内存映射共享
+WEBVIEW_HOST = "127.0.0.1"     # Web Viewer 仅本机访问
+WEBVIEW_PORT = 5000
+WEBVIEW_THREADS = 8            # 每个进程的请求处理线程数
+WEBVIEW_WORKERS = 1            # 进程数；>1 时走 gunicorn（需安装，仅 POSIX），各进程经 .arrow 内存映射共享派生数据
+WEBVIEW_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Web Viewer 进程内数据缓存的总内存上限（字节，按 LRU 逐出）
+VALUATION_BAND_WINDOWS = {"1Y": 252, "3Y": 756, "5Y": 1260}  # 估值分位带的滚动窗口（交易日行数）；另有扩张窗口 All
+VALUATION_BAND_QUANTILES = (10, 25, 50, 75, 90)               # 估值分位带输出的分位点
+# 各入口的冷启动导入耗时预算（毫秒，已扣除解释器自身启动；startup_bench.py 超出即失败）
+# 取 `startup_bench.py --runs 9 --calibrate` 在多台机器上实测中位数的较大值 ×1.3，向上取整到 50ms；
+# 单次测量在共享机器上可波动 ±20%，依赖或机器变化后重新校准
+STARTUP_IMPORT_BUDGET_MS = {
+    "config": 50,                          # 实测 <5（接近解释器基线噪声）
+    "webview.app": 600,                    # 实测 370–446
+    "webview.serve": 550,                  # 实测 385–400
+    "backtesting.run_backtest": 450,       # 实测 ≈310
+    "llm_report.report_generator": 100,    # 实测 34–49
+    "main": 650,                           # 实测 375–494（pandas_ta 已延迟到指标计算时导入）
+}
+TELEMETRY_KEEP_RUNS = 50  # 每类运行（pipeline / backtest / report）保留的埋点日志份数
+FINANCIALS_TTL_DAYS = 7  # 财报三表的最短刷新间隔（天）：TTL 内，或尚未到下一期预计披露日时，跳过重新拉取
+
+# 外部数据源 (yfinance / AkShare / RSS) 的并发与重试策略
+VENDOR_MAX_WORKERS = 4        # 单只股票内部 vendor 调用的并发上限（有界线程池）
+VENDOR_MAX_RETRIES = 3        # 单次调用遇到网络 / 超时 / 限流等暂时性错误后的最大重试次数（确定性错误不重试）
+VENDOR_BACKOFF_SECONDS = 1.0  # 指数退避的基准间隔：1s → 2s → 4s（叠加随机抖动）
+
+# HTTP 响应缓存 TTL（秒），按 URL 主机名后缀匹配，未命中走 default
+HTTP_CACHE_TTL_SECONDS = {
+    "news.google.com": 30 * 60,          # RSS：30 分钟，过期后走 ETag / If-Modified-Since 条件请求
+    "eastmoney.com": 60 * 60,            # AkShare 东方财富接口：1 小时
+    "finance.yahoo.com": 6 * 60 * 60,    # yfinance：6 小时（财报/画像本身变化很慢）
+    "default": 60 * 60,
+}
+# HTTP_OFFLINE（离线模式）来自环境变量，见 §5 _ENV_SETTINGS
 
 # === 7. 大盘指数配置 ===
 # yfinance 格式的指数代码，用于拉取大盘参照数据
 INDEX_SYMBOLS = ["^HSI", "3033.HK"]  # 恒生指数, 恒生科技指数ETF
 
 # === 8. 宏观数据配置 ===
-RISK_FREE_RATE = 0.04  # 夏普比率的无风险利率假设，可根据利率环境调整
\ No newline at end of file
+RISK_FREE_RATE = 0.04  # 夏普比率的无风险利率假设，可根据利率环境调整
+
+# === 9. 组合尾部风险与集中度 (processors/returns_panel.py · tail_risk.py · covariance.py) ===
+BASE_CURRENCY = "CAD"  # 账户基础货币（IBKR account_summary 的 BASE_TOTAL_CALC 行即以此计价）
+# 各持仓币种 → 基础货币的 yfinance 汇率代码；第零阶段随指数一起拉取日线（INDEX_HKDCAD=X_daily.csv），缺失时按当前汇率常数折算
+FX_HISTORY_SYMBOLS = {"HKD": "HKDCAD=X", "USD": "USDCAD=X"}
+VAR_CONFIDENCE_LEVELS = (0.95, 0.99)  # VaR / CVaR 置信度
+TAIL_RISK_LOOKBACK_DAYS = 504         # 收益率矩阵回看长度（交易日，约 2 年）
+TAIL_RISK_MIN_OBS = 120               # 单只持仓有效收益率少于该数目时不进矩阵，单独列为未覆盖
+EWMA_LAMBDA = 0.94                    # 过滤历史模拟 (FHS) 的 EWMA 波动率衰减因子（RiskMetrics 日频取值）
+MONTE_CARLO_PATHS = 100_000           # 蒙特卡洛情景数
+MONTE_CARLO_T_DF = 5                  # 蒙特卡洛多元 t 分布自由度（厚尾；协方差已按 df 缩放为收缩协方差）
+MONTE_CARLO_SEED = 20240101           # 固定随机种子，保证同一份数据每次结果一致
+CLUSTER_CORR_THRESHOLD = 0.5          # 持仓层次聚类：簇间平均相关系数低于该值时不再合并
+CORRELATION_TOP_PAIRS = 10            # portfolio_risk.json 里列出的最高相关持仓对数
+# 历史情景回放：恒指实际区间（起点 ≈ 阶段高点，终点 ≈ 阶段低点）
+STRESS_SCENARIOS = {
+    "2008_GFC": ("2008-09-01", "2008-10-27"),
+    "2015_China_crash": ("2015-04-27", "2015-09-29"),
+    "2020_COVID": ("2020-01-17", "2020-03-23"),
+    "2022_HK_tech_selloff": ("2022-01-03", "2022-10-31"),
+}
+STRESS_SCENARIO_INDEX = "^HSI"        # 情景回放的参照指数：第零阶段按最早情景起点回溯并补齐其历史（不受 LOOKBACK_YEARS 限制）
\ No newline at end of file
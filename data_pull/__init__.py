@@ -1,21 +1,24 @@
-from .ibkr_api import (
-    fetch_ibkr_base_data,
-    fetch_ibkr_ohlcv,
-    pull_all_ibkr_data,
-)
-from .akshare_api import fetch_financials_akshare
-from .yfinance_api import (
-    fetch_financials,
-    fallback_to_yfinance,
-    fetch_index_ohlcv,
-)
+# 子模块按需导入（PEP 562）：导入 data_pull.http_cache 等不再连带加载 ib_insync / yfinance / akshare
+import importlib
 
-__all__ = [
-    "fetch_ibkr_base_data",
-    "fetch_ibkr_ohlcv",
-    "pull_all_ibkr_data",
-    "fetch_financials_akshare",
-    "fetch_financials",
-    "fallback_to_yfinance",
-    "fetch_index_ohlcv",
-]
+_EXPORTS = {
+    "fetch_ibkr_base_data": ".ibkr_api",
+    "fetch_ibkr_ohlcv": ".ibkr_api",
+    "pull_all_ibkr_data": ".ibkr_api",
+    "fetch_financials_akshare": ".akshare_api",
+    "financials_freshness": ".financials_refresh",
+    "refresh_financials": ".financials_refresh",
+    "fetch_financials": ".yfinance_api",
+    "fallback_to_yfinance": ".yfinance_api",
+    "fetch_index_ohlcv": ".yfinance_api",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = getattr(importlib.import_module(module, __name__), name)
+    return value
@@ -1,12 +1,12 @@
 import sys
 import pandas as pd
-import akshare as ak
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
 from config import FINANCIALS_DIR
+from data_pull.fetch_utils import run_bounded
 
 # ==========================================
 # 中文科目 → yfinance 英文列名 映射表
@@ -91,6 +91,7 @@ def fetch_financials_akshare(ticker_symbol: str) -> bool:
         ticker_symbol: 标准代码 (如 "0700.HK")
     """
     print(f"🔄 [AkShare] 开始抓取 {ticker_symbol} 的财务报表 (东方财富数据源)...")
+    import akshare as ak  # 导入很慢（数百个接口模块），只在真正拉取时加载
 
     # 0700.HK → 00700
     ak_symbol = ticker_symbol.split('.')[0].zfill(5)
@@ -107,13 +108,20 @@ def fetch_financials_akshare(ticker_symbol: str) -> bool:
         ("现金流量表", "报告期", CASHFLOW_MAP, "quarterly_cashflow", "季报现金流量表"),
     ]
 
+    # 六次 stock_financial_hk_report_em 互不依赖 → 有界线程池并发 + 重试退避
+    fetched, fetch_errors = run_bounded({
+        suffix: (lambda report_type=report_type, indicator=indicator:
+                 ak.stock_financial_hk_report_em(stock=ak_symbol, symbol=report_type, indicator=indicator))
+        for report_type, indicator, _, suffix, _ in tasks
+    }, vendor="akshare")
+
     success_count = 0
 
     for report_type, indicator, name_map, suffix, label in tasks:
         try:
-            df_raw = ak.stock_financial_hk_report_em(
-                stock=ak_symbol, symbol=report_type, indicator=indicator
-            )
+            if suffix in fetch_errors:
+                raise fetch_errors[suffix]
+            df_raw = fetched[suffix]
 
             df_wide = _pivot_long_to_wide(df_raw, name_map)
 
@@ -122,6 +130,7 @@ def fetch_financials_akshare(ticker_symbol: str) -> bool:
                 continue
 
             file_path = FINANCIALS_DIR / f"{ticker_symbol}_{suffix}.csv"
+            FINANCIALS_DIR.mkdir(parents=True, exist_ok=True)
             df_wide.to_csv(file_path, index=False, encoding='utf-8')
             print(f"  ✅ 成功提取 {label}: {file_path.name} (共 {len(df_wide)} 期)")
             success_count += 1
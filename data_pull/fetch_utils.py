@@ -0,0 +1,128 @@
+"""
+fetch_utils.py — 外部数据源共用抓取工具
+
+包含内容：
+    - call_with_retry  : 单次 vendor 调用 + 指数退避重试（带随机抖动，避免同时重试撞墙）
+    - run_bounded      : 有界线程池并发执行一组具名任务，分别收集结果与异常
+    - is_transient     : 默认重试判定：只有网络 / 超时 / 限流 / 5xx 才值得重试
+
+vendor 调用（yfinance 属性访问、AkShare 接口、RSS 请求）全部是 I/O 等待，
+线程池即可获得接近线性的加速；并发上限由 config.VENDOR_MAX_WORKERS 控制，防止被限流。
+每次尝试都记一个 telemetry 延迟样本 vendor.<vendor>，重试 / 最终失败分别计数。
+代码错误、空表、找不到代码之类的确定性失败重试也不会变好，直接抛给调用方，不浪费退避时间。
+"""
+
+from __future__ import annotations
+
+import http.client
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+import requests
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+import telemetry
+from config import VENDOR_BACKOFF_SECONDS, VENDOR_MAX_RETRIES, VENDOR_MAX_WORKERS
+from data_pull.http_cache import OfflineCacheMiss
+
+
+_TRANSIENT_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    ConnectionError,          # 内置：连接被重置 / 拒绝 / 远端断开
+    TimeoutError,             # 内置：socket 超时
+    http.client.IncompleteRead,
+)
+
+
+def is_transient(exc: BaseException) -> bool:
+    """
+    网络 / 超时 / 限流 (429) / 服务端 5xx 视为暂时性错误；沿 __cause__ 链查找被 vendor 库包装过的原始异常。
+    离线模式的缓存未命中虽是 ConnectionError 子类，但重试只会再次未命中，直接判为确定性失败。
+    """
+    while exc is not None:
+        if isinstance(exc, OfflineCacheMiss):
+            return False
+        if isinstance(exc, _TRANSIENT_ERRORS):
+            return True
+        if isinstance(exc, requests.HTTPError) and exc.response is not None:
+            status = exc.response.status_code
+            return status == 429 or status >= 500
+        if type(exc).__name__ == "YFRateLimitError":  # yfinance 限流（不为判断它而导入 yfinance）
+            return True
+        exc = exc.__cause__
+    return False
+
+
+def call_with_retry(
+    fn: Callable,
+    *args,
+    retries: int = VENDOR_MAX_RETRIES,
+    backoff: float = VENDOR_BACKOFF_SECONDS,
+    label: str = "",
+    vendor: str = "call",
+    retry_on: Callable[[BaseException], bool] = is_transient,
+    **kwargs,
+):
+    """
+    调用 fn(*args, **kwargs)，失败后按 backoff × 2^n (+ 0~50% 抖动) 等待再试。
+    只有 retry_on(异常) 为真时才重试；确定性失败与重试耗尽都抛出最后一次异常，由调用方决定降级策略。
+    """
+    attempt = 0
+    while True:
+        try:
+            with telemetry.timer(f"vendor.{vendor}", label=label, attempt=attempt):
+                return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt >= retries or not retry_on(e):
+                telemetry.count(f"vendor.{vendor}.failed")
+                raise
+            telemetry.count(f"vendor.{vendor}.retry")
+            wait = backoff * (2 ** attempt)
+            wait += random.uniform(0, wait * 0.5)
+            print(f"      ↻ {label or getattr(fn, '__name__', 'call')} 失败 ({e})，"
+                  f"{wait:.1f}s 后第 {attempt + 1}/{retries} 次重试...")
+            time.sleep(wait)
+            attempt += 1
+
+
+def run_bounded(
+    tasks: dict[str, Callable[[], object]],
+    max_workers: int = VENDOR_MAX_WORKERS,
+    retries: int = VENDOR_MAX_RETRIES,
+    backoff: float = VENDOR_BACKOFF_SECONDS,
+    vendor: str = "call",
+    retry_on: Callable[[BaseException], bool] = is_transient,
+) -> tuple[dict[str, object], dict[str, Exception]]:
+    """
+    在有界线程池中并发执行 {name: 无参函数}，每个任务都经过 call_with_retry（只重试 retry_on 判定的暂时性错误）。
+
+    返回:
+        (results, errors) — 两个字典的键都是任务名；单个任务失败不影响其他任务。
+    """
+    results: dict[str, object] = {}
+    errors: dict[str, Exception] = {}
+    if not tasks:
+        return results, errors
+
+    workers = max(1, min(max_workers, len(tasks)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            name: pool.submit(call_with_retry, fn, retries=retries, backoff=backoff, label=name, vendor=vendor,
+                              retry_on=retry_on)
+            for name, fn in tasks.items()
+        }
+        for name, fut in futures.items():
+            try:
+                results[name] = fut.result()
+            except Exception as e:
+                errors[name] = e
+    return results, errors
@@ -0,0 +1,173 @@
+"""
+financials_refresh.py — 财报三表刷新调度（新鲜度策略 + 双引擎拉取）
+
+财报按季度/半年度更新，但流水线每天运行。本模块在真正发起 12 次 vendor 调用
+（yfinance info + 6 张表、AkShare 6 张表）之前先判断本地数据是否仍然新鲜：
+
+    1. 距离上次成功拉取 < FINANCIALS_TTL_DAYS          → 跳过
+    2. 当前日期 < 下一期财报预计披露日                  → 跳过
+       预计披露日优先取 info.json 的 earningsTimestamp(Start)，
+       否则按「最新报告期 + 报告间隔 + 披露滞后」推算
+    3. 其余情况 / 任一 CSV 缺失 / force=True            → 重新拉取
+
+拉取成功后写入 <ticker>_fetch_meta.json 记录时间与推算的下一期披露日。
+
+公开接口：
+    financials_freshness(ticker) -> (is_fresh: bool, reason: str)
+    refresh_financials(ticker, force=False) -> bool   # True = 本地财报可用
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from config import FINANCIALS_DIR, FINANCIALS_TTL_DAYS
+from processors.technical_utils import FINANCIAL_PUBLICATION_LAG_DAYS
+
+# 两个引擎共同产出的六张表（akshare 覆盖 yfinance，文件名一致）
+STATEMENT_SUFFIXES = (
+    "annual_income", "quarterly_income",
+    "annual_balance", "quarterly_balance",
+    "annual_cashflow", "quarterly_cashflow",
+)
+
+_DEFAULT_REPORT_INTERVAL_DAYS = 91
+
+
+def _meta_path(ticker: str) -> Path:
+    return FINANCIALS_DIR / f"{ticker}_fetch_meta.json"
+
+
+def _load_meta(ticker: str) -> dict:
+    path = _meta_path(ticker)
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (json.JSONDecodeError, OSError):
+        return {}
+
+
+def _quarterly_report_dates(ticker: str) -> list[pd.Timestamp]:
+    path = FINANCIALS_DIR / f"{ticker}_quarterly_income.csv"
+    if not path.exists():
+        return []
+    try:
+        dates = pd.read_csv(path, usecols=["Date"])["Date"]
+    except (ValueError, OSError):
+        return []
+    return sorted(pd.to_datetime(dates, errors="coerce").dropna().unique())
+
+
+def _next_expected_report_date(ticker: str) -> datetime | None:
+    """
+    推算下一期财报预计披露日。
+    优先用 yfinance info.json 中的 earningsTimestampStart / earningsTimestamp（公司公告的业绩日）；
+    其次用最新报告期 + 近几期的中位报告间隔（港股多为半年报 ≈ 182 天）+ 披露滞后。
+    """
+    info_path = FINANCIALS_DIR / f"{ticker}_info.json"
+    if info_path.exists():
+        try:
+            info = json.loads(info_path.read_text(encoding="utf-8"))
+        except (json.JSONDecodeError, OSError):
+            info = {}
+        for key in ("earningsTimestampStart", "earningsTimestamp"):
+            ts = info.get(key)
+            if isinstance(ts, (int, float)) and ts > 0:
+                candidate = datetime.fromtimestamp(ts)
+                if candidate > datetime.now():
+                    return candidate
+
+    dates = _quarterly_report_dates(ticker)
+    if not dates:
+        return None
+    if len(dates) >= 2:
+        gaps = pd.Series(dates[-5:]).diff().dropna().dt.days
+        interval = int(gaps.median()) if not gaps.empty else _DEFAULT_REPORT_INTERVAL_DAYS
+    else:
+        interval = _DEFAULT_REPORT_INTERVAL_DAYS
+    next_period_end = pd.Timestamp(dates[-1]) + timedelta(days=interval)
+    return (next_period_end + timedelta(days=FINANCIAL_PUBLICATION_LAG_DAYS)).to_pydatetime()
+
+
+def financials_freshness(ticker: str, ttl_days: int = FINANCIALS_TTL_DAYS) -> tuple[bool, str]:
+    """判断本地财报是否足够新，返回 (是否新鲜, 原因说明)。"""
+    missing = [s for s in STATEMENT_SUFFIXES if not (FINANCIALS_DIR / f"{ticker}_{s}.csv").exists()]
+    if missing or not (FINANCIALS_DIR / f"{ticker}_info.json").exists():
+        return False, "本地财报不完整"
+
+    meta = _load_meta(ticker)
+    fetched_at_raw = meta.get("fetched_at")
+    if not fetched_at_raw:
+        return False, "无拉取记录"
+    try:
+        fetched_at = datetime.fromisoformat(fetched_at_raw)
+    except ValueError:
+        return False, "拉取记录损坏"
+
+    now = datetime.now()
+    age_days = (now - fetched_at).days
+    if age_days < ttl_days:
+        return True, f"距上次拉取 {age_days} 天 < TTL {ttl_days} 天"
+
+    next_report = _next_expected_report_date(ticker)
+    if next_report is not None and now < next_report:
+        return True, f"下一期财报预计 {next_report:%Y-%m-%d} 披露，尚无新数据"
+
+    return False, f"已过期 (上次拉取 {fetched_at:%Y-%m-%d})"
+
+
+def refresh_financials(ticker: str, force: bool = False) -> bool:
+    """
+    按新鲜度策略刷新财报：先 yfinance（info + 底线三表），再 AkShare 覆盖三表。
+    两个引擎内部各自并发拉取；两者之间保持串行，保证 AkShare 的数据最后落盘。
+    """
+    # 延迟导入：避免仅做新鲜度判断时就加载 yfinance / akshare
+    from data_pull.akshare_api import fetch_financials_akshare
+    from data_pull.yfinance_api import fetch_financials
+
+    if not force:
+        fresh, reason = financials_freshness(ticker)
+        if fresh:
+            print(f"   ⏭️  {ticker} 财报仍然新鲜，跳过拉取 ({reason})")
+            return True
+
+    ok = False
+    try:
+        ok = fetch_financials(ticker) or ok
+    except Exception as e:
+        print(f"   ⚠️ yfinance 拉取失败: {e}")
+
+    try:
+        ok = fetch_financials_akshare(ticker) or ok
+    except Exception as e:
+        print(f"   ⚠️ AkShare 财报覆盖失败，将使用 yfinance 数据: {e}")
+
+    if ok:
+        next_report = _next_expected_report_date(ticker)
+        meta = {
+            "fetched_at": datetime.now().isoformat(timespec="seconds"),
+            "next_expected_report": next_report.strftime("%Y-%m-%d") if next_report else None,
+        }
+        FINANCIALS_DIR.mkdir(parents=True, exist_ok=True)
+        _meta_path(ticker).write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    return ok
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="按新鲜度策略刷新财报三表")
+    parser.add_argument("--ticker", required=True, help="标准代码，如 0700.HK")
+    parser.add_argument("--force", action="store_true", help="忽略 TTL 强制重新拉取")
+    args = parser.parse_args()
+    refresh_financials(args.ticker, force=args.force)
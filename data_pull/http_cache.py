@@ -0,0 +1,267 @@
+"""
+http_cache.py — 全 vendor 共用的 HTTP 层（连接池 + 持久化响应缓存）
+
+组成：
+    - 连接池：单个 requests.Session + HTTPAdapter（keep-alive，线程安全复用）
+    - 响应缓存：data/cache/http_cache.sqlite，按 URL 主机名匹配 HTTP_CACHE_TTL_SECONDS
+    - 条件请求：过期条目带 ETag / Last-Modified 时发送 If-None-Match / If-Modified-Since，
+      收到 304 只刷新时间戳，不重新下载（Google News RSS 即走此路径）
+    - 离线模式：HTTP_OFFLINE=1 或 set_offline(True) 时只读缓存，未命中抛 OfflineCacheMiss
+    - 旁路模式：set_bypass(True) 时 get() 直接走 requests.get（录制 / 回放模式下由 main 打开）
+
+接入方式：
+    news_api._fetch_google_rss_news   → 直接调用 get()
+    AkShare（内部用 requests.get）    → install_vendor_adapters() 替换 requests.get
+    yfinance（内部用 curl_cffi 会话） → install_vendor_adapters() 包装 YfData.get
+                                         (yfinance 只接受 curl_cffi 会话，无法直接注入 requests.Session)
+
+TTL 内重跑流水线时，上述三个入口都直接命中 SQLite，不产生任何网络请求。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlencode, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+import telemetry
+from config import HTTP_CACHE_DB, HTTP_CACHE_TTL_SECONDS, HTTP_OFFLINE, VENDOR_MAX_WORKERS
+
+
+class OfflineCacheMiss(requests.ConnectionError):
+    """离线模式下缓存未命中（沿用 ConnectionError，调用方已有的网络异常处理可直接兜住；fetch_utils 不对它重试）。"""
+
+
+# 缓存 key 中剔除的易变参数（yfinance 的 crumb 每个会话都不同）
+_VOLATILE_PARAMS = ("crumb",)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key           TEXT PRIMARY KEY,
+    url           TEXT NOT NULL,
+    status        INTEGER NOT NULL,
+    headers       TEXT NOT NULL,
+    content       BLOB NOT NULL,
+    encoding      TEXT,
+    etag          TEXT,
+    last_modified TEXT,
+    fetched_at    REAL NOT NULL
+)
+"""
+
+
+def ttl_for(url: str) -> int:
+    """按主机名后缀匹配 TTL（秒）。"""
+    host = urlparse(url).hostname or ""
+    for suffix, ttl in HTTP_CACHE_TTL_SECONDS.items():
+        if suffix != "default" and host.endswith(suffix):
+            return int(ttl)
+    return int(HTTP_CACHE_TTL_SECONDS.get("default", 3600))
+
+
+def _cache_key(url: str, params: dict | None) -> str:
+    stable = sorted((k, str(v)) for k, v in (params or {}).items() if k not in _VOLATILE_PARAMS)
+    raw = url + ("?" + urlencode(stable) if stable else "")
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _build_response(url: str, status: int, headers: dict, content: bytes, encoding: str | None) -> requests.Response:
+    """把缓存行还原为 requests.Response，下游 .json()/.text/.content 用法不变。"""
+    resp = requests.Response()
+    resp.url = url
+    resp.status_code = status
+    resp.headers = CaseInsensitiveDict(headers)
+    resp._content = content
+    resp.encoding = encoding
+    return resp
+
+
+class HttpCache:
+    """SQLite 响应缓存 + 共享连接池。单进程内多线程安全（写操作串行化）。"""
+
+    def __init__(self, db_path: Path = HTTP_CACHE_DB, offline: bool = HTTP_OFFLINE):
+        self.db_path = Path(db_path)
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=VENDOR_MAX_WORKERS * 2, pool_maxsize=VENDOR_MAX_WORKERS * 4)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.stats = {"hit": 0, "revalidated": 0, "miss": 0}
+
+    # --- 存储 ---
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(_SCHEMA)
+        return self._conn
+
+    def _lookup(self, key: str):
+        with self._lock:
+            return self._db().execute(
+                "SELECT url, status, headers, content, encoding, etag, last_modified, fetched_at "
+                "FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+    def _store(self, key: str, resp) -> None:
+        headers = {k: v for k, v in dict(resp.headers).items()}
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, str(resp.url), int(resp.status_code), json.dumps(headers),
+                 bytes(resp.content), getattr(resp, "encoding", None),
+                 headers.get("ETag") or headers.get("etag"),
+                 headers.get("Last-Modified") or headers.get("last-modified"),
+                 time.time()),
+            )
+            self._db().commit()
+
+    def _touch(self, key: str) -> None:
+        with self._lock:
+            self._db().execute("UPDATE responses SET fetched_at = ? WHERE key = ?", (time.time(), key))
+            self._db().commit()
+
+    # --- 请求 ---
+    def fetch(self, url: str, params: dict | None, network_get, ttl: int | None = None,
+              conditional: bool = False, **kwargs):
+        """
+        通用缓存读取流程；network_get(url, params=..., headers=..., **kwargs) 负责真正的网络请求，
+        使同一套 TTL/条件请求/离线逻辑可以套在 requests 与 yfinance 的 curl_cffi 会话上。
+        """
+        key = _cache_key(url, params)
+        ttl = ttl_for(url) if ttl is None else ttl
+        row = self._lookup(key)
+
+        if row is not None:
+            c_url, status, headers, content, encoding, etag, last_mod, fetched_at = row
+            fresh = (time.time() - fetched_at) < ttl
+            if fresh or self.offline:
+                self.stats["hit"] += 1
+                telemetry.count("cache.http.hit")
+                return _build_response(c_url, status, json.loads(headers), content, encoding)
+        elif self.offline:
+            raise OfflineCacheMiss(f"[offline] 缓存未命中: {url}")
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if row is not None and conditional:
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_mod:
+                headers["If-Modified-Since"] = last_mod
+
+        host = urlparse(url).hostname or "unknown"
+        with telemetry.timer(f"http.{host}"):
+            resp = network_get(url, params=params, headers=headers or None, **kwargs)
+        if row is not None and resp.status_code == 304:
+            self._touch(key)
+            self.stats["revalidated"] += 1
+            telemetry.count("cache.http.revalidated")
+            return _build_response(c_url, status, json.loads(row[2]), content, encoding)
+
+        self.stats["miss"] += 1
+        telemetry.count("cache.http.miss")
+        telemetry.count("http.bytes", len(resp.content or b""))
+        if 200 <= resp.status_code < 300:
+            self._store(key, resp)
+        return resp
+
+    def get(self, url: str, params: dict | None = None, ttl: int | None = None,
+            conditional: bool = False, **kwargs) -> requests.Response:
+        """经连接池发起 GET（走缓存）。conditional=True 时过期条目使用条件请求再验证。"""
+        return self.fetch(url, params, self.session.get, ttl=ttl, conditional=conditional, **kwargs)
+
+
+# ==========================================================================
+# 进程级单例 + 便捷函数
+# ==========================================================================
+
+_CACHE: HttpCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache() -> HttpCache:
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = HttpCache()
+    return _CACHE
+
+
+_BYPASS = False
+
+
+def get(url: str, params: dict | None = None, ttl: int | None = None,
+        conditional: bool = False, **kwargs) -> requests.Response:
+    if _BYPASS:
+        # 运行时查找 requests.get：录制 / 回放模式替换的就是它
+        return requests.get(url, params=params, **kwargs)
+    return get_cache().get(url, params=params, ttl=ttl, conditional=conditional, **kwargs)
+
+
+def set_offline(offline: bool = True) -> None:
+    get_cache().offline = offline
+
+
+def set_bypass(bypass: bool = True) -> None:
+    """完全绕过缓存（录制 / 回放模式）：直接调用的 get() 也不读写缓存，每个请求都经过录制器。"""
+    global _BYPASS
+    _BYPASS = bypass
+
+
+# ==========================================================================
+# vendor 适配器（monkeypatch）
+# ==========================================================================
+
+_ADAPTERS_INSTALLED = False
+
+
+def install_vendor_adapters() -> None:
+    """
+    让 AkShare 与 yfinance 的 HTTP 请求也走同一缓存：
+        - requests.get           → 缓存版（AkShare 绝大多数接口直接调用模块级 requests.get）
+        - yfinance YfData.get    → 缓存版（保留 yfinance 自带 curl_cffi 会话做真实请求）
+    幂等，可重复调用。
+    """
+    global _ADAPTERS_INSTALLED
+    if _ADAPTERS_INSTALLED:
+        return
+    cache = get_cache()
+
+    def _cached_requests_get(url, params=None, **kwargs):
+        return cache.get(url, params=params, **kwargs)
+
+    requests.get = _cached_requests_get
+
+    try:
+        from yfinance.data import YfData
+    except ImportError:
+        YfData = None
+
+    if YfData is not None and hasattr(YfData, "get"):
+        original_get = YfData.get
+
+        def _cached_yf_get(self, url, params=None, *args, **kwargs):
+            def _network(u, params=None, headers=None, **kw):
+                return original_get(self, u, params, *args, **kwargs)
+            return cache.fetch(url, params, _network)
+
+        YfData.get = _cached_yf_get
+
+    _ADAPTERS_INSTALLED = True
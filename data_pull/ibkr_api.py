@@ -1,15 +1,27 @@
 import sys
 from datetime import datetime
 import pandas as pd
-from ib_insync import IB, Stock, util
 from pathlib import Path
 
 # 为了确保在终端里直接运行此文件也能找到根目录的 config.py，需要将项目根目录加入 sys.path
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
+import telemetry
 from config import PORTFOLIO_DIR, OHLCV_DIR, IBKR_HOST, IBKR_PORT, CLIENT_ID, ACCOUNT_ID, get_today_str, LOOKBACK_YEARS
 
+# ib_insync（连带 eventkit / nest_asyncio）只在真正连接 IBKR 时导入。
+# replay.install 会把这里替换成 RecordingIB / FakeIB 工厂，_ib_class() 原样返回替身。
+IB = None
+
+
+def _ib_class():
+    global IB
+    if IB is None:
+        from ib_insync import IB as ib_cls
+        IB = ib_cls
+    return IB
+
 # ==========================================
 # Function 1: 从 IBKR 拉取核心持仓与价格数据 (多币种隔离与汇率版)
 # ==========================================
@@ -110,6 +122,7 @@ def fetch_ibkr_base_data(ib, account_id):
     # 落盘 1: 账户资金摘要 (分币种绝对隔离)
     df_summary = pd.DataFrame(summary_rows)
     summary_file = PORTFOLIO_DIR / f"account_summary_{get_today_str()}.csv"
+    PORTFOLIO_DIR.mkdir(parents=True, exist_ok=True)
     df_summary.to_csv(summary_file, index=False, encoding='utf-8')
     print(f"   📊 账户分币种摘要已保存: {summary_file.name}")
 
@@ -242,6 +255,8 @@ def fetch_ibkr_ohlcv(ib, standard_symbol: str, currency: str, years: int = LOOKB
         currency: 计价货币 (如 "HKD", "USD")
         years: 回溯年限，默认 LOOKBACK_YEARS
     """
+    from ib_insync import Stock, util
+
     file_path = OHLCV_DIR / f"{standard_symbol}_daily.csv"
 
     # 构建合约对象
@@ -284,15 +299,16 @@ def fetch_ibkr_ohlcv(ib, standard_symbol: str, currency: str, years: int = LOOKB
     # --------------------------------------------------
     # 向 IBKR 发起历史数据请求
     # --------------------------------------------------
-    bars = ib.reqHistoricalData(
-        contract,
-        endDateTime='',
-        durationStr=duration_str,
-        barSizeSetting='1 day',
-        whatToShow='TRADES',
-        useRTH=True,
-        formatDate=1
-    )
+    with telemetry.timer("vendor.ibkr", label="reqHistoricalData", ticker=standard_symbol):
+        bars = ib.reqHistoricalData(
+            contract,
+            endDateTime='',
+            durationStr=duration_str,
+            barSizeSetting='1 day',
+            whatToShow='TRADES',
+            useRTH=True,
+            formatDate=1
+        )
 
     if not bars:
         raise RuntimeError(f"IBKR 未能获取到 {standard_symbol} 的任何历史数据")
@@ -301,6 +317,7 @@ def fetch_ibkr_ohlcv(ib, standard_symbol: str, currency: str, years: int = LOOKB
     # 转换为下游兼容的 DataFrame 格式
     # --------------------------------------------------
     df_new = util.df(bars)
+    telemetry.count("rows.ohlcv.ibkr", len(df_new))
 
     # IBKR 的 average 字段 = 当日真实 VWAP，乘以成交量即得成交额
     df_new['Turnover_Value'] = df_new['average'] * df_new['volume']
@@ -324,6 +341,7 @@ def fetch_ibkr_ohlcv(ib, standard_symbol: str, currency: str, years: int = LOOKB
         df_combined = df_new
 
     df_combined.sort_values('Date', ascending=True, inplace=True)
+    OHLCV_DIR.mkdir(parents=True, exist_ok=True)
     df_combined.to_csv(file_path, index=False, encoding='utf-8')
 
     print(f"   ✅ [IBKR] {standard_symbol} 日K线已保存 (共 {len(df_combined)} 条交易日)")
@@ -344,7 +362,7 @@ def pull_all_ibkr_data():
         ConnectionError: TWS/Gateway 未启动或端口错误
         其他异常向上抛出，由 main.py 捕获处理
     """
-    ib = IB()
+    ib = _ib_class()()
     try:
         ib.connect(IBKR_HOST, IBKR_PORT, clientId=CLIENT_ID, readonly=True)
         print("✅ 成功连接至 IBKR TWS/Gateway!")
@@ -1,7 +1,7 @@
 import sys
 import json
+import threading
 import requests
-import akshare as ak
 import xml.etree.ElementTree as ET
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -9,51 +9,86 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
-from config import SENTIMENT_DIR
+from concurrent.futures import ThreadPoolExecutor
+
+from config import SENTIMENT_DIR, VENDOR_MAX_WORKERS
+from data_pull import http_cache
+from hashing import url_hash
+from processors.headline_dedup import HeadlineIndex, collapse_clusters
 
 # 本地缓存文件：避免每次都重新拉取 stock_hk_spot_em 全量数据（约3分钟）
 _NAME_CACHE_FILE = SENTIMENT_DIR / "_hk_name_cache.json"
 
+# 每只股票的新闻高水位线：{ticker: {"date": "YYYY-MM-DD", "url_hashes": [最新日期已见过的 url_hash]}}
+_HWM_FILE = SENTIMENT_DIR / "_news_hwm.json"
+
+# 每只股票的标题 MinHash/LSH 索引（近重复聚类，跨运行增量匹配）
+_LSH_DIR = SENTIMENT_DIR / "_lsh"
+
+# 喂给下游（<ticker>_news.json 视图）的条数上限
+_NEWS_VIEW_LIMIT = 20
+
+# 进程级名称缓存：整个进程只读一次磁盘，且最多触发一次 stock_hk_spot_em 全量重建
+_NAME_CACHE: dict | None = None
+_NAME_CACHE_REBUILT = False
+_NAME_CACHE_LOCK = threading.Lock()
+_HWM_LOCK = threading.Lock()
+
 
 def _get_ak_symbol(standard_symbol: str) -> str:
     """0700.HK → 00700"""
     return standard_symbol.split('.')[0].zfill(5)
 
 
+def _load_name_cache() -> dict:
+    """读取本地名称缓存（每个进程只读一次磁盘）。"""
+    global _NAME_CACHE
+    with _NAME_CACHE_LOCK:
+        if _NAME_CACHE is None:
+            _NAME_CACHE = {}
+            if _NAME_CACHE_FILE.exists():
+                try:
+                    with open(_NAME_CACHE_FILE, 'r', encoding='utf-8') as f:
+                        _NAME_CACHE = json.load(f)
+                except Exception:
+                    pass
+        return _NAME_CACHE
+
+
 def _get_cn_name(standard_symbol: str) -> str:
     """
     获取港股简体中文名称（如"腾讯控股"）。
-    优先读本地缓存，缓存未命中才拉取 stock_hk_spot_em 并更新缓存。
+    优先读进程内缓存，未命中才拉取 stock_hk_spot_em 并更新缓存（整个进程至多一次）。
     """
+    global _NAME_CACHE_REBUILT
     ak_symbol = _get_ak_symbol(standard_symbol)
 
-    # 读缓存
-    cache = {}
-    if _NAME_CACHE_FILE.exists():
-        try:
-            with open(_NAME_CACHE_FILE, 'r', encoding='utf-8') as f:
-                cache = json.load(f)
-        except Exception:
-            pass
-
+    cache = _load_name_cache()
     if ak_symbol in cache:
         return cache[ak_symbol]
 
-    # 缓存未命中 → 拉取全量港股名称列表（耗时约1-3分钟，只需执行一次）
-    print(f"   📋 首次构建港股名称缓存 (stock_hk_spot_em，需1-3分钟，后续瞬时读取)...")
-    try:
-        df = ak.stock_hk_spot_em()
-        for _, row in df.iterrows():
-            code = str(row.get('代码', ''))
-            name = str(row.get('名称', ''))
-            if code and name:
-                cache[code] = name
-        SENTIMENT_DIR.mkdir(parents=True, exist_ok=True)
-        with open(_NAME_CACHE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(cache, f, ensure_ascii=False, indent=2)
-        print(f"      ✅ 名称缓存已保存 ({len(cache)} 只港股)")
-    except Exception as e:
-        print(f"   ⚠️ 获取港股中文名称失败: {e}")
+    with _NAME_CACHE_LOCK:
+        # 并发场景下其他线程可能已经重建过
+        if ak_symbol in cache or _NAME_CACHE_REBUILT:
+            return cache.get(ak_symbol, standard_symbol)
+        _NAME_CACHE_REBUILT = True
+
+        # 缓存未命中 → 拉取全量港股名称列表（耗时约1-3分钟，只需执行一次）
+        print(f"   📋 首次构建港股名称缓存 (stock_hk_spot_em，需1-3分钟，后续瞬时读取)...")
+        try:
+            import akshare as ak  # 导入很慢，只在真正请求时加载
+            df = ak.stock_hk_spot_em()
+            for _, row in df.iterrows():
+                code = str(row.get('代码', ''))
+                name = str(row.get('名称', ''))
+                if code and name:
+                    cache[code] = name
+            SENTIMENT_DIR.mkdir(parents=True, exist_ok=True)
+            with open(_NAME_CACHE_FILE, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, ensure_ascii=False, indent=2)
+            print(f"      ✅ 名称缓存已保存 ({len(cache)} 只港股)")
+        except Exception as e:
+            print(f"   ⚠️ 获取港股中文名称失败: {e}")
 
     return cache.get(ak_symbol, standard_symbol)
 
@@ -78,16 +113,23 @@ def _parse_date(ts) -> str:
     return datetime.utcnow().strftime("%Y-%m-%d")
 
 
-def _fetch_google_rss_news(cn_name: str, cutoff_date: datetime) -> list[dict]:
-    """用简体中文公司名从 Google News RSS 拉取新闻"""
+def _fetch_google_rss_news(cn_name: str, cutoff_date: datetime, incremental: bool = False) -> list[dict]:
+    """
+    用简体中文公司名从 Google News RSS 拉取新闻。
+    incremental=True 时在查询中附加 after:（高水位线前一天），只请求更新的条目。
+    """
     results = []
     try:
-        query = requests.utils.quote(f"{cn_name} 股票")
+        keywords = f"{cn_name} 股票"
+        if incremental:
+            keywords += f" after:{(cutoff_date - timedelta(days=1)):%Y-%m-%d}"
+        query = requests.utils.quote(keywords)
         url = (
             f"https://news.google.com/rss/search?q={query}"
             f"&hl=zh-CN&gl=HK&ceid=HK:zh-Hans"
         )
-        resp = requests.get(url, timeout=10)
+        # 走共享 HTTP 层：连接池复用 + TTL 缓存 + ETag/If-Modified-Since 条件请求
+        resp = http_cache.get(url, timeout=10, conditional=True)
         resp.raise_for_status()
         root = ET.fromstring(resp.content)
         channel = root.find("channel")
@@ -115,6 +157,7 @@ def _fetch_akshare_news(ak_symbol: str, cutoff_date: datetime) -> list[dict]:
     """从 AkShare stock_news_em (东方财富) 拉取最近100条新闻并过滤日期"""
     results = []
     try:
+        import akshare as ak
         df = ak.stock_news_em(symbol=ak_symbol)
         if df is None or df.empty:
             return results
@@ -134,48 +177,193 @@ def _fetch_akshare_news(ak_symbol: str, cutoff_date: datetime) -> list[dict]:
     return results
 
 
-def fetch_stock_news(standard_symbol: str, days_back: int = 30) -> list[dict]:
+def _archive_file(standard_symbol: str) -> Path:
+    return SENTIMENT_DIR / f"{standard_symbol}_news_archive.jsonl"
+
+
+def _load_archive(standard_symbol: str) -> list[dict]:
     """
-    拉取指定港股近 days_back 天的新闻。
+    读取累积新闻归档 (JSON Lines，只追加)。
+    首次运行时用旧版 <ticker>_news.json 做种子，避免丢掉已有的 20 条。
+    """
+    path = _archive_file(standard_symbol)
+    if not path.exists():
+        legacy = SENTIMENT_DIR / f"{standard_symbol}_news.json"
+        if not legacy.exists():
+            return []
+        try:
+            with open(legacy, 'r', encoding='utf-8') as f:
+                seed = json.load(f)
+        except Exception:
+            return []
+        for a in seed:
+            a.setdefault("url_hash", url_hash(a.get("url") or a.get("title") or ""))
+        _append_archive(standard_symbol, seed)
+        return seed
+
+    items = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    items.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return items
+
+
+def _append_archive(standard_symbol: str, articles: list[dict]) -> None:
+    if not articles:
+        return
+    SENTIMENT_DIR.mkdir(parents=True, exist_ok=True)
+    with open(_archive_file(standard_symbol), 'a', encoding='utf-8') as f:
+        for a in articles:
+            f.write(json.dumps(a, ensure_ascii=False) + "\n")
+
+
+def _write_news_view(standard_symbol: str, archive: list[dict], cutoff_date: datetime) -> list[dict]:
+    """
+    <ticker>_news.json = 归档中窗口期内最新的 _NEWS_VIEW_LIMIT 个聚类（日期降序）。
+    近重复标题只保留一条代表，附 source_count / sources。
+    """
+    cutoff_str = cutoff_date.strftime("%Y-%m-%d")
+    view = [a for a in archive if a.get("date", "") >= cutoff_str]
+    view.sort(key=lambda x: x["date"], reverse=True)
+    view = collapse_clusters(view)[:_NEWS_VIEW_LIMIT]
+
+    output_file = SENTIMENT_DIR / f"{standard_symbol}_news.json"
+    SENTIMENT_DIR.mkdir(parents=True, exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(view, f, indent=4, ensure_ascii=False)
+    return view
+
+
+def _load_hwm() -> dict:
+    if not _HWM_FILE.exists():
+        return {}
+    try:
+        with open(_HWM_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _save_hwm(hwm: dict) -> None:
+    SENTIMENT_DIR.mkdir(parents=True, exist_ok=True)
+    with _HWM_LOCK:
+        with open(_HWM_FILE, 'w', encoding='utf-8') as f:
+            json.dump(hwm, f, ensure_ascii=False, indent=2)
+
+
+def fetch_stock_news(standard_symbol: str, days_back: int = 30, hwm: dict | None = None) -> list[dict]:
+    """
+    增量拉取指定港股的新闻，并合并进累积归档。
     主引擎: AkShare stock_news_em（东方财富，及时性更好，约返回10条）。
     补充引擎: Google News RSS（始终运行，约返回10条，两源直接合并）。
-    结果落盘至 data/input/sentiment/{symbol}_news.json，最多保留20条。
+
+    高水位线 (最新已见日期 + 当日已见 url_hash) 之前的条目不再请求/合并；
+    新条目经标题 MinHash/LSH 聚类后（cluster_id）追加到 {symbol}_news_archive.jsonl，
+    {symbol}_news.json 重写为归档上的近 days_back 天视图（每个聚类一条代表，最多20条）。
+
+    参数:
+        hwm: 共享的高水位线字典（批量模式由 fetch_news_for_holdings 传入并统一落盘）；
+             None 时本函数自行读写 _news_hwm.json
     """
+    own_hwm = hwm is None
+    if own_hwm:
+        hwm = _load_hwm()
+
     ak_symbol = _get_ak_symbol(standard_symbol)
-    cutoff_date = datetime.utcnow() - timedelta(days=days_back)
+    window_start = datetime.utcnow() - timedelta(days=days_back)
+
+    mark = hwm.get(standard_symbol) or {}
+    mark_date = mark.get("date")
+    seen_hashes = set(mark.get("url_hashes") or [])
+    incremental = bool(mark_date) and datetime.strptime(mark_date, "%Y-%m-%d") > window_start
+    cutoff_date = datetime.strptime(mark_date, "%Y-%m-%d") if incremental else window_start
 
     # 获取中文公司名
     cn_name = _get_cn_name(standard_symbol)
-    print(f"   📰 正在拉取 {standard_symbol}（{cn_name}）近 {days_back} 天新闻...")
+    mode = f"增量 (自 {mark_date})" if incremental else f"近 {days_back} 天"
+    print(f"   📰 正在拉取 {standard_symbol}（{cn_name}）{mode}新闻...")
 
-    articles: list[dict] = []
+    # 两个引擎（AkShare stock_news_em + Google News RSS）合并；URL 格式不同，跨源近重复由标题聚类处理
+    fetched: list[dict] = []
+    fetched.extend(_fetch_akshare_news(ak_symbol, cutoff_date))
+    n_ak = len(fetched)
+    fetched.extend(_fetch_google_rss_news(cn_name, cutoff_date, incremental=incremental))
+    print(f"      {standard_symbol}: AkShare {n_ak} 条 + Google News {len(fetched) - n_ak} 条")
 
-    # 主引擎：AkShare stock_news_em（东方财富，及时性更好）
-    print(f"      [1/2] AkShare stock_news_em 拉取 (symbol={ak_symbol})...")
-    articles.extend(_fetch_akshare_news(ak_symbol, cutoff_date))
-    print(f"      AkShare 获得 {len(articles)} 条有效新闻")
+    # 只保留高水位线之后的新条目（同一天的按 url_hash 去重），批内也去重
+    archive = _load_archive(standard_symbol)
+    archive_hashes = {a.get("url_hash") for a in archive}
+    new_items = []
+    for a in fetched:
+        h = url_hash(a.get("url") or a.get("title") or "")
+        if h in archive_hashes or h in seen_hashes:
+            continue
+        if mark_date and a["date"] < mark_date:
+            continue
+        a["url_hash"] = h
+        archive_hashes.add(h)
+        new_items.append(a)
 
-    # 补充引擎：Google News RSS（始终运行，两源 URL 格式不同无法去重，直接合并）
-    print(f"      [2/2] Google News RSS 补充搜索: 「{cn_name} 股票」...")
-    before = len(articles)
-    articles.extend(_fetch_google_rss_news(cn_name, cutoff_date))
-    print(f"      Google News 新增 {len(articles) - before} 条（共 {len(articles)} 条）")
+    # 标题近重复聚类：旧归档（无 cluster_id 的历史条目）按 url_hash 复用或补建，新条目走 LSH 匹配
+    lsh_file = _LSH_DIR / f"{standard_symbol}.npz"
+    index = HeadlineIndex.load(lsh_file)
+    index.assign([a for a in archive if not a.get("cluster_id")])
+    index.assign(new_items)
+    index.save(lsh_file)
 
-    if not articles:
+    _append_archive(standard_symbol, new_items)
+    archive.extend(new_items)
+
+    # 推进高水位线
+    if archive:
+        latest = max(a["date"] for a in archive)
+        hwm[standard_symbol] = {
+            "date": latest,
+            "url_hashes": sorted({a["url_hash"] for a in archive if a.get("date") == latest and a.get("url_hash")}),
+        }
+    if own_hwm:
+        _save_hwm(hwm)
+
+    view = _write_news_view(standard_symbol, archive, window_start)
+    if not view:
         print(f"   ⚠️ {standard_symbol} 未找到任何新闻，将返回空列表")
+    n_clusters = len({a.get("cluster_id") for a in new_items})
+    print(f"      ✅ {standard_symbol} 新增 {len(new_items)} 条 ({n_clusters} 个聚类)，"
+          f"视图 {len(view)} 条 (归档共 {len(archive)} 条)")
+    return view
 
-    # 排序（日期降序）并截取前 20 条
-    articles.sort(key=lambda x: x["date"], reverse=True)
-    articles = articles[:20]
 
-    # 落盘
-    SENTIMENT_DIR.mkdir(parents=True, exist_ok=True)
-    output_file = SENTIMENT_DIR / f"{standard_symbol}_news.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(articles, f, indent=4, ensure_ascii=False)
-    print(f"      ✅ 新闻数据已落盘: {output_file.name} ({len(articles)} 条)")
+def fetch_news_for_holdings(symbols: list[str], days_back: int = 30,
+                            max_workers: int = VENDOR_MAX_WORKERS) -> dict[str, list[dict]]:
+    """
+    全部持仓并发增量拉取新闻（有界线程池），高水位线统一读一次、写一次。
+    单只股票失败不影响其他股票；返回 {ticker: 新闻视图}。
+    """
+    if not symbols:
+        return {}
 
-    return articles
+    hwm = _load_hwm()
+    # 先在主线程预热名称缓存，避免多个线程同时触发 stock_hk_spot_em 全量重建
+    for sym in symbols:
+        _get_cn_name(sym)
+
+    results: dict[str, list[dict]] = {}
+    workers = max(1, min(max_workers, len(symbols)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {sym: pool.submit(fetch_stock_news, sym, days_back, hwm) for sym in symbols}
+        for sym, fut in futures.items():
+            try:
+                results[sym] = fut.result()
+            except Exception as e:
+                print(f"   ⚠️ {sym} 新闻拉取失败，将跳过舆情分析: {e}")
+
+    _save_hwm(hwm)
+    return results
 
 
 # ==========================================
@@ -0,0 +1,445 @@
+"""
+replay.py — 离线录制/回放层 (Record & Replay Harness)
+
+流水线的每一个外部依赖 (TWS、Yahoo、东方财富、Google News) 都可以被录制到本地
+fixture 仓库，再在无网络、无 TWS 的环境下按可配置延迟原样回放，用于对 main.py
+做确定性的端到端基准测试。
+
+覆盖的调用面：
+    ib_insync.IB                      → RecordingIB / FakeIB
+    yf.Ticker (info/三表/history)     → RecordingTicker / ReplayTicker
+    ak.stock_financial_hk_report_em   → 函数级替换
+    ak.stock_news_em / stock_hk_spot_em
+    requests.get / Session.get        → 响应体快照 (_RecordedResponse)
+                                        (http_cache 的连接池经 Session.get 发请求)
+
+Fixture 布局：
+    data/replay/<vendor>/<method>__<key_hash>.pkl
+
+公开接口：
+    install(mode, latency=0.0, root=REPLAY_DIR)   # mode: "record" | "replay"
+    uninstall()
+    FakeIB / FixtureStore / ReplayMissError
+
+CLI：
+    python main.py --record                       # 在线跑一遍并录制
+    python main.py --replay --latency 0.05        # 离线回放，每次调用模拟 50ms 延迟
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import pickle
+import sys
+import time
+from dataclasses import fields, is_dataclass
+from pathlib import Path
+from types import SimpleNamespace
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from config import REPLAY_DIR
+
+
+class ReplayMissError(KeyError):
+    """回放模式下找不到对应 fixture（需先用 --record 在线跑一遍）。"""
+
+
+# ==========================================================================
+# 1. Fixture 仓库
+# ==========================================================================
+
+def _contract_key(c) -> str:
+    # 只取 secType/symbol/currency：conId 与 exchange 在 qualifyContracts 前后会变化，
+    # 放进 key 会让录制时（已 qualify）和回放时（未 qualify）对不上。
+    return f"{getattr(c, 'secType', '')}:{getattr(c, 'symbol', '')}:{getattr(c, 'currency', '')}"
+
+
+def _freeze_key(obj) -> str:
+    """把调用参数折叠成稳定字符串，合约对象按 _contract_key 归一化。"""
+    if hasattr(obj, "secType") and hasattr(obj, "symbol"):
+        return _contract_key(obj)
+    if isinstance(obj, (list, tuple)):
+        return "(" + ",".join(_freeze_key(o) for o in obj) + ")"
+    if isinstance(obj, dict):
+        return "{" + ",".join(f"{k}={_freeze_key(obj[k])}" for k in sorted(obj)) + "}"
+    return repr(obj)
+
+
+def _snapshot(obj):
+    """
+    录制前把对象转换成可 pickle 的形态。
+    ib_insync 的 Ticker 内含 eventkit.Event，无法直接 pickle → 降级为 SimpleNamespace；
+    BarData / PortfolioItem 等纯 dataclass 原样保留（util.df 依赖 dataclass 识别）。
+    """
+    try:
+        pickle.dumps(obj)
+        return obj
+    except Exception:
+        pass
+    if isinstance(obj, list):
+        return [_snapshot(o) for o in obj]
+    if is_dataclass(obj):
+        attrs = {}
+        for f in fields(obj):
+            val = getattr(obj, f.name, None)
+            if hasattr(val, "emit") and hasattr(val, "connect"):
+                continue  # 丢弃事件对象
+            attrs[f.name] = _snapshot(val)
+        return SimpleNamespace(**attrs)
+    return repr(obj)
+
+
+class FixtureStore:
+    """按 (vendor, method, key) 存取 pickle fixture。"""
+
+    def __init__(self, root: Path = REPLAY_DIR):
+        self.root = Path(root)
+
+    def path(self, vendor: str, method: str, key: str) -> Path:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return self.root / vendor / f"{method}__{digest}.pkl"
+
+    def save(self, vendor: str, method: str, key: str, value) -> Path:
+        path = self.path(vendor, method, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump({"key": key, "value": _snapshot(value)}, f)
+        return path
+
+    def load(self, vendor: str, method: str, key: str):
+        path = self.path(vendor, method, key)
+        if not path.exists():
+            raise ReplayMissError(f"[replay] 缺少 fixture: {vendor}.{method}({key})")
+        with open(path, "rb") as f:
+            return pickle.load(f)["value"]
+
+
+# ==========================================================================
+# 2. 回放延迟
+# ==========================================================================
+
+class _Latency:
+    """单一浮点数 = 所有 vendor 相同延迟；dict = 按 vendor 单独配置（缺省 0）。"""
+
+    def __init__(self, latency: float | dict[str, float] = 0.0):
+        self.latency = latency
+
+    def sleep(self, vendor: str) -> None:
+        if isinstance(self.latency, dict):
+            sec = float(self.latency.get(vendor, 0.0))
+        else:
+            sec = float(self.latency or 0.0)
+        if sec > 0:
+            time.sleep(sec)
+
+
+# ==========================================================================
+# 3. IBKR：RecordingIB / FakeIB
+# ==========================================================================
+
+# 方法名 → 参与 key 的位置参数/关键字参数名（其余参数如 durationStr 随日期变化，不参与 key）
+_IB_RECORDED = {
+    "accountValues": ("account",),
+    "portfolio": ("account",),
+    "reqContractDetails": ("contract",),
+    "reqMktData": ("contract",),
+    "reqPnLSingle": ("account", "modelCode", "conId"),
+    "reqHistoricalData": ("contract", "barSizeSetting", "whatToShow"),
+}
+
+# 纯副作用调用：回放时直接忽略
+_IB_NOOP = ("reqAccountUpdates", "cancelMktData", "cancelPnLSingle")
+
+
+def _ib_call_key(method: str, args: tuple, kwargs: dict) -> str:
+    names = _IB_RECORDED[method]
+    picked = {}
+    for i, name in enumerate(names):
+        if name in kwargs:
+            picked[name] = kwargs[name]
+        elif i < len(args):
+            picked[name] = args[i]
+    return _freeze_key(picked)
+
+
+class RecordingIB:
+    """
+    真实 IB 连接的透明代理：记录 _IB_RECORDED 中方法的返回值。
+    reqMktData / reqPnLSingle 返回的对象会在 ib.sleep() 期间被异步填充，
+    所以只先记下引用，到 disconnect()（或进程退出）时才统一快照落盘。
+    """
+
+    def __init__(self, real, store: FixtureStore):
+        self._real = real
+        self._store = store
+        self._pending: dict[tuple[str, str], object] = {}
+        atexit.register(self.flush)
+
+    def __getattr__(self, name):
+        attr = getattr(self._real, name)
+        if name not in _IB_RECORDED:
+            return attr
+
+        def _wrapped(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            self._pending[(name, _ib_call_key(name, args, kwargs))] = result
+            return result
+        return _wrapped
+
+    def flush(self) -> None:
+        for (method, key), value in self._pending.items():
+            self._store.save("ibkr", method, key, value)
+        self._pending.clear()
+
+    def disconnect(self):
+        self.flush()
+        return self._real.disconnect()
+
+
+class FakeIB:
+    """
+    离线 IB 替身：支持流水线用到的全部调用
+    (connect / portfolio / accountValues / reqContractDetails / reqMktData /
+    reqPnLSingle / qualifyContracts / reqHistoricalData / sleep / disconnect ...)。
+    ib.sleep() 不真正等待，节奏由 latency 统一控制。
+    """
+
+    def __init__(self, store: FixtureStore, latency: _Latency):
+        self._store = store
+        self._latency = latency
+        self._connected = False
+
+    # --- 连接管理 ---
+    def connect(self, *args, **kwargs):
+        self._connected = True
+        return self
+
+    def isConnected(self) -> bool:
+        return self._connected
+
+    def disconnect(self) -> None:
+        self._connected = False
+
+    def sleep(self, *args) -> bool:
+        return True
+
+    def qualifyContracts(self, *contracts):
+        return list(contracts)
+
+    def __getattr__(self, name):
+        if name in _IB_NOOP:
+            return lambda *args, **kwargs: None
+        if name in _IB_RECORDED:
+            def _replayed(*args, **kwargs):
+                self._latency.sleep("ibkr")
+                return self._store.load("ibkr", name, _ib_call_key(name, args, kwargs))
+            return _replayed
+        raise AttributeError(f"FakeIB 不支持 {name}()，请在 _IB_RECORDED 中登记")
+
+
+# ==========================================================================
+# 4. yfinance：RecordingTicker / ReplayTicker
+# ==========================================================================
+
+# history(start=..., end=...) 的日期随运行日变化，不参与 key
+_YF_VOLATILE_KWARGS = ("start", "end")
+
+
+def _yf_key(symbol: str, name: str, kwargs: dict | None = None) -> str:
+    if kwargs is None:
+        return f"{symbol}.{name}"
+    stable = {k: v for k, v in kwargs.items() if k not in _YF_VOLATILE_KWARGS}
+    return f"{symbol}.{name}{_freeze_key(stable)}"
+
+
+class RecordingTicker:
+    def __init__(self, real_cls, store: FixtureStore, symbol: str, *args, **kwargs):
+        self._real = real_cls(symbol, *args, **kwargs)
+        self._store = store
+        self._symbol = symbol
+
+    def __getattr__(self, name):
+        value = getattr(self._real, name)
+        if not callable(value):
+            self._store.save("yfinance", name, _yf_key(self._symbol, name), value)
+            return value
+
+        def _wrapped(*args, **kwargs):
+            result = value(*args, **kwargs)
+            self._store.save("yfinance", name, _yf_key(self._symbol, name, kwargs), result)
+            return result
+        return _wrapped
+
+
+class ReplayTicker:
+    # yf.Ticker 上以方法形式调用的成员；其余成员（info/financials/...）按属性回放
+    _METHODS = ("history",)
+
+    def __init__(self, store: FixtureStore, latency: _Latency, symbol: str, *args, **kwargs):
+        self._store = store
+        self._latency = latency
+        self._symbol = symbol
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in self._METHODS:
+            def _replayed(*args, **kwargs):
+                self._latency.sleep("yfinance")
+                return self._store.load("yfinance", name, _yf_key(self._symbol, name, kwargs))
+            return _replayed
+        self._latency.sleep("yfinance")
+        return self._store.load("yfinance", name, _yf_key(self._symbol, name))
+
+
+# ==========================================================================
+# 5. 函数级替换：AkShare / requests.get
+# ==========================================================================
+
+_AK_FUNCTIONS = ("stock_financial_hk_report_em", "stock_news_em", "stock_hk_spot_em")
+
+
+class _RecordedResponse:
+    """requests.Response 的最小可 pickle 快照（news_api 只用到 content/status）。"""
+
+    def __init__(self, url: str, status_code: int, content: bytes, headers: dict, encoding: str | None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.encoding = encoding
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def json(self):
+        import json
+        return json.loads(self.text)
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise RuntimeError(f"HTTP {self.status_code}: {self.url}")
+
+
+def _http_key(url: str, kwargs: dict) -> str:
+    return url + _freeze_key(kwargs.get("params") or {})
+
+
+def _record_fn(store: FixtureStore, vendor: str, name: str, fn):
+    def _wrapped(*args, **kwargs):
+        result = fn(*args, **kwargs)
+        store.save(vendor, name, _freeze_key((args, kwargs)), result)
+        return result
+    return _wrapped
+
+
+def _replay_fn(store: FixtureStore, latency: _Latency, vendor: str, name: str):
+    def _replayed(*args, **kwargs):
+        latency.sleep(vendor)
+        return store.load(vendor, name, _freeze_key((args, kwargs)))
+    return _replayed
+
+
+def _record_requests_get(store: FixtureStore, real_get):
+    def _wrapped(url, **kwargs):
+        resp = real_get(url, **kwargs)
+        snap = _RecordedResponse(resp.url, resp.status_code, resp.content,
+                                 dict(resp.headers), resp.encoding)
+        store.save("http", "get", _http_key(url, kwargs), snap)
+        return resp
+    return _wrapped
+
+
+def _replay_requests_get(store: FixtureStore, latency: _Latency):
+    def _replayed(url, **kwargs):
+        latency.sleep("http")
+        return store.load("http", "get", _http_key(url, kwargs))
+    return _replayed
+
+
+def _as_method(fn):
+    """把 (url, **kwargs) 形式的包装函数适配成 Session.get(self, url, **kwargs)。"""
+    def _method(self, url, **kwargs):
+        return fn(url, **kwargs)
+    return _method
+
+
+# ==========================================================================
+# 6. 安装 / 卸载
+# ==========================================================================
+
+_ORIGINALS: list[tuple[object, str, object]] = []
+
+
+def _patch(target, name: str, value) -> None:
+    _ORIGINALS.append((target, name, getattr(target, name)))
+    setattr(target, name, value)
+
+
+def install(
+    mode: str,
+    latency: float | dict[str, float] = 0.0,
+    root: Path = REPLAY_DIR,
+) -> FixtureStore:
+    """
+    在进程内替换所有外部调用面。必须在 main() 运行前调用。
+
+    参数:
+        mode    : "record" 在线调用并录制；"replay" 仅从 fixture 回放
+        latency : 回放时每次调用的模拟延迟（秒），可按 vendor 传 dict
+                  (键: "ibkr" / "yfinance" / "akshare" / "http")
+        root    : fixture 根目录
+    """
+    if mode not in ("record", "replay"):
+        raise ValueError(f"未知 replay 模式: {mode!r}")
+    if _ORIGINALS:
+        uninstall()
+
+    import akshare as ak
+    import requests
+    import yfinance as yf
+    from data_pull import ibkr_api
+
+    store = FixtureStore(root)
+    lat = _Latency(latency)
+
+    if mode == "record":
+        real_ib_cls = ibkr_api._ib_class()
+        real_ticker_cls = yf.Ticker
+        _patch(ibkr_api, "IB", lambda: RecordingIB(real_ib_cls(), store))
+        _patch(yf, "Ticker", lambda symbol, *a, **kw: RecordingTicker(real_ticker_cls, store, symbol, *a, **kw))
+        for name in _AK_FUNCTIONS:
+            _patch(ak, name, _record_fn(store, "akshare", name, getattr(ak, name)))
+        _patch(requests, "get", _record_requests_get(store, requests.get))
+        real_session_get = requests.Session.get
+
+        def _record_session_get(self, url, **kwargs):
+            bound = lambda u, **k: real_session_get(self, u, **k)
+            return _record_requests_get(store, bound)(url, **kwargs)
+        _patch(requests.Session, "get", _record_session_get)
+    else:
+        _patch(ibkr_api, "IB", lambda: FakeIB(store, lat))
+        _patch(yf, "Ticker", lambda symbol, *a, **kw: ReplayTicker(store, lat, symbol, *a, **kw))
+        for name in _AK_FUNCTIONS:
+            _patch(ak, name, _replay_fn(store, lat, "akshare", name))
+        _patch(requests, "get", _replay_requests_get(store, lat))
+        _patch(requests.Session, "get", _as_method(_replay_requests_get(store, lat)))
+
+    print(f"🎞️ [Replay] 已启用 {mode} 模式 (fixture: {store.root})")
+    return store
+
+
+def uninstall() -> None:
+    """恢复 install() 之前的全部原始对象。"""
+    while _ORIGINALS:
+        target, name, original = _ORIGINALS.pop()
+        setattr(target, name, original)
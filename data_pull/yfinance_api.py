@@ -2,7 +2,6 @@ import sys
 import json
 import pandas as pd
 import numpy as np
-import yfinance as yf
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -11,6 +10,10 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
 from config import FINANCIALS_DIR, OHLCV_DIR, LOOKBACK_YEARS
+from data_pull.fetch_utils import run_bounded
+
+# yfinance（连带 curl_cffi / bs4 等）只在真正发请求的函数里导入：
+# 本模块会被 fundamental_calc 等间接引用，webview / 回测不应为此付出导入开销
 
 # ==========================================
 # Function 1: 拉 info.json + 三表 CSV (作为底线)
@@ -22,14 +25,37 @@ def fetch_financials(ticker_symbol: str) -> bool:
     """
     print(f"🔄 开始抓取 {ticker_symbol} 的财务报表与基本面数据 (yfinance)...")
 
+    import yfinance as yf
+
     # 注意：yfinance 认的港股代码就是 "0700.HK"，不需要像 AkShare 那样去转换
-    ticker = yf.Ticker(ticker_symbol)
+    # 映射字典：将 yfinance 的属性对象与我们要保存的文件名后缀对应起来
+    financial_statements_map = {
+        "annual_income": "financials",
+        "quarterly_income": "quarterly_financials",
+        "annual_balance": "balance_sheet",
+        "quarterly_balance": "quarterly_balance_sheet",
+        "annual_cashflow": "cashflow",
+        "quarterly_cashflow": "quarterly_cashflow"
+    }
 
     # ==========================================
-    # 1. 抓取基础画像 (Info) -> 保存为 JSON
+    # 0. 并发拉取：info + 六张报表的属性访问各自是一次网络请求，
+    #    放进有界线程池同时发出（带重试退避），落盘仍按原顺序串行执行。
+    #    每个任务（含每次重试）各建一个 Ticker：yf.Ticker 内部的懒加载缓存不是线程安全的
+    # ==========================================
+    tasks = {"info": lambda: yf.Ticker(ticker_symbol).info}
+    for name, attr_name in financial_statements_map.items():
+        tasks[name] = lambda attr_name=attr_name: getattr(yf.Ticker(ticker_symbol), attr_name)
+    fetched, fetch_errors = run_bounded(tasks, vendor="yfinance")
+    FINANCIALS_DIR.mkdir(parents=True, exist_ok=True)
+
+    # ==========================================
+    # 1. 基础画像 (Info) -> 保存为 JSON
     # ==========================================
     try:
-        info = ticker.info
+        if "info" in fetch_errors:
+            raise fetch_errors["info"]
+        info = fetched["info"]
         info_file = FINANCIALS_DIR / f"{ticker_symbol}_info.json"
 
         # 将静态的字典信息落盘
@@ -40,22 +66,13 @@ def fetch_financials(ticker_symbol: str) -> bool:
         print(f"  ❌ 获取基础画像失败: {e}")
 
     # ==========================================
-    # 2. 抓取三大财报 -> 转置并保存为 CSV
+    # 2. 三大财报 -> 转置并保存为 CSV
     # ==========================================
-    # 映射字典：将 yfinance 的属性对象与我们要保存的文件名后缀对应起来
-    financial_statements_map = {
-        "annual_income": "financials",
-        "quarterly_income": "quarterly_financials",
-        "annual_balance": "balance_sheet",
-        "quarterly_balance": "quarterly_balance_sheet",
-        "annual_cashflow": "cashflow",
-        "quarterly_cashflow": "quarterly_cashflow"
-    }
-
-    for name, attr_name in financial_statements_map.items():
+    for name in financial_statements_map:
         try:
-            # 在这里（try块内部）才真正发起网络请求拉取数据
-            df = getattr(ticker, attr_name)
+            if name in fetch_errors:
+                raise fetch_errors[name]
+            df = fetched[name]
 
             # yfinance 如果没有数据，可能会返回 None 或空的 DataFrame
             if df is None or df.empty:
@@ -104,6 +121,7 @@ def fallback_to_yfinance(ticker_symbol: str, years: int) -> bool:
     start_date = end_date - timedelta(days=years * 365)
 
     try:
+        import yfinance as yf
         ticker = yf.Ticker(ticker_symbol)
         # yfinance 对新股极其包容，比如理想汽车只有 5 年历史，要 15 年它也会平稳返回 5 年数据
         df = ticker.history(start=start_date.strftime('%Y-%m-%d'), end=end_date.strftime('%Y-%m-%d'))
@@ -136,6 +154,7 @@ def fallback_to_yfinance(ticker_symbol: str, years: int) -> bool:
 
         df_clean.sort_values('Date', ascending=True, inplace=True)
         file_path = OHLCV_DIR / f"{ticker_symbol}_daily.csv"
+        OHLCV_DIR.mkdir(parents=True, exist_ok=True)
         df_clean.to_csv(file_path, index=False, encoding='utf-8')
 
         print(f"   ✅ [备用引擎] 成功! {ticker_symbol} 量价数据已由 yfinance 存入 (共 {len(df_clean)} 条)")
@@ -148,7 +167,7 @@ def fallback_to_yfinance(ticker_symbol: str, years: int) -> bool:
 # ==========================================
 # Function 3: 拉取大盘指数日 K 线 (yfinance 专属)
 # ==========================================
-def fetch_index_ohlcv(index_symbol: str, years: int = LOOKBACK_YEARS):
+def fetch_index_ohlcv(index_symbol: str, years: int = LOOKBACK_YEARS, backfill: bool = False):
     """
     通过 yfinance 拉取指数日K线数据 (如恒生指数 ^HSI, 恒生科技 ^HSTECH)。
     支持增量更新：本地已有数据时只拉缺口部分。
@@ -156,6 +175,8 @@ def fetch_index_ohlcv(index_symbol: str, years: int = LOOKBACK_YEARS):
     参数:
         index_symbol: yfinance 格式的指数代码 (如 "^HSI")
         years: 回溯年限
+        backfill: 本地最早日期晚于 years 对应的起点时，向前补齐缺失的早期历史
+                  （历史情景回放需要覆盖最早情景起点；上市晚于该起点的标的不要开启，否则每次都会白拉一遍）
     """
     from datetime import datetime, timedelta
 
@@ -172,18 +193,27 @@ def fetch_index_ohlcv(index_symbol: str, years: int = LOOKBACK_YEARS):
         last_date_str = df_existing['Date'].max()
         last_dt = datetime.strptime(last_date_str, '%Y-%m-%d')
         days_gap = (end_date - last_dt).days
+        required_start = end_date - timedelta(days=years * 365)
+        first_dt = datetime.strptime(df_existing['Date'].min(), '%Y-%m-%d')
+        # 起点容忍 10 天（节假日 / 周末），避免每次都触发补齐
+        need_backfill = backfill and first_dt - required_start > timedelta(days=10)
 
-        if days_gap <= 1:
+        if days_gap <= 1 and not need_backfill:
             print(f"   ℹ️ {index_symbol} 指数数据已是最新，跳过拉取。")
             return True
 
-        start_date = last_dt - timedelta(days=5)  # 小缓冲区防遗漏
-        print(f"   📥 [增量模式] {index_symbol} 拉取最近 {days_gap} 天...")
+        if need_backfill:
+            start_date = required_start
+            print(f"   📥 [补齐模式] {index_symbol} 本地最早 {first_dt:%Y-%m-%d}，向前补齐至 {start_date:%Y-%m-%d}...")
+        else:
+            start_date = last_dt - timedelta(days=5)  # 小缓冲区防遗漏
+            print(f"   📥 [增量模式] {index_symbol} 拉取最近 {days_gap} 天...")
     else:
         start_date = end_date - timedelta(days=years * 365)
         print(f"   📥 [全量模式] {index_symbol} 首次拉取过去 {years} 年...")
 
     try:
+        import yfinance as yf
         ticker = yf.Ticker(index_symbol)
         df = ticker.history(start=start_date.strftime('%Y-%m-%d'), end=end_date.strftime('%Y-%m-%d'))
 
@@ -209,6 +239,7 @@ def fetch_index_ohlcv(index_symbol: str, years: int = LOOKBACK_YEARS):
             df_combined = df_new
 
         df_combined.sort_values('Date', ascending=True, inplace=True)
+        OHLCV_DIR.mkdir(parents=True, exist_ok=True)
         df_combined.to_csv(file_path, index=False, encoding='utf-8')
 
         print(f"   ✅ {index_symbol} 指数日K线已保存 (共 {len(df_combined)} 条)")
@@ -227,6 +258,7 @@ def fetch_treasury_yield() -> float:
     返回百分比数字 (如 4.5 代表 4.5%)。失败时返回 None。
     """
     try:
+        import yfinance as yf
         tnx = yf.Ticker("^TNX")
         hist = tnx.history(period="5d")
         if hist.empty:
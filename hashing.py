@@ -0,0 +1,15 @@
+"""
+hashing.py — 跨层共用的短哈希键
+
+data_pull（新闻拉取的高水位线 / 去重）与 processors（情绪归档的 _keys.idx、打分缓存）都用同一个
+url_hash 作为文章主键，两边必须算出完全一致的值，因此放在根目录，不让拉取层反向依赖处理层。
+
+公开接口：
+    url_hash(url) -> str   # 16 位 md5 十六进制前缀；url 为空时按空串计算
+"""
+
+import hashlib
+
+
+def url_hash(url: str) -> str:
+    return hashlib.md5((url or "").encode("utf-8", errors="ignore")).hexdigest()[:16]
@@ -1,7 +1,18 @@
-from .prompt_template import generate_consolidated_api_prompt
-from .report_generator import generate_report
+# 子模块按需导入（PEP 562）：`python -m llm_report.report_generator` 不再经 prompt_template
+# 连带加载 pandas / processors 全套计算模块；`from llm_report import X` 用法不变
+import importlib
 
-__all__ = [
-    "generate_consolidated_api_prompt",
-    "generate_report",
-]
+_EXPORTS = {
+    "generate_consolidated_api_prompt": ".prompt_template",
+    "generate_report": ".report_generator",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = getattr(importlib.import_module(module, __name__), name)
+    return value
@@ -0,0 +1,187 @@
+"""
+llm_report/compact_extractor.py
+================================
+Deterministic local compaction of a Stage 1 per-stock analysis.
+
+Stage 1 output follows the fixed per-stock analysis_requirements
+(1. 基本面与估值穿透 / 2. 技术面与多周期共振 / 3. 情绪面分析 / 4. 牛熊指引),
+and the compact format expected by Stage 2 is equally fixed
+(see report_generator._compact_prompt_stage2):
+
+  ①核心估值结论 (≤3 行)  ②技术信号 (≤3 行)  ③情绪与新闻 (≤2 行)
+  ④推荐操作 (1 行)       ⑤关键价位 (1 行)
+
+Locally, ⑤ keeps up to 3 source lines, because Stage 1 often puts target, stop and
+support levels on separate lines. ④ prefers a bare action line. A line that
+carries price labels belongs to ⑤ and is never accepted as the action.
+
+This module splits the markdown into sections by heading, scores every
+line / table row against per-field keyword rules (section match first,
+whole document as fallback) and copies the best lines verbatim — numbers
+are never rewritten. Only markdown headings (``#``) and bold numbered lines
+(``**1. …``) open a section; plain numbered list items are content.
+
+The confidence score (share of fields filled, with the action and price
+fields weighted double) only counts fields that were found inside their own
+section and pass field validation — whole-document fallback lines are still
+rendered but never raise confidence, so a mis-structured analysis drops
+below the caller's threshold and falls back to the Haiku compaction.
+
+Public API:
+  extract_compact(full_text, ticker) -> (compact_text, confidence)
+"""
+
+from __future__ import annotations
+
+import re
+
+_MAX_COMPACT_CHARS = 600
+_MAX_LINE_CHARS = 110
+
+_HEADING_RE = re.compile(r"^\s*(#{1,6}\s+|\*\*\s*\d+[.、])")
+_TABLE_SEP_RE = re.compile(r"^\s*\|?\s*:?-{2,}")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+# field → (section-heading keywords, line keywords, max lines, weight)
+_FIELDS = {
+    "valuation": (
+        ("估值", "基本面"),
+        ("市赚率", "PR", "PEG", "DCF", "格雷厄姆", "市梦率", "低估", "高估", "合理", "估值"),
+        3, 1.0,
+    ),
+    "technical": (
+        ("技术",),
+        ("日线", "周线", "月线", "共振", "支撑", "阻力", "MACD", "RSI", "均线", "趋势"),
+        3, 1.0,
+    ),
+    "sentiment": (
+        ("情绪", "舆情", "新闻"),
+        ("利好", "利空", "中性", "情绪", "催化"),
+        2, 1.0,
+    ),
+    "action": (
+        ("牛熊", "操作", "建议", "结论", "决断"),
+        ("加仓", "减仓", "持有", "买入", "卖出", "清仓"),
+        1, 2.0,
+    ),
+    "prices": (
+        ("牛熊", "操作", "建议", "价位"),
+        ("目标价", "止损价", "参考价", "止损", "目标", "买入价", "支撑位"),
+        3, 2.0,
+    ),
+}
+_PRICE_KEYS = _FIELDS["prices"][1]
+
+_LABELS = {
+    "valuation": "①核心估值结论",
+    "technical": "②技术信号",
+    "sentiment": "③情绪与新闻",
+    "action": "④推荐操作",
+    "prices": "⑤关键价位",
+}
+
+
+def _clean(line: str) -> str:
+    """Strip markdown decoration; table rows become 'a | b | c'."""
+    line = line.strip()
+    if line.startswith("|"):
+        cells = [c.strip() for c in line.strip("|").split("|")]
+        line = " | ".join(c for c in cells if c)
+    line = re.sub(r"^#{1,6}\s*", "", line)
+    line = re.sub(r"^[-*+>]\s+", "", line)
+    line = line.replace("**", "").replace("__", "").replace("`", "")
+    return line.strip()
+
+
+def _split_sections(full_text: str) -> list[tuple[str, list[str]]]:
+    sections: list[tuple[str, list[str]]] = [("", [])]
+    for raw in full_text.splitlines():
+        if not raw.strip() or _TABLE_SEP_RE.match(raw):
+            continue
+        if _HEADING_RE.match(raw) and not raw.lstrip().startswith("|"):
+            sections.append((_clean(raw), []))
+        else:
+            sections[-1][1].append(_clean(raw))
+    return sections
+
+
+def _score(line: str, field: str) -> int:
+    hits = sum(1 for k in _FIELDS[field][1] if k in line)
+    if not hits:
+        return 0
+    has_number = bool(_NUMBER_RE.search(line))
+    if field == "prices":
+        return hits + 1 if has_number else 0
+    if field == "action":
+        # a bare action line beats one that also lists price levels (those belong to ⑤)
+        bare = not has_number and not any(k in line for k in _PRICE_KEYS)
+        return hits + (2 if bare else 0)
+    return hits + (1 if has_number else 0)
+
+
+def _pick(lines: list[str], field: str) -> list[str]:
+    limit = _FIELDS[field][2]
+    scored = [(_score(l, field), i, l) for i, l in enumerate(lines)]
+    best = sorted((t for t in scored if t[0] > 0), key=lambda t: (-t[0], t[1]))[:limit]
+    # keep document order for readability
+    return [l[:_MAX_LINE_CHARS] for _, _, l in sorted(best, key=lambda t: t[1])]
+
+
+def _valid(field: str, lines: list[str]) -> bool:
+    """Field-level sanity check applied before a field counts toward confidence."""
+    if not lines:
+        return False
+    _, line_keys, limit, _ = _FIELDS[field]
+    if len(lines) > limit:
+        return False
+    if field == "prices":
+        return all(_NUMBER_RE.search(l) for l in lines)
+    if field == "action":
+        # exactly one line that names a concrete action and is not a price line
+        return any(k in lines[0] for k in line_keys) and not any(k in lines[0] for k in _PRICE_KEYS)
+    return all(any(k in l for k in line_keys) for l in lines)
+
+
+def extract_compact(full_text: str, ticker: str = "") -> tuple[str, float]:
+    """
+    Build the Stage 2 compact summary from a Stage 1 markdown analysis.
+
+    Returns (compact_text, confidence in [0, 1]).
+    """
+    sections = _split_sections(full_text or "")
+    all_lines = [l for _, body in sections for l in body]
+
+    picked: dict[str, list[str]] = {}
+    trusted: set[str] = set()
+    for field, (sec_keys, *_) in _FIELDS.items():
+        in_section = [l for head, body in sections if any(k in head for k in sec_keys) for l in body]
+        lines = _pick(in_section, field)
+        if lines and _valid(field, lines):
+            trusted.add(field)
+        else:
+            lines = _pick(all_lines, field)
+        picked[field] = lines
+
+    total_weight = sum(spec[3] for spec in _FIELDS.values())
+    confidence = sum(spec[3] for f, spec in _FIELDS.items() if f in trusted) / total_weight
+
+    compact = _render(picked, ticker)
+    # Over the length cap: drop trailing lines of the descriptive fields first
+    # (action / prices are always kept whole), then hard-truncate
+    while len(compact) > _MAX_COMPACT_CHARS:
+        multi = [f for f in ("technical", "valuation", "sentiment") if len(picked[f]) > 1]
+        if not multi:
+            compact = compact[:_MAX_COMPACT_CHARS].rstrip() + "…"
+            break
+        longest = max(multi, key=lambda f: len(picked[f]))
+        picked[longest] = picked[longest][:-1]
+        compact = _render(picked, ticker)
+    return compact, round(confidence, 3)
+
+
+def _render(picked: dict[str, list[str]], ticker: str) -> str:
+    parts = [f"# {ticker} compact（本地提取）" if ticker else "# compact（本地提取）"]
+    for field, label in _LABELS.items():
+        body = "\n".join(picked[field]) if picked[field] else "（未提取到）"
+        parts.append(f"{label}：\n{body}")
+    return "\n".join(parts)
@@ -0,0 +1,351 @@
+"""
+llm_report/llm_backend.py
+==========================
+Pluggable LLM transport for report_generator.
+
+Every LLM call in the report pipeline goes through one LLMBackend.send(),
+which returns an LLMResult carrying the reply text plus per-call metrics
+(latency, time-to-first-token, token usage). Three implementations:
+
+  cli   CLIBackend   — `claude -p --output-format json` subprocess (the
+                       original transport). The reply is only available once
+                       the process exits, so TTFT is not measured.
+  http  HTTPBackend  — direct Messages API call with stream=true. Text deltas
+                       are appended to `stream_path` as they arrive, so a
+                       partial reply survives a timeout or a dropped
+                       connection. The shared prefix is sent as a system block
+                       with cache_control; betas go in the anthropic-beta
+                       header; effort maps to an extended-thinking budget.
+  mock  HTTPBackend pointed at llm_report.mock_server — a local SSE server
+                       with configurable latency and canned responses, for
+                       offline benchmarking of the whole report pipeline.
+
+Selection: create_backend(name) with name from --backend or the LLM_BACKEND
+env var (default "cli").
+
+Timeouts raise LLMTimeoutError (a subprocess.TimeoutExpired subclass) and
+transport/API failures raise RuntimeError, matching what report_generator
+already handles for the CLI.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+try:
+    from config import CLAUDE_API_KEY
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from config import CLAUDE_API_KEY
+
+_API_URL          = os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com").rstrip("/")
+_API_VERSION      = "2023-06-01"
+_MAX_OUTPUT_TOKENS = 16000
+
+# --effort → extended-thinking budget for the HTTP backend (None = thinking off)
+_EFFORT_THINKING_BUDGET = {
+    "low": None,
+    "medium": 4096,
+    "high": 16000,
+    "max": 32000,
+}
+
+BACKENDS = ("cli", "http", "mock")
+
+
+class LLMTimeoutError(subprocess.TimeoutExpired):
+    """Backend-neutral timeout (subclasses TimeoutExpired so existing handlers apply)."""
+
+
+@dataclass
+class LLMResult:
+    text: str
+    session_id: str = ""
+    latency_s: float = 0.0
+    ttft_s: float | None = None
+    usage: dict = field(default_factory=dict)
+
+
+def _empty_usage() -> dict:
+    return {"input_uncached": 0, "input_cache_read": 0, "input_cache_write": 0, "output": 0}
+
+
+class LLMBackend:
+    """Interface: send one prompt, return the reply with timing and token usage."""
+
+    name = "base"
+
+    def send(
+        self,
+        prompt_text: str,
+        *,
+        model: str,
+        timeout: int = 300,
+        session_id: str | None = None,
+        effort: str | None = None,
+        betas: list[str] | None = None,
+        allowed_tools: list[str] | None = None,
+        system_prefix_file: Path | None = None,
+        stream_path: Path | None = None,
+    ) -> LLMResult:
+        raise NotImplementedError
+
+
+# ---------------------------------------------------------------------------
+# CLI backend
+# ---------------------------------------------------------------------------
+
+def find_claude_cli() -> str:
+    """Return path to claude binary, or raise EnvironmentError."""
+    path = shutil.which("claude")
+    if not path:
+        raise EnvironmentError(
+            "claude CLI not found in PATH.\n"
+            "Ensure Claude Code is installed and accessible from this shell.\n"
+            "Try: claude --version"
+        )
+    return path
+
+
+def _parse_cli_usage(data: dict) -> dict:
+    """
+    Extract token usage from the CLI's JSON output.
+
+    input_tokens counts only the uncached part of the prompt; cached prefix
+    tokens are reported separately as cache_read (hit) / cache_write (first
+    call that populates the cache).
+    """
+    usage = data.get("usage") or {}
+    return {
+        "input_uncached": int(usage.get("input_tokens") or 0),
+        "input_cache_read": int(usage.get("cache_read_input_tokens") or 0),
+        "input_cache_write": int(usage.get("cache_creation_input_tokens") or 0),
+        "output": int(usage.get("output_tokens") or 0),
+        "cost_usd": data.get("total_cost_usd"),
+    }
+
+
+class CLIBackend(LLMBackend):
+    """`claude -p` in non-interactive print mode, one subprocess per call."""
+
+    name = "cli"
+
+    def __init__(self, cli_path: str | None = None):
+        self.cli_path = cli_path or find_claude_cli()
+
+    def send(self, prompt_text, *, model, timeout=300, session_id=None, effort=None,
+             betas=None, allowed_tools=None, system_prefix_file=None, stream_path=None):
+        cmd = [
+            self.cli_path, "-p",
+            "--model", model,
+            "--output-format", "json",
+        ]
+        if effort:
+            cmd += ["--effort", effort]
+        if session_id:
+            cmd += ["--resume", session_id]
+        if allowed_tools is not None:
+            cmd += ["--allowedTools", ",".join(allowed_tools)]
+        if system_prefix_file is not None:
+            # The CLI has no per-block cache_control; the appended system prompt
+            # precedes the user turn and ends at the CLI's cache breakpoint.
+            cmd += ["--append-system-prompt-file", str(system_prefix_file)]
+
+        env = os.environ.copy()
+        if betas:
+            existing = env.get("ANTHROPIC_BETAS", "").strip()
+            env["ANTHROPIC_BETAS"] = ",".join([b for b in [existing, *betas] if b])
+
+        started = time.monotonic()
+        try:
+            result = subprocess.run(
+                cmd,
+                input=prompt_text,
+                capture_output=True,
+                text=True,
+                encoding="utf-8",
+                timeout=timeout,
+                env=env,
+            )
+        except subprocess.TimeoutExpired as exc:
+            raise LLMTimeoutError(exc.cmd, exc.timeout) from exc
+        latency = time.monotonic() - started
+
+        if result.returncode != 0:
+            stderr = result.stderr.strip()
+            raise RuntimeError(f"claude exited with code {result.returncode}: {stderr[:600]}")
+
+        try:
+            data = json.loads(result.stdout)
+            text = data.get("result") or data.get("content") or result.stdout
+            sid = data.get("session_id") or session_id or ""
+            usage = _parse_cli_usage(data)
+        except json.JSONDecodeError:
+            # Fallback: raw stdout is better than nothing
+            text, sid, usage = result.stdout, session_id or "", _empty_usage()
+
+        if stream_path is not None:
+            stream_path.parent.mkdir(parents=True, exist_ok=True)
+            stream_path.write_text(text, encoding="utf-8")
+        return LLMResult(text=text, session_id=sid, latency_s=latency, ttft_s=None, usage=usage)
+
+
+# ---------------------------------------------------------------------------
+# HTTP streaming backend
+# ---------------------------------------------------------------------------
+
+class HTTPBackend(LLMBackend):
+    """
+    Messages API over HTTPS with server-sent events.
+
+    Sessions (--resume) and tool permissions are CLI concepts: session_id must
+    be None and allowed_tools is ignored (no tools are offered to the model).
+    """
+
+    name = "http"
+
+    def __init__(self, base_url: str = _API_URL, api_key: str | None = None):
+        import requests  # deferred: only the HTTP/mock backends need it
+
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key if api_key is not None else (CLAUDE_API_KEY or os.getenv("ANTHROPIC_API_KEY"))
+        if not self.api_key:
+            raise EnvironmentError("HTTP backend needs CLAUDE_API_KEY (or ANTHROPIC_API_KEY) in .env")
+        self._session = requests.Session()
+        self._requests = requests
+
+    def _request_body(self, prompt_text, model, effort, system_prefix_file) -> dict:
+        body = {
+            "model": model,
+            "max_tokens": _MAX_OUTPUT_TOKENS,
+            "stream": True,
+            "messages": [{"role": "user", "content": prompt_text}],
+        }
+        if system_prefix_file is not None:
+            body["system"] = [{
+                "type": "text",
+                "text": Path(system_prefix_file).read_text(encoding="utf-8"),
+                "cache_control": {"type": "ephemeral"},
+            }]
+        budget = _EFFORT_THINKING_BUDGET.get(effort or "low")
+        if budget:
+            body["thinking"] = {"type": "enabled", "budget_tokens": budget}
+            body["max_tokens"] = budget + _MAX_OUTPUT_TOKENS
+        return body
+
+    def send(self, prompt_text, *, model, timeout=300, session_id=None, effort=None,
+             betas=None, allowed_tools=None, system_prefix_file=None, stream_path=None):
+        if session_id:
+            raise RuntimeError(f"{self.name} backend does not support session resume")
+
+        headers = {
+            "x-api-key": self.api_key,
+            "anthropic-version": _API_VERSION,
+            "content-type": "application/json",
+        }
+        if betas:
+            headers["anthropic-beta"] = ",".join(betas)
+
+        body = self._request_body(prompt_text, model, effort, system_prefix_file)
+        usage = _empty_usage()
+        chunks: list[str] = []
+        ttft = None
+        started = time.monotonic()
+        deadline = started + timeout
+
+        sink = None
+        if stream_path is not None:
+            stream_path.parent.mkdir(parents=True, exist_ok=True)
+            sink = open(stream_path, "w", encoding="utf-8")
+        try:
+            try:
+                resp = self._session.post(f"{self.base_url}/v1/messages", json=body, headers=headers,
+                                          stream=True, timeout=(10, timeout))
+            except self._requests.Timeout as exc:
+                raise LLMTimeoutError(f"POST {self.base_url}/v1/messages", timeout) from exc
+            except self._requests.RequestException as exc:
+                raise RuntimeError(f"{self.name} backend request failed: {exc}") from exc
+            if resp.status_code != 200:
+                raise RuntimeError(f"{self.name} backend HTTP {resp.status_code}: {resp.text[:600]}")
+
+            try:
+                # Split raw bytes on b"\n" and decode each line as UTF-8 ourselves: decode_unicode
+                # falls back to ISO-8859-1 for text/event-stream without a charset, and str.splitlines
+                # then breaks lines on \x85, a byte that occurs inside UTF-8 encoded CJK text.
+                for raw_bytes in resp.iter_lines(delimiter=b"\n"):
+                    if time.monotonic() > deadline:
+                        resp.close()
+                        raise LLMTimeoutError(f"POST {self.base_url}/v1/messages", timeout)
+                    raw = raw_bytes.decode("utf-8", errors="replace").rstrip("\r")
+                    if not raw.startswith("data:"):
+                        continue
+                    try:
+                        event = json.loads(raw[5:].strip())
+                    except json.JSONDecodeError as exc:
+                        raise RuntimeError(f"{self.name} backend sent malformed SSE data: {raw[:200]!r}") from exc
+                    kind = event.get("type")
+                    if kind == "message_start":
+                        u = (event.get("message") or {}).get("usage") or {}
+                        usage["input_uncached"] = int(u.get("input_tokens") or 0)
+                        usage["input_cache_read"] = int(u.get("cache_read_input_tokens") or 0)
+                        usage["input_cache_write"] = int(u.get("cache_creation_input_tokens") or 0)
+                    elif kind == "content_block_delta":
+                        delta = event.get("delta") or {}
+                        if delta.get("type") != "text_delta":
+                            continue  # thinking deltas are not part of the reply
+                        if ttft is None:
+                            ttft = time.monotonic() - started
+                        chunks.append(delta.get("text", ""))
+                        if sink is not None:
+                            sink.write(chunks[-1])
+                            sink.flush()
+                    elif kind == "message_delta":
+                        usage["output"] = int((event.get("usage") or {}).get("output_tokens") or 0)
+                    elif kind == "error":
+                        raise RuntimeError(f"{self.name} backend stream error: {event.get('error')}")
+            except self._requests.Timeout as exc:
+                raise LLMTimeoutError(f"POST {self.base_url}/v1/messages", timeout) from exc
+            except self._requests.RequestException as exc:
+                raise RuntimeError(f"{self.name} backend stream interrupted: {exc}") from exc
+        finally:
+            if sink is not None:
+                sink.close()
+
+        return LLMResult(text="".join(chunks), latency_s=time.monotonic() - started, ttft_s=ttft, usage=usage)
+
+
+class MockBackend(HTTPBackend):
+    """HTTPBackend against an in-process llm_report.mock_server (started on first use)."""
+
+    name = "mock"
+
+    def __init__(self, latency: float | None = None, token_delay: float | None = None,
+                 responses_dir: Path | None = None):
+        from llm_report.mock_server import start_mock_server
+
+        self.server, url = start_mock_server(
+            port=0,
+            latency=float(os.getenv("LLM_MOCK_LATENCY", "0.5")) if latency is None else latency,
+            token_delay=float(os.getenv("LLM_MOCK_TOKEN_DELAY", "0.005")) if token_delay is None else token_delay,
+            responses_dir=responses_dir,
+        )
+        super().__init__(base_url=url, api_key="mock")
+
+
+def create_backend(name: str | None = None) -> LLMBackend:
+    """Build the backend named by `name` or the LLM_BACKEND env var (default "cli")."""
+    name = (name or os.getenv("LLM_BACKEND") or "cli").lower()
+    if name == "cli":
+        return CLIBackend()
+    if name == "http":
+        return HTTPBackend()
+    if name == "mock":
+        return MockBackend()
+    raise ValueError(f"Unknown LLM backend {name!r}; expected one of {BACKENDS}")
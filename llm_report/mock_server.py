@@ -0,0 +1,185 @@
+"""
+llm_report/mock_server.py
+==========================
+Local stand-in for the Messages API, for offline benchmarking of the report
+pipeline (pair with `--backend mock`, or run standalone and point the HTTP
+backend at it via ANTHROPIC_BASE_URL).
+
+POST /v1/messages answers with canned text, streamed as server-sent events in
+the same shape as the real API (message_start → content_block_delta × N →
+message_delta → message_stop), or as one JSON body when stream=false.
+
+  latency      seconds before the first token (models queueing + prefill)
+  token_delay  seconds between streamed chunks (models decode speed)
+
+Canned responses live in responses_dir (default data/replay/llm/): the first
+<name>.md whose stem appears in the prompt wins (e.g. 0700.HK.md), then
+default.md, then a built-in reply in the Stage 1 compact layout so local
+compact extraction succeeds. Token usage is estimated locally; a system block
+marked cache_control reports cache_creation the first time it is seen and
+cache_read afterwards, mimicking provider prompt caching.
+
+Usage:
+  python -m llm_report.mock_server --port 8765 --latency 0.5 --token-delay 0.005
+  ANTHROPIC_BASE_URL=http://127.0.0.1:8765 CLAUDE_API_KEY=mock \\
+      python -m llm_report.report_generator --backend http
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+try:
+    from config import REPLAY_DIR
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from config import REPLAY_DIR
+
+from llm_report.payload_compiler import estimate_tokens
+
+_DEFAULT_RESPONSES_DIR = REPLAY_DIR / "llm"
+_CHUNK_CHARS = 12
+
+_FALLBACK_REPLY = (
+    "# 模拟分析（mock server）\n\n"
+    "## 1. 基本面与估值穿透\n"
+    "- 市赚率 PR 0.85，估值合理；PEG 1.2；DCF 底线 320.5\n\n"
+    "## 2. 技术面与多周期共振\n"
+    "- 日线 RSI 48，周线均线多头排列，月线趋势向上，支撑 350 / 阻力 420\n\n"
+    "## 3. 情绪面分析\n"
+    "- 近期新闻情绪中性偏利好，催化剂为回购\n\n"
+    "## 4. 牛熊指引\n"
+    "- 建议：持有\n"
+    "- 目标价 450，止损价 330\n"
+)
+
+
+def _pick_response(prompt: str, responses_dir: Path) -> str:
+    if responses_dir.is_dir():
+        for path in sorted(responses_dir.glob("*.md")):
+            if path.stem != "default" and path.stem in prompt:
+                return path.read_text(encoding="utf-8")
+        default = responses_dir / "default.md"
+        if default.exists():
+            return default.read_text(encoding="utf-8")
+    return _FALLBACK_REPLY
+
+
+def _make_handler(latency: float, token_delay: float, responses_dir: Path):
+    seen_prefixes: set[str] = set()
+    lock = threading.Lock()
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):  # keep benchmark output clean
+            pass
+
+        def _usage(self, body: dict) -> dict:
+            prompt = "".join(
+                m["content"] if isinstance(m.get("content"), str) else json.dumps(m.get("content"), ensure_ascii=False)
+                for m in body.get("messages", [])
+            )
+            usage = {"input_tokens": estimate_tokens(prompt), "cache_read_input_tokens": 0,
+                     "cache_creation_input_tokens": 0}
+            for block in body.get("system") or []:
+                tokens = estimate_tokens(block.get("text", ""))
+                if not block.get("cache_control"):
+                    usage["input_tokens"] += tokens
+                    continue
+                key = hashlib.sha256(block.get("text", "").encode("utf-8")).hexdigest()
+                with lock:
+                    hit = key in seen_prefixes
+                    seen_prefixes.add(key)
+                usage["cache_read_input_tokens" if hit else "cache_creation_input_tokens"] += tokens
+            return usage
+
+        def _sse(self, event: dict) -> None:
+            data = f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/v1/messages":
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            prompt = "".join(m.get("content", "") for m in body.get("messages", []) if isinstance(m.get("content"), str))
+            reply = _pick_response(prompt, responses_dir)
+            usage = self._usage(body)
+            output_tokens = estimate_tokens(reply)
+            time.sleep(latency)
+
+            if not body.get("stream"):
+                payload = json.dumps({
+                    "type": "message", "role": "assistant", "model": body.get("model"),
+                    "content": [{"type": "text", "text": reply}],
+                    "usage": {**usage, "output_tokens": output_tokens},
+                }, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                self._sse({"type": "message_start", "message": {"model": body.get("model"), "usage": usage}})
+                self._sse({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+                for i in range(0, len(reply), _CHUNK_CHARS):
+                    self._sse({"type": "content_block_delta", "index": 0,
+                               "delta": {"type": "text_delta", "text": reply[i:i + _CHUNK_CHARS]}})
+                    time.sleep(token_delay)
+                self._sse({"type": "content_block_stop", "index": 0})
+                self._sse({"type": "message_delta", "delta": {"stop_reason": "end_turn"},
+                           "usage": {"output_tokens": output_tokens}})
+                self._sse({"type": "message_stop"})
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client gave up (timeout) — nothing to clean up
+
+    return _Handler
+
+
+def start_mock_server(
+    port: int = 0,
+    latency: float = 0.5,
+    token_delay: float = 0.005,
+    responses_dir: Path | None = None,
+    host: str = "127.0.0.1",
+) -> tuple[ThreadingHTTPServer, str]:
+    """Start the mock server on a daemon thread. port=0 picks a free port. Returns (server, base_url)."""
+    handler = _make_handler(latency, token_delay, Path(responses_dir or _DEFAULT_RESPONSES_DIR))
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="llm-mock-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mock of the Messages API for offline benchmarks.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds before the first token.")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="Seconds between streamed chunks.")
+    parser.add_argument("--responses", type=Path, default=None, metavar="DIR",
+                        help=f"Canned responses directory (default: {_DEFAULT_RESPONSES_DIR}).")
+    args = parser.parse_args()
+
+    server, url = start_mock_server(args.port, args.latency, args.token_delay, args.responses)
+    print(f"LLM mock server listening on {url} (latency={args.latency}s, token_delay={args.token_delay}s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
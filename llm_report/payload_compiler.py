@@ -0,0 +1,239 @@
+"""
+payload_compiler.py — 个股 Payload 的 token 预算编译器
+
+此前 payload 只靠固定截断（FINANCIAL_REPORT_YEARS / FINANCIAL_REPORT_QTERS / 新闻条数）控制体积，
+完全看不到实际 token 开销。本模块在写 web_prompts 之前对每只股票的 quantitative_payload 做编译：
+
+    1. 估算：本地 tokenizer 近似（CJK 字符 ≈ 1 token，其余字符 ≈ 3.5 字符/token），按顶层 section 统计
+    2. 预算：每只股票 PROMPT_TOKEN_BUDGET_PER_STOCK，全部股票合计 PROMPT_TOKEN_BUDGET_PER_RUN
+             实际生效预算 = min(单股预算, 全局预算 / 股票数)
+    3. 裁剪：超预算时按优先级依次应用规则，每条规则执行后重新估算，达标即停：
+        round_numbers      浮点数保留 4 位有效数字
+        drop_low_value     删除低价值字段（原始权重、绝对成交额、生成时间等）
+        collapse_timeframes 周线/月线中与日线一致（数值相差 < 1%）的字段省略
+        trim_lists         交易流水 / 财报期数 / 新闻标题再截短
+        drop_timeframes    最后手段：只保留日线
+    4. 报告：write_token_report() 把每个切片文件的分 section token 数与裁剪记录
+             写到 web_prompts_YYYYMMDD_token_report.json（与切片目录同级）
+
+公开接口：
+    estimate_tokens(obj_or_text)              -> int
+    section_tokens(obj)                       -> dict[section, int]
+    compile_payload(payload, budget)          -> (payload, stats)
+    effective_budget(n_stocks)                -> int
+    write_token_report(web_dir, report)       -> Path
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import math
+import re
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from config import PROMPT_TOKEN_BUDGET_PER_RUN, PROMPT_TOKEN_BUDGET_PER_STOCK
+
+_CJK_RE = re.compile(r"[　-〿㐀-䶿一-鿿＀-￯]")
+_CHARS_PER_TOKEN = 3.5
+_SIG_DIGITS = 4
+_AGREE_RTOL = 0.01
+
+# 低价值字段：(section 路径, 字段名)；路径中的 "*" 匹配任意键（如 daily/weekly/monthly）
+_LOW_VALUE_FIELDS = [
+    (("meta",), "generation_date"),
+    (("technicals", "*"), "turnover_value"),
+    (("technicals", "*"), "vwap"),
+    (("technicals", "daily", "cycle_risk"), "long_term_weights"),
+    (("technicals", "daily", "cycle_risk"), "short_term_weights"),
+    (("technicals", "daily", "cycle_risk"), "long_term_composite_raw"),
+    (("technicals", "daily", "cycle_risk"), "short_term_composite_raw"),
+    (("news_sentiment",), "news_summary"),
+]
+
+# trim_lists 规则下各列表的保留条数
+_LIST_LIMITS = {
+    ("transaction_history",): 10,
+    ("fundamentals", "annual_reports"): 2,
+    ("fundamentals", "quarterly_reports"): 4,
+    ("news_sentiment", "headlines"): 3,
+}
+
+
+# ==========================================
+# token 估算
+# ==========================================
+
+def _dumps(obj) -> str:
+    return obj if isinstance(obj, str) else json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def estimate_tokens(obj) -> int:
+    """本地近似 token 数：CJK 字符逐字计，其余字符按 3.5 字符/token。"""
+    text = _dumps(obj)
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / _CHARS_PER_TOKEN)
+
+
+def section_tokens(obj: dict) -> dict[str, int]:
+    """按顶层键统计 token 数。"""
+    return {k: estimate_tokens(v) for k, v in obj.items()} if isinstance(obj, dict) else {}
+
+
+def effective_budget(n_stocks: int) -> int:
+    return min(PROMPT_TOKEN_BUDGET_PER_STOCK, PROMPT_TOKEN_BUDGET_PER_RUN // max(n_stocks, 1))
+
+
+# ==========================================
+# 裁剪规则（均为原地修改）
+# ==========================================
+
+def _round_sig(value: float) -> float:
+    if value == 0 or not math.isfinite(value):
+        return value
+    digits = _SIG_DIGITS - int(math.floor(math.log10(abs(value)))) - 1
+    # 大数（≥ 10^4）按有效数字取整后转 int，避免 "123500.0" 多出的字符
+    return round(value, digits) if digits > 0 else int(round(value, digits))
+
+
+def _round_numbers(node):
+    if isinstance(node, dict):
+        for k, v in node.items():
+            node[k] = _round_numbers(v)
+    elif isinstance(node, list):
+        for i, v in enumerate(node):
+            node[i] = _round_numbers(v)
+    elif isinstance(node, float):
+        return _round_sig(node)
+    return node
+
+
+def _resolve(payload: dict, path: tuple) -> list[dict]:
+    """按路径（支持 "*"）取出所有匹配的 dict 节点。"""
+    nodes = [payload]
+    for key in path:
+        nxt = []
+        for n in nodes:
+            if not isinstance(n, dict):
+                continue
+            if key == "*":
+                nxt.extend(v for v in n.values() if isinstance(v, dict))
+            elif isinstance(n.get(key), dict):
+                nxt.append(n[key])
+        nodes = nxt
+    return nodes
+
+
+def _drop_low_value(payload: dict):
+    for path, field in _LOW_VALUE_FIELDS:
+        for node in _resolve(payload, path):
+            node.pop(field, None)
+    return payload
+
+
+def _agrees(a, b) -> bool:
+    if isinstance(a, bool) or isinstance(b, bool) or not isinstance(a, (int, float)) or not isinstance(b, (int, float)):
+        return a == b
+    if a == b:
+        return True
+    return abs(a - b) <= _AGREE_RTOL * max(abs(a), abs(b))
+
+
+def _strip_agreeing(node: dict, ref: dict) -> dict:
+    """返回 node 中与 ref 不一致的部分（递归）。"""
+    out = {}
+    for k, v in node.items():
+        if k not in ref:
+            out[k] = v
+        elif isinstance(v, dict) and isinstance(ref[k], dict):
+            sub = _strip_agreeing(v, ref[k])
+            if sub:
+                out[k] = sub
+        elif not _agrees(v, ref[k]):
+            out[k] = v
+    return out
+
+
+def _collapse_timeframes(payload: dict):
+    tech = payload.get("technicals")
+    if not isinstance(tech, dict) or not isinstance(tech.get("daily"), dict):
+        return payload
+    for tf in ("weekly", "monthly"):
+        if isinstance(tech.get(tf), dict):
+            diff = _strip_agreeing(tech[tf], tech["daily"])
+            diff["_collapsed"] = "与 daily 一致的字段已省略"
+            tech[tf] = diff
+    return payload
+
+
+def _trim_lists(payload: dict):
+    for path, limit in _LIST_LIMITS.items():
+        for parent in _resolve(payload, path[:-1]):
+            if isinstance(parent.get(path[-1]), list):
+                parent[path[-1]] = parent[path[-1]][:limit]
+    return payload
+
+
+def _drop_timeframes(payload: dict):
+    tech = payload.get("technicals")
+    if isinstance(tech, dict):
+        for tf in ("weekly", "monthly"):
+            tech.pop(tf, None)
+    return payload
+
+
+# 优先级从高到低：越靠前损失越小
+_PRUNING_RULES = [
+    ("round_numbers", _round_numbers),
+    ("drop_low_value", _drop_low_value),
+    ("collapse_timeframes", _collapse_timeframes),
+    ("trim_lists", _trim_lists),
+    ("drop_timeframes", _drop_timeframes),
+]
+
+
+def compile_payload(payload: dict, budget: int | None = None) -> tuple[dict, dict]:
+    """
+    在不超过 budget 的前提下尽量少地裁剪 payload（不修改入参）。
+
+    返回:
+        (compiled_payload, stats)
+        stats = {"budget", "tokens_before", "tokens_after", "within_budget",
+                 "rules_applied": [{"rule", "saved"}], "sections": {section: tokens}}
+    """
+    budget = PROMPT_TOKEN_BUDGET_PER_STOCK if budget is None else budget
+    compiled = copy.deepcopy(payload)
+    before = estimate_tokens(compiled)
+    current = before
+    applied = []
+
+    for name, rule in _PRUNING_RULES:
+        if current <= budget:
+            break
+        compiled = rule(compiled)
+        after = estimate_tokens(compiled)
+        applied.append({"rule": name, "saved": current - after})
+        current = after
+
+    stats = {
+        "budget": budget,
+        "tokens_before": before,
+        "tokens_after": current,
+        "within_budget": current <= budget,
+        "rules_applied": applied,
+        "sections": section_tokens(compiled),
+    }
+    return compiled, stats
+
+
+def write_token_report(web_dir: Path, report: dict) -> Path:
+    """写入 <web_dir>_token_report.json（与切片目录同级，不会被 report_generator 当作 prompt 读取）。"""
+    path = web_dir.parent / f"{web_dir.name}_token_report.json"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return path
@@ -6,6 +6,8 @@ import pandas as pd
 from pathlib import Path
 from datetime import datetime
 from processors.json_assembler import sanitize_for_web
+from llm_report.payload_compiler import compile_payload, effective_budget, estimate_tokens, section_tokens, write_token_report
+from processors.payload_diff import diff_payload, load_previous_payload
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
@@ -14,6 +16,11 @@ from config import LATEST_DIR, PORTFOLIO_DIR
 
 USER_NOTES_FILE = BASE_DIR / "user_notes.json"
 
+# 个股共享前缀文件名（report_generator 以 "01_00_" 识别，不当作个股文件）
+SHARED_PREFIX_FILENAME = "01_00_共享分析框架.txt"
+# 个股增量（与上次运行 payload 的差异）子目录，供 report_generator --incremental 使用
+DELTA_SUBDIR = "deltas"
+
 def _load_user_notes():
     """安全读取用户外部备忘录"""
     if USER_NOTES_FILE.exists():
@@ -85,6 +92,7 @@ def generate_consolidated_api_prompt() -> str:
     # 但不再进入新的 web prompt。如果没有任何持仓数据可参考(held_tickers 为空)，退化为原有的全量扫描。
     stock_analysis_queue = []
     skipped_tickers = []
+    stock_deltas = {}
 
     # 扫描所有生成的 Payload JSON
     payload_files = glob.glob(str(LATEST_DIR / "*_LLM_Payload.json"))
@@ -104,11 +112,34 @@ def generate_consolidated_api_prompt() -> str:
             ibkr_symbol = ticker.split('.')[0].lstrip('0') if '.' in ticker else ticker
             note = user_notes_dict.get(ibkr_symbol, "无特定主观备注。")
 
-            stock_analysis_queue.append({
+            # 与上次运行的归档 payload 比对，生成 "changes since YYYY-MM-DD" 增量段
+            since, previous = load_previous_payload(ticker, before=today_str)
+            delta = diff_payload(previous, stock_data, since)
+
+            stock_entry = {
                 "target_ticker": ticker,
                 "user_subjective_note": note,
                 "quantitative_payload": stock_data
-            })
+            }
+            if since:
+                stock_entry[f"changes_since_{since}"] = {k: v for k, v in delta.items() if k != "since"}
+            stock_analysis_queue.append(stock_entry)
+            stock_deltas[ticker] = delta
+
+    # 按 token 预算编译个股 payload（超预算时按优先级裁剪），统计写入 token 报告
+    stock_budget = effective_budget(len(stock_analysis_queue))
+    compile_stats = {}
+    for stock in stock_analysis_queue:
+        stock["quantitative_payload"], stats = compile_payload(stock["quantitative_payload"], stock_budget)
+        compile_stats[stock["target_ticker"]] = stats
+        rules = ", ".join(r["rule"] for r in stats["rules_applied"]) or "无需裁剪"
+        flag = "✅" if stats["within_budget"] else "⚠️"
+        print(f"   {flag} {stock['target_ticker']} payload ≈ {stats['tokens_before']} → {stats['tokens_after']} tokens "
+              f"(预算 {stock_budget}；{rules})")
+
+    changed_count = sum(1 for d in stock_deltas.values() if d["material"])
+    if stock_deltas:
+        print(f"   🔍 增量比对: {changed_count}/{len(stock_deltas)} 只个股自上次运行以来有重大变化")
 
     if skipped_tickers:
         print(f"   ⏭️  已跳过 {len(skipped_tickers)} 只非持仓股票的陈旧 payload: {', '.join(sorted(skipped_tickers))}")
@@ -159,6 +190,11 @@ def generate_consolidated_api_prompt() -> str:
         # 多周期共振判断
         # ==========================================
         "multi_timeframe_resonance": "长短线多周期共振判断。direction 字段：bullish = 长短线风险均偏低（强机会信号），bearish = 长短线风险均偏高（强风险信号），divergent = 长短背离（如长线低估但短线偏高，说明短期可能回调但长期有价值），neutral = 均在中性区间。长短方向一致时信号最强，背离时需根据自身投资周期决策。",
+        # ==========================================
+        # 组合尾部风险 (portfolio_risk_report.tail_risk)
+        # ==========================================
+        "tail_risk": "组合级 1 日尾部风险，所有 *_ratio 均为占账户净值比例、损失记为正数。var_95/var_99 = 95%/99% 置信度下单日最大损失（VaR），cvar_* = 超过 VaR 那部分坏日子的平均损失（CVaR，更能反映极端情况）。historical 直接用过去约 2 年的真实日收益；filtered_historical 按当前波动率（EWMA）重新缩放历史样本，近期波动放大时会明显高于 historical；monte_carlo 为 10 万条厚尾（t 分布）模拟路径，tail_contribution_99_ratio 为 99% 最坏情景里各持仓贡献的平均损失。scenarios 为恒指真实历史危机区间（2008/2015/2020/2022）回放到当前持仓的冲击，beta_proxied_symbols 中的持仓当时尚无价格，按对恒指 beta 代理。scenarios_skipped 为恒指缺该区间数据而未能回放的情景。coverage 标明有多少敞口进入了收益率矩阵。",
+        "risk_concentration": "组合集中度（portfolio_risk_report.risk_concentration）。effective_number_of_bets = 考虑相关性后的有效独立押注数（主成分熵口径，1 表示全部持仓本质上是同一个赌注），effective_number_of_positions = 只看权重的有效持仓数，两者差距越大说明相关性吃掉的分散效果越多。diversification_ratio = 个股波动加权和 / 组合波动，越接近 1 分散越差。clusters 为按收益相关性聚成的簇（簇间平均相关低于 cluster_corr_threshold 时不再合并；avg_correlation 为簇内两两平均相关，单只持仓的簇为 null），weight_ratio 与 risk_share_ratio 分别为该簇的净值权重与组合风险占比。positions 中 marginal_risk_annual 为边际风险贡献（加仓 1 单位对组合年化波动的影响），component_risk_annual 为成分风险贡献，risk_share_ratio 为其占组合风险的比例（负值代表对冲作用）。",
     }
 
     master_prompt = {
@@ -185,8 +221,8 @@ def generate_consolidated_api_prompt() -> str:
             "1. 资产核心状态速览: 评估全局账户安全度，及各个标的的仓位健康度，并制作表格。",
             "2. 每只股票的基本面与估值穿透: 对每个独立指标进行专业和狗都能看懂的角度进行解析，并制作表格。",
             "3. 每只股票的技术面与多周期共振: 结合日/周/月线判断支撑阻力与当前动能，对每个独立指标进行专业和狗都能看懂的角度进行解析，并制作表格。",
-            "4. 每只股票的情绪面分析: 基于已提供的新闻标题数据(news_sentiment字段)，分析市场情绪倾向（利好/利空/中性），识别关键事件催化剂，并结合网络搜索补充近期重要信息。制作表格。",
-            "5. 指出组合中最大的潜在风险点：如果股市强烈回调20%会发生什么。包括但不限于关税战，贸易战，热战，瘟疫等",
+            "4. 每只股票的情绪面分析: 基于已提供的新闻舆情数据(news_sentiment字段：sentiment_scores 为本地词典打分的日/周/月情绪聚合，headlines 为情绪最极端的标题)，分析市场情绪倾向（利好/利空/中性），识别关键事件催化剂，并结合网络搜索补充近期重要信息。制作表格。",
+            "5. 指出组合中最大的潜在风险点：结合 portfolio_risk_report.tail_risk 的 VaR/CVaR 与历史危机情景回放，说明如果股市强烈回调会发生什么。包括但不限于关税战，贸易战，热战，瘟疫等",
             "6. 牛熊指引：如果一切顺利，股价能到多少？逻辑是什么？如果风险爆发，股价底线在哪里？",
             "7. 最终决断与操作计划: 基于用户的特定备忘录和全局资金，给出明确的[加仓/减仓/持有/止损]建议（需精确到参考价位和数量比例）。"
         ]
@@ -199,20 +235,22 @@ def generate_consolidated_api_prompt() -> str:
         "0. 所有HKD金额必须显式标注 HKD，所有CAD金额必须显式标注 CAD。任何跨币种比较必须先写出换算公式（含使用的汇率，汇率可使用网络搜索到的结果），再给结果。禁止口算、禁止省略单位、禁止混用。",
         "1. 基本面与估值穿透: 对每个独立指标进行专业和狗都能看懂的角度进行解析，并制作表格。",
         "2. 技术面与多周期共振: 结合日/周/月线判断支撑阻力与当前动能，对每个独立指标进行专业和狗都能看懂的角度进行解析，并制作表格。",
-        "3. 情绪面分析: 基于已提供的新闻标题数据(news_sentiment 字段)，分析市场情绪倾向（利好/利空/中性），识别关键事件催化剂，并结合网络搜索补充近期重要信息。制作表格。",
+        "3. 情绪面分析: 基于已提供的新闻舆情数据(news_sentiment 字段：sentiment_scores 为本地词典打分的日/周/月情绪聚合，headlines 为情绪最极端的标题)，分析市场情绪倾向（利好/利空/中性），识别关键事件催化剂，并结合网络搜索补充近期重要信息。制作表格。",
         "4. 牛熊指引: 如果一切顺利，股价能到多少？逻辑是什么？如果风险爆发，股价底线在哪里？",
+        "5. 变化追踪: 若目标个股数据含 changes_since_YYYY-MM-DD 增量段，用表格列出自上次运行以来的关键变化、阈值穿越与新增标题，并说明它们是否改变结论。",
     ]
 
     portfolio_analysis_requirements = [
         "请基于上方提供的所有个股深度分析结论 + 账户全局上下文，使用“马斯克的第一性原理”进行综合输出，输出 Markdown 内容：",
         "0. 所有HKD金额必须显式标注 HKD，所有CAD金额必须显式标注 CAD。任何跨币种比较必须先写出换算公式（含使用的汇率，汇率可使用网络搜索到的结果），再给结果。禁止口算、禁止省略单位、禁止混用。",
         "1. 资产核心状态速览: 评估全局账户安全度，及各个标的的仓位健康度，并制作表格。",
-        "2. 组合最大潜在风险点: 如果股市强烈回调 20% 会发生什么。包括但不限于关税战、贸易战、热战、瘟疫等。",
+        "2. 组合最大潜在风险点: 结合 portfolio_risk_report.tail_risk 的 VaR/CVaR 与历史危机情景回放，说明如果股市强烈回调会发生什么。包括但不限于关税战、贸易战、热战、瘟疫等。",
         "3. 最终决断与操作计划: 基于用户的特定备忘录和全局资金，给出明确的[加仓/减仓/持有/止损]建议（需精确到参考价位和数量比例）。",
     ]
 
     # 落盘为统一的 JSON 文件
     output_path = LATEST_DIR / f"prompt_{today_str}.json"
+    LATEST_DIR.mkdir(parents=True, exist_ok=True)
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(master_prompt, f, indent=4, ensure_ascii=False)
 
@@ -221,6 +259,7 @@ def generate_consolidated_api_prompt() -> str:
     # ==========================================
     web_dir = LATEST_DIR / f"web_prompts_{today_str}"
     web_dir.mkdir(exist_ok=True) # 创建专属切片文件夹
+    token_report = {"stock_budget": stock_budget, "files": {}, "payload_compile": compile_stats}
 
     # --- 第 0 口：持仓情况表格（轻量独立轮，仅含持仓数据）---
     portfolio_slice = {
@@ -229,6 +268,7 @@ def generate_consolidated_api_prompt() -> str:
         "user_profile": master_prompt["user_profile"],
         "global_portfolio_context": master_prompt["global_portfolio_context"],
     }
+    token_report["files"]["00_持仓情况表格.txt"] = {"total": estimate_tokens(portfolio_slice), "sections": section_tokens(portfolio_slice)}
     with open(web_dir / "00_持仓情况表格.txt", 'w', encoding='utf-8') as f:
         f.write("[Portfolio Status Table]\n")
         f.write("请阅读以下账户持仓数据：\n```json\n")
@@ -237,32 +277,62 @@ def generate_consolidated_api_prompt() -> str:
         f.write("请根据提供的持仓数据，生成的账户持仓摘要，一张完整的持仓情况总览表格（包含：代码、公司、持仓量、均价、现价、市值、浮动盈亏金额、浮动盈亏比例、仓位占比、状态等关键字段），账户关键风险警示表格。直接以Markdown格式输出内容。\n")
         f.write("生成完毕后请回复：'持仓表格已生成，准备接收全局设定与个股数据。'")
 
-    # --- 第 1 到 N 口：个股深度分析（每个文件自包含全部框架，新 session 即可独立运行）---
-    # 由于每只股都送进全新的 Opus session，文件必须自带 instructions / user_profile /
-    # metric_definitions / global_portfolio_context，否则模型无法解读高阶量化指标。
+    # --- 第 1 口前缀：共享分析框架（全部个股共用，字节级稳定）---
+    # instructions / user_profile / metric_definitions / global_portfolio_context /
+    # analysis_requirements 对所有个股完全相同，单独落成 01_00 前缀文件；
+    # 内容中不含序号、ticker、时间戳，保证同一次运行内逐字节一致，
+    # report_generator 把它作为可缓存的 system 前缀发送，后续个股直接命中 provider 的 prompt cache。
+    shared_prefix = {
+        "instructions": master_prompt["instructions"],
+        "user_profile": master_prompt["user_profile"],
+        "metric_definitions": metric_definitions,
+        "global_portfolio_context": global_context,
+        "analysis_requirements": per_stock_analysis_requirements,
+    }
+    token_report["files"][SHARED_PREFIX_FILENAME] = {
+        "total": estimate_tokens(shared_prefix),
+        "sections": section_tokens(shared_prefix),
+    }
+    with open(web_dir / SHARED_PREFIX_FILENAME, 'w', encoding='utf-8') as f:
+        f.write("[Shared Analysis Framework]\n")
+        f.write("以下 JSON 是所有个股深度分析共用的完整框架（角色定义、用户画像、指标说明书、组合上下文、分析要求）。"
+                "之后每条消息只提供一只目标个股的数据，请始终按此框架分析：\n```json\n")
+        f.write(json.dumps(shared_prefix, ensure_ascii=False, separators=(',', ':')))
+        f.write("\n```\n")
+
+    # --- 第 1 到 N 口：个股深度分析（只含可变部分：目标个股数据 + 指令）---
+    # 自动化流程中每只股仍是全新 Opus session，共享框架以前缀形式随每次调用一起发送；
+    # 手动 web 流中先粘贴 01_00 共享框架，再依次粘贴各个股文件。
     total_stocks = len(stock_analysis_queue)
     for i, stock in enumerate(stock_analysis_queue):
         ticker = stock['target_ticker']
         safe_ticker = ticker.replace(":", "_")
-        per_stock_payload = {
-            "instructions": master_prompt["instructions"],
-            "user_profile": master_prompt["user_profile"],
-            "metric_definitions": metric_definitions,
-            "global_portfolio_context": global_context,
-            "target_stock": stock,
-            "analysis_requirements": per_stock_analysis_requirements,
+        per_stock_payload = {"target_stock": stock}
+        stock_file = f"01_{i+1:02d}_个股数据_{safe_ticker}.txt"
+        token_report["files"][stock_file] = {
+            "total": estimate_tokens(per_stock_payload),
+            "sections": section_tokens(per_stock_payload),
+            "payload_sections": section_tokens(stock["quantitative_payload"]),
         }
-        with open(web_dir / f"01_{i+1:02d}_个股数据_{safe_ticker}.txt", 'w', encoding='utf-8') as f:
+        with open(web_dir / stock_file, 'w', encoding='utf-8') as f:
             f.write(f"[Single-Stock Deep Analysis {i+1}/{total_stocks} — {ticker}]\n")
-            f.write("以下 JSON 是本只股票深度分析所需的完整自包含上下文（角色定义、用户画像、指标说明书、组合上下文、目标个股数据、分析要求）：\n```json\n")
+            f.write(f"以下 JSON 是目标个股数据（分析框架见共享前缀 {SHARED_PREFIX_FILENAME}）：\n```json\n")
             f.write(json.dumps(per_stock_payload, ensure_ascii=False, separators=(',', ':')))
             f.write("\n```\n[重要指令]\n")
-            f.write("请阅读以上完整的分析框架（角色定义、用户画像、指标定义、组合上下文）以及目标个股数据，")
+            f.write("请结合共享分析框架（角色定义、用户画像、指标定义、组合上下文）阅读以上目标个股数据，")
             f.write("按照 analysis_requirements 列表逐项进行不惜字数的深度剖析"
                     "（包括市赚率、现金流排雷、多周期技术面共振和牛熊推演等）。\n")
             f.write("每一个分析内容都需要分成专业角度和狗都能看懂的角度进行输出，输出 Markdown 文件。\n")
             f.write("写完后，请提示我发送下一只股票的数据。")
 
+    # --- 增量段：每只股票一份（含 material 判定），report_generator --incremental 据此
+    # 对变化不大的个股只发送"上次 compact + 增量"，而不是完整 payload ---
+    delta_dir = web_dir / DELTA_SUBDIR
+    delta_dir.mkdir(exist_ok=True)
+    for ticker, delta in stock_deltas.items():
+        with open(delta_dir / f"{ticker}.json", 'w', encoding='utf-8') as f:
+            json.dump(delta, f, indent=2, ensure_ascii=False)
+
     # --- 最终口：终极决断（自包含组合级综合任务）---
     # 注意：此文件在自动化流程(report_generator.py)中由 Opus 全新 session 接收，
     # 届时所有个股分析的 compact 摘要已作为上下文注入同一 prompt；
@@ -273,6 +343,7 @@ def generate_consolidated_api_prompt() -> str:
         "global_portfolio_context": global_context,
         "analysis_requirements": portfolio_analysis_requirements,
     }
+    token_report["files"]["02_终极决断与操作计划.txt"] = {"total": estimate_tokens(final_payload), "sections": section_tokens(final_payload)}
     with open(web_dir / "02_终极决断与操作计划.txt", 'w', encoding='utf-8') as f:
         f.write("[Final Actionable Plan]\n")
         f.write("以上已提供每只个股的完整深度分析结果。下方 JSON 是组合级综合任务所需的自包含上下文（角色定义、用户画像、组合上下文、综合分析要求）：\n```json\n")
@@ -282,6 +353,10 @@ def generate_consolidated_api_prompt() -> str:
         f.write("出具一份包含明确股数、参考价位和买卖逻辑的[最终操作计划表]。\n")
         f.write("要求：总动用资金绝不超过可用现金；严格遵守马斯克的第一性原理；给出明确的[加仓/减仓/持有/止损]结论，不得模糊。")
 
+    token_report["total_tokens"] = sum(v["total"] for v in token_report["files"].values())
+    report_path = write_token_report(web_dir, token_report)
+    print(f"🧮 切片 token 估算合计 ≈ {token_report['total_tokens']}，分 section 明细: {report_path.name}")
+
     print(f"✅ 终极 API 聚合完毕！仅需发送此单一文件至大模型: {output_path.name}")
     print(f"📦 网页端投喂切片已生成至: {web_dir.name} (请按文件编号顺序复制给 AI 网页端)")
     return master_prompt
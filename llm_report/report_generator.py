@@ -5,18 +5,26 @@ Multi-stage Claude CLI report generator for HK stock portfolio analysis.
 
 Each stage opens an independent `claude -p` session (non-interactive print
 mode), writes a full MD file to disk, then compresses it to a compact summary
-via Haiku before passing it to the next stage. This keeps each session's
+before passing it to the next stage (Stage 1 compacts are extracted locally
+from the markdown sections/tables; Haiku is only a low-confidence fallback). This keeps each session's
 context small and focused, letting extended-thinking models reason deeply
 on a single task rather than scanning a giant undifferentiated context.
 
 Pipeline (generate_staged_report):
   Stage 0  Haiku                  — portfolio status table (00_*.txt)
-  Stage 1  Opus 4.7 + 1M context  — per-stock deep analysis (fresh session per stock,
-                                    self-contained 01_*.txt with full framework)
+  Stage 1  Opus 4.7 + 1M context  — per-stock deep analysis (fresh session per stock;
+                                    shared 01_00_*.txt framework as cached system
+                                    prompt + per-stock 01_NN_*.txt payload)
   Stage 2  Opus 4.7 + effort max  — final action plan (stage1 compacts + 02_*.txt)
   Stage 3  Python only            — local assembly → CLAUDE_staged_YYYYMMDD.md
 
 Intermediate files are written to web_prompts_YYYYMMDD/stages/ for inspection.
+Stage 1 runs stocks concurrently (STAGE1_PARALLELISM, default 3; --parallel N),
+compacting each stock as soon as its analysis returns. LLM responses are cached
+in stages/cache/ by (model, effort, betas, prompt SHA-256); every call's
+latency, time-to-first-token and cached vs uncached input tokens are printed
+and logged to stages/llm_metrics.jsonl. The transport is pluggable
+(llm_backend: cli / http streaming / local mock server; --backend).
 
 Legacy single-session mode (generate_report) is kept for reference.
 
@@ -24,6 +32,10 @@ Usage:
   # Staged mode (default)
   python -m llm_report.report_generator
   python -m llm_report.report_generator --dir data/output/latest/web_prompts_20260412
+  python -m llm_report.report_generator --resume            # continue after a failed Stage 2
+  python -m llm_report.report_generator --only 0700.HK      # redo one stock, reassemble locally
+  python -m llm_report.report_generator --incremental       # prior compact + delta for unchanged stocks
+  python -m llm_report.report_generator --backend mock      # offline benchmark against the local mock server
 
   # Legacy single-session mode
   python -m llm_report.report_generator --legacy
@@ -34,23 +46,31 @@ Usage:
 """
 
 import argparse
+import hashlib
 import json
 import os
-import shutil
 import subprocess
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
 # Project-level config (BASE_DIR already on sys.path when called from main.py;
 # when run as __main__ we add it explicitly below)
 try:
-    from config import LATEST_DIR, FINAL_REPORTS_DIR
+    from config import LATEST_DIR, FINAL_REPORTS_DIR, load_env
 except ImportError:
     _BASE = Path(__file__).resolve().parent.parent
     sys.path.insert(0, str(_BASE))
-    from config import LATEST_DIR, FINAL_REPORTS_DIR
+    from config import LATEST_DIR, FINAL_REPORTS_DIR, load_env
+
+load_env()  # STAGE1_PARALLELISM 等下方常量直接读 os.getenv，可来自 .env
+
+import telemetry
+from llm_report.compact_extractor import extract_compact
+from llm_report.llm_backend import BACKENDS, CLIBackend, LLMBackend, create_backend
 
 # ---------------------------------------------------------------------------
 # Constants
@@ -78,21 +98,54 @@ _TIMEOUT_STAGE2   = 900      # Opus per-stock (effort max — allow up to 15 min
 _TIMEOUT_STAGE3   = 900      # Opus final plan (effort max)
 _TIMEOUT_COMPACT  = 180      # Haiku compact summarization
 
+# Stage 1 concurrency: each stock runs analysis → compact in its own worker,
+# so a finished stock's compaction overlaps the other stocks' analyses.
+# Every CLI launch passes through a shared rate limiter that spaces
+# launches at least _STAGE1_MIN_INTERVAL seconds apart (replaces the
+# per-stock _INTER_TURN_SLEEP pauses of the serial loop).
+_STAGE1_PARALLELISM  = int(os.getenv("STAGE1_PARALLELISM", "3"))
+_STAGE1_MIN_INTERVAL = float(os.getenv("STAGE1_MIN_INTERVAL", str(_INTER_TURN_SLEEP)))
+
+# Per-call metrics (latency, TTFT, token counts), one JSON line per call
+_METRICS_FILENAME = "llm_metrics.jsonl"
+
+# Active LLM transport (set per run by _init_backend; None → CLI backend)
+_BACKEND: LLMBackend | None = None
+
+# Shared analysis framework written by prompt_template (SHARED_PREFIX_FILENAME)
+_SHARED_PREFIX_MARK = "01_00_"
+
+# Incremental mode (--incremental): stocks whose payload delta (prompt_template
+# writes web_prompts_*/deltas/<ticker>.json) is below the materiality threshold
+# get "prior compact + delta" instead of the full payload, at a lower effort.
+_DELTA_SUBDIR          = "deltas"
+_EFFORT_INCREMENTAL    = "high"
+_TIMEOUT_INCREMENTAL   = 300
+
+# Local compaction (llm_report.compact_extractor) replaces the Haiku compact call;
+# the LLM is used only when extraction confidence is below this threshold
+# (confidence = weighted share of the 5 compact fields found; action/prices ×2).
+_COMPACT_MIN_CONFIDENCE = 0.8
+
+# Placeholder prefixes written on failure — --resume treats such files as missing
+_COMPACT_FAILED_PREFIX = "[Compact generation failed"
+_STAGE2_FAILED_PREFIXES = ("[最终计划超时", "[最终计划生成失败")
+
 
 # ---------------------------------------------------------------------------
 # Internal helpers
 # ---------------------------------------------------------------------------
 
-def _check_claude_cli() -> str:
-    """Return path to claude binary, or raise EnvironmentError."""
-    path = shutil.which("claude")
-    if not path:
-        raise EnvironmentError(
-            "claude CLI not found in PATH.\n"
-            "Ensure Claude Code is installed and accessible from this shell.\n"
-            "Try: claude --version"
-        )
-    return path
+def _init_backend(name: str | None = None) -> str:
+    """
+    Select the process-wide LLM backend (see llm_backend.create_backend) and
+    return the cli_path threaded through the call sites ("claude" when the
+    backend is not the CLI — it is then unused).
+    """
+    global _BACKEND
+    _BACKEND = create_backend(name)
+    print(f"  LLM backend: {_BACKEND.name}")
+    return getattr(_BACKEND, "cli_path", "claude")
 
 
 def _send_message(
@@ -104,18 +157,32 @@ def _send_message(
     effort: str | None = None,
     betas: list[str] | None = None,
     allowed_tools: list[str] | None = None,
+    system_prefix_file: Path | None = None,
+    usage_out: dict | None = None,
+    stream_path: Path | None = None,
 ) -> tuple[str, str]:
     """
-    Send one message to the Claude CLI in non-interactive print mode.
+    Send one message through the active LLM backend (the Claude CLI in
+    non-interactive print mode unless _init_backend selected another one).
 
     Parameters
     ----------
     betas : list[str] | None
         Optional list of Anthropic beta flags (e.g. ["context-1m-2025-08-07"]).
-        Passed to the subprocess via ANTHROPIC_BETAS env var (comma-separated).
+        The CLI backend passes them via the ANTHROPIC_BETAS env var, the HTTP
+        backend via the anthropic-beta header.
     allowed_tools : list[str] | None
         If provided, passed as --allowedTools to the CLI. Pass [] to disable all
         tools (prevents Claude from attempting file writes or web searches).
+    system_prefix_file : Path | None
+        Shared, byte-stable prefix (01_00_*.txt) sent as a cacheable system
+        prompt, so every call sharing this file after the first reads it from
+        the provider's prompt cache.
+    usage_out : dict | None
+        If provided, filled with the call's token usage plus latency_s / ttft_s.
+    stream_path : Path | None
+        Streaming backends append the reply here as it arrives (a partial
+        reply survives a timeout); the CLI backend writes it on completion.
 
     Returns
     -------
@@ -125,54 +192,179 @@ def _send_message(
 
     Raises
     ------
-    subprocess.TimeoutExpired   if the CLI doesn't respond within `timeout`
-    RuntimeError                if the CLI exits with a non-zero return code
+    subprocess.TimeoutExpired   if the backend doesn't respond within `timeout`
+    RuntimeError                if the CLI exits non-zero / the API call fails
     """
-    cmd = [
-        cli_path, "-p",
-        "--model", model,
-        "--output-format", "json",
-    ]
-    if effort:
-        cmd += ["--effort", effort]
-    if session_id:
-        cmd += ["--resume", session_id]
-    if allowed_tools is not None:
-        cmd += ["--allowedTools", ",".join(allowed_tools)]
-
-    env = os.environ.copy()
-    if betas:
-        existing = env.get("ANTHROPIC_BETAS", "").strip()
-        merged = ",".join([b for b in [existing, *betas] if b])
-        env["ANTHROPIC_BETAS"] = merged
-
-    result = subprocess.run(
-        cmd,
-        input=prompt_text,
-        capture_output=True,
-        text=True,
-        encoding="utf-8",
+    backend = _BACKEND or CLIBackend(cli_path)
+    result = backend.send(
+        prompt_text,
+        model=model,
         timeout=timeout,
-        env=env,
+        session_id=session_id,
+        effort=effort,
+        betas=betas,
+        allowed_tools=allowed_tools,
+        system_prefix_file=system_prefix_file,
+        stream_path=stream_path,
     )
+    if usage_out is not None:
+        usage_out.update(result.usage)
+        usage_out["latency_s"] = round(result.latency_s, 3)
+        usage_out["ttft_s"] = None if result.ttft_s is None else round(result.ttft_s, 3)
+    return result.text, result.session_id
 
-    if result.returncode != 0:
-        stderr = result.stderr.strip()
-        raise RuntimeError(
-            f"claude exited with code {result.returncode}: {stderr[:600]}"
-        )
 
-    # Parse JSON output to extract response text and session ID
-    try:
-        data = json.loads(result.stdout)
-        text = data.get("result") or data.get("content") or result.stdout
-        sid  = data.get("session_id") or session_id or ""
-    except json.JSONDecodeError:
-        # Fallback: raw stdout is better than nothing
-        text = result.stdout
-        sid  = session_id or ""
+class _RateLimiter:
+    """Thread-safe launch spacer: at most one acquire() per `min_interval` seconds."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = max(0.0, min_interval)
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.min_interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class _ResponseCache:
+    """
+    On-disk LLM response cache under stages/cache/, one JSON file per entry.
+
+    Key = SHA-256 of (model, effort, sorted betas, SHA-256 of prompt), so any
+    change to the prompt text or call settings is a miss. Entries carry
+    metadata (label, created_at, elapsed_s, prompt_sha256, token usage) for
+    inspection. Only successful responses are stored; failures always re-run.
+    Every call (response-cache hits and failures included) is logged to
+    stages/llm_metrics.jsonl: backend, latency, time-to-first-token and
+    cached vs uncached input tokens. Streaming backends write the reply to
+    stages/partial/<label>.partial.md as it arrives; the file is removed on
+    success and left behind on timeout/error.
+    """
+
+    def __init__(self, stage_dir: Path, enabled: bool = True):
+        self.dir = stage_dir / "cache"
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.usage: list[dict] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model: str, effort: str | None, betas: list[str] | None, prompt_sha: str) -> str:
+        raw = json.dumps([model, effort or "", sorted(betas or []), prompt_sha])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def send(
+        self,
+        prompt_text: str,
+        *,
+        model: str,
+        label: str,
+        effort: str | None = None,
+        betas: list[str] | None = None,
+        refresh: bool = False,
+        system_prefix_file: Path | None = None,
+        limiter: _RateLimiter | None = None,
+        **kwargs,
+    ) -> str:
+        """
+        _send_message with caching. refresh=True skips the lookup but still stores the new result.
+        limiter is acquired only on a miss, right before the real call, so cache hits never wait for a slot.
+        """
+        hasher = hashlib.sha256()
+        if system_prefix_file is not None:
+            hasher.update(system_prefix_file.read_bytes())
+            hasher.update(b"\x00")
+        hasher.update(prompt_text.encode("utf-8"))
+        prompt_sha = hasher.hexdigest()
+        path = self.dir / f"{self._key(model, effort, betas, prompt_sha)}.json"
+
+        if self.enabled and not refresh and path.exists():
+            try:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+                with self._lock:
+                    self.hits += 1
+                telemetry.count("cache.llm.hit")
+                telemetry.echo(f"  ↺ {label} 命中响应缓存 ({entry.get('created_at', '?')})")
+                self._log_usage(label, model, {}, response_cache_hit=True)
+                return entry["response"]
+            except (json.JSONDecodeError, KeyError, OSError):
+                pass
+
+        started = time.monotonic()
+        usage: dict = {}
+        stream_path = self.dir.parent / "partial" / f"{label.replace('/', '_')}.partial.md"
+        backend = _BACKEND.name if _BACKEND else CLIBackend.name
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            with telemetry.timer(f"vendor.llm.{backend}", label=label, model=model):
+                text, _ = _send_message(prompt_text, model=model, effort=effort, betas=betas,
+                                        system_prefix_file=system_prefix_file, usage_out=usage,
+                                        stream_path=stream_path, **kwargs)
+        except (subprocess.TimeoutExpired, RuntimeError) as exc:
+            usage["latency_s"] = round(time.monotonic() - started, 3)
+            self._log_usage(label, model, usage, error=f"{type(exc).__name__}: {exc}")
+            raise
+        stream_path.unlink(missing_ok=True)
+        with self._lock:
+            self.misses += 1
+        telemetry.count("cache.llm.miss")
+        self._log_usage(label, model, usage)
+        if self.enabled:
+            entry = {
+                "label": label,
+                "model": model,
+                "effort": effort,
+                "betas": betas or [],
+                "prompt_sha256": prompt_sha,
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "elapsed_s": round(time.monotonic() - started, 1),
+                "usage": usage,
+                "response": text,
+            }
+            self.dir.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(entry, ensure_ascii=False, indent=2), encoding="utf-8")
+            tmp.replace(path)
+        return text
 
-    return text, sid
+    def _log_usage(self, label: str, model: str, usage: dict,
+                   response_cache_hit: bool = False, error: str | None = None) -> None:
+        """Print cached vs uncached input tokens and append one line to stages/llm_metrics.jsonl."""
+        record = {
+            "ts": datetime.now().isoformat(timespec="seconds"),
+            "label": label,
+            "backend": _BACKEND.name if _BACKEND else CLIBackend.name,
+            "model": model,
+            "response_cache_hit": response_cache_hit,
+            "ok": error is None,
+            **usage,
+        }
+        if error:
+            record["error"] = error[:300]
+        with self._lock:
+            self.usage.append(record)
+            self.dir.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.dir.parent / _METRICS_FILENAME, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        for key in ("input_uncached", "input_cache_read", "input_cache_write", "output"):
+            if usage.get(key):
+                telemetry.count(f"llm.tokens.{key}", usage[key])
+        if usage and error is None:
+            ttft = f"，首 token {usage['ttft_s']}s" if usage.get("ttft_s") is not None else ""
+            telemetry.echo(f"  · {label}: 输入 {usage['input_uncached']:,} 未缓存 + "
+                           f"{usage['input_cache_read']:,} 缓存命中 (写入缓存 {usage['input_cache_write']:,})，"
+                           f"输出 {usage['output']:,} tokens，耗时 {usage.get('latency_s', 0)}s{ttft}")
+
+    def usage_totals(self) -> dict:
+        keys = ("input_uncached", "input_cache_read", "input_cache_write", "output")
+        return {k: sum(r.get(k) or 0 for r in self.usage) for k in keys}
 
 
 def _write_stage_file(stage_dir: Path, filename: str, content: str) -> Path:
@@ -187,12 +379,23 @@ def _compress_to_compact(
     compress_prompt: str,
     cli_path: str,
     timeout: int = _TIMEOUT_COMPACT,
+    limiter: _RateLimiter | None = None,
+    cache: _ResponseCache | None = None,
+    label: str = "compact",
 ) -> str:
     """
     Use Haiku to compress a full analysis MD to a compact summary.
     Falls back to the first 2000 characters if compression fails.
     """
     prompt = compress_prompt + "\n\n---\n\n" + full_text
+    if cache is not None:
+        try:
+            return cache.send(prompt, model=_MODEL_COMPACT, label=label, limiter=limiter,
+                              session_id=None, timeout=timeout, cli_path=cli_path)
+        except Exception as exc:
+            return f"{_COMPACT_FAILED_PREFIX}: {exc}]\n\n{full_text[:2000]}"
+    if limiter is not None:
+        limiter.acquire()
     try:
         text, _ = _send_message(
             prompt,
@@ -203,7 +406,7 @@ def _compress_to_compact(
         )
         return text
     except Exception as exc:
-        return f"[Compact generation failed: {exc}]\n\n{full_text[:2000]}"
+        return f"{_COMPACT_FAILED_PREFIX}: {exc}]\n\n{full_text[:2000]}"
 
 
 def _compact_prompt_stage2(ticker: str) -> str:
@@ -290,6 +493,234 @@ def _assemble_staged_report(
     return "\n".join(lines)
 
 
+def _locate_prompt_files(web_prompts_dir: Path) -> tuple[Path | None, Path | None, list[Path], Path]:
+    """
+    Split a web_prompts directory into (position_file, prefix_file, stock_files, final_file).
+
+    prefix_file is the shared analysis framework (01_00_*.txt) that every
+    per-stock file builds on; it is None for directories generated before the
+    split, whose 01_*.txt files are still self-contained.
+    """
+    all_files     = sorted(web_prompts_dir.glob("*.txt"))
+    position_file = next((f for f in all_files if f.name.startswith("00_")), None)
+    prefix_file   = next((f for f in all_files if f.name.startswith(_SHARED_PREFIX_MARK)), None)
+    stock_files   = sorted(f for f in all_files
+                           if f.name.startswith("01_") and not f.name.startswith(_SHARED_PREFIX_MARK))
+    final_file    = next((f for f in all_files if f.name.startswith("02_")), None)
+
+    if not stock_files or not final_file:
+        raise FileNotFoundError(
+            f"Expected 01_*.txt (per-stock) and 02_*.txt (final) in {web_prompts_dir}.\n"
+            f"Found: {[f.name for f in all_files]}"
+        )
+    return position_file, prefix_file, stock_files, final_file
+
+
+def _stock_ticker(stock_file: Path) -> str:
+    """01_03_个股数据_0700.HK.txt → 0700.HK"""
+    stem_parts = stock_file.stem.split("_")
+    return stem_parts[-1] if len(stem_parts) >= 4 else stock_file.stem
+
+
+def _read_stage_output(stage_dir: Path, filename: str, failed_prefixes: tuple[str, ...] = ()) -> str | None:
+    """Return an existing stage file's text, or None if missing/empty/a failure placeholder."""
+    path = stage_dir / filename
+    if not path.exists():
+        return None
+    text = path.read_text(encoding="utf-8")
+    if not text.strip() or (failed_prefixes and text.startswith(failed_prefixes)):
+        return None
+    return text
+
+
+def _find_prior_compact(web_prompts_dir: Path, ticker: str) -> tuple[str, str] | None:
+    """
+    Most recent successful Stage 1 compact for ticker from an earlier
+    web_prompts_* directory. Returns (directory name, compact text) or None.
+    """
+    safe_ticker = ticker.replace(".", "_")
+    for prior in sorted(web_prompts_dir.parent.glob("web_prompts_*"), reverse=True):
+        if not prior.is_dir() or prior.name >= web_prompts_dir.name:
+            continue
+        text = _read_stage_output(prior / "stages", f"stage1_{safe_ticker}_compact.md", (_COMPACT_FAILED_PREFIX,))
+        if text is not None:
+            return prior.name, text
+    return None
+
+
+def _plan_incremental(web_prompts_dir: Path, stock_files: list[Path]) -> dict[str, dict]:
+    """
+    Pick the stocks eligible for an incremental update: a delta file marked
+    material=False and a prior compact to update. Returns ticker → plan.
+    """
+    plans: dict[str, dict] = {}
+    for stock_file in stock_files:
+        ticker = _stock_ticker(stock_file)
+        delta_file = web_prompts_dir / _DELTA_SUBDIR / f"{ticker}.json"
+        if not delta_file.exists():
+            continue
+        try:
+            delta = json.loads(delta_file.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            continue
+        if delta.get("material", True):
+            continue
+        prior = _find_prior_compact(web_prompts_dir, ticker)
+        if prior is None:
+            continue
+        plans[ticker] = {"prior_dir": prior[0], "prior_compact": prior[1], "delta": delta}
+    return plans
+
+
+def _incremental_prompt(ticker: str, plan: dict) -> str:
+    delta = plan["delta"]
+    return (
+        f"[Incremental Stock Update — {ticker}]\n"
+        f"以下是 {ticker} 上次运行（{plan['prior_dir']}）的核心结论摘要：\n\n"
+        f"{plan['prior_compact']}\n\n---\n\n"
+        f"自 {delta.get('since')} 以来该股数据变化未达重大阈值（无指标穿越判定阈值、无新交易与新财报、"
+        f"收盘价变动较小）。变化明细（changes since {delta.get('since')}）：\n```json\n"
+        f"{json.dumps(delta, ensure_ascii=False, separators=(',', ':'))}\n```\n"
+        "[重要指令]\n"
+        "请结合共享分析框架，仅根据以上变化更新上次结论（无需重新做完整分析），"
+        "保持相同的 compact 结构输出：\n"
+        "①核心估值结论（3行）②技术信号（3行）③情绪与新闻（2行）④推荐操作（1行）⑤关键价位（1行），"
+        "并在末尾用 1 行说明相对上次结论的变化（无变化则写“结论维持”）。"
+        "总长度不超过600字，数字必须精确保留。"
+    )
+
+
+def _run_stage1_stock(
+    stock_file: Path,
+    idx: int,
+    total: int,
+    stage_dir: Path,
+    cli_path: str,
+    limiter: _RateLimiter,
+    cache: _ResponseCache,
+    resume: bool = False,
+    refresh: bool = False,
+    prefix_file: Path | None = None,
+    incremental: dict | None = None,
+) -> tuple[str, str, str | None]:
+    """
+    Stage 1 worker: Opus analysis followed immediately by its compact
+    (local extraction; Haiku only when extraction confidence is low).
+
+    Returns (ticker, compact_text, error_or_None). Timeouts and CLI errors are
+    captured here exactly as in the serial loop, so one failing stock never
+    aborts the others.
+
+    resume=True reuses existing stage1 full/compact files as-is; refresh=True
+    bypasses the response cache (used by --only to force regeneration).
+    prefix_file (the shared framework) is sent as the cacheable system prompt.
+    incremental (from _plan_incremental) replaces the full payload with the
+    prior compact + payload delta; the response is already in compact form.
+    """
+    ticker = _stock_ticker(stock_file)
+    safe_ticker = ticker.replace(".", "_")
+
+    if resume and not refresh:
+        full_done = _read_stage_output(stage_dir, f"stage1_{safe_ticker}_full.md")
+        compact_done = _read_stage_output(stage_dir, f"stage1_{safe_ticker}_compact.md", (_COMPACT_FAILED_PREFIX,))
+        if full_done is not None and compact_done is not None:
+            print(f"  ↺ [{idx}/{total}] {ticker} 已有 Stage 1 结果，跳过")
+            return ticker, compact_done, None
+
+    if incremental is not None:
+        return _run_stage1_incremental(ticker, idx, total, stage_dir, cli_path, limiter, cache,
+                                       incremental, refresh=refresh, prefix_file=prefix_file)
+
+    print(f"  → [{idx}/{total}] {ticker} 开始分析...")
+    try:
+        stock_text = cache.send(
+            stock_file.read_text(encoding="utf-8"),
+            model=_MODEL_PERSTOCK,
+            label=f"Stage1/{ticker}",
+            effort=_EFFORT_STAGE2,
+            betas=[_BETA_1M_CONTEXT],
+            refresh=refresh,
+            system_prefix_file=prefix_file,
+            limiter=limiter,
+            session_id=None,
+            timeout=_TIMEOUT_STAGE2,
+            cli_path=cli_path,
+        )
+    except subprocess.TimeoutExpired:
+        print(f"  ⚠ {ticker} 超时，跳过继续...")
+        return ticker, f"[分析超时 ({_TIMEOUT_STAGE2}s)]", f"Stage1/{ticker}: timeout after {_TIMEOUT_STAGE2}s"
+    except RuntimeError as exc:
+        print(f"  ⚠ {ticker} 出错: {exc}，跳过继续...")
+        return ticker, f"[分析失败: {exc}]", f"Stage1/{ticker}: {exc}"
+
+    _write_stage_file(stage_dir, f"stage1_{safe_ticker}_full.md", stock_text)
+    print(f"  ✓ {ticker} 分析完成 ({len(stock_text):,} 字符)，生成 compact...")
+
+    compact_text, confidence = extract_compact(stock_text, ticker)
+    if confidence >= _COMPACT_MIN_CONFIDENCE:
+        source = f"本地提取, 置信度 {confidence:.2f}"
+    else:
+        print(f"  … {ticker} 本地提取置信度 {confidence:.2f} < {_COMPACT_MIN_CONFIDENCE}，回退 Haiku compact")
+        compact_text = _compress_to_compact(
+            stock_text,
+            _compact_prompt_stage2(ticker),
+            cli_path,
+            limiter=limiter,
+            cache=cache,
+            label=f"Stage1/{ticker}/compact",
+        )
+        source = "Haiku"
+    _write_stage_file(stage_dir, f"stage1_{safe_ticker}_compact.md", compact_text)
+    print(f"  ✓ {ticker} compact 完成 ({len(compact_text):,} 字符, {source})")
+    return ticker, compact_text, None
+
+
+def _run_stage1_incremental(
+    ticker: str,
+    idx: int,
+    total: int,
+    stage_dir: Path,
+    cli_path: str,
+    limiter: _RateLimiter,
+    cache: _ResponseCache,
+    plan: dict,
+    refresh: bool = False,
+    prefix_file: Path | None = None,
+) -> tuple[str, str, str | None]:
+    """Stage 1 incremental worker: update the prior compact from the payload delta."""
+    safe_ticker = ticker.replace(".", "_")
+    since = plan["delta"].get("since")
+    print(f"  → [{idx}/{total}] {ticker} 增量更新（自 {since}，基于 {plan['prior_dir']} 的 compact）...")
+    try:
+        compact_text = cache.send(
+            _incremental_prompt(ticker, plan),
+            model=_MODEL_PERSTOCK,
+            label=f"Stage1/{ticker}/incremental",
+            effort=_EFFORT_INCREMENTAL,
+            refresh=refresh,
+            system_prefix_file=prefix_file,
+            limiter=limiter,
+            session_id=None,
+            timeout=_TIMEOUT_INCREMENTAL,
+            cli_path=cli_path,
+        )
+    except subprocess.TimeoutExpired:
+        print(f"  ⚠ {ticker} 增量更新超时，跳过继续...")
+        return ticker, f"[分析超时 ({_TIMEOUT_INCREMENTAL}s)]", f"Stage1/{ticker}: timeout after {_TIMEOUT_INCREMENTAL}s"
+    except RuntimeError as exc:
+        print(f"  ⚠ {ticker} 增量更新出错: {exc}，跳过继续...")
+        return ticker, f"[分析失败: {exc}]", f"Stage1/{ticker}: {exc}"
+
+    full_text = (
+        f"> 增量更新：自 {since} 以来数据变化未达重大阈值，"
+        f"本节基于 {plan['prior_dir']} 的结论与变化明细更新，未重新做完整分析。\n\n{compact_text}"
+    )
+    _write_stage_file(stage_dir, f"stage1_{safe_ticker}_full.md", full_text)
+    _write_stage_file(stage_dir, f"stage1_{safe_ticker}_compact.md", compact_text)
+    print(f"  ✓ {ticker} 增量更新完成 ({len(compact_text):,} 字符)")
+    return ticker, compact_text, None
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
@@ -306,7 +737,7 @@ def find_latest_web_prompts(base_dir: Path | None = None) -> Path:
     return dirs[0]
 
 
-def generate_report(web_prompts_dir: Path | None = None) -> Path | None:
+def generate_report(web_prompts_dir: Path | None = None, backend: str | None = None) -> Path | None:
     """
     Orchestrate the full multi-turn conversation and save the report.
 
@@ -315,27 +746,20 @@ def generate_report(web_prompts_dir: Path | None = None) -> Path | None:
     web_prompts_dir : Path, optional
         Path to a specific web_prompts_YYYYMMDD directory.
         If None, the most recent one under LATEST_DIR is used.
+    backend : str, optional
+        LLM transport: "cli" (default), "http" or "mock" (env LLM_BACKEND).
 
     Returns
     -------
     Path to the saved markdown report, or None if the run failed entirely.
     """
-    cli_path = _check_claude_cli()
+    cli_path = _init_backend(backend)
 
     # --- Locate prompt files ---
     if web_prompts_dir is None:
         web_prompts_dir = find_latest_web_prompts()
 
-    all_files     = sorted(web_prompts_dir.glob("*.txt"))
-    position_file = next((f for f in all_files if f.name.startswith("00_")), None)
-    stock_files   = sorted(f for f in all_files if f.name.startswith("01_"))
-    final_file    = next((f for f in all_files if f.name.startswith("02_")), None)
-
-    if not stock_files or not final_file:
-        raise FileNotFoundError(
-            f"Expected 01_*.txt (per-stock) and 02_*.txt (final) in {web_prompts_dir}.\n"
-            f"Found: {[f.name for f in all_files]}"
-        )
+    position_file, prefix_file, stock_files, final_file = _locate_prompt_files(web_prompts_dir)
 
     total_turns = 1 + len(stock_files) + (1 if position_file else 0)
     responses:  list[dict] = []
@@ -380,9 +804,9 @@ def generate_report(web_prompts_dir: Path | None = None) -> Path | None:
 
     # -------------------------------------------------------------------
     # Per-stock deep analysis (Opus) — each stock uses a FRESH session.
-    # Per-stock files are self-contained (instructions + metric_definitions +
-    # global_portfolio_context + target_stock + analysis_requirements), so no
-    # external context prefix is needed.
+    # The shared framework (01_00_*.txt: instructions + metric_definitions +
+    # global_portfolio_context + analysis_requirements) is sent as the system
+    # prompt; the per-stock file carries only target_stock.
     # -------------------------------------------------------------------
     stock_analyses: list[tuple[str, str]] = []   # (ticker, analysis_text)
 
@@ -401,6 +825,7 @@ def generate_report(web_prompts_dir: Path | None = None) -> Path | None:
                 timeout=_TIMEOUT_STOCK,
                 cli_path=cli_path,
                 betas=[_BETA_1M_CONTEXT],
+                system_prefix_file=prefix_file,
             )
             responses.append({"label": f"个股深度分析: {ticker}", "text": text})
             stock_analyses.append((ticker, text))
@@ -468,6 +893,7 @@ def generate_report(web_prompts_dir: Path | None = None) -> Path | None:
     # -------------------------------------------------------------------
     today_str   = datetime.now().strftime("%Y%m%d")
     output_path = FINAL_REPORTS_DIR / f"CLAUDE_hybrid_{today_str}.md"
+    FINAL_REPORTS_DIR.mkdir(parents=True, exist_ok=True)
     report      = _assemble_report(responses, web_prompts_dir, errors)
     output_path.write_text(report, encoding="utf-8")
 
@@ -481,51 +907,79 @@ def generate_report(web_prompts_dir: Path | None = None) -> Path | None:
     return output_path
 
 
-def generate_staged_report(web_prompts_dir: Path | None = None) -> Path | None:
+def generate_staged_report(
+    web_prompts_dir: Path | None = None,
+    parallelism: int | None = None,
+    resume: bool = False,
+    only: str | None = None,
+    use_cache: bool = True,
+    incremental: bool = False,
+    backend: str | None = None,
+) -> Path | None:
     """
     Multi-stage report generation using separate CLI chat sessions per stage.
 
     Pipeline:
       Stage 0  Haiku                  — portfolio table (00_*.txt)
-      Stage 1  Opus 4.7 + 1M context  — per-stock analysis (self-contained 01_*.txt each)
+      Stage 1  Opus 4.7 + 1M context  — per-stock analysis (shared 01_00_*.txt as system prompt + 01_NN_*.txt)
       Stage 2  Opus 4.7 + effort max  — final action plan (stage1 compacts + 02_*.txt)
       Stage 3  Python only            — local assembly → CLAUDE_staged_YYYYMMDD.md
 
     Intermediate files are written to web_prompts_YYYYMMDD/stages/ for review.
+    Every LLM call goes through a response cache in stages/cache/ keyed by
+    (model, effort, betas, prompt SHA-256), so a rerun with unchanged prompts
+    only pays for the calls that previously failed.
 
     Parameters
     ----------
     web_prompts_dir : Path, optional
         Specific web_prompts_YYYYMMDD directory. Defaults to most recent.
+    parallelism : int, optional
+        Max concurrent Stage 1 stocks. Defaults to _STAGE1_PARALLELISM
+        (env STAGE1_PARALLELISM, 3). 1 reproduces the serial behaviour.
+    resume : bool
+        Continue from the first missing stage: existing stage0 / stage1 /
+        stage2 output files are reused as-is (failure placeholders count as
+        missing), even when they predate the response cache.
+    only : str, optional
+        Regenerate Stage 1 for this ticker only (cache bypassed), keep all
+        other stage files, skip Stages 0 and 2, and reassemble the report.
+    use_cache : bool
+        False disables the response cache (always call the CLI).
+    incremental : bool
+        Stocks whose payload changed below the materiality threshold since
+        the previous run (deltas/<ticker>.json, material=False) and that have
+        a prior Stage 1 compact get a short "prior compact + delta" update
+        instead of the full analysis. --only always runs the full analysis.
+    backend : str, optional
+        LLM transport: "cli" (default), "http" (streaming Messages API) or
+        "mock" (local mock server, offline benchmarks). Env LLM_BACKEND.
 
     Returns
     -------
     Path to the saved markdown report, or None if the run failed entirely.
     """
-    cli_path = _check_claude_cli()
+    cli_path = _init_backend(backend)
 
     if web_prompts_dir is None:
         web_prompts_dir = find_latest_web_prompts()
 
-    all_files     = sorted(web_prompts_dir.glob("*.txt"))
-    position_file = next((f for f in all_files if f.name.startswith("00_")), None)
-    stock_files   = sorted(f for f in all_files if f.name.startswith("01_"))
-    final_file    = next((f for f in all_files if f.name.startswith("02_")), None)
+    position_file, prefix_file, stock_files, final_file = _locate_prompt_files(web_prompts_dir)
 
-    if not stock_files or not final_file:
-        raise FileNotFoundError(
-            f"Expected 01_*.txt (per-stock) and 02_*.txt (final) in {web_prompts_dir}.\n"
-            f"Found: {[f.name for f in all_files]}"
-        )
+    if only:
+        stock_files = [f for f in stock_files if _stock_ticker(f) == only]
+        if not stock_files:
+            raise FileNotFoundError(f"No 01_*.txt for ticker {only} in {web_prompts_dir}")
 
     stage_dir = web_prompts_dir / "stages"
     stage_dir.mkdir(exist_ok=True)
+    cache = _ResponseCache(stage_dir, enabled=use_cache)
 
     total_stages = 3
     errors: list[str] = []
 
     print(f"\n{'='*58}")
-    print(f"  Claude 多阶段报告生成")
+    print(f"  Claude 多阶段报告生成" + (f" (仅重跑 {only})" if only else " (续跑)" if resume else ""))
     print(f"  来源: {web_prompts_dir.name}")
     print(f"  阶段: Stage0(Haiku 持仓表) "
           f"→ Stage1(Opus/{_EFFORT_STAGE2} × {len(stock_files)} 只个股, 1M context) "
@@ -537,12 +991,16 @@ def generate_staged_report(web_prompts_dir: Path | None = None) -> Path | None:
     # Stage 0 — Portfolio table (Haiku, no effort)
     # -----------------------------------------------------------------------
     print(f"[Stage 0/{total_stages}] 持仓情况表格 (Haiku)...")
-    stage0_text = ""
-    if position_file:
+    if only:
+        print("  — --only 模式，保留现有 Stage 0 结果")
+    elif resume and _read_stage_output(stage_dir, "stage0_portfolio.md") is not None:
+        print("  ↺ 已有 Stage 0 结果，跳过")
+    elif position_file:
         try:
-            stage0_text, _ = _send_message(
+            stage0_text = cache.send(
                 position_file.read_text(encoding="utf-8"),
                 model=_MODEL_POSITION,
+                label="Stage0",
                 session_id=None,
                 timeout=_TIMEOUT_STAGE0,
                 cli_path=cli_path,
@@ -558,61 +1016,59 @@ def generate_staged_report(web_prompts_dir: Path | None = None) -> Path | None:
         except RuntimeError as exc:
             errors.append(f"Stage0: {exc}")
             print(f"  ⚠ Stage 0 出错: {exc}，跳过继续...")
+        time.sleep(_INTER_TURN_SLEEP)
     else:
         print("  — 无 00_*.txt，跳过 Stage 0")
-    time.sleep(_INTER_TURN_SLEEP)
 
     # -----------------------------------------------------------------------
     # Stage 1 — Per-stock deep analysis (Opus 4.7 + 1M context, effort max,
-    # fresh session each). Per-stock files are self-contained, so no global
-    # context prefix is needed.
+    # fresh session each). Every call carries the same shared framework file as
+    # its system prompt (byte-identical → provider prompt-cache hit after the
+    # first stock); the per-stock file holds only target_stock. Stocks run concurrently (bounded pool + shared
+    # rate limiter); each worker pipelines its own compact, and Stage 2 starts
+    # as soon as the last worker returns.
     # -----------------------------------------------------------------------
-    stock_compacts: list[tuple[str, str]] = []  # (ticker, compact_text)
-
-    for idx, stock_file in enumerate(stock_files, start=1):
-        stem_parts = stock_file.stem.split("_")
-        ticker = stem_parts[-1] if len(stem_parts) >= 4 else stock_file.stem
+    # Stocks whose Stage 1 outputs are missing before this run — if any, a
+    # resumed run must redo Stage 2 as well (its compacts input changed)
+    stage1_missing = [
+        f for f in stock_files
+        if _read_stage_output(stage_dir, f"stage1_{_stock_ticker(f).replace('.', '_')}_full.md") is None
+        or _read_stage_output(stage_dir, f"stage1_{_stock_ticker(f).replace('.', '_')}_compact.md",
+                              (_COMPACT_FAILED_PREFIX,)) is None
+    ]
 
-        print(f"[Stage 1/{total_stages}] 个股分析 [{idx}/{len(stock_files)}] {ticker} "
-              f"(Opus 4.7, 1M ctx, effort={_EFFORT_STAGE2})...")
-        try:
-            stock_text, _ = _send_message(
-                stock_file.read_text(encoding="utf-8"),
-                model=_MODEL_PERSTOCK,
-                session_id=None,
-                timeout=_TIMEOUT_STAGE2,
-                cli_path=cli_path,
-                effort=_EFFORT_STAGE2,
-                betas=[_BETA_1M_CONTEXT],
-            )
-            safe_ticker = ticker.replace(".", "_")
-            _write_stage_file(stage_dir, f"stage1_{safe_ticker}_full.md", stock_text)
-            print(f"  ✓ {ticker} 分析完成 ({len(stock_text):,} 字符)，生成 compact...")
-
-            compact_text = _compress_to_compact(
-                stock_text,
-                _compact_prompt_stage2(ticker),
-                cli_path,
-            )
-            _write_stage_file(stage_dir, f"stage1_{safe_ticker}_compact.md", compact_text)
-            stock_compacts.append((ticker, compact_text))
-            print(f"  ✓ {ticker} compact 完成 ({len(compact_text):,} 字符)")
-            time.sleep(_INTER_TURN_SLEEP)
-        except subprocess.TimeoutExpired:
-            msg = f"[分析超时 ({_TIMEOUT_STAGE2}s)]"
-            stock_compacts.append((ticker, msg))
-            errors.append(f"Stage1/{ticker}: timeout after {_TIMEOUT_STAGE2}s")
-            print(f"  ⚠ {ticker} 超时，跳过继续...")
-        except RuntimeError as exc:
-            msg = f"[分析失败: {exc}]"
-            stock_compacts.append((ticker, msg))
-            errors.append(f"Stage1/{ticker}: {exc}")
-            print(f"  ⚠ {ticker} 出错: {exc}，跳过继续...")
+    incremental_plans = _plan_incremental(web_prompts_dir, stock_files) if incremental and not only else {}
+
+    workers = max(1, min(parallelism or _STAGE1_PARALLELISM, len(stock_files)))
+    limiter = _RateLimiter(_STAGE1_MIN_INTERVAL)
+    print(f"[Stage 1/{total_stages}] 个股分析 × {len(stock_files)} "
+          f"(Opus 4.7, 1M ctx, effort={_EFFORT_STAGE2}, 并发 {workers})...")
+    if incremental:
+        print(f"  增量模式: {len(incremental_plans)} 只个股变化未达重大阈值，仅发送上次 compact + 增量"
+              + (f" ({', '.join(incremental_plans)})" if incremental_plans else ""))
+
+    with telemetry.span("llm.stage1", stocks=len(stock_files), workers=workers), \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_run_stage1_stock, stock_file, idx, len(stock_files),
+                        stage_dir, cli_path, limiter, cache,
+                        resume=resume, refresh=bool(only), prefix_file=prefix_file,
+                        incremental=incremental_plans.get(_stock_ticker(stock_file)))
+            for idx, stock_file in enumerate(stock_files, start=1)
+        ]
+        # Collect in submission order so compacts/tickers.json keep the 01_NN order
+        results = [f.result() for f in futures]
 
-        time.sleep(_INTER_TURN_SLEEP)
+    stock_compacts: list[tuple[str, str]] = [(ticker, compact) for ticker, compact, _ in results]
+    errors += [err for _, _, err in results if err]
 
     # Save safe_ticker → original_ticker mapping for assembly step
-    tickers_map = {t.replace(".", "_"): t for t, _ in stock_compacts}
+    # (merged with the existing map so --only keeps the other stocks' entries)
+    tickers_json = stage_dir / "tickers.json"
+    tickers_map: dict[str, str] = {}
+    if only and tickers_json.exists():
+        tickers_map = json.loads(tickers_json.read_text(encoding="utf-8"))
+    tickers_map.update({t.replace(".", "_"): t for t, _ in stock_compacts})
     _write_stage_file(stage_dir, "tickers.json",
                       json.dumps(tickers_map, ensure_ascii=False, indent=2))
 
@@ -622,37 +1078,44 @@ def generate_staged_report(web_prompts_dir: Path | None = None) -> Path | None:
     # analysis_requirements); we prepend per-stock compacts as context.
     # -----------------------------------------------------------------------
     print(f"[Stage 2/{total_stages}] 终极决断与操作计划 (Opus 4.7, effort={_EFFORT_STAGE3})...")
-    compacts_block = "\n\n".join(
-        f"### {ticker} 核心结论摘要\n{compact}"
-        for ticker, compact in stock_compacts
-    )
-    stage2_prompt = (
-        f"# 各个股核心结论摘要（由 Opus 深度分析后压缩）\n\n"
-        f"{compacts_block}\n\n"
-        f"---\n\n"
-        + final_file.read_text(encoding="utf-8")
-    )
-    try:
-        stage2_text, _ = _send_message(
-            stage2_prompt,
-            model=_MODEL_FINAL,
-            session_id=None,
-            timeout=_TIMEOUT_STAGE3,
-            cli_path=cli_path,
-            effort=_EFFORT_STAGE3,
+    if only:
+        print("  — --only 模式，保留现有 Stage 2 结果（如需重新决断请去掉 --only 再运行）")
+    elif resume and not stage1_missing and _read_stage_output(
+            stage_dir, "stage2_final_plan.md", _STAGE2_FAILED_PREFIXES) is not None:
+        print("  ↺ 已有 Stage 2 结果，跳过")
+    else:
+        compacts_block = "\n\n".join(
+            f"### {ticker} 核心结论摘要\n{compact}"
+            for ticker, compact in stock_compacts
         )
-        _write_stage_file(stage_dir, "stage2_final_plan.md", stage2_text)
-        print(f"  ✓ Stage 2 完成 ({len(stage2_text):,} 字符)")
-    except subprocess.TimeoutExpired:
-        _write_stage_file(stage_dir, "stage2_final_plan.md",
-                          f"[最终计划超时 ({_TIMEOUT_STAGE3}s) — 请手动补充]")
-        errors.append(f"Stage2: timeout after {_TIMEOUT_STAGE3}s")
-        print(f"  ⚠ Stage 2 超时")
-    except RuntimeError as exc:
-        _write_stage_file(stage_dir, "stage2_final_plan.md",
-                          f"[最终计划生成失败: {exc}]")
-        errors.append(f"Stage2: {exc}")
-        print(f"  ⚠ Stage 2 出错: {exc}")
+        stage2_prompt = (
+            f"# 各个股核心结论摘要（由 Opus 深度分析后压缩）\n\n"
+            f"{compacts_block}\n\n"
+            f"---\n\n"
+            + final_file.read_text(encoding="utf-8")
+        )
+        try:
+            stage2_text = cache.send(
+                stage2_prompt,
+                model=_MODEL_FINAL,
+                label="Stage2",
+                effort=_EFFORT_STAGE3,
+                session_id=None,
+                timeout=_TIMEOUT_STAGE3,
+                cli_path=cli_path,
+            )
+            _write_stage_file(stage_dir, "stage2_final_plan.md", stage2_text)
+            print(f"  ✓ Stage 2 完成 ({len(stage2_text):,} 字符)")
+        except subprocess.TimeoutExpired:
+            _write_stage_file(stage_dir, "stage2_final_plan.md",
+                              f"[最终计划超时 ({_TIMEOUT_STAGE3}s) — 请手动补充]")
+            errors.append(f"Stage2: timeout after {_TIMEOUT_STAGE3}s")
+            print(f"  ⚠ Stage 2 超时")
+        except RuntimeError as exc:
+            _write_stage_file(stage_dir, "stage2_final_plan.md",
+                              f"[最终计划生成失败: {exc}]")
+            errors.append(f"Stage2: {exc}")
+            print(f"  ⚠ Stage 2 出错: {exc}")
 
     # -----------------------------------------------------------------------
     # Stage 3 — Local assembly (no LLM)
@@ -660,12 +1123,17 @@ def generate_staged_report(web_prompts_dir: Path | None = None) -> Path | None:
     print(f"[Stage 3/{total_stages}] 本地组合最终报告...")
     today_str   = datetime.now().strftime("%Y%m%d")
     output_path = FINAL_REPORTS_DIR / f"CLAUDE_staged_{today_str}.md"
+    FINAL_REPORTS_DIR.mkdir(parents=True, exist_ok=True)
     report      = _assemble_staged_report(stage_dir, web_prompts_dir, errors)
     output_path.write_text(report, encoding="utf-8")
 
     status = "⚠️ 部分错误" if errors else "✅"
     print(f"\n{status} 报告已保存: {output_path}")
     print(f"   中间文件: {stage_dir}")
+    print(f"   响应缓存: 命中 {cache.hits} 次，实际调用 {cache.misses} 次")
+    totals = cache.usage_totals()
+    print(f"   输入 tokens: 未缓存 {totals['input_uncached']:,} / 前缀缓存命中 {totals['input_cache_read']:,} "
+          f"/ 写入缓存 {totals['input_cache_write']:,}；输出 {totals['output']:,}")
     if errors:
         print("   错误摘要:")
         for e in errors:
@@ -695,20 +1163,75 @@ if __name__ == "__main__":
         help="Path to a specific web_prompts_YYYYMMDD directory. "
              "Defaults to the most recent one in data/output/latest/.",
     )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Max concurrent Stage 1 per-stock analyses "
+             f"(default: STAGE1_PARALLELISM env or {_STAGE1_PARALLELISM}).",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue from the first missing stage, reusing existing stages/ outputs.",
+    )
+    parser.add_argument(
+        "--only",
+        type=str,
+        default=None,
+        metavar="TICKER",
+        help="Regenerate Stage 1 for a single ticker (e.g. 0700.HK) and reassemble the report.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the prompt-hash response cache in stages/cache/.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="For stocks whose payload changed below the materiality threshold since the "
+             "previous run, send only the prior compact + payload delta to Stage 1.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=None,
+        help="LLM transport: cli (claude -p, default), http (streaming Messages API, "
+             "partial replies kept in stages/partial/) or mock (local mock server). "
+             "Env: LLM_BACKEND.",
+    )
     parser.add_argument(
         "--legacy",
         action="store_true",
         help="Use legacy single-session mode (Haiku→Sonnet→Opus in one process). "
              "Faster but shallower — no extended thinking, no intermediate files.",
     )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Suppress per-call progress lines (telemetry is still written to data/output/telemetry/).",
+    )
     args = parser.parse_args()
 
+    telemetry.start_run("report", quiet=args.quiet)
     try:
         if args.legacy:
-            path = generate_report(args.dir)
+            path = generate_report(args.dir, backend=args.backend)
         else:
-            path = generate_staged_report(args.dir)
+            path = generate_staged_report(
+                args.dir,
+                parallelism=args.parallel,
+                resume=args.resume,
+                only=args.only,
+                use_cache=not args.no_cache,
+                incremental=args.incremental,
+                backend=args.backend,
+            )
         print(f"\nDone: {path}")
     except Exception as exc:
         print(f"\nFatal: {exc}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        telemetry.finish_run()
@@ -1,5 +1,7 @@
+import argparse
 import sys
 import time
+from datetime import datetime
 from pathlib import Path
 
 # ==========================================
@@ -10,10 +12,11 @@ sys.path.append(str(BASE_DIR))
 
 # [1] 数据拉取层 (Extract)
 from data_pull.ibkr_api import pull_all_ibkr_data, fetch_ibkr_ohlcv  # IBKR 持仓快照 K线拉取主引擎
-from data_pull.yfinance_api import fetch_financials, fetch_index_ohlcv, fallback_to_yfinance  # yfinance 底线财务报表(info.json)+财报副引擎-akshare挂掉 大盘指数拉取 K线副引擎-IBKR挂掉
-from data_pull.akshare_api import fetch_financials_akshare  # akshare 财报主引擎
-from data_pull.news_api import fetch_stock_news  # 拉取新闻
-from config import LOOKBACK_YEARS, INDEX_SYMBOLS
+from data_pull.yfinance_api import fetch_index_ohlcv, fallback_to_yfinance  # yfinance 大盘指数拉取 K线副引擎-IBKR挂掉
+from data_pull.financials_refresh import refresh_financials  # 财报新鲜度调度: yfinance 底线(info.json) + akshare 财报主引擎覆盖
+from data_pull.news_api import fetch_news_for_holdings  # 全持仓并发增量拉取新闻
+from data_pull.http_cache import install_vendor_adapters, set_bypass, set_offline  # 全 vendor 共用 HTTP 缓存层
+from config import LOOKBACK_YEARS, INDEX_SYMBOLS, FX_HISTORY_SYMBOLS, STRESS_SCENARIOS, STRESS_SCENARIO_INDEX
 
 # [2] 数据处理和分析层 (Transform & Calculate)
 from processors.risk_calc import generate_portfolio_risk_report
@@ -24,26 +27,131 @@ from processors.derived_writer import (
     write_valuation_history,
     append_sentiment_archive,
 )
+from processors.headline_scoring import write_sentiment_aggregates
 
 # [3] 报告与 Prompt 生成层 (Load & Output)
 from llm_report.prompt_template import generate_consolidated_api_prompt
 from llm_report.report_generator import generate_staged_report
 
-# [4] 浏览器展开层 (Web Viewer)
-from webview.app import create_app
+# [4] 浏览器展开层 (Web Viewer)：Flask 等只在第六阶段才导入，见 main() 末尾
 
-def main():
+# [5] 运行埋点 (各阶段 / 各 ticker 耗时、vendor 延迟、缓存命中率 → data/output/telemetry/)
+import telemetry
+
+def _to_standard_symbol(item: dict) -> str:
+    """IBKR 持仓行 → 标准代码 (HKD: 700 → 0700.HK；其他市场原样)。"""
+    raw_symbol = str(item['Symbol'])
+    if item['Currency'] == 'HKD':
+        return raw_symbol.zfill(4) + ".HK"
+    return raw_symbol
+
+def _process_holding(ib, standard_symbol: str, currency: str, force_financials: bool) -> None:
+    """单只持仓的第三阶段全部步骤；每步一个 telemetry span（自动归到外层 ticker span 下）。"""
+    # --- 1. 数据拉取层 (Extract) ---
+    # 主引擎: IBKR 拉取 OHLCV，失败自动降级到 yfinance
+    telemetry.echo(f"   ▶ [1/3] 拉取历史量价数据 (IBKR)...")
+    with telemetry.span("ohlcv") as s:
+        try:
+            fetch_ibkr_ohlcv(ib, standard_symbol, currency)
+            s["source"] = "ibkr"
+        except Exception as e:
+            print(f"   ⚠️ IBKR 历史数据拉取失败: {e}")
+            print(f"   🔄 启动 yfinance 备用引擎...")
+            # 副引擎：yfinance 拉取 OHLCV
+            fallback_to_yfinance(standard_symbol, LOOKBACK_YEARS)
+            s["source"] = "yfinance"
+
+    ib.sleep(2)  # IBKR pacing 礼貌间隔
+
+    # 财报三表: 先判断新鲜度 (TTL / 下一期披露日)，过期才拉取
+    # yfinance 拉 info.json + 三表 CSV 作为底线，再用 AkShare 覆盖 (更新更快)
+    telemetry.echo(f"   ▶ [2/3a] 刷新公司画像与财报 (yfinance + AkShare)...")
+    try:
+        with telemetry.span("financials"):
+            refresh_financials(standard_symbol, force=force_financials)
+    except Exception as e:
+        print(f"   ⚠️ 财报刷新失败: {e}")
+
+    time.sleep(1)
+
+    # 派生时序：技术指标 + 估值 + 舆情归档落 parquet（webview 直接读）
+    telemetry.echo(f"   ▶ [3/3a] 落盘技术面历史时序 (parquet)...")
+    try:
+        with telemetry.span("derived.technical"):
+            write_technical_history(standard_symbol)
+    except Exception as e:
+        print(f"   ⚠️ 技术面 parquet 落盘失败: {e}")
+
+    telemetry.echo(f"   ▶ [3/3b] 落盘估值历史时序 (parquet)...")
+    try:
+        with telemetry.span("derived.valuation"):
+            write_valuation_history(standard_symbol)
+    except Exception as e:
+        print(f"   ⚠️ 估值 parquet 落盘失败: {e}")
+
+    telemetry.echo(f"   ▶ [3/3c] 归档舆情记录 (master parquet)...")
+    try:
+        with telemetry.span("derived.sentiment_archive") as s:
+            n_new = append_sentiment_archive(standard_symbol)
+            s["rows"] = n_new
+        if n_new:
+            telemetry.echo(f"      新增 {n_new} 条舆情记录")
+    except Exception as e:
+        print(f"   ⚠️ 舆情归档失败: {e}")
+
+    telemetry.echo(f"   ▶ [3/3d] 本地标题打分 + 舆情日/周/月聚合 (parquet)...")
+    try:
+        with telemetry.span("derived.sentiment_aggregates"):
+            write_sentiment_aggregates(standard_symbol)
+    except Exception as e:
+        print(f"   ⚠️ 舆情打分聚合失败: {e}")
+
+    telemetry.echo(f"   ▶ [3/3e] 组装终极 LLM 数据载荷 (JSON)...")
+    with telemetry.span("payload"):
+        assemble_llm_payload(standard_symbol)
+
+def _stress_history_years() -> int:
+    """情景回放参照指数的回溯年限：覆盖最早的 STRESS_SCENARIOS 起点（向上取整多留一年），且不少于 LOOKBACK_YEARS。"""
+    earliest = min(datetime.strptime(start, "%Y-%m-%d") for start, _ in STRESS_SCENARIOS.values())
+    return max(LOOKBACK_YEARS, (datetime.now() - earliest).days // 365 + 1)
+
+def _finish_telemetry() -> None:
+    summary_path = telemetry.finish_run()
+    if summary_path:
+        print(f"📈 运行埋点汇总: {summary_path}")
+
+def main(serve_webview: bool = True, force_financials: bool = False, offline: bool = False,
+         incremental_report: bool = False, quiet: bool = False, http_cache: bool = True):
+    telemetry.start_run("pipeline", quiet=quiet)
     print("🌟" + "="*50 + "🌟")
     print("      启动终极量化投研流水线 (Quant Pipeline)")
     print("🌟" + "="*50 + "🌟\n")
 
+    # AkShare / yfinance / RSS 统一走 SQLite 响应缓存，TTL 内重跑零网络请求
+    # 录制 / 回放模式下不装缓存层：缓存会盖在录制器之上（TTL 内命中的请求录不进 fixture），
+    # 回放卸载时也会把 requests.get 恢复成错误的对象
+    if http_cache:
+        install_vendor_adapters()
+    else:
+        set_bypass(True)
+        print("🎞️ 录制 / 回放模式：跳过 HTTP 响应缓存层\n")
+    if offline:
+        set_offline(True)
+        print("📴 HTTP 离线模式：仅从本地响应缓存读取\n")
+
     # ---------------------------------------------------------
     # 第零阶段：拉取大盘指数数据 (yfinance，不依赖 IBKR 连接)
     # ---------------------------------------------------------
-    print("📊 [第零阶段] 拉取大盘指数参照数据 (yfinance)...\n")
-    for idx_symbol in INDEX_SYMBOLS:
+    telemetry.stage("0_index")
+    print("📊 [第零阶段] 拉取大盘指数参照数据与汇率日线 (yfinance)...\n")
+    # 汇率日线供尾部风险引擎把各持仓收益率折算为基础货币
+    for idx_symbol in [*INDEX_SYMBOLS, *FX_HISTORY_SYMBOLS.values()]:
         try:
-            fetch_index_ohlcv(idx_symbol)
+            with telemetry.span("index", ticker=idx_symbol):
+                if idx_symbol == STRESS_SCENARIO_INDEX:
+                    fetch_index_ohlcv(idx_symbol, years=_stress_history_years(), backfill=True)
+                else:
+                    fetch_index_ohlcv(idx_symbol)
         except Exception as e:
             print(f"   ⚠️ {idx_symbol} 指数拉取异常: {e}")
         time.sleep(1)
@@ -51,6 +159,7 @@ def main():
     # ---------------------------------------------------------
     # 第一阶段：清洗 IBKR 历史交易记录 (Flex Query CSV -> 标准化)
     # ---------------------------------------------------------
+    telemetry.stage("1_transactions")
     print("\n🧹 [第一阶段] 清洗 IBKR 历史交易记录...\n")
     try:
         clean_ibkr_transactions()
@@ -60,11 +169,13 @@ def main():
     # ---------------------------------------------------------
     # 第二阶段：账户与风控全局扫描
     # ---------------------------------------------------------
+    telemetry.stage("2_account_risk")
     ib = None  # 预声明，确保 finally 能安全访问
     try:
         ib, ibkr_data, symbols_for_yf = pull_all_ibkr_data()  # 接收 ib 连接对象
     except Exception as e:
         print(f"\n❌ 致命错误: IBKR 数据拉取失败，流水线终止。({e})")
+        _finish_telemetry()
         return
 
     # 用 try/finally 包裹后续全部流程，确保无论如何都能断开连接
@@ -82,85 +193,32 @@ def main():
         # ---------------------------------------------------------
         # 第三阶段：持仓标的逐个击破 (自动批处理)
         # ---------------------------------------------------------
+        telemetry.stage("3_per_ticker")
         print("\n🎯 账户扫描完毕，开始批量生成单股深度分析报告...\n")
 
         unique_holdings = {item['Symbol']: item for item in ibkr_data}.values()
 
+        # 新闻与舆情：所有持仓一次性并发增量拉取 (按高水位线只请求新条目)
+        print(f"📰 并发拉取全部持仓的近期新闻与舆情 (News)...")
+        try:
+            with telemetry.span("news"):
+                fetch_news_for_holdings([_to_standard_symbol(item) for item in unique_holdings])
+        except Exception as e:
+            print(f"   ⚠️ 新闻拉取失败，将跳过舆情分析: {e}")
+
         for item in unique_holdings:
-            raw_symbol = str(item['Symbol'])
             currency = item['Currency']
             company_name = item.get('Company Name (EN)', 'Unknown')
+            standard_symbol = _to_standard_symbol(item)
 
-            if currency == 'HKD':
-                standard_symbol = raw_symbol.zfill(4) + ".HK"
-            else:
-                standard_symbol = raw_symbol
-
-            print(f"\n" + "▼"*50)
-            print(f"  🚀 开始处理: {standard_symbol} ({company_name})")
-            print("▲"*50)
+            telemetry.echo(f"\n" + "▼"*50)
+            telemetry.echo(f"  🚀 开始处理: {standard_symbol} ({company_name})")
+            telemetry.echo("▲"*50)
 
             try:
-                # --- 1. 数据拉取层 (Extract) ---
-                # 主引擎: IBKR 拉取 OHLCV，失败自动降级到 yfinance
-                print(f"   ▶ [1/3] 拉取历史量价数据 (IBKR)...")
-                try:
-                    fetch_ibkr_ohlcv(ib, standard_symbol, currency)
-                except Exception as e:
-                    print(f"   ⚠️ IBKR 历史数据拉取失败: {e}")
-                    print(f"   🔄 启动 yfinance 备用引擎...")
-                    # 副引擎：yfinance 拉取 OHLCV
-                    fallback_to_yfinance(standard_symbol, LOOKBACK_YEARS)
-
-                ib.sleep(2)  # IBKR pacing 礼貌间隔
-
-                # 先跑 yfinance 拉 info.json + 三表 CSV (作为底线)
-                print(f"   ▶ [2/3a] 拉取公司画像与基础财报 (yfinance)...")
-                try:
-                    fetch_financials(standard_symbol)
-                except Exception as e:
-                    print(f"   ⚠️ yfinance 拉取失败: {e}")
-
-                # 再跑 akshare 覆盖三表 CSV (更新更快，会覆盖 yfinance 的旧数据)
-                print(f"   ▶ [2/3b] 用东方财富最新财报覆盖 (AkShare)...")
-                try:
-                    fetch_financials_akshare(standard_symbol)
-                except Exception as e:
-                    print(f"   ⚠️ AkShare 财报覆盖失败，将使用 yfinance 数据: {e}")
-
-                time.sleep(1)
-
-                print(f"   ▶ [2/3c] 拉取近期新闻与舆情 (News)...")
-                try:
-                    fetch_stock_news(standard_symbol)
-                except Exception as e:
-                    print(f"   ⚠️ 新闻拉取失败，将跳过舆情分析: {e}")
-
-                # 派生时序：技术指标 + 估值 + 舆情归档落 parquet（webview 直接读）
-                print(f"   ▶ [3/3a] 落盘技术面历史时序 (parquet)...")
-                try:
-                    write_technical_history(standard_symbol)
-                except Exception as e:
-                    print(f"   ⚠️ 技术面 parquet 落盘失败: {e}")
-
-                print(f"   ▶ [3/3b] 落盘估值历史时序 (parquet)...")
-                try:
-                    write_valuation_history(standard_symbol)
-                except Exception as e:
-                    print(f"   ⚠️ 估值 parquet 落盘失败: {e}")
-
-                print(f"   ▶ [3/3c] 归档舆情记录 (master parquet)...")
-                try:
-                    n_new = append_sentiment_archive(standard_symbol)
-                    if n_new:
-                        print(f"      新增 {n_new} 条舆情记录")
-                except Exception as e:
-                    print(f"   ⚠️ 舆情归档失败: {e}")
-
-                print(f"   ▶ [3/3d] 组装终极 LLM 数据载荷 (JSON)...")
-                assemble_llm_payload(standard_symbol)
-
-                print(f"   ✅ {standard_symbol} 专属研报材料准备就绪！")
+                with telemetry.span("ticker", ticker=standard_symbol):
+                    _process_holding(ib, standard_symbol, currency, force_financials)
+                telemetry.echo(f"   ✅ {standard_symbol} 专属研报材料准备就绪！")
 
             except Exception as e:
                 print(f"   ❌ {standard_symbol} 处理过程中发生异常: {e}")
@@ -169,6 +227,7 @@ def main():
         # ---------------------------------------------------------
         # 第四阶段：终极聚合 (Consolidate into API Prompt)
         # ---------------------------------------------------------
+        telemetry.stage("4_prompt")
         print("\n【第四阶段】合成终极 API Prompt...")
         try:
             generate_consolidated_api_prompt()
@@ -178,9 +237,10 @@ def main():
         # ---------------------------------------------------------
         # 第五阶段：LLM 多阶段报告自动生成
         # ---------------------------------------------------------
+        telemetry.stage("5_llm_report")
         print("\n【第五阶段】调用 Claude CLI 多阶段自动生成分析报告...")
         try:
-            generate_staged_report()
+            generate_staged_report(incremental=incremental_report)
         except Exception as e:
             print(
                 f"⚠️ LLM 报告生成失败，可手动运行:\n"
@@ -203,19 +263,56 @@ def main():
         if ib and ib.isConnected():
             ib.disconnect()
             print("🔌 IBKR 连接已安全断开。")
+        # Web Viewer 阻塞运行，埋点在此之前收尾
+        _finish_telemetry()
 
     # ---------------------------------------------------------
     # 第六阶段：开启 Web Viewer
     # ---------------------------------------------------------
+    if not serve_webview:
+        return
     print("\n【第六阶段】打开 Web Viewer ...")
     try:
-        create_app().run(host="127.0.0.1", port=5000, debug=False)
+        from webview.serve import serve as serve_webview_app
+        serve_webview_app()  # 多线程 WSGI + 后台缓存预热
     except Exception as e:
         print(
             f"⚠️ Web Viewer 开启失败，可手动运行:\n"
-            f"   python -m webview.app\n"
+            f"   python -m webview.serve\n"
             f"   错误: {e}"
         )
 
+def _parse_args():
+    parser = argparse.ArgumentParser(description="港股量化投研流水线")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--record", action="store_true",
+                      help="在线运行并把 IBKR/yfinance/AkShare/RSS 原始响应录制到 data/replay/")
+    mode.add_argument("--replay", action="store_true",
+                      help="完全离线：从 data/replay/ 回放录制的响应（无需 TWS 与网络）")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="回放模式下每次外部调用的模拟延迟（秒）")
+    parser.add_argument("--force-financials", action="store_true",
+                        help="忽略财报新鲜度 TTL，强制重新拉取所有持仓的财报三表")
+    parser.add_argument("--offline", action="store_true",
+                        help="HTTP 层只读本地响应缓存 (data/cache/http_cache.sqlite)，不发任何网络请求")
+    parser.add_argument("--incremental-report", action="store_true",
+                        help="增量报告：自上次运行以来变化未达重大阈值的个股，Stage 1 只发送上次 compact + 增量")
+    parser.add_argument("--no-webview", action="store_true",
+                        help="流水线结束后不启动 Web Viewer（基准测试用）")
+    parser.add_argument("--quiet", action="store_true",
+                        help="只输出阶段标题、警告与错误，关闭逐 ticker / 逐步骤的过程输出（埋点日志照常写入）")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    main()
+    args = _parse_args()
+    if args.record or args.replay:
+        from data_pull.replay import install
+        install("record" if args.record else "replay", latency=args.latency)
+    main(
+        serve_webview=not args.no_webview,
+        force_financials=args.force_financials,
+        offline=args.offline,
+        incremental_report=args.incremental_report,
+        quiet=args.quiet,
+        http_cache=not (args.record or args.replay),
+    )
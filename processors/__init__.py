@@ -1,20 +1,25 @@
-from .fundamental_calc import generate_fundamental_analysis
-from .json_assembler import assemble_llm_payload, sanitize_for_web
-from .risk_calc import generate_portfolio_risk_report
-from .sentiment_calc import generate_sentiment_summary
-from .technical_calc import generate_technical_analysis
-from .technical_multifactor import calc_multifactor_risk
-from .technical_financial import load_financial_series
-from .transaction_parser import clean_ibkr_transactions
+# 子模块按需导入（PEP 562）：`from processors.arrow_mirror import ...` 这类只读入口
+# 不再连带加载 pandas_ta / yfinance / akshare；`from processors import X` 用法不变
+import importlib
 
-__all__ = [
-    "generate_fundamental_analysis",
-    "assemble_llm_payload",
-    "sanitize_for_web",
-    "generate_portfolio_risk_report",
-    "generate_sentiment_summary",
-    "calc_multifactor_risk",
-    "load_financial_series",
-    "generate_technical_analysis",
-    "clean_ibkr_transactions",
-]
+_EXPORTS = {
+    "generate_fundamental_analysis": ".fundamental_calc",
+    "assemble_llm_payload": ".json_assembler",
+    "sanitize_for_web": ".json_assembler",
+    "generate_portfolio_risk_report": ".risk_calc",
+    "generate_sentiment_summary": ".sentiment_calc",
+    "calc_multifactor_risk": ".technical_multifactor",
+    "load_financial_series": ".technical_financial",
+    "generate_technical_analysis": ".technical_calc",
+    "clean_ibkr_transactions": ".transaction_parser",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = getattr(importlib.import_module(module, __name__), name)
+    return value
@@ -0,0 +1,99 @@
+"""
+arrow_mirror.py — 派生 parquet 的 Arrow IPC 镜像（供 webview 多 worker 内存映射共享）
+
+derived_writer 每写一份 parquet，同时在旁边写一份未压缩的 Arrow IPC 文件
+（<stem>.arrow）。webview 读取时优先 memory-map 这份镜像：
+    - 无需解压 / 解码 parquet，冷启动读取更快；
+    - 列缓冲直接指向 OS page cache，split_blocks=True 时无空值的数值列可零拷贝转成 DataFrame，
+      多个 worker 进程读同一文件共享同一批物理页，而不是各自持有一份副本。
+      零拷贝只限这类列：字符串 / 布尔 / 含空值的列在 to_pandas 时仍会在每个进程里各转换出一份私有副本
+      （派生 parquet 以数值列为主，共享的是大头，不是全部）。
+
+镜像正被其他进程映射时，Windows 上 os.replace 会失败：此时保留旧镜像（它比新 parquet 旧，读取方自动回退 parquet），
+下次写入再覆盖。
+
+镜像比 parquet 旧（写入中断）或 pyarrow 不可用时，回退到 pd.read_parquet，行为与原来一致。
+
+公开接口：
+    arrow_path(parquet_path)          -> Path
+    write_frame(df, parquet_path)     -> Path       # parquet + 镜像
+    read_frame(parquet_path)          -> pd.DataFrame
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+import telemetry
+from config import DERIVED_ARROW_MIRROR
+
+
+def _pyarrow():
+    """首次读写镜像时才导入 pyarrow（它是 webview 冷启动里最重的依赖）；不可用时返回 None。"""
+    try:
+        import pyarrow as pa
+    except ImportError:  # 没有 pyarrow 时 pandas 也写不了 parquet，这里仅防御
+        return None
+    return pa
+
+
+def arrow_path(parquet_path: Path) -> Path:
+    return parquet_path.with_suffix(".arrow")
+
+
+def write_frame(df: pd.DataFrame, parquet_path: Path) -> Path:
+    """写 parquet；开启 DERIVED_ARROW_MIRROR 时再原子写入 Arrow IPC 镜像（先 parquet 后镜像，保证镜像 mtime 不早于 parquet）。"""
+    parquet_path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(parquet_path)
+    telemetry.count("derived.rows", len(df))
+    telemetry.count("derived.bytes", parquet_path.stat().st_size)
+    pa = _pyarrow() if DERIVED_ARROW_MIRROR else None
+    if pa is None:
+        return parquet_path
+
+    mirror = arrow_path(parquet_path)
+    tmp = mirror.with_suffix(".arrow.tmp")
+    table = pa.Table.from_pandas(df)  # index 写进 pandas metadata，读回时自动还原
+    with pa.OSFile(str(tmp), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    try:
+        os.replace(tmp, mirror)
+    except PermissionError:
+        # Windows：旧镜像正被 viewer 内存映射，无法覆盖；旧镜像 mtime 早于新 parquet，read_frame 会回退读 parquet
+        tmp.unlink(missing_ok=True)
+        telemetry.count("derived.mirror.locked")
+        print(f"   ⚠️ Arrow 镜像被占用，暂保留旧文件（读取回退 parquet）: {mirror.name}")
+    return parquet_path
+
+
+def _mirror_fresh(parquet_path: Path, mirror: Path) -> bool:
+    try:
+        return mirror.stat().st_mtime_ns >= parquet_path.stat().st_mtime_ns
+    except OSError:
+        return False
+
+
+def read_frame(parquet_path: Path) -> pd.DataFrame:
+    """优先 memory-map 镜像；镜像缺失/过期/损坏时读 parquet。parquet 也不存在时返回空 DataFrame。"""
+    mirror = arrow_path(parquet_path)
+    pa = _pyarrow() if _mirror_fresh(parquet_path, mirror) else None
+    if pa is not None:
+        try:
+            # 不显式 close：table 的缓冲区持有映射区域的引用，随 DataFrame 回收自动解除映射
+            source = pa.memory_map(str(mirror), "r")
+            table = pa.ipc.open_file(source).read_all()
+            return table.to_pandas(split_blocks=True)
+        except (OSError, pa.ArrowInvalid):
+            pass
+    if not parquet_path.exists():
+        return pd.DataFrame()
+    return pd.read_parquet(parquet_path)
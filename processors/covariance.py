@@ -0,0 +1,185 @@
+"""
+covariance.py — 持仓协方差、相关性聚类与集中度分析
+
+在 returns_panel 的对齐日收益率矩阵上：
+    shrinkage_covariance     Ledoit–Wolf (2004) 收缩协方差（向 μ·I 收缩，强度取闭式最优解）
+    estimate_covariance      收缩协方差 + 相关矩阵，按面板数据指纹缓存（同一次风控里 tail_risk 与这里只算一次）
+    cluster_holdings         平均连接层次聚类：每轮合并簇间平均相关系数最高的两簇，低于阈值即停止合并
+    compute_concentration    有效押注数、分散化比率、各持仓边际 / 成分风险贡献、聚类层面的敞口与风险占比
+
+风险贡献按年化波动率口径（日波动 × √252）：
+    MCR_i = (Σw)_i / σ_p          边际风险贡献：该持仓权重增加 1 单位时组合波动的变化
+    CCR_i = w_i · MCR_i           成分风险贡献，Σ CCR_i = σ_p
+    risk_share_i = CCR_i / σ_p    风险占比（可能为负：对冲效果）
+有效押注数 (ENB) 取 Meucci (2009) 的主成分熵口径：exp(−Σ p_k ln p_k)，p_k 为第 k 个主成分承担的方差占比。
+
+公开接口：
+    shrinkage_covariance(returns) -> (cov, shrinkage)
+    estimate_covariance(panel) -> (cov, corr, shrinkage)
+    cluster_holdings(corr) -> list[list[int]]
+    compute_concentration(panel) -> dict
+"""
+
+from __future__ import annotations
+
+import sys
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from config import CLUSTER_CORR_THRESHOLD, CORRELATION_TOP_PAIRS
+from processors.returns_panel import ReturnsPanel
+
+_ANNUALIZE = np.sqrt(252)
+_CACHE_SIZE = 8
+
+# 面板指纹 → (cov, corr, shrinkage)
+_COV_CACHE: "OrderedDict[str, tuple[np.ndarray, np.ndarray, float]]" = OrderedDict()
+
+
+def shrinkage_covariance(returns: np.ndarray) -> tuple[np.ndarray, float]:
+    """
+    Ledoit–Wolf (2004) 收缩：样本协方差向 μ·I（μ 为平均方差）收缩，强度按闭式最优解计算。
+    returns 为 (T, N) 日收益率矩阵；返回 (收缩后协方差, 收缩强度 0–1)。
+    """
+    x = returns - returns.mean(axis=0)
+    t, n = x.shape
+    sample = x.T @ x / t
+    mu = np.trace(sample) / n
+    target = mu * np.eye(n)
+    delta = ((sample - target) ** 2).sum()
+    if delta <= 0:
+        return sample, 0.0
+    x2 = x ** 2
+    beta = ((x2.T @ x2) / t - sample ** 2).sum() / t
+    shrinkage = float(min(beta, delta) / delta)
+    return (1.0 - shrinkage) * sample + shrinkage * target, shrinkage
+
+
+def estimate_covariance(panel: ReturnsPanel) -> tuple[np.ndarray, np.ndarray, float]:
+    """面板的 (收缩协方差, 相关矩阵, 收缩强度)；同一指纹直接命中进程内缓存。"""
+    key = panel.fingerprint
+    cached = _COV_CACHE.get(key)
+    if cached is not None:
+        _COV_CACHE.move_to_end(key)
+        return cached
+    cov, shrinkage = shrinkage_covariance(panel.matrix)
+    sd = np.sqrt(np.diag(cov))
+    corr = np.clip(cov / np.outer(sd, sd), -1.0, 1.0)
+    np.fill_diagonal(corr, 1.0)
+    _COV_CACHE[key] = (cov, corr, shrinkage)
+    while len(_COV_CACHE) > _CACHE_SIZE:
+        _COV_CACHE.popitem(last=False)
+    return cov, corr, shrinkage
+
+
+def cluster_holdings(corr: np.ndarray, threshold: float = CLUSTER_CORR_THRESHOLD) -> list[list[int]]:
+    """
+    平均连接层次聚类：每轮合并簇间平均相关系数（两簇成员两两相关的均值）最高的两簇，
+    直到最高值低于 threshold。直接比较相关系数本身：距离 sqrt((1-ρ)/2) 是凹变换，
+    「平均距离 ≤ 阈值距离」并不等价于「平均相关 ≥ threshold」。返回按簇大小降序的成员下标列表。
+    持仓数量在几十以内，朴素 O(n³) 足够。
+    """
+    clusters = [[i] for i in range(len(corr))]
+    while len(clusters) > 1:
+        best, best_pair = None, None
+        for a in range(len(clusters)):
+            for b in range(a + 1, len(clusters)):
+                c = corr[np.ix_(clusters[a], clusters[b])].mean()
+                if best is None or c > best:
+                    best, best_pair = c, (a, b)
+        if best < threshold:
+            break
+        a, b = best_pair
+        clusters[a] = clusters[a] + clusters[b]
+        del clusters[b]
+    return sorted(clusters, key=len, reverse=True)
+
+
+def _effective_number_of_bets(cov: np.ndarray, weights: np.ndarray) -> float:
+    """Meucci 主成分熵口径的有效押注数：1（全押一个因子）… N（风险均匀分布在 N 个不相关主成分上）。"""
+    eigval, eigvec = np.linalg.eigh(cov)
+    exposure = eigvec.T @ weights
+    var_k = np.clip(eigval, 0.0, None) * exposure ** 2
+    total = var_k.sum()
+    if total <= 0:
+        return float("nan")
+    p = var_k[var_k > 0] / total
+    return float(np.exp(-(p * np.log(p)).sum()))
+
+
+def _top_pairs(corr: np.ndarray, symbols: list[str]) -> list[dict]:
+    upper = np.triu_indices(len(symbols), k=1)
+    values = corr[upper]
+    order = np.argsort(-values)[:CORRELATION_TOP_PAIRS]
+    return [
+        {"pair": [symbols[upper[0][k]], symbols[upper[1][k]]], "correlation": round(float(values[k]), 4)}
+        for k in order
+    ]
+
+
+def compute_concentration(panel: ReturnsPanel) -> dict:
+    """portfolio_risk.json 的 risk_concentration 段；只有一只持仓进矩阵时不做聚类与配对。"""
+    symbols = panel.symbols
+    weights = panel.covered_weights
+    cov, corr, shrinkage = estimate_covariance(panel)
+
+    port_var = float(weights @ cov @ weights)
+    if port_var <= 0:
+        return {}
+    port_vol = np.sqrt(port_var)
+    marginal = cov @ weights / port_vol
+    component = weights * marginal
+    asset_vol = np.sqrt(np.diag(cov))
+
+    clusters = cluster_holdings(corr) if len(symbols) > 1 else [[0]]
+    cluster_of = {i: k + 1 for k, members in enumerate(clusters) for i in members}
+
+    positions = [
+        {
+            "symbol": symbols[i],
+            "weight_ratio": round(float(weights[i]), 6),
+            "volatility_annual": round(float(asset_vol[i] * _ANNUALIZE), 4),
+            "marginal_risk_annual": round(float(marginal[i] * _ANNUALIZE), 4),
+            "component_risk_annual": round(float(component[i] * _ANNUALIZE), 4),
+            "risk_share_ratio": round(float(component[i] / port_vol), 4),
+            "cluster": cluster_of[i],
+        }
+        for i in np.argsort(-component)
+    ]
+
+    cluster_rows = []
+    for k, members in enumerate(clusters, start=1):
+        sub = corr[np.ix_(members, members)]
+        n = len(members)
+        # 单成员簇没有簇内相关可言，输出 null
+        avg_corr = round(float((sub.sum() - n) / (n * (n - 1))), 4) if n > 1 else None
+        cluster_rows.append({
+            "cluster": k,
+            "symbols": [symbols[i] for i in members],
+            "weight_ratio": round(float(weights[members].sum()), 6),
+            "risk_share_ratio": round(float(component[members].sum() / port_vol), 4),
+            "avg_correlation": avg_corr,
+        })
+
+    gross = np.abs(weights).sum()
+    return {
+        "as_of": panel.returns.index[-1].strftime("%Y-%m-%d"),
+        "observations": len(panel.returns),
+        "covariance_shrinkage": round(shrinkage, 4),
+        "portfolio_volatility_annual": round(float(port_vol * _ANNUALIZE), 4),
+        "diversification_ratio": round(float(np.abs(weights) @ asset_vol / port_vol), 4),
+        "effective_number_of_bets": round(_effective_number_of_bets(cov, weights), 2),
+        # 只看权重不看相关性的「有效持仓数」(1/HHI)，与 ENB 的差距就是相关性吃掉的分散度
+        "effective_number_of_positions": round(float(gross ** 2 / (weights ** 2).sum()), 2),
+        "cluster_corr_threshold": CLUSTER_CORR_THRESHOLD,
+        "clusters": cluster_rows,
+        "positions": positions,
+        "top_correlated_pairs": _top_pairs(corr, symbols) if len(symbols) > 1 else [],
+        "uncovered_symbols": panel.uncovered,
+    }
@@ -6,26 +6,34 @@ webview/分析层只读这些 parquet，不再二次计算。
 
 输出位置：
     data/output/derived/technical/<ticker>_{daily,weekly,monthly}.parquet
+        technical / valuation 每份 parquet 旁附 .arrow 镜像（arrow_mirror.write_frame，webview 内存映射读取）
     data/output/derived/valuation/<ticker>_daily.parquet
-    data/output/derived/sentiment/sentiment_master.parquet  (单一 master)
+        含 PE/PB/PS 的 1Y/3Y/5Y/All 滚动分位带与当前分位（valuation_bands.add_valuation_bands）
+    data/output/derived/sentiment/archive/ticker=<t>/month=<YYYY-MM>/part-*.parquet
+        每个分区附带 _keys.idx（url_hash 一行一个），去重只探测索引，追加只写新分片
+    data/output/derived/sentiment/<ticker>_sentiment_{daily,weekly,monthly}.parquet
+        标题词典打分后的情绪聚合（由 headline_scoring.write_sentiment_aggregates 生成）
 
 公开接口：
     write_technical_history(ticker)   -> dict[tf, Path]
     write_valuation_history(ticker)   -> Path | None
     append_sentiment_archive(ticker)  -> int  # 新增行数
+    load_sentiment_archive(ticker)    -> pd.DataFrame
+    compact_sentiment_archive()       -> int  # 被合并的分区数
     backfill_all()                    -> dict[ticker, dict]
 
 CLI：
     python -m processors.derived_writer --backfill-all
     python -m processors.derived_writer --ticker 0700.HK
+    python -m processors.derived_writer --compact-sentiment
 """
 
 from __future__ import annotations
 
 import argparse
-import hashlib
 import json
 import sys
+import uuid
 from pathlib import Path
 
 import numpy as np
@@ -41,16 +49,22 @@ from config import (
     DERIVED_VALUATION_DIR,
     FINANCIALS_DIR,
     OHLCV_DIR,
+    SENTIMENT_ARCHIVE_DIR,
     SENTIMENT_DIR,
     SENTIMENT_MASTER_PARQUET,
 )
+from hashing import url_hash
 
 try:
     from .technical_indicators import _add_technical_indicators
     from .technical_utils import _ttm_from_ytd_series, RESAMPLE_AGG, RESAMPLE_RULES
+    from .valuation_bands import add_valuation_bands
+    from .arrow_mirror import write_frame
 except ImportError:
     from processors.technical_indicators import _add_technical_indicators
     from processors.technical_utils import _ttm_from_ytd_series, RESAMPLE_AGG, RESAMPLE_RULES
+    from processors.valuation_bands import add_valuation_bands
+    from processors.arrow_mirror import write_frame
 
 
 # ==========================================================================
@@ -86,7 +100,7 @@ def write_technical_history(ticker: str) -> dict[str, Path]:
     # daily
     daily = _add_technical_indicators(df_daily.copy())
     daily_path = DERIVED_TECHNICAL_DIR / f"{ticker}_daily.parquet"
-    daily.to_parquet(daily_path)
+    write_frame(daily, daily_path)
     written["daily"] = daily_path
 
     # weekly / monthly
@@ -97,7 +111,7 @@ def write_technical_history(ticker: str) -> dict[str, Path]:
             continue
         with_ind = _add_technical_indicators(resampled)
         out = DERIVED_TECHNICAL_DIR / f"{ticker}_{tf}.parquet"
-        with_ind.to_parquet(out)
+        write_frame(with_ind, out)
         written[tf] = out
 
     return written
@@ -155,7 +169,7 @@ def _load_shares_outstanding(ticker: str) -> float | None:
 
 
 def write_valuation_history(ticker: str) -> Path | None:
-    """读季度财报 → TTM 滚动 → 与 daily Close 合并 → PE/PB/PS_TTM 时序落盘。"""
+    """读季度财报 → TTM 滚动 → 与 daily Close 合并 → PE/PB/PS_TTM 时序 + 滚动分位带落盘。"""
     df_daily = _load_daily_ohlcv(ticker)
     if df_daily is None or df_daily.empty:
         return None
@@ -205,33 +219,79 @@ def write_valuation_history(ticker: str) -> Path | None:
     if out[["PE_TTM", "PB", "PS_TTM"]].dropna(how="all").empty:
         return None
 
+    out = add_valuation_bands(out)
+
     path = DERIVED_VALUATION_DIR / f"{ticker}_daily.parquet"
-    out.to_parquet(path)
+    write_frame(out, path)
     return path
 
 
 # ==========================================================================
-# 3. Sentiment 历史归档（master parquet，按 url_hash 去重）
+# 3. Sentiment 历史归档（按 ticker/月份分区，分区内 url_hash 索引去重）
 # ==========================================================================
 
 _SENTIMENT_COLUMNS = [
     "ticker", "date", "captured_at",
     "title", "source", "url", "url_hash", "vendor",
+    "cluster_id", "source_count",
 ]
 
+_KEY_INDEX_NAME = "_keys.idx"
+
+
+def _ticker_dir(ticker: str) -> Path:
+    return SENTIMENT_ARCHIVE_DIR / f"ticker={ticker}"
+
+
+def _partition_dir(ticker: str, month: str) -> Path:
+    return _ticker_dir(ticker) / f"month={month}"
+
+
+def _read_key_index(pdir: Path) -> set[str]:
+    path = pdir / _KEY_INDEX_NAME
+    if not path.exists():
+        return set()
+    return set(path.read_text(encoding="utf-8").split())
+
+
+def _append_key_index(pdir: Path, hashes) -> None:
+    with open(pdir / _KEY_INDEX_NAME, "a", encoding="utf-8") as f:
+        f.writelines(f"{h}\n" for h in hashes)
+
 
-def _url_hash(url: str) -> str:
-    return hashlib.md5((url or "").encode("utf-8", errors="ignore")).hexdigest()[:16]
+def _write_partitions(df: pd.DataFrame) -> int:
+    """按 (ticker, 月份) 切分后各写一个新分片 + 追加分区索引，返回写入行数。"""
+    if df.empty:
+        return 0
+    months = df["date"].dt.strftime("%Y-%m")
+    stamp = pd.Timestamp.now().strftime("%Y%m%dT%H%M%S")
+    written = 0
+    for (ticker, month), part in df.groupby([df["ticker"], months], sort=False):
+        pdir = _partition_dir(ticker, month)
+        pdir.mkdir(parents=True, exist_ok=True)
+        part = part.sort_values("date", ascending=False)
+        part.to_parquet(pdir / f"part-{stamp}-{uuid.uuid4().hex[:6]}.parquet", index=False)
+        _append_key_index(pdir, part["url_hash"])
+        written += len(part)
+    return written
 
 
-def _load_master() -> pd.DataFrame:
+def _migrate_legacy_master() -> None:
+    """旧版单文件 sentiment_master.parquet → 分区归档（仅执行一次，原文件改名保留）。"""
     if not SENTIMENT_MASTER_PARQUET.exists():
-        return pd.DataFrame(columns=_SENTIMENT_COLUMNS)
-    return pd.read_parquet(SENTIMENT_MASTER_PARQUET)
+        return
+    legacy = pd.read_parquet(SENTIMENT_MASTER_PARQUET)
+    if not legacy.empty:
+        legacy["date"] = pd.to_datetime(legacy["date"], errors="coerce")
+        legacy = legacy.dropna(subset=["date"]).drop_duplicates(["ticker", "url_hash"], keep="first")
+        _write_partitions(legacy)
+    SENTIMENT_MASTER_PARQUET.rename(SENTIMENT_MASTER_PARQUET.with_suffix(".parquet.migrated"))
 
 
 def append_sentiment_archive(ticker: str) -> int:
-    """读 <ticker>_news.json → 追加到 master parquet（按 (ticker, url_hash) 去重）→ 返回新增行数。"""
+    """读 <ticker>_news.json → 探测分区索引去重 → 只把净新增写成新分片 → 返回新增行数。"""
+    _migrate_legacy_master()
+
     news_file = SENTIMENT_DIR / f"{ticker}_news.json"
     if not news_file.exists():
         return 0
@@ -243,40 +303,65 @@ def append_sentiment_archive(ticker: str) -> int:
         return 0
 
     captured_at = pd.Timestamp.now("UTC").tz_localize(None)
-    rows = []
-    for a in articles:
-        url = a.get("url") or ""
-        rows.append({
-            "ticker": ticker,
-            "date": pd.to_datetime(a.get("date"), errors="coerce"),
-            "captured_at": captured_at,
-            "title": a.get("title") or "",
-            "source": a.get("source") or "",
-            "url": url,
-            "url_hash": _url_hash(url) if url else _url_hash(a.get("title") or ""),
-            "vendor": a.get("data_vendor") or "",
-        })
-    new_df = pd.DataFrame(rows, columns=_SENTIMENT_COLUMNS)
-    new_df = new_df.dropna(subset=["date"])
+    new_df = pd.DataFrame({
+        "ticker": ticker,
+        "date": pd.to_datetime([a.get("date") for a in articles], errors="coerce"),
+        "captured_at": captured_at,
+        "title": [a.get("title") or "" for a in articles],
+        "source": [a.get("source") or "" for a in articles],
+        "url": [a.get("url") or "" for a in articles],
+        "url_hash": [a.get("url_hash") or url_hash(a.get("url") or a.get("title") or "") for a in articles],
+        "vendor": [a.get("data_vendor") or "" for a in articles],
+        "cluster_id": [a.get("cluster_id") or "" for a in articles],
+        "source_count": [int(a.get("source_count") or 1) for a in articles],
+    }, columns=_SENTIMENT_COLUMNS)
+    new_df = new_df.dropna(subset=["date"]).drop_duplicates("url_hash", keep="first")
     if new_df.empty:
         return 0
 
-    master = _load_master()
-    if master.empty:
-        merged = new_df
-    else:
-        # 按 (ticker, url_hash) 防重复，旧记录优先（保留首次 captured_at）
-        existing_keys = set(zip(master["ticker"], master["url_hash"]))
-        keep_mask = ~new_df.apply(lambda r: (r["ticker"], r["url_hash"]) in existing_keys, axis=1)
-        net_new = new_df[keep_mask]
-        if net_new.empty:
-            return 0
-        merged = pd.concat([master, net_new], ignore_index=True)
+    # 按 (ticker, url_hash) 防重复，旧记录优先（保留首次 captured_at）：
+    # 只读取该 ticker 各分区的小索引文件，不加载任何 parquet
+    tdir = _ticker_dir(ticker)
+    existing: set[str] = set()
+    if tdir.exists():
+        for pdir in tdir.glob("month=*"):
+            existing |= _read_key_index(pdir)
+    net_new = new_df[~new_df["url_hash"].isin(existing)]
+    return _write_partitions(net_new)
+
+
+def load_sentiment_archive(ticker: str | None = None) -> pd.DataFrame:
+    """读取归档：指定 ticker 时只读该 ticker 的分区；按 (ticker, date 降序) 排列。"""
+    _migrate_legacy_master()
+    pattern = f"ticker={ticker}/month=*/part-*.parquet" if ticker else "ticker=*/month=*/part-*.parquet"
+    files = sorted(SENTIMENT_ARCHIVE_DIR.glob(pattern))
+    if not files:
+        return pd.DataFrame(columns=_SENTIMENT_COLUMNS)
+    df = pd.concat([pd.read_parquet(f) for f in files], ignore_index=True)
+    return df.sort_values(["ticker", "date"], ascending=[True, False]).reset_index(drop=True)
+
 
-    merged = merged.sort_values(["ticker", "date"], ascending=[True, False]).reset_index(drop=True)
-    SENTIMENT_MASTER_PARQUET.parent.mkdir(parents=True, exist_ok=True)
-    merged.to_parquet(SENTIMENT_MASTER_PARQUET, index=False)
-    return len(merged) - len(master)
+def compact_sentiment_archive(min_files: int = 2) -> int:
+    """把分片数 ≥ min_files 的分区合并为单个 parquet（先写新文件再删旧分片），并重建索引。"""
+    compacted = 0
+    for pdir in sorted(SENTIMENT_ARCHIVE_DIR.glob("ticker=*/month=*")):
+        parts = sorted(pdir.glob("part-*.parquet"))
+        if len(parts) < min_files:
+            continue
+        merged = pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True)
+        merged = (
+            merged.sort_values("captured_at")
+                  .drop_duplicates("url_hash", keep="first")
+                  .sort_values("date", ascending=False)
+        )
+        out = pdir / f"part-{pd.Timestamp.now():%Y%m%dT%H%M%S}-compact.parquet"
+        merged.to_parquet(out, index=False)
+        for p in parts:
+            if p != out:
+                p.unlink()
+        (pdir / _KEY_INDEX_NAME).write_text("".join(f"{h}\n" for h in merged["url_hash"]), encoding="utf-8")
+        compacted += 1
+    return compacted
 
 
 # ==========================================================================
@@ -319,8 +404,13 @@ def main() -> None:
     parser = argparse.ArgumentParser(description="Derived 时序数据落盘工具")
     parser.add_argument("--backfill-all", action="store_true", help="对所有 ticker 全量重建")
     parser.add_argument("--ticker", type=str, help="仅处理单只 ticker（如 0700.HK）")
+    parser.add_argument("--compact-sentiment", action="store_true", help="合并舆情归档各分区的小分片")
     args = parser.parse_args()
 
+    if args.compact_sentiment:
+        print(f"Compacted partitions: {compact_sentiment_archive()}")
+        return
+
     if args.backfill_all:
         backfill_all()
         return
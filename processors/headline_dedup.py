@@ -0,0 +1,166 @@
+"""
+headline_dedup.py — 新闻标题近重复聚类（MinHash + LSH）
+
+同一条新闻经常同时出现在东方财富与 Google News（甚至同一 vendor 的多个转载源），
+URL 不同无法按 url_hash 去重。本模块按标题文本做近重复判定：
+
+    1. 归一化：去掉 Google RSS 的 " - 来源" 后缀、标点与空白，统一小写
+    2. 字符 2-gram 分片（中文无需分词，英文同样适用）
+    3. MinHash 签名（64 个置换，numpy 批量向量化：所有标题的分片一次性广播计算）
+    4. LSH 分桶（16 band × 4 row）：新标题只与同桶候选比较，匹配复杂度与归档规模近似无关
+    5. 签名一致率 ≥ 0.6（≈ Jaccard 相似度）即并入已有聚类，否则自成新聚类
+
+聚类 ID 取该聚类首条新闻的 url_hash，保证跨运行稳定。
+
+公开接口：
+    minhash_signatures(titles)       -> np.ndarray[n, 64]
+    HeadlineIndex.load(path) / .assign(articles) / .save(path)
+    collapse_clusters(articles)      -> list[dict]  # 每个聚类保留一条代表 + source_count
+"""
+
+from __future__ import annotations
+
+import re
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+_NUM_PERM = 64
+_BANDS = 16
+_ROWS = _NUM_PERM // _BANDS
+_SIMILARITY_THRESHOLD = 0.6
+_SHINGLE_SIZE = 2
+
+# 通用哈希 h(x) = (a·x + b) mod p；a < 2^31 保证 a·x 在 uint64 内不溢出
+_PRIME = np.uint64(4294967291)  # 2^32 - 5
+_rng = np.random.default_rng(20260419)
+_A = _rng.integers(1, 1 << 31, size=_NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, size=_NUM_PERM, dtype=np.uint64)
+
+_SOURCE_SUFFIX_RE = re.compile(r"\s+[-–—|]\s+[^-–—|]{1,30}$")
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+def _normalize(title: str) -> str:
+    title = _SOURCE_SUFFIX_RE.sub("", title or "")
+    return _NON_WORD_RE.sub("", title.lower())
+
+
+def _shingle_ids(title: str) -> np.ndarray:
+    text = _normalize(title)
+    if len(text) < _SHINGLE_SIZE:
+        grams = [text]
+    else:
+        grams = [text[i:i + _SHINGLE_SIZE] for i in range(len(text) - _SHINGLE_SIZE + 1)]
+    # crc32 跨进程稳定（Python 内置 hash 对 str 有随机化，不能落盘复用）
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in set(grams)), dtype=np.uint64)
+
+
+def minhash_signatures(titles: list[str]) -> np.ndarray:
+    """
+    批量计算 MinHash 签名：把所有标题的分片拼成一个长向量，一次广播完成
+    (M 个分片 × 64 个置换) 的哈希，再用 np.minimum.reduceat 按标题分段取最小值。
+    """
+    if not titles:
+        return np.empty((0, _NUM_PERM), dtype=np.uint32)
+    per_title = [_shingle_ids(t) for t in titles]
+    lengths = np.array([len(ids) for ids in per_title])
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    all_ids = np.concatenate(per_title)
+    hashed = (all_ids[:, None] * _A[None, :] + _B[None, :]) % _PRIME
+    return np.minimum.reduceat(hashed, offsets, axis=0).astype(np.uint32)
+
+
+def _band_keys(sig: np.ndarray) -> list[tuple[int, bytes]]:
+    return [(b, band.tobytes()) for b, band in enumerate(sig.reshape(_BANDS, _ROWS))]
+
+
+class HeadlineIndex:
+    """单只股票的 LSH 索引：签名矩阵 + 分桶表 + url_hash → cluster_id 映射。"""
+
+    def __init__(self):
+        self._sigs: list[np.ndarray] = []
+        self._clusters: list[str] = []
+        self._url_hashes: list[str] = []
+        self._by_hash: dict[str, str] = {}
+        self._buckets: dict[tuple[int, bytes], list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._clusters)
+
+    @classmethod
+    def load(cls, path: Path) -> "HeadlineIndex":
+        index = cls()
+        if not Path(path).exists():
+            return index
+        data = np.load(path, allow_pickle=False)
+        for sig, cid, uh in zip(data["signatures"], data["cluster_ids"], data["url_hashes"]):
+            index._add(str(uh), sig, str(cid))
+        return index
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        sigs = np.vstack(self._sigs) if self._sigs else np.empty((0, _NUM_PERM), dtype=np.uint32)
+        np.savez_compressed(
+            path,
+            signatures=sigs,
+            cluster_ids=np.array(self._clusters, dtype=str),
+            url_hashes=np.array(self._url_hashes, dtype=str),
+        )
+
+    def _add(self, url_hash: str, sig: np.ndarray, cluster_id: str) -> None:
+        row = len(self._clusters)
+        self._sigs.append(sig)
+        self._clusters.append(cluster_id)
+        self._url_hashes.append(url_hash)
+        self._by_hash[url_hash] = cluster_id
+        for key in _band_keys(sig):
+            self._buckets.setdefault(key, []).append(row)
+
+    def _match(self, sig: np.ndarray) -> str | None:
+        candidates = {row for key in _band_keys(sig) for row in self._buckets.get(key, ())}
+        if not candidates:
+            return None
+        rows = np.fromiter(candidates, dtype=np.int64)
+        sims = (np.vstack([self._sigs[r] for r in rows]) == sig).mean(axis=1)
+        best = int(np.argmax(sims))
+        return self._clusters[rows[best]] if sims[best] >= _SIMILARITY_THRESHOLD else None
+
+    def assign(self, articles: list[dict]) -> None:
+        """
+        为每条新闻写入 article["cluster_id"]（原地修改）。
+        已见过的 url_hash 直接复用；否则 LSH 匹配已有聚类（含同批次先处理的条目），未命中则自成聚类。
+        """
+        pending = [a for a in articles if a.get("url_hash") not in self._by_hash]
+        for a in articles:
+            if a.get("url_hash") in self._by_hash:
+                a["cluster_id"] = self._by_hash[a["url_hash"]]
+        if not pending:
+            return
+        sigs = minhash_signatures([a.get("title") or "" for a in pending])
+        for a, sig in zip(pending, sigs):
+            if a["url_hash"] in self._by_hash:  # 同批次内 url 重复
+                a["cluster_id"] = self._by_hash[a["url_hash"]]
+                continue
+            cluster_id = self._match(sig) or a["url_hash"]
+            self._add(a["url_hash"], sig, cluster_id)
+            a["cluster_id"] = cluster_id
+
+
+def collapse_clusters(articles: list[dict]) -> list[dict]:
+    """
+    每个聚类只保留一条代表（输入顺序中的第一条，调用方通常已按日期降序排好），
+    并附加 source_count（聚类内条数）与 sources（去重后的来源列表）。
+    """
+    groups: dict[str, list[dict]] = {}
+    for a in articles:
+        groups.setdefault(a.get("cluster_id") or a.get("url_hash") or id(a), []).append(a)
+    collapsed = []
+    for members in groups.values():
+        rep = dict(members[0])
+        rep["source_count"] = len(members)
+        rep["sources"] = list(dict.fromkeys(m.get("source", "") for m in members if m.get("source")))
+        collapsed.append(rep)
+    return collapsed
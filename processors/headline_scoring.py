@@ -0,0 +1,247 @@
+"""
+headline_scoring.py — 新闻标题本地词典打分 + 情绪聚合时序
+
+此前 generate_sentiment_summary 不做任何打分，把全部标题原样交给 LLM 解读，
+每次 Stage 1 调用都要为此付出 token 与延迟。本模块在本地完成打分：
+
+    1. 金融领域中英文情绪词典（带强度权重），正则一次性匹配（长词优先，避免「增长放缓」被拆成「增长」）
+    2. 否定处理：否定词（不/未/没有/难以/not/never…）后 2 个字符（英文 1 个词）内出现的情绪词取反；
+       「非常 / 不断 / 不仅 / 无论」这类以否定字开头但不表否定的复合词先抹成空白，不参与否定匹配
+    3. 批量向量化：pandas str.extractall 对整列标题一次匹配，按行 groupby 求和，tanh 压缩到 (-1, 1)
+    4. 打分结果按 url_hash 缓存在 SENTIMENT_SCORE_CACHE，只对新标题打分；词典版本变化时整体失效
+    5. 每只股票的日 / 周 / 月聚合（按 source_count 加权）落盘为 derived parquet
+
+公开接口：
+    score_headlines(titles)              -> pd.DataFrame[raw, hits, score]
+    score_articles(articles)             -> list[float]   # 优先读缓存
+    write_sentiment_aggregates(ticker)   -> dict[tf, Path]
+    load_sentiment_aggregates(ticker, tf) -> pd.DataFrame | None
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from config import DERIVED_SENTIMENT_DIR, SENTIMENT_SCORE_CACHE
+from hashing import url_hash
+
+try:
+    from .derived_writer import load_sentiment_archive
+    from .technical_utils import RESAMPLE_RULES
+except ImportError:
+    from processors.derived_writer import load_sentiment_archive
+    from processors.technical_utils import RESAMPLE_RULES
+
+# 词典有改动时递增，旧缓存自动失效
+LEXICON_VERSION = "lex-v2"
+
+# 情绪词 → 强度权重（正 = 利好，负 = 利空）
+_LEXICON_ZH = {
+    # 利好
+    "暴涨": 2, "大涨": 2, "飙升": 2, "涨停": 2, "创新高": 2, "超预期": 2, "扭亏为盈": 2,
+    "上涨": 1, "上升": 1, "走高": 1, "反弹": 1, "增长": 1, "增持": 1, "回购": 1, "派息": 1,
+    "分红": 1, "买入": 1, "看好": 1, "利好": 1, "突破": 1, "盈利": 1, "获批": 1, "上调": 1,
+    "升级": 1, "强劲": 1, "加码": 1, "领涨": 1, "净流入": 1, "中标": 1, "新高": 1, "合作": 0.5,
+    # 利空
+    "暴跌": -2, "大跌": -2, "跳水": -2, "跌停": -2, "崩盘": -2, "违约": -2, "不及预期": -2, "低于预期": -2,
+    "亏损": -1, "下跌": -1, "下滑": -1, "走低": -1, "下降": -1, "减持": -1, "卖出": -1, "看空": -1,
+    "利空": -1, "下调": -1, "降级": -1, "调查": -1, "诉讼": -1, "疲软": -1, "承压": -1, "放缓": -1,
+    "增长放缓": -1, "沽空": -1, "做空": -1, "净流出": -1, "裁员": -1, "新低": -1,
+    "罚款": -1.5, "处罚": -1.5, "风险": -0.5, "监管": -0.5,
+}
+_LEXICON_EN = {
+    "surge": 1.5, "surges": 1.5, "surged": 1.5, "soar": 1.5, "soars": 1.5, "soared": 1.5,
+    "rally": 1, "rallies": 1, "rallied": 1, "jump": 1, "jumps": 1, "jumped": 1,
+    "beat": 1, "beats": 1, "upgrade": 1, "upgrades": 1, "upgraded": 1, "buyback": 1,
+    "outperform": 1, "bullish": 1, "record high": 1.5, "profit": 0.5, "growth": 0.5,
+    "plunge": -1.5, "plunges": -1.5, "plunged": -1.5, "tumble": -1.5, "tumbles": -1.5, "tumbled": -1.5,
+    "slump": -1.5, "slumps": -1.5, "slumped": -1.5, "selloff": -1.5, "sell-off": -1.5,
+    "miss": -1, "misses": -1, "missed": -1, "downgrade": -1, "downgrades": -1, "downgraded": -1,
+    "loss": -1, "losses": -1, "lawsuit": -1, "probe": -1, "fined": -1, "bearish": -1,
+    "layoffs": -1, "warning": -1,
+}
+_LEXICON = {**_LEXICON_ZH, **_LEXICON_EN}
+
+_NEGATORS_ZH = ("并非", "没有", "毫无", "难以", "无法", "不", "未", "没", "无", "非")
+_NEGATORS_EN = ("not", "no", "never", "without", "hardly")
+# 以否定字开头却不表否定的复合词：「非常看好」「不断上涨」「不断创新高」不能被「非 / 不」取反
+_NON_NEGATING_ZH = (
+    "毫无疑问", "非常", "非凡", "不断", "不少", "不仅", "不但", "不停", "不乏", "不菲",
+    "无论", "无限", "无比", "没想到",
+)
+_NON_NEGATING_RE = "|".join(re.escape(t) for t in sorted(_NON_NEGATING_ZH, key=len, reverse=True))
+
+_TERM_ALT = "|".join(
+    [re.escape(t) for t in sorted(_LEXICON_ZH, key=len, reverse=True)]
+    + [rf"\b{re.escape(t)}\b" for t in sorted(_LEXICON_EN, key=len, reverse=True)]
+)
+# 否定词与情绪词之间最多隔 2 个非标点字符（中文）或 1 个词（英文）
+_PATTERN = (
+    rf"(?P<neg>(?:{'|'.join(_NEGATORS_ZH)})[^，。,.;；:：!！?？\s]{{0,2}}?"
+    rf"|\b(?:{'|'.join(_NEGATORS_EN)})\s+(?:[a-z]+\s+)?)?"
+    rf"(?P<term>{_TERM_ALT})"
+)
+
+_POLARITY_THRESHOLD = 0.1
+_CACHE_COLUMNS = ["url_hash", "raw", "hits", "score", "lexicon"]
+
+
+def score_headlines(titles) -> pd.DataFrame:
+    """
+    批量打分。返回与输入等长的 DataFrame：
+        raw   — 加权命中之和（否定已取反）
+        hits  — 命中情绪词个数
+        score — tanh(raw / 2)，(-1, 1)
+    """
+    titles = pd.Series(list(titles), dtype="object").fillna("").astype(str).str.lower()
+    # 等长空白替换：空白会截断否定词的 2 字符作用域，复合词后面的情绪词按原极性计分
+    titles = titles.str.replace(_NON_NEGATING_RE, lambda m: " " * len(m.group()), regex=True)
+    out = pd.DataFrame({"raw": 0.0, "hits": 0}, index=titles.index)
+    if titles.empty:
+        out["score"] = pd.Series(dtype=float)
+        return out
+
+    matches = titles.str.extractall(_PATTERN)
+    if not matches.empty:
+        weight = matches["term"].map(_LEXICON).astype(float)
+        weight = weight.where(matches["neg"].isna(), -weight)
+        grouped = weight.groupby(level=0)
+        out["raw"] = grouped.sum().reindex(out.index, fill_value=0.0)
+        out["hits"] = grouped.size().reindex(out.index, fill_value=0).astype(int)
+    out["score"] = np.tanh(out["raw"] / 2.0).round(4)
+    return out
+
+
+def _load_cache() -> pd.DataFrame:
+    if not SENTIMENT_SCORE_CACHE.exists():
+        return pd.DataFrame(columns=_CACHE_COLUMNS)
+    cache = pd.read_parquet(SENTIMENT_SCORE_CACHE)
+    return cache[cache["lexicon"] == LEXICON_VERSION]
+
+
+def _update_cache(frame: pd.DataFrame) -> pd.DataFrame:
+    """frame: 含 url_hash / title 列。只为缓存中没有的 url_hash 打分，返回 url_hash → score 全表。"""
+    cache = _load_cache()
+    todo = frame[~frame["url_hash"].isin(cache["url_hash"])].drop_duplicates("url_hash")
+    if todo.empty:
+        return cache
+
+    scored = score_headlines(todo["title"])
+    scored.index = todo.index
+    fresh = pd.DataFrame({
+        "url_hash": todo["url_hash"],
+        "raw": scored["raw"],
+        "hits": scored["hits"],
+        "score": scored["score"],
+        "lexicon": LEXICON_VERSION,
+    }, columns=_CACHE_COLUMNS)
+    cache = pd.concat([cache, fresh], ignore_index=True) if not cache.empty else fresh.reset_index(drop=True)
+    SENTIMENT_SCORE_CACHE.parent.mkdir(parents=True, exist_ok=True)
+    cache.to_parquet(SENTIMENT_SCORE_CACHE, index=False)
+    return cache
+
+
+def score_articles(articles: list[dict]) -> list[float]:
+    """给新闻视图中的条目打分（命中缓存直接读取，未命中则打分并写回缓存）。"""
+    if not articles:
+        return []
+    frame = pd.DataFrame({
+        "url_hash": [a.get("url_hash") or url_hash(a.get("url") or a.get("title") or "") for a in articles],
+        "title": [a.get("title") or "" for a in articles],
+    })
+    lookup = _update_cache(frame).set_index("url_hash")["score"]
+    lookup = lookup[~lookup.index.duplicated(keep="last")]
+    return frame["url_hash"].map(lookup).fillna(0.0).astype(float).tolist()
+
+
+def _aggregate(df: pd.DataFrame, rule: str) -> pd.DataFrame:
+    """按 source_count 加权的均分 + 条数 + 利好/利空占比。"""
+    w = df["source_count"]
+    parts = pd.DataFrame({
+        "w": w,
+        "ws": w * df["score"],
+        "pos": w * (df["score"] > _POLARITY_THRESHOLD),
+        "neg": w * (df["score"] < -_POLARITY_THRESHOLD),
+        "n": 1,
+    }, index=df["date"])
+    agg = parts.resample(rule).sum()
+    agg = agg[agg["n"] > 0]
+    return pd.DataFrame({
+        "score": (agg["ws"] / agg["w"]).round(4),
+        "n": agg["n"].astype(int),
+        "positive_ratio": (agg["pos"] / agg["w"]).round(4),
+        "negative_ratio": (agg["neg"] / agg["w"]).round(4),
+    })
+
+
+def _aggregate_path(ticker: str, tf: str) -> Path:
+    return DERIVED_SENTIMENT_DIR / f"{ticker}_sentiment_{tf}.parquet"
+
+
+def write_sentiment_aggregates(ticker: str) -> dict[str, Path]:
+    """对该 ticker 的舆情归档整体打分（增量），落盘 daily / weekly / monthly 聚合。"""
+    archive = load_sentiment_archive(ticker)
+    if archive.empty:
+        return {}
+
+    archive = archive.dropna(subset=["date"]).drop_duplicates("url_hash")
+    lookup = _update_cache(archive[["url_hash", "title"]]).set_index("url_hash")["score"]
+    lookup = lookup[~lookup.index.duplicated(keep="last")]
+
+    df = pd.DataFrame({
+        "date": pd.to_datetime(archive["date"]).values,
+        "score": archive["url_hash"].map(lookup).fillna(0.0).values,
+        "source_count": (archive["source_count"] if "source_count" in archive
+                         else pd.Series(1, index=archive.index)).fillna(1).clip(lower=1).values,
+    }).sort_values("date")
+
+    written: dict[str, Path] = {}
+    for tf, rule in {"daily": "D", **RESAMPLE_RULES}.items():
+        out = _aggregate(df, rule)
+        path = _aggregate_path(ticker, tf)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        out.to_parquet(path)
+        written[tf] = path
+    return written
+
+
+def load_sentiment_aggregates(ticker: str, tf: str = "daily") -> pd.DataFrame | None:
+    path = _aggregate_path(ticker, tf)
+    if not path.exists():
+        return None
+    return pd.read_parquet(path)
+
+
+# ==========================================
+# 自检：python -m processors.headline_scoring
+# ==========================================
+_SELF_CHECK = [
+    ("腾讯业绩超预期，股价大涨", 1),
+    ("机构非常看好腾讯前景", 1),
+    ("股价不断上涨", 1),
+    ("恒指不断创新高", 1),
+    ("不仅盈利增长，还宣布回购", 1),
+    ("无论如何都看好", 1),
+    ("业绩并非利好", -1),
+    ("公司未能扭亏为盈", -1),
+    ("不看好后市", -1),
+    ("shares did not rally", -1),
+]
+
+if __name__ == "__main__":
+    scored = score_headlines([t for t, _ in _SELF_CHECK])
+    failed = 0
+    for (title, sign), score in zip(_SELF_CHECK, scored["score"]):
+        ok = np.sign(score) == sign
+        failed += not ok
+        print(f"{'✅' if ok else '❌'} {score:+.3f}  {title}")
+    sys.exit(1 if failed else 0)
@@ -10,11 +10,14 @@ from processors.sentiment_calc import generate_sentiment_summary
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
+import telemetry
 from config import TRANSACTIONS_DIR, LATEST_DIR
 # 动态导入基本面引擎
 from processors.fundamental_calc import generate_fundamental_analysis
 # 动态导入技术面引擎
 from processors.technical_calc import generate_technical_analysis
+# 按日归档 payload，供下次运行做增量比对
+from processors.payload_diff import archive_payload
 
 
 def sanitize_for_web(data, precision=6):
@@ -34,7 +37,7 @@ def sanitize_for_web(data, precision=6):
 # 核心组装引擎
 # ==========================================
 def assemble_llm_payload(ticker_symbol: str) -> dict:
-    print(f"\n🧩 正在为 {ticker_symbol} 组装个股专属 Payload...")
+    telemetry.echo(f"\n🧩 正在为 {ticker_symbol} 组装个股专属 Payload...")
 
     payload = {
         "meta": {
@@ -59,13 +62,15 @@ def assemble_llm_payload(ticker_symbol: str) -> dict:
 
     # 2. 基本面
     try:
-        payload["fundamentals"] = generate_fundamental_analysis(ticker_symbol)
+        with telemetry.span("payload.fundamentals"):
+            payload["fundamentals"] = generate_fundamental_analysis(ticker_symbol)
     except Exception as e:
         print(f"   ❌ 基本面挂载失败: {e}")
 
     # 3. 技术面
     try:
-        tech_data = generate_technical_analysis(ticker_symbol)
+        with telemetry.span("payload.technicals"):
+            tech_data = generate_technical_analysis(ticker_symbol)
         if tech_data:
             payload["technicals"] = tech_data
     except Exception as e:
@@ -73,7 +78,8 @@ def assemble_llm_payload(ticker_symbol: str) -> dict:
 
     # 4. 新闻与舆情 (News & Sentiment)
     try:
-        sentiment_data = generate_sentiment_summary(ticker_symbol)
+        with telemetry.span("payload.sentiment"):
+            sentiment_data = generate_sentiment_summary(ticker_symbol)
         if sentiment_data:
             payload["news_sentiment"] = sentiment_data
     except Exception as e:
@@ -83,10 +89,13 @@ def assemble_llm_payload(ticker_symbol: str) -> dict:
 
     # 落盘为极其精简的个股 Payload
     payload_file = LATEST_DIR / f"{ticker_symbol}_LLM_Payload.json"
+    LATEST_DIR.mkdir(parents=True, exist_ok=True)
     with open(payload_file, 'w', encoding='utf-8') as f:
         json.dump(safe_payload, f, indent=4, ensure_ascii=False)
+    archive_payload(ticker_symbol, safe_payload)
+    telemetry.count("payload.bytes", payload_file.stat().st_size)
 
-    print(f"   ✅ 个股切片装配完成: {payload_file.name}")
+    telemetry.echo(f"   ✅ 个股切片装配完成: {payload_file.name}")
     return safe_payload
 
 # ==========================================
@@ -0,0 +1,270 @@
+"""
+payload_diff.py — 个股 Payload 增量比对（与上一次运行的归档 payload 对比）
+
+大多数交易日里，持仓个股的财报、历史财务与绝大部分技术字段与上一次运行的
+<ticker>_LLM_Payload.json 完全一致，但此前每次都把完整 payload 重新发给 LLM。
+本模块负责：
+
+    1. 归档：json_assembler 每次组装完成后按日期把 payload 复制一份到 PAYLOAD_ARCHIVE_DIR
+             （<ticker>_YYYYMMDD.json，同日覆盖，只保留最近 PAYLOAD_ARCHIVE_KEEP 份）
+    2. 比对：把新旧 payload 展平为 "a.b.c" 路径后逐字段比较
+        changed_fields      数值相对变化 ≥ PAYLOAD_DELTA_REL_TOL 或文本字段变化（按变化幅度排序截断）
+        threshold_crossings 关键指标穿越判定阈值（风险水平 0.05/0.95、RSI 30/70、市赚率 0.4/1/2 …）
+        new_headlines       新出现的舆情标题（按标题去重）
+        new_transactions    新增交易流水
+        new_reports         新披露的财报期
+    3. 重要性：出现阈值穿越 / 新交易 / 新财报 / 收盘价变动 ≥ PAYLOAD_DELTA_MATERIAL_PRICE_PCT /
+             强情绪新标题时判为 material；否则 report_generator --incremental 可只发送
+             "上次 compact 摘要 + 本增量"，而不是完整 payload
+
+公开接口：
+    archive_payload(ticker, payload)            -> Path
+    load_previous_payload(ticker, before)       -> (date_str, payload) | (None, None)
+    diff_payload(old, new, since)               -> dict   # "changes since YYYY-MM-DD" 段
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import sys
+from datetime import datetime
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from config import (
+    PAYLOAD_ARCHIVE_DIR,
+    PAYLOAD_ARCHIVE_KEEP,
+    PAYLOAD_DELTA_MATERIAL_PRICE_PCT,
+    PAYLOAD_DELTA_MAX_FIELDS,
+    PAYLOAD_DELTA_REL_TOL,
+)
+
+# 每次运行必然变化、本身不携带信息的字段
+_IGNORED_KEYS = {"generation_date", "date", "period"}
+
+# 列表元素的身份键：按内容而不是下标对齐（新财报插到列表头部时下标整体后移）
+_LIST_ID_KEYS = ("report_period", "Time", "url_hash", "title", "period", "date")
+
+# 指标名 → (判定阈值, 含义)；同名字段出现在任意路径（日/周/月线）都适用
+_THRESHOLDS = {
+    "long_term_risk_level": ((0.05, 0.20, 0.80, 0.95), "长线风险水平：<0.05 机会区，>0.95 风险区"),
+    "short_term_risk_level": ((0.01, 0.99), "短线风险水平：<0.01 机会点，>0.99 风险点"),
+    "own_cycle_level": ((0.05, 0.95), "自身周期：<0.05 周期机会区，>0.95 周期风险区"),
+    "rsi_14": ((30, 70), "RSI：<30 超卖，>70 超买"),
+    "price_to_earnings_to_roe_pr": ((0.4, 1.0, 2.0), "市赚率：<0.4 极度低估，1 合理，>2 透支"),
+    "price_to_dream_ps_adjusted": ((0.5, 1.0, 2.0), "市梦率：<0.5 便宜，1-2 偏贵，>2 透支"),
+    "altman_z_score": ((1.1, 2.6), "Altman Z''：<1.1 困境，>2.6 安全"),
+    "price_position_52w_ratio": ((0.2, 0.8), "52 周水位：<0.2 近一年低位，>0.8 近一年高位"),
+    "correlation_250d": ((0.3, 0.8), "与大盘相关性：<0.3 独立走势，>0.8 高度联动"),
+}
+
+# 判定 material 所看的收盘价路径与强情绪阈值
+_PRICE_PATH = "technicals.daily.close"
+_STRONG_HEADLINE_SCORE = 0.5
+
+
+# ==========================================
+# 归档
+# ==========================================
+
+def _archive_path(ticker: str, date_str: str) -> Path:
+    return PAYLOAD_ARCHIVE_DIR / f"{ticker}_{date_str}.json"
+
+
+def archive_payload(ticker: str, payload: dict, date_str: str | None = None) -> Path:
+    """按日期归档 payload（同日覆盖），并清理超出保留份数的旧归档。"""
+    date_str = date_str or datetime.now().strftime("%Y%m%d")
+    PAYLOAD_ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    path = _archive_path(ticker, date_str)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+
+    history = sorted(PAYLOAD_ARCHIVE_DIR.glob(f"{ticker}_????????.json"))
+    for old in history[:-PAYLOAD_ARCHIVE_KEEP]:
+        old.unlink(missing_ok=True)
+    return path
+
+
+def load_previous_payload(ticker: str, before: str | None = None) -> tuple[str | None, dict | None]:
+    """
+    取 before（YYYYMMDD，默认今天）之前最近一次的归档 payload。
+    返回 (YYYY-MM-DD, payload)；没有归档时返回 (None, None)。
+    """
+    before = before or datetime.now().strftime("%Y%m%d")
+    candidates = [
+        p for p in sorted(PAYLOAD_ARCHIVE_DIR.glob(f"{ticker}_????????.json"), reverse=True)
+        if p.stem.rsplit("_", 1)[-1] < before
+    ]
+    for path in candidates:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        d = path.stem.rsplit("_", 1)[-1]
+        return f"{d[:4]}-{d[4:6]}-{d[6:]}", payload
+    return None, None
+
+
+# ==========================================
+# 比对
+# ==========================================
+
+def _list_key(item, index: int) -> str:
+    if isinstance(item, dict):
+        for k in _LIST_ID_KEYS:
+            if item.get(k):
+                return str(item[k])
+    return str(index)
+
+
+def _flatten(node, prefix: str = "", out: dict | None = None) -> dict:
+    """嵌套 dict/list → {"a.b[key].c": 叶子值}"""
+    out = {} if out is None else out
+    if isinstance(node, dict):
+        for k, v in node.items():
+            if k in _IGNORED_KEYS:
+                continue
+            _flatten(v, f"{prefix}.{k}" if prefix else str(k), out)
+    elif isinstance(node, list) and node and isinstance(node[0], (dict, list)):
+        for i, v in enumerate(node):
+            _flatten(v, f"{prefix}[{_list_key(v, i)}]", out)
+    else:
+        out[prefix] = node
+    return out
+
+
+def _is_number(v) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v)
+
+
+def _rel_change(old, new) -> float | None:
+    if not (_is_number(old) and _is_number(new)):
+        return None
+    if old == new:
+        return 0.0
+    return abs(new - old) / max(abs(old), abs(new))
+
+
+def _leaf_name(path: str) -> str:
+    return path.rsplit(".", 1)[-1]
+
+
+def _crossings(path: str, old, new) -> list[dict]:
+    spec = _THRESHOLDS.get(_leaf_name(path))
+    if spec is None or not (_is_number(old) and _is_number(new)):
+        return []
+    levels, meaning = spec
+    found = []
+    for level in levels:
+        if (old < level) != (new < level):
+            found.append({
+                "path": path,
+                "old": old,
+                "new": new,
+                "threshold": level,
+                "direction": "up" if new > old else "down",
+                "meaning": meaning,
+            })
+    return found
+
+
+def _headline_titles(payload: dict) -> dict[str, dict]:
+    headlines = (payload.get("news_sentiment") or {}).get("headlines") or []
+    return {h.get("title", ""): h for h in headlines if isinstance(h, dict) and h.get("title")}
+
+
+def _keyed_records(payload: dict, *path: str) -> dict[str, dict]:
+    node = payload
+    for key in path:
+        node = node.get(key) if isinstance(node, dict) else None
+    if not isinstance(node, list):
+        return {}
+    return {_list_key(r, i): r for i, r in enumerate(node) if isinstance(r, dict)}
+
+
+def diff_payload(old: dict | None, new: dict, since: str | None = None) -> dict:
+    """
+    比较新旧 payload，返回 "changes since YYYY-MM-DD" 增量段。
+    old 为 None（首次运行 / 无归档）时返回 material=True 的空增量。
+    """
+    if not old:
+        return {"since": None, "material": True, "material_reasons": ["无历史归档（首次运行）"]}
+
+    flat_old, flat_new = _flatten(old), _flatten(new)
+
+    new_reports = []
+    for section in ("annual_reports", "quarterly_reports"):
+        old_periods = _keyed_records(old, "fundamentals", section)
+        new_reports += [f"fundamentals.{section}[{k}]"
+                        for k in _keyed_records(new, "fundamentals", section) if k not in old_periods]
+
+    # 新闻标题 / 交易流水 / 新财报期单独成段，不混入逐字段变化；
+    # 已有财报期的字段修订（如估值随股价变化）仍按 report_period 对齐逐字段比较
+    skip_prefixes = ("news_sentiment.headlines", "transaction_history", *new_reports)
+
+    changed, crossings = [], []
+    for path in sorted(set(flat_old) | set(flat_new)):
+        if path.startswith(skip_prefixes):
+            continue
+        o, n = flat_old.get(path), flat_new.get(path)
+        if o == n:
+            continue
+        rel = _rel_change(o, n)
+        if rel is not None and rel < PAYLOAD_DELTA_REL_TOL:
+            continue
+        crossings += _crossings(path, o, n)
+        entry = {"path": path, "old": o, "new": n}
+        if rel is not None and o != 0:
+            entry["change_pct"] = round((n - o) / abs(o), 4)
+        changed.append((rel if rel is not None else 1.0, entry))
+
+    changed.sort(key=lambda t: -t[0])
+    changed_fields = [e for _, e in changed[:PAYLOAD_DELTA_MAX_FIELDS]]
+
+    old_titles = _headline_titles(old)
+    new_headlines = [h for t, h in _headline_titles(new).items() if t not in old_titles]
+
+    old_tx = _keyed_records(old, "transaction_history")
+    new_transactions = [r for k, r in _keyed_records(new, "transaction_history").items() if k not in old_tx]
+
+    touched = {e["path"].split(".", 1)[0].split("[", 1)[0] for _, e in changed}
+    if new_headlines:
+        touched.add("news_sentiment")
+    if new_transactions:
+        touched.add("transaction_history")
+    if new_reports:
+        touched.add("fundamentals")
+    unchanged_sections = sorted(k for k in new if k not in touched and k != "meta")
+
+    # 重要性判定
+    reasons = []
+    if crossings:
+        reasons.append(f"{len(crossings)} 个指标穿越判定阈值")
+    if new_transactions:
+        reasons.append(f"新增 {len(new_transactions)} 笔交易")
+    if new_reports:
+        reasons.append(f"新披露财报: {', '.join(new_reports)}")
+    price_rel = _rel_change(flat_old.get(_PRICE_PATH), flat_new.get(_PRICE_PATH))
+    if price_rel is not None and price_rel >= PAYLOAD_DELTA_MATERIAL_PRICE_PCT:
+        reasons.append(f"收盘价变动 ≥ {PAYLOAD_DELTA_MATERIAL_PRICE_PCT:.0%}")
+    strong = [h for h in new_headlines if _is_number(h.get("score")) and abs(h["score"]) >= _STRONG_HEADLINE_SCORE]
+    if strong:
+        reasons.append(f"{len(strong)} 条强情绪新标题")
+
+    return {
+        "since": since,
+        "material": bool(reasons),
+        "material_reasons": reasons,
+        "threshold_crossings": crossings,
+        "changed_fields": changed_fields,
+        "changed_fields_total": len(changed),
+        "new_headlines": new_headlines,
+        "new_transactions": new_transactions,
+        "new_reports": new_reports,
+        "unchanged_sections": unchanged_sections,
+    }
@@ -0,0 +1,175 @@
+"""
+returns_panel.py — 持仓日收益率面板（尾部风险 / 协方差分析共用）
+
+从 OHLCV 库读出当前全部持仓的收盘价，折算为基础货币（FX_HISTORY_SYMBOLS 的汇率日线，缺失时退化为当前汇率常数），
+按日期并集对齐、前向填充最多 5 天（港股 / 美股 / 加股休市日不一致），取最近 TAIL_RISK_LOOKBACK_DAYS 行的简单收益率。
+每次风控计算只构建一次，tail_risk 与 covariance 直接复用，不再各自读 CSV。
+
+权重 = 持仓基础货币市值 / 账户净值（现金部分视为零波动）；有效收益率少于 TAIL_RISK_MIN_OBS 的持仓不进矩阵，
+记在 uncovered 里，由调用方决定如何代理。
+
+公开接口：
+    build_returns_panel(df_pos, fx_dict, net_liq) -> ReturnsPanel | None
+    load_close(path) -> pd.Series | None
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from config import (
+    BASE_CURRENCY,
+    FX_HISTORY_SYMBOLS,
+    OHLCV_DIR,
+    TAIL_RISK_LOOKBACK_DAYS,
+    TAIL_RISK_MIN_OBS,
+)
+
+_FFILL_LIMIT = 5  # 跨市场休市日最多前向填充的天数
+
+
+@dataclass
+class ReturnsPanel:
+    returns: pd.DataFrame                        # (日期 × 已覆盖持仓) 基础货币日收益率，无 NaN
+    prices: dict[str, pd.Series]                 # 全部有 K 线持仓的完整基础货币收盘价（情景回放用）
+    weights: dict[str, float]                    # 全部持仓的净值权重（含未进矩阵的）
+    fx_source: dict[str, str] = field(default_factory=dict)   # 币种 → history / spot / base
+    missing: list[str] = field(default_factory=list)          # OHLCV 库里没有 K 线的持仓
+
+    @property
+    def symbols(self) -> list[str]:
+        return list(self.returns.columns)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self.returns.to_numpy()
+
+    @property
+    def covered_weights(self) -> np.ndarray:
+        """与 symbols 顺序一致的权重向量。"""
+        return np.array([self.weights[s] for s in self.symbols])
+
+    @property
+    def uncovered(self) -> list[str]:
+        return sorted(set(self.weights) - set(self.symbols))
+
+    @property
+    def fingerprint(self) -> str:
+        """收益率矩阵内容（含列名与日期范围）的摘要：数据不变则指纹不变，供下游按指纹缓存。"""
+        h = hashlib.sha1()
+        h.update("|".join(self.symbols).encode())
+        h.update(f"{self.returns.index[0]}|{self.returns.index[-1]}".encode())
+        h.update(np.ascontiguousarray(self.matrix).tobytes())
+        return h.hexdigest()
+
+
+def _standard_symbol(symbol, currency: str) -> str:
+    """IBKR 持仓代码 → OHLCV 库文件名 (HKD: 700 → 0700.HK；其他市场原样)，与 main._to_standard_symbol 一致。"""
+    raw = str(symbol)
+    return raw.zfill(4) + ".HK" if currency == "HKD" else raw
+
+
+def _safe_float(val) -> float:
+    try:
+        out = float(val)
+    except (ValueError, TypeError):
+        return 0.0
+    return out if np.isfinite(out) else 0.0
+
+
+def _safe_rate(val) -> float:
+    rate = _safe_float(val)
+    return rate if rate > 0 else 1.0
+
+
+def load_close(path: Path) -> pd.Series | None:
+    """OHLCV CSV → 以日期为索引、去重升序的正收盘价序列；文件不存在或为空时返回 None。"""
+    if not path.exists():
+        return None
+    df = pd.read_csv(path, usecols=["Date", "Close"])
+    if df.empty:
+        return None
+    series = pd.Series(df["Close"].to_numpy(dtype=float), index=pd.to_datetime(df["Date"]))
+    series = series[~series.index.duplicated(keep="last")].sort_index()
+    return series[series > 0]
+
+
+def _fx_series(currency: str, cache: dict) -> tuple[pd.Series | None, str]:
+    """币种 → (基础货币汇率日线, 来源)；基础货币本身或没有汇率日线时返回 (None, ...)，调用方用常数 spot。"""
+    if currency == BASE_CURRENCY:
+        return None, "base"
+    if currency not in cache:
+        fx_symbol = FX_HISTORY_SYMBOLS.get(currency)
+        series = None
+        if fx_symbol:
+            safe_name = fx_symbol.replace("^", "").replace(".", "_")
+            series = load_close(OHLCV_DIR / f"INDEX_{safe_name}_daily.csv")
+        cache[currency] = series
+    series = cache[currency]
+    return (series, "history") if series is not None and len(series) else (None, "spot")
+
+
+def _base_prices(holdings: pd.DataFrame, fx_dict: dict) -> tuple[dict, dict, list]:
+    """各持仓全部历史收盘价折算为基础货币，返回 ({symbol: Series}, {币种: 汇率来源}, [缺 K 线的 symbol])。"""
+    prices, fx_source, missing, fx_cache = {}, {}, [], {}
+    for symbol, currency in zip(holdings["symbol"], holdings["currency"]):
+        close = load_close(OHLCV_DIR / f"{symbol}_daily.csv")
+        if close is None or close.empty:
+            missing.append(symbol)
+            continue
+        spot = _safe_rate(fx_dict.get(currency, 1.0))
+        fx, source = _fx_series(currency, fx_cache)
+        fx_source[currency] = source
+        if fx is not None:
+            rate = fx.reindex(close.index.union(fx.index)).ffill().reindex(close.index)
+            close = close * rate.fillna(spot)
+        else:
+            close = close * spot
+        prices[symbol] = close
+    return prices, fx_source, missing
+
+
+def _returns_matrix(prices: dict) -> pd.DataFrame:
+    """日期并集对齐 → 前向填充 → 简单收益率，取最近 TAIL_RISK_LOOKBACK_DAYS 行；样本不足的持仓整列剔除。"""
+    if not prices:
+        return pd.DataFrame()
+    panel = pd.DataFrame(prices).sort_index().ffill(limit=_FFILL_LIMIT)
+    returns = panel.pct_change(fill_method=None).iloc[1:].tail(TAIL_RISK_LOOKBACK_DAYS)
+    keep = [c for c in returns.columns if returns[c].notna().sum() >= TAIL_RISK_MIN_OBS]
+    return returns[keep].dropna(how="any")
+
+
+def build_returns_panel(df_pos: pd.DataFrame, fx_dict: dict, net_liq: float) -> ReturnsPanel | None:
+    """
+    df_pos 为 IBKR current_positions 表（Symbol / Currency / Market Value），fx_dict 为币种 → 基础货币汇率，
+    net_liq 为基础货币计价的账户净值。没有持仓、或对齐后样本不足 TAIL_RISK_MIN_OBS 行时返回 None。
+    """
+    if df_pos.empty or net_liq <= 0:
+        return None
+
+    holdings = pd.DataFrame({
+        "symbol": [_standard_symbol(s, c) for s, c in zip(df_pos["Symbol"], df_pos["Currency"])],
+        "currency": df_pos["Currency"].to_numpy(),
+        "exposure": [
+            _safe_float(mv) * _safe_rate(fx_dict.get(c, 1.0))
+            for mv, c in zip(df_pos["Market Value"], df_pos["Currency"])
+        ],
+    })
+    holdings = holdings.groupby(["symbol", "currency"], as_index=False)["exposure"].sum()
+    weights = dict(zip(holdings["symbol"], (holdings["exposure"] / net_liq).astype(float)))
+
+    prices, fx_source, missing = _base_prices(holdings, fx_dict)
+    returns = _returns_matrix(prices)
+    if returns.empty or len(returns) < TAIL_RISK_MIN_OBS:
+        return None
+    return ReturnsPanel(returns=returns, prices=prices, weights=weights, fx_source=fx_source, missing=missing)
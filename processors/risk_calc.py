@@ -9,7 +9,11 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
-from config import PORTFOLIO_DIR, LATEST_DIR
+from config import PORTFOLIO_DIR, LATEST_DIR, BASE_CURRENCY, VAR_CONFIDENCE_LEVELS
+from processors.returns_panel import build_returns_panel
+from processors.tail_risk import compute_tail_risk
+from processors.covariance import compute_concentration
+import telemetry
 
 def _get_latest_file(directory: Path, prefix: str) -> Path:
     """
@@ -140,12 +144,38 @@ def generate_portfolio_risk_report() -> dict:
     stress_test_drawdown_value = total_stock_exposure_base * 0.20
     max_drawdown_impact_ratio = (stress_test_drawdown_value / net_liq)
 
+    # 收益率矩阵驱动的尾部风险与集中度：面板只构建一次，两者共用（协方差按面板指纹缓存，也只估计一次）
+    # 上面的 20% 断崖假设保留作粗略对照（下游 prompt 已在引用）
+    tail_risk, risk_concentration = {}, {}
+    try:
+        with telemetry.span("risk.panel") as s:
+            panel = build_returns_panel(df_pos, fx_dict, net_liq)
+            s["holdings"] = total_positions
+    except Exception as e:
+        print(f"⚠️ 持仓收益率面板构建失败，仅保留 20% 压力测试: {e}")
+        panel = None
+    if panel is None:
+        print("⚠️ 持仓 K 线不足，跳过尾部风险与集中度分析。")
+    else:
+        # 尾部风险：历史 / 过滤历史 VaR·CVaR、蒙特卡洛、恒指历史情景回放
+        try:
+            with telemetry.span("risk.tail"):
+                tail_risk = compute_tail_risk(panel, net_liq)
+        except Exception as e:
+            print(f"⚠️ 尾部风险计算失败: {e}")
+        # 集中度：收缩协方差、相关性聚类、有效押注数与风险贡献
+        try:
+            with telemetry.span("risk.concentration"):
+                risk_concentration = compute_concentration(panel)
+        except Exception as e:
+            print(f"⚠️ 集中度分析失败: {e}")
+
     # ==========================================
     # 4. 组装风控 JSON
     # ==========================================
     risk_report = {
         "portfolio_summary": {
-            "base_currency": "CAD",
+            "base_currency": BASE_CURRENCY,
             "net_liquidation": net_liq,
             "total_cash": total_cash,
             "cash_ratio": cash_ratio,
@@ -162,16 +192,27 @@ def generate_portfolio_risk_report() -> dict:
         "concentration_and_stress": {
             "top_holdings": top_holdings,
             "stress_test_20pct_drop_impact_ratio": max_drawdown_impact_ratio
-        }
+        },
+        "tail_risk": tail_risk,
+        "risk_concentration": risk_concentration
     }
     
     # 落盘保存为组合级风控报告
     risk_file_path = LATEST_DIR / "portfolio_risk.json"
+    LATEST_DIR.mkdir(parents=True, exist_ok=True)
     with open(risk_file_path, 'w', encoding='utf-8') as f:
         json.dump(risk_report, f, indent=4, ensure_ascii=False)
         
     margin_str = "N/A" if margin_utilization is None else f"{round(margin_utilization*100, 2)}%"
     print(f"✅ 风控计算完成！(账户净值: {round(net_liq, 2)} CAD, 维持保证金占用: {margin_str})")
+    if tail_risk:
+        hist, mc = tail_risk["historical"], tail_risk["monte_carlo"]
+        tag = int(round(max(VAR_CONFIDENCE_LEVELS) * 100))
+        print(f"✅ 1日 VaR{tag} (历史/蒙特卡洛): {hist[f'var_{tag}_ratio']:.2%} / {mc[f'var_{tag}_ratio']:.2%} 净值，"
+              f"CVaR{tag}: {hist[f'cvar_{tag}_ratio']:.2%}（{tail_risk['elapsed_ms']} ms）")
+    if risk_concentration:
+        print(f"✅ 有效押注数 {risk_concentration['effective_number_of_bets']} / 持仓 {total_positions}，"
+              f"相关性聚类 {len(risk_concentration['clusters'])} 簇")
     print(f"✅ 账户级风控报告已保存至: {risk_file_path.name}")
     
     return risk_report
@@ -6,7 +6,15 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
-from config import SENTIMENT_DIR
+from config import SENTIMENT_DIR, SENTIMENT_TOP_K_HEADLINES
+
+try:
+    from .headline_scoring import LEXICON_VERSION, load_sentiment_aggregates, score_articles
+except ImportError:
+    from processors.headline_scoring import LEXICON_VERSION, load_sentiment_aggregates, score_articles
+
+# 载荷中每个时间粒度保留的最近聚合期数
+_AGG_TAIL = {"daily": 7, "weekly": 4, "monthly": 3}
 
 _EMPTY_RESULT = {
     "news_summary": {
@@ -15,6 +23,7 @@ _EMPTY_RESULT = {
         "news_frequency": "None",
         "top_sources": [],
     },
+    "sentiment_scores": {},
     "headlines": []
 }
 
@@ -22,7 +31,8 @@ _EMPTY_RESULT = {
 def generate_sentiment_summary(standard_symbol: str) -> dict:
     """
     读取 fetch_stock_news() 落盘的新闻 JSON，计算基础统计摘要。
-    不做 ML 情感评分——让 LLM 自行解读标题情绪。
+    标题情绪由本地词典打分（headline_scoring），载荷只携带日/周/月聚合分数
+    与得分绝对值最大的 SENTIMENT_TOP_K_HEADLINES 条标题，不再把全部标题交给 LLM。
     """
     news_file = SENTIMENT_DIR / f"{standard_symbol}_news.json"
 
@@ -55,16 +65,35 @@ def generate_sentiment_summary(standard_symbol: str) -> dict:
     source_counts = Counter(a.get("source", "") for a in articles if a.get("source"))
     top_sources = [src for src, _ in source_counts.most_common(3)]
 
+    # 只保留情绪最极端的 k 条（得分绝对值降序，同分取更新的）
+    scores = score_articles(articles)
+    ranked = sorted(
+        zip(articles, scores),
+        key=lambda pair: (abs(pair[1]), pair[0].get("date", "")),
+        reverse=True,
+    )[:SENTIMENT_TOP_K_HEADLINES]
     headlines = [
         {
             "date": a.get("date", ""),
             "title": a.get("title", ""),
             "source": a.get("source", ""),
-            # "url": a.get("url", "")
+            "source_count": a.get("source_count", 1),  # 近重复聚类内的报道条数（多源转载 = 关注度更高）
+            "score": round(score, 3),
         }
-        for a in articles
+        for a, score in ranked
     ]
 
+    sentiment_scores = {"method": LEXICON_VERSION, "view_mean": round(sum(scores) / len(scores), 3)}
+    for tf, tail in _AGG_TAIL.items():
+        agg = load_sentiment_aggregates(standard_symbol, tf)
+        if agg is None or agg.empty:
+            continue
+        agg = agg.tail(tail)
+        sentiment_scores[tf] = [
+            {"period": idx.strftime("%Y-%m-%d"), **{k: row[k] for k in ("score", "n", "positive_ratio", "negative_ratio")}}
+            for idx, row in agg.iterrows()
+        ]
+
     return {
         "news_summary": {
             "total_articles": total,
@@ -72,6 +101,7 @@ def generate_sentiment_summary(standard_symbol: str) -> dict:
             "news_frequency": news_frequency,
             "top_sources": top_sources,
         },
+        "sentiment_scores": sentiment_scores,
         "headlines": headlines
     }
 
@@ -11,12 +11,11 @@ technical_indicators.py — 技术指标计算模块
     - _calc_price_percentile_rank: 计算当前价格在过去 N 个交易日中的分位数排名
           抗极端值，反映真实价格分布位置（0=历史低位，1=历史高位）
 
-依赖：pandas_ta、technical_utils._get_dynamic_col
+依赖：pandas_ta（_add_technical_indicators 内延迟导入）、technical_utils._get_dynamic_col
 """
 
 import pandas as pd
 import numpy as np
-import pandas_ta as ta  # noqa: F401 (used via df.ta accessor)
 
 try:
     from .technical_utils import _get_dynamic_col
@@ -27,10 +26,11 @@ except ImportError:
 def _add_technical_indicators(df: pd.DataFrame) -> pd.DataFrame:
     """
     内部辅助函数：为输入的 DataFrame 批量添加技术指标 (MA, MACD, RSI, KDJ, BOLL, VWAP)。
-    依赖: pandas_ta 库
+    依赖: pandas_ta 库（在此处才导入：它本身导入很重，模块级导入会拖慢 main / headline_scoring 等入口的冷启动）
     """
     if df.empty or len(df) < 20:
         return df
+    import pandas_ta as ta  # noqa: F401 (注册 df.ta accessor)
 
     # 1. 均线系统 (MA: 5, 10, 20, 30, 60, 120, 250)
     ma_windows = [5, 10, 20, 30, 60, 120, 250]
@@ -1,4 +1,10 @@
+import argparse
 import csv
+import hashlib
+import json
+import os
+import shutil
+import uuid
 from datetime import datetime
 import glob
 import pandas as pd
@@ -9,115 +15,285 @@ import sys
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
-from config import TRANSACTIONS_DIR
+from config import TRANSACTIONS_DIR, TRANSACTIONS_LEDGER_DIR, TRANSACTIONS_MANIFEST
+import telemetry
 
-def clean_ibkr_transactions():
+# 总账（ledger）列与类型：导出的 transactions_master.csv 只是其中 _MASTER_COLUMNS 的视图
+_LEDGER_DTYPES = {
+    "trade_key": "string",
+    "Symbol": "string",
+    "Currency": "string",
+    "DateTime": "datetime64[ns]",
+    "Time": "datetime64[ns]",      # 成交日（DateTime 去掉时分秒）
+    "Action": "string",
+    "Quantity": "float64",
+    "Price": "float64",
+    "Commission": "float64",
+    "Realized_PnL": "float64",
+    "Code": "string",
+    "source_file": "string",
+}
+_MASTER_COLUMNS = ["Symbol", "Time", "Action", "Quantity", "Price", "Realized_PnL"]
+_KEY_INDEX_NAME = "_keys.idx"
+
+
+def _trade_key(symbol: str, time_str: str, qty: float, price: float) -> str:
+    """(股票代码, 交易时间, 带符号数量, 价格) 联合主键的短哈希：同一笔交易出现在多份流水里也只记一次。"""
+    raw = f"{symbol}|{time_str}|{qty!r}|{price!r}"
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _parse_statement(file_path: Path) -> list[dict]:
+    """
+    解析单份 IBKR Activity Statement CSV，只提取股票 Trades 区域的 Data 行。
+    """
+    records = []
+    # 使用 utf-8-sig 以兼容可能带有 BOM 头的 CSV 文件
+    with open(file_path, 'r', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        trades_header = None  # 动态捕获 Trades 区域的表头
+
+        for row in reader:
+            if not row:
+                continue
+
+            # ==================================================
+            # 第一步：捕获 Trades 区域的 Header 行，建立列名映射
+            # ==================================================
+            if row[0] == 'Trades' and row[1] == 'Header':
+                trades_header = row
+                continue
+
+            # ==================================================
+            # 第二步：用 Header 列名安全提取 Data 行
+            # ==================================================
+            if row[0] == 'Trades' and row[1] == 'Data' and trades_header:
+                record = dict(zip(trades_header, row))
+
+                # 只处理股票交易，跳过期权/期货等
+                if record.get('Asset Category') != 'Stocks':
+                    continue
+
+                symbol = record.get('Symbol', '')
+                time_str = record.get('Date/Time', '').strip()
+
+                # 清洗数字（去除可能存在的千位分隔符逗号，如 "2,000"）
+                qty_raw = record.get('Quantity', '0').replace(',', '')
+                price_raw = record.get('T. Price', '0').replace(',', '')
+                comm_raw = record.get('Comm/Fee', '0').replace(',', '')
+                pnl_raw = record.get('Realized P/L', '0').replace(',', '')
+
+                qty = float(qty_raw) if qty_raw else 0.0
+                price = float(price_raw) if price_raw else 0.0
+
+                # 盈透的佣金通常是负数
+                comm = float(comm_raw) if comm_raw else 0.0
+                pnl = float(pnl_raw) if pnl_raw else 0.0
+
+                traded_at = datetime.strptime(time_str, "%Y-%m-%d, %H:%M:%S")
+                records.append({
+                    "trade_key": _trade_key(symbol, time_str, qty, price),
+                    "Symbol": symbol,
+                    "Currency": record.get('Currency', ''),
+                    "DateTime": traded_at,
+                    "Time": traded_at.replace(hour=0, minute=0, second=0),
+                    "Action": "BUY" if qty > 0 else "SELL",
+                    "Quantity": abs(qty),
+                    "Price": price,
+                    "Commission": comm,
+                    "Realized_PnL": pnl,
+                    "Code": record.get('Code', ''),
+                    "source_file": file_path.name,
+                })
+    return records
+
+
+# ==========================================
+# 已导入文件清单 (Manifest)
+# ==========================================
+def _file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _load_manifest() -> dict:
+    if not TRANSACTIONS_MANIFEST.exists():
+        return {}
+    try:
+        return json.loads(TRANSACTIONS_MANIFEST.read_text(encoding='utf-8'))
+    except (json.JSONDecodeError, OSError):
+        return {}  # 清单损坏：全部重新解析一遍，唯一键索引保证不会重复入账
+
+
+def _save_manifest(manifest: dict) -> None:
+    TRANSACTIONS_MANIFEST.parent.mkdir(parents=True, exist_ok=True)
+    tmp = TRANSACTIONS_MANIFEST.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp, TRANSACTIONS_MANIFEST)
+
+
+def _pending_files(csv_files: list[Path], manifest: dict) -> list[tuple[Path, dict]]:
     """
-    自动扫描目录下所有的 IBKR 交易流水 CSV，只提取核心 Trades 数据，
-    并进行多文件合并与自动去重。
+    对比清单，返回需要解析的 (文件, 新清单条目)。
+    大小 + mtime 都没变直接跳过（不读文件）；变了再算 sha256，内容没变只刷新清单里的 mtime。
     """
-    print(f"🧹 开始扫描并清洗 IBKR 交易流水 (支持多文件合并与自动去重)...")
+    pending = []
+    for path in csv_files:
+        st = path.stat()
+        entry = manifest.get(path.name)
+        if entry and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+            continue
+        digest = _file_sha256(path)
+        fresh = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+        if entry and entry.get("sha256") == digest:
+            manifest[path.name] = {**entry, **fresh}
+            continue
+        pending.append((path, fresh))
+    return pending
+
+
+# ==========================================
+# 总账 (Ledger) 读写
+# ==========================================
+def _shard_files() -> list[Path]:
+    return sorted(TRANSACTIONS_LEDGER_DIR.glob("part-*.parquet"))
+
+
+def _rebuild_key_index() -> set[str]:
+    """从全部分片重建唯一键索引（原子替换）。"""
+    keys: set[str] = set()
+    for f in _shard_files():
+        keys.update(pd.read_parquet(f, columns=["trade_key"])["trade_key"].astype(str))
+    path = TRANSACTIONS_LEDGER_DIR / _KEY_INDEX_NAME
+    tmp = path.with_suffix(".idx.tmp")
+    tmp.write_text("".join(f"{k}\n" for k in sorted(keys)), encoding='utf-8')
+    os.replace(tmp, path)
+    return keys
+
+
+def _read_key_index() -> set[str]:
+    """
+    读唯一键索引。分片先于索引落盘，若两步之间崩溃，会留下比索引更新的分片：
+    此时（或索引缺失 / 有分片无索引时）先从分片重建索引，避免下次重复入账。
+    """
+    path = TRANSACTIONS_LEDGER_DIR / _KEY_INDEX_NAME
+    shards = _shard_files()
+    if not shards:
+        return set()
+    if not path.exists() or max(f.stat().st_mtime_ns for f in shards) > path.stat().st_mtime_ns:
+        return _rebuild_key_index()
+    return set(path.read_text(encoding='utf-8').split())
+
+
+def _append_ledger(records: list[dict]) -> int:
+    """唯一键去重（先到先得，与旧版字典合并语义一致）后写一个新分片并追加索引，返回新增行数。"""
+    existing = _read_key_index()
+    fresh, seen = [], set()
+    for rec in records:
+        key = rec["trade_key"]
+        if key in existing or key in seen:
+            continue
+        seen.add(key)
+        fresh.append(rec)
+    if not fresh:
+        return 0
+
+    df = pd.DataFrame(fresh, columns=list(_LEDGER_DTYPES)).astype(_LEDGER_DTYPES)
+    TRANSACTIONS_LEDGER_DIR.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    df.to_parquet(TRANSACTIONS_LEDGER_DIR / f"part-{stamp}-{uuid.uuid4().hex[:6]}.parquet", index=False)
+    with open(TRANSACTIONS_LEDGER_DIR / _KEY_INDEX_NAME, 'a', encoding='utf-8') as f:
+        f.writelines(f"{k}\n" for k in df["trade_key"])
+    return len(df)
+
+
+def load_ledger() -> pd.DataFrame:
+    """读取全部总账分片（强类型），按唯一键去重（先写入的分片优先），按成交时间从新到旧排列。"""
+    files = _shard_files()
+    if not files:
+        return pd.DataFrame({c: pd.Series(dtype=t) for c, t in _LEDGER_DTYPES.items()})
+    df = pd.concat([pd.read_parquet(f) for f in files], ignore_index=True)
+    df = df.drop_duplicates("trade_key", keep="first")
+    return df.sort_values("DateTime", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def export_master_csv() -> Path | None:
+    """由总账导出 transactions_master.csv（下游 json_assembler / webview 读取的视图，列与旧版一致）。"""
+    df = load_ledger()
+    if df.empty:
+        return None
+    view = df[_MASTER_COLUMNS].copy()
+    view["Time"] = view["Time"].dt.strftime("%Y-%m-%d")
+    output_csv_path = TRANSACTIONS_DIR / "transactions_master.csv"
+    TRANSACTIONS_DIR.mkdir(parents=True, exist_ok=True)
+    view.to_csv(output_csv_path, index=False, encoding='utf-8')
+    return output_csv_path
+
+
+def clean_ibkr_transactions(rebuild: bool = False) -> dict:
+    """
+    增量导入 IBKR 交易流水：只解析清单里没有、或内容已变更的 U*.csv，
+    新交易经唯一键去重后追加进 parquet 总账，再导出 transactions_master.csv 视图。
+    rebuild=True 时清空清单与总账重新导入（删除过流水文件、需要让总账与现存文件严格一致时使用）。
+    返回 {"files": 扫描数, "parsed": 解析数, "new_trades": 新增交易数, "total_trades": 总账行数}。
+    """
+    telemetry.echo(f"🧹 开始增量导入 IBKR 交易流水 (清单比对 + 唯一键去重)...")
 
     # 获取所有的流水文件 (匹配 U 开头的盈透文件)
-    csv_files = glob.glob(str(TRANSACTIONS_DIR / "U*.csv"))
+    csv_files = sorted(Path(p) for p in glob.glob(str(TRANSACTIONS_DIR / "U*.csv")))
 
     if not csv_files:
         print(f"❌ 找不到任何以 U 开头的 CSV 文件在目录: {TRANSACTIONS_DIR}")
-        return
+        return {"files": 0, "parsed": 0, "new_trades": 0, "total_trades": 0}
 
-    # 核心：去重字典
-    # 将 (股票代码, 交易时间, 数量, 价格) 作为联合主键。
-    # 哪怕 1年流水和 3个月流水里有同一笔交易，由于主键一致，字典会自动覆盖，实现绝对去重。
-    trades_dict = {}
+    if rebuild and TRANSACTIONS_LEDGER_DIR.exists():
+        shutil.rmtree(TRANSACTIONS_LEDGER_DIR)
 
-    for file_path in csv_files:
-        print(f"   📄 正在解析: {Path(file_path).name}")
-        try:
-            # 使用 utf-8-sig 以兼容可能带有 BOM 头的 CSV 文件
-            with open(file_path, 'r', encoding='utf-8-sig') as f:
-                reader = csv.reader(f)
-                trades_header = None  # 动态捕获 Trades 区域的表头
-
-                for row in reader:
-                    if not row:
-                        continue
-
-                    # ==================================================
-                    # 第一步：捕获 Trades 区域的 Header 行，建立列名映射
-                    # ==================================================
-                    if row[0] == 'Trades' and row[1] == 'Header':
-                        trades_header = row
-                        continue
-
-                    # ==================================================
-                    # 第二步：用 Header 列名安全提取 Data 行
-                    # ==================================================
-                    if row[0] == 'Trades' and row[1] == 'Data' and trades_header:
-                        record = dict(zip(trades_header, row))
-
-                        # 只处理股票交易，跳过期权/期货等
-                        if record.get('Asset Category') != 'Stocks':
-                            continue
-
-                        symbol = record.get('Symbol', '')
-                        time_str = record.get('Date/Time', '').strip()
-
-                        # 清洗数字（去除可能存在的千位分隔符逗号，如 "2,000"）
-                        qty_raw = record.get('Quantity', '0').replace(',', '')
-                        price_raw = record.get('T. Price', '0').replace(',', '')
-                        comm_raw = record.get('Comm/Fee', '0').replace(',', '')
-                        pnl_raw = record.get('Realized P/L', '0').replace(',', '')
-                        trade_code = record.get('Code', '')
-
-                        qty = float(qty_raw) if qty_raw else 0.0
-                        price = float(price_raw) if price_raw else 0.0
-
-                        # 盈透的佣金通常是负数
-                        comm = float(comm_raw) if comm_raw else 0.0
-                        pnl = float(pnl_raw) if pnl_raw else 0.0
-
-                        action = "BUY" if qty > 0 else "SELL"
-
-                        # 生成防重复的主键 (Unique Key)
-                        unique_key = (symbol, time_str, qty, price)
-
-                        if unique_key not in trades_dict:
-                            trades_dict[unique_key] = {
-                                "Symbol": symbol,
-                                "Time": datetime.strptime(time_str, "%Y-%m-%d, %H:%M:%S").strftime("%Y-%m-%d"),
-                                "Action": action,
-                                "Quantity": abs(qty),
-                                "Price": price,
-                                # "Commission": comm,       # 统一使用 Commission
-                                "Realized_PnL": pnl,
-                                # "Code": trade_code
-                            }
+    manifest = _load_manifest()
+    pending = _pending_files(csv_files, manifest)
+    telemetry.count("transactions.files.skipped", len(csv_files) - len(pending))
 
+    records = []
+    for file_path, entry in pending:
+        telemetry.echo(f"   📄 正在解析: {file_path.name}")
+        try:
+            parsed = _parse_statement(file_path)
         except Exception as e:
-            print(f"   ⚠️ 解析文件 {Path(file_path).name} 时发生错误: {e}")
-
-    # 将去重后的字典转换为列表
-    parsed_data = list(trades_dict.values())
-
-    if parsed_data:
-        df = pd.DataFrame(parsed_data)
+            print(f"   ⚠️ 解析文件 {file_path.name} 时发生错误: {e}")
+            continue  # 不写入清单，下次运行重试
+        records.extend(parsed)
+        manifest[file_path.name] = {
+            **entry,
+            "trades": len(parsed),
+            "ingested_at": datetime.now().isoformat(timespec="seconds"),
+        }
+    telemetry.count("transactions.files.parsed", len(pending))
 
-        # 按照时间从新到旧排序 (确保最新的交易记录在 CSV 的最上面)
-        df['Time_Obj'] = pd.to_datetime(df['Time'])
-        df = df.sort_values(by='Time_Obj', ascending=False)
-        df = df.drop(columns=['Time_Obj'])
+    # 先落总账再写清单：中途崩溃只会导致下次重复解析，唯一键索引保证不重复入账
+    new_trades = _append_ledger(records)
+    _save_manifest(manifest)
+    telemetry.count("transactions.rows.new", new_trades)
 
-        # 生成唯一的全量流水总账
-        output_csv_path = TRANSACTIONS_DIR / "transactions_master.csv"
-        df.to_csv(output_csv_path, index=False, encoding='utf-8')
+    master_csv = TRANSACTIONS_DIR / "transactions_master.csv"
+    if new_trades or rebuild or not master_csv.exists():
+        export_master_csv()
 
-        print(f"✅ 清洗与去重成功！多个文件的重叠数据已被完美合并。")
-        print(f"✅ 共提取 {len(df)} 条独立股票交易记录，已保存至: {output_csv_path.name}")
+    total_trades = len(_read_key_index())
+    if total_trades:
+        print(f"✅ 流水导入完成：扫描 {len(csv_files)} 份，解析 {len(pending)} 份新增/变更文件，"
+              f"新增 {new_trades} 条交易，总账共 {total_trades} 条 → {master_csv.name}")
     else:
         print("⚠️ 未能在目录中找到任何有效的股票交易记录。")
+    return {"files": len(csv_files), "parsed": len(pending), "new_trades": new_trades, "total_trades": total_trades}
 
 # ==========================================
 # 独立运行入口
 # ==========================================
 if __name__ == "__main__":
-    clean_ibkr_transactions()
+    parser = argparse.ArgumentParser(description="增量导入 IBKR 交易流水到 parquet 总账")
+    parser.add_argument("--rebuild", action="store_true", help="清空清单与总账，按现存流水文件全量重建")
+    args = parser.parse_args()
+    clean_ibkr_transactions(rebuild=args.rebuild)
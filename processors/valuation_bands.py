@@ -0,0 +1,65 @@
+"""
+valuation_bands.py — 估值分位带（滚动 PE / PB / PS 分位数 + 当前分位）
+
+对每个估值列、每个回看窗口，预先算好逐日的历史分位带：
+    <metric>_P10_<w> … <metric>_P90_<w>   窗口内的 10/25/50/75/90 分位
+    <metric>_PCTL_<w>                      当日值在窗口内的百分位（0–100，≤ 当前值的占比）
+
+窗口按交易日行数计（1Y=252 / 3Y=756 / 5Y=1260），All 为扩张窗口；分母 ≤ 0 的 NaN 日
+不计入窗口样本。rolling().quantile / rolling().rank 均为 pandas 的 C 实现，
+整段历史一次算完，webview 只需切片读取，不再逐请求 np.percentile。
+
+公开接口：
+    add_valuation_bands(df) -> pd.DataFrame   # 原 df 追加分位带列后返回
+    band_column(metric, label, window) -> str
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from config import VALUATION_BAND_QUANTILES, VALUATION_BAND_WINDOWS
+
+BAND_METRICS = ("PE_TTM", "PB", "PS_TTM")
+
+# 窗口内有效样本不足该比例时不出分位（刚上市 / 刚转盈的早期数据噪声太大）
+_MIN_COVERAGE = 0.5
+_MIN_PERIODS_ALL = 60
+
+
+def band_column(metric: str, label: str, window: str) -> str:
+    """band_column("PE_TTM", "P25", "3Y") -> "PE_TTM_P25_3Y"；label="PCTL" 为当前分位列。"""
+    return f"{metric}_{label}_{window}"
+
+
+def _roller(series: pd.Series, window: str):
+    rows = VALUATION_BAND_WINDOWS.get(window)
+    if rows is None:  # "All"：扩张窗口
+        return series.expanding(min_periods=_MIN_PERIODS_ALL)
+    return series.rolling(rows, min_periods=int(rows * _MIN_COVERAGE))
+
+
+def add_valuation_bands(df: pd.DataFrame) -> pd.DataFrame:
+    """为 df 中存在的 PE_TTM / PB / PS_TTM 列追加所有窗口的分位带与当前分位列。"""
+    bands = {}
+    for metric in BAND_METRICS:
+        if metric not in df.columns:
+            continue
+        series = pd.to_numeric(df[metric], errors="coerce").astype(float)
+        for window in (*VALUATION_BAND_WINDOWS, "All"):
+            roller = _roller(series, window)
+            for q in VALUATION_BAND_QUANTILES:
+                bands[band_column(metric, f"P{q}", window)] = roller.quantile(q / 100.0)
+            # method="max"：并列值取最大名次 → 与「窗口内 ≤ 当前值的占比」一致
+            bands[band_column(metric, "PCTL", window)] = roller.rank(method="max", pct=True) * 100.0
+    if not bands:
+        return df
+    stale = [c for c in bands if c in df.columns]
+    return pd.concat([df.drop(columns=stale), pd.DataFrame(bands, index=df.index)], axis=1)
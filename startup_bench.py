@@ -0,0 +1,134 @@
+"""
+startup_bench.py
+================
+各入口模块的冷启动导入耗时基准：对每个入口在全新子进程里跑 `python -X importtime -c "import <模块>"`，
+解析 importtime 输出，扣除解释器自身启动（`-c pass`）的导入开销，取多次中位数，
+与 config.STARTUP_IMPORT_BUDGET_MS 的预算比较；任何一个入口超出预算即以退出码 1 结束（可直接挂 CI）。
+
+第一轮只用于生成 .pyc，不计入结果（测的是「进程冷启动」，不是「首次编译」）。
+
+Usage:
+    python startup_bench.py                       # 全部入口，各 5 轮
+    python startup_bench.py --runs 9 --top 8      # 额外列出每个入口自身耗时最重的 8 个模块（含嵌套导入）
+    python startup_bench.py webview.app main      # 只测指定入口
+    python startup_bench.py --calibrate           # 按本机实测中位数 ×1.3 给出建议预算（不判定）
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from config import STARTUP_IMPORT_BUDGET_MS
+
+# import time:       123 |        456 |   package.module
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+def _importtime(statement: str) -> tuple[dict[str, int], dict[str, tuple[int, int]]]:
+    """
+    运行一次，返回 ({顶层导入名: 累计微秒}, {任意层级模块名: (自身微秒, 累计微秒)})。
+    顶层只取缩进为 0 的行（由该语句直接触发的导入），用于求总耗时；后者覆盖全部嵌套行，用于定位最重的模块。
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=BASE_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{statement!r} 失败:\n{proc.stderr.strip().splitlines()[-1] if proc.stderr else ''}")
+    top: dict[str, int] = {}
+    modules: dict[str, tuple[int, int]] = {}
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        self_us, cum_us, name = int(m.group(1)), int(m.group(2)), m.group(4)
+        modules[name] = (self_us, cum_us)
+        if len(m.group(3)) == 1:  # 顶层行只有分隔符后的一个空格
+            top[name] = top.get(name, 0) + cum_us
+    return top, modules
+
+
+def measure(module: str, runs: int = 5) -> dict:
+    """
+    入口 module 的导入耗时（毫秒，已扣除解释器基线），返回中位数、各轮结果，
+    以及全部被导入模块（含嵌套）按自身耗时降序的 {模块: [自身 ms, 累计 ms]}。
+    """
+    _importtime(f"import {module}")  # 预热：生成 .pyc
+    startup = [_importtime("pass") for _ in range(max(1, runs // 2))]
+    baseline = statistics.median(sum(top.values()) for top, _ in startup)
+    samples, heaviest = [], {}
+    for _ in range(runs):
+        top, modules = _importtime(f"import {module}")
+        samples.append((sum(top.values()) - baseline) / 1000)
+        for name, (self_us, cum_us) in modules.items():
+            if name in startup[0][1]:  # 解释器启动本身的导入（site / encodings）不列入
+                continue
+            acc = heaviest.setdefault(name, [0.0, 0.0])
+            acc[0] += self_us / runs
+            acc[1] += cum_us / runs
+    return {
+        "module": module,
+        "median_ms": round(statistics.median(samples), 1),
+        "samples_ms": [round(s, 1) for s in samples],
+        "heaviest_ms": {
+            k: [round(v[0] / 1000, 1), round(v[1] / 1000, 1)]
+            for k, v in sorted(heaviest.items(), key=lambda kv: (-kv[1][0], -kv[1][1]))
+        },
+    }
+
+
+def _suggest_budget(median_ms: float) -> int:
+    # 留 30% 余量，向上取整到 50ms
+    return int(math.ceil(median_ms * 1.3 / 50) * 50)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="入口模块冷启动导入耗时基准（超预算退出码 1）")
+    parser.add_argument("modules", nargs="*", help="默认测 STARTUP_IMPORT_BUDGET_MS 中的全部入口")
+    parser.add_argument("--runs", type=int, default=5, help="每个入口测量轮数（取中位数）")
+    parser.add_argument("--top", type=int, default=0, help="列出每个入口自身耗时最重的 N 个模块（含嵌套导入，附累计耗时）")
+    parser.add_argument("--calibrate", action="store_true", help="只输出建议预算，不判定")
+    parser.add_argument("--out", help="把结果追加写入该 JSONL 文件")
+    args = parser.parse_args()
+
+    modules = args.modules or list(STARTUP_IMPORT_BUDGET_MS)
+    failed = []
+    print(f"{'entry':<30}{'median ms':>12}{'budget ms':>12}  status")
+    for module in modules:
+        try:
+            result = measure(module, args.runs)
+        except RuntimeError as e:
+            print(f"{module:<30}{'-':>12}{'-':>12}  ❌ {e}")
+            failed.append(module)
+            continue
+        budget = STARTUP_IMPORT_BUDGET_MS.get(module)
+        if args.calibrate:
+            status = f"建议预算 {_suggest_budget(result['median_ms'])}"
+        elif budget is None:
+            status = "（无预算）"
+        elif result["median_ms"] > budget:
+            status = "❌ 超出预算"
+            failed.append(module)
+        else:
+            status = "✅"
+        print(f"{module:<30}{result['median_ms']:>12}{budget if budget is not None else '-':>12}  {status}")
+        for name, (self_ms, cum_ms) in list(result["heaviest_ms"].items())[:args.top]:
+            print(f"{'':<4}{name:<38}{self_ms:>8} ms self{cum_ms:>10} ms cumulative")
+        if args.out:
+            with open(args.out, "a", encoding="utf-8") as f:
+                f.write(json.dumps({**result, "budget_ms": budget}, ensure_ascii=False) + "\n")
+
+    if failed and not args.calibrate:
+        print(f"\n超出预算 / 导入失败: {', '.join(failed)}")
+        sys.exit(1)
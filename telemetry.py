@@ -0,0 +1,330 @@
+"""
+telemetry.py — 流水线结构化埋点（span / timer / 计数器 + JSONL 事件日志 + 运行汇总）
+
+每次运行（start_run → finish_run）在 TELEMETRY_DIR 下写两份文件：
+    <run>_<YYYYmmdd_HHMMSS>.jsonl           事件流，一行一个 JSON：span 开始/结束、timer 样本、最终计数器
+    <run>_<YYYYmmdd_HHMMSS>_summary.json    运行汇总：各阶段 / 各 ticker（及其子步骤）墙钟时间、
+                                            timer 延迟 p50/p95/max、缓存命中率、峰值 RSS
+
+用法：
+    telemetry.start_run("pipeline", quiet=args.quiet)
+    telemetry.stage("1_transactions")                     # 顺序阶段：自动结束上一阶段
+    with telemetry.span("ticker", ticker="0700.HK"):      # 嵌套 span，子 span 继承父 span 的属性（如 ticker）
+        with telemetry.span("ohlcv") as s:
+            s["rows"] = n                                 # 附加字段写进 span_end 事件
+    with telemetry.timer("vendor.yfinance", label="info"):   # 延迟样本，汇总按名字算分位数
+        ...
+    telemetry.count("cache.http.hit")                     # cache.<名字>.hit / 其他结果 → 自动算命中率
+    telemetry.echo("   ▶ ...")                            # quiet 模式下不打印
+    telemetry.finish_run()
+
+没有 start_run 时全部接口照常可用但不记录（webview、单模块调试不产生日志），开销只是一次全局判断。
+quiet 也可用环境变量 PIPELINE_QUIET=1 打开（子进程 / 直接运行模块时）；首次判断时才读取（先 config.load_env()），
+因此写在 .env 里同样生效。
+"""
+
+from __future__ import annotations
+
+import contextvars
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource  # POSIX
+except ImportError:
+    resource = None
+
+BASE_DIR = Path(__file__).resolve().parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from config import TELEMETRY_DIR, TELEMETRY_KEEP_RUNS, load_env
+
+_QUIET: bool | None = None  # None：跟随 PIPELINE_QUIET（首次判断时读取）；set_quiet() 显式覆盖
+_RUN: "_Run | None" = None
+_RUN_LOCK = threading.Lock()
+
+# 当前线程/协程的 span 栈顶：(span_id, 继承属性)；线程池里的任务不继承，作为顶层 span 记录
+_CURRENT: contextvars.ContextVar[tuple | None] = contextvars.ContextVar("telemetry_span", default=None)
+_IDS = itertools.count(1)
+
+
+# ==========================================================================
+# quiet 模式
+# ==========================================================================
+
+def set_quiet(quiet: bool = True) -> None:
+    global _QUIET
+    _QUIET = quiet
+
+
+def is_quiet() -> bool:
+    """显式 set_quiet 优先；否则读 PIPELINE_QUIET（导入时 .env 还没加载，所以延迟到这里先 load_env 再读）。"""
+    global _QUIET
+    if _QUIET is None:
+        load_env()
+        _QUIET = os.getenv("PIPELINE_QUIET", "0") == "1"
+    return _QUIET
+
+
+def echo(*args, **kwargs) -> None:
+    """进度类输出：quiet 模式下直接丢弃。警告 / 错误仍应使用 print。"""
+    if not is_quiet():
+        print(*args, **kwargs)
+
+
+# ==========================================================================
+# 单次运行的聚合状态
+# ==========================================================================
+
+def _percentile(ordered: list[float], q: float) -> float:
+    k = (len(ordered) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位 KB，macOS 单位字节
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+
+
+class _Run:
+    def __init__(self, name: str, log_dir: Path):
+        self.name = name
+        self.started_at = datetime.now()
+        self.t0 = time.perf_counter()
+        stamp = self.started_at.strftime("%Y%m%d_%H%M%S")
+        log_dir.mkdir(parents=True, exist_ok=True)
+        self.log_path = log_dir / f"{name}_{stamp}.jsonl"
+        self.summary_path = log_dir / f"{name}_{stamp}_summary.json"
+        self._fh = open(self.log_path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+        self.stage_name: str | None = None
+        self.stage_t0 = 0.0
+        self.stages: dict[str, float] = {}
+        self.tickers: dict[str, float] = defaultdict(float)
+        self.ticker_steps: dict[str, dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.spans: dict[str, list[float]] = defaultdict(list)
+        self.timers: dict[str, list[float]] = defaultdict(list)
+        self.counters: dict[str, float] = defaultdict(int)
+        self.errors = 0
+
+    def emit(self, event: dict) -> None:
+        event["t"] = round(time.perf_counter() - self.t0, 4)
+        if self.stage_name is not None:
+            event.setdefault("stage", self.stage_name)
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            self._fh.write(line + "\n")
+
+    def end_span(self, name: str, attrs: dict, dur: float) -> None:
+        with self._lock:
+            self.spans[name].append(dur)
+            ticker = attrs.get("ticker")
+            if ticker is not None:
+                if name == "ticker":
+                    self.tickers[ticker] += dur
+                else:
+                    self.ticker_steps[ticker][name] += dur
+            if "error" in attrs:
+                self.errors += 1
+
+    def add_sample(self, name: str, dur: float) -> None:
+        with self._lock:
+            self.timers[name].append(dur)
+
+    def add_count(self, name: str, n: float) -> None:
+        with self._lock:
+            self.counters[name] += n
+
+    def begin_stage(self, name: str | None) -> None:
+        now = time.perf_counter()
+        if self.stage_name is not None:
+            dur = now - self.stage_t0
+            self.stages[self.stage_name] = self.stages.get(self.stage_name, 0.0) + dur
+            self.emit({"ev": "stage_end", "name": self.stage_name, "dur_s": round(dur, 4)})
+        self.stage_name, self.stage_t0 = name, now
+        if name is not None:
+            self.emit({"ev": "stage_start", "name": name})
+
+    def summary(self) -> dict:
+        def _r(x: float) -> float:
+            return round(x, 3)
+
+        latency = {}
+        for name, samples in sorted(self.timers.items()):
+            ordered = sorted(samples)
+            latency[name] = {
+                "n": len(ordered),
+                "p50_ms": round(_percentile(ordered, 0.50) * 1000, 1),
+                "p95_ms": round(_percentile(ordered, 0.95) * 1000, 1),
+                "max_ms": round(ordered[-1] * 1000, 1),
+                "total_s": _r(sum(ordered)),
+            }
+
+        # cache.<名字>.<结果>：hit 占全部结果之比
+        cache: dict[str, dict[str, float]] = defaultdict(dict)
+        for key, n in self.counters.items():
+            parts = key.split(".")
+            if len(parts) == 3 and parts[0] == "cache":
+                cache[parts[1]][parts[2]] = n
+        hit_rates = {}
+        for name, outcomes in sorted(cache.items()):
+            total = sum(outcomes.values())
+            hit_rates[name] = {**outcomes, "hit_rate": round(outcomes.get("hit", 0) / total, 3) if total else None}
+
+        return {
+            "run": self.name,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "wall_s": _r(time.perf_counter() - self.t0),
+            "peak_rss_mb": _peak_rss_mb(),
+            "errors": self.errors,
+            "stages": {k: _r(v) for k, v in self.stages.items()},
+            "tickers": {
+                t: {"wall_s": _r(self.tickers.get(t, 0.0)),
+                    "steps": {k: _r(v) for k, v in self.ticker_steps.get(t, {}).items()}}
+                for t in sorted(set(self.tickers) | set(self.ticker_steps))
+            },
+            "spans": {k: {"n": len(v), "total_s": _r(sum(v))} for k, v in sorted(self.spans.items())},
+            "latency": latency,
+            "cache": hit_rates,
+            "counters": dict(sorted(self.counters.items())),
+            "log": self.log_path.name,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._fh.close()
+
+
+def _prune(log_dir: Path, name: str, keep: int) -> None:
+    logs = sorted(log_dir.glob(f"{name}_*_summary.json"))
+    for old in logs[:-keep] if keep > 0 else []:
+        old.unlink(missing_ok=True)
+        old.with_name(old.name.replace("_summary.json", ".jsonl")).unlink(missing_ok=True)
+
+
+# ==========================================================================
+# 公开接口
+# ==========================================================================
+
+def start_run(name: str = "pipeline", quiet: bool | None = None, log_dir: Path = TELEMETRY_DIR) -> Path:
+    """
+    开始记录一次运行（已有运行时先结束它），返回事件日志路径。
+    quiet=True（命令行 --quiet）打开 quiet 模式；False / None 不覆盖，仍跟随 PIPELINE_QUIET。
+    """
+    global _RUN
+    if quiet:
+        set_quiet(True)
+    with _RUN_LOCK:
+        previous = _RUN
+    if previous is not None:
+        finish_run()
+    run = _Run(name, log_dir)
+    with _RUN_LOCK:
+        _RUN = run
+    run.emit({"ev": "run_start", "name": name, "pid": os.getpid(), "argv": sys.argv, "quiet": is_quiet()})
+    return run.log_path
+
+
+def finish_run() -> Path | None:
+    """结束当前运行：写最终计数器与汇总文件，返回汇总路径；没有进行中的运行时返回 None。"""
+    global _RUN
+    with _RUN_LOCK:
+        run, _RUN = _RUN, None
+    if run is None:
+        return None
+    run.begin_stage(None)
+    summary = run.summary()
+    run.emit({"ev": "counters", "values": summary["counters"]})
+    run.emit({"ev": "run_end", "wall_s": summary["wall_s"], "peak_rss_mb": summary["peak_rss_mb"]})
+    run.close()
+    with open(run.summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    _prune(run.summary_path.parent, run.name, TELEMETRY_KEEP_RUNS)
+    return run.summary_path
+
+
+def stage(name: str) -> None:
+    """进入顺序阶段 name（自动结束上一个阶段）；阶段墙钟时间进入汇总的 stages。"""
+    run = _RUN
+    if run is not None:
+        run.begin_stage(name)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    计时一段嵌套工作。属性沿 span 栈向下继承（外层 ticker=... 让内层步骤自动归到该 ticker），
+    yield 一个 dict，写入其中的字段随 span_end 事件落盘。异常照常抛出，并记为 error。
+    """
+    extra: dict = {}
+    run = _RUN
+    if run is None:
+        yield extra
+        return
+
+    parent = _CURRENT.get()
+    merged = {**parent[1], **attrs} if parent else attrs
+    sid = next(_IDS)
+    token = _CURRENT.set((sid, merged))
+    run.emit({"ev": "span_start", "id": sid, "parent": parent[0] if parent else None, "name": name, **merged})
+    t0 = time.perf_counter()
+    try:
+        yield extra
+    except BaseException as e:
+        extra["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        dur = time.perf_counter() - t0
+        _CURRENT.reset(token)
+        run.end_span(name, {**merged, **extra}, dur)
+        run.emit({"ev": "span_end", "id": sid, "name": name, "dur_s": round(dur, 4), **merged, **extra})
+
+
+@contextmanager
+def timer(name: str, **attrs):
+    """记录一个延迟样本（如一次 vendor 调用）；汇总里按 name 计算 p50/p95/max。失败的调用同样计入。"""
+    run = _RUN
+    if run is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        dur = time.perf_counter() - t0
+        run.add_sample(name, dur)
+        parent = _CURRENT.get()
+        event = {"ev": "timer", "name": name, "dur_s": round(dur, 4), **(parent[1] if parent else {}), **attrs}
+        if error:
+            event["error"] = error
+        run.emit(event)
+
+
+def count(name: str, n: float = 1) -> None:
+    """计数器累加（行数、字节数、缓存命中等）；只在汇总与结束事件里落盘，热路径上不写日志。"""
+    run = _RUN
+    if run is not None:
+        run.add_count(name, n)
@@ -1,11 +1,17 @@
 from __future__ import annotations
 
+import gzip
+import hashlib
+import io
 import sys
+import threading
+import time
+from datetime import datetime, timezone
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
-from flask import Flask, abort, jsonify, redirect, render_template, request, url_for
+from flask import Flask, Response, abort, jsonify, redirect, render_template, request, url_for
 from markupsafe import Markup, escape
 
 # Ensure project root on sys.path so `from config import ...` works when
@@ -14,10 +20,23 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-from webview import data_io, signals  # noqa: E402
+from config import VALUATION_BAND_QUANTILES, VALUATION_BAND_WINDOWS  # noqa: E402
+from processors.valuation_bands import band_column  # noqa: E402
+from webview import data_io, downsample, report_index, signals  # noqa: E402
 
 VALID_RANGES = ("1Y", "3Y", "5Y", "All")
 VALID_TFS = ("daily", "weekly", "monthly")
+VALID_FORMATS = ("columns", "rows")
+VALID_MODES = ("line", "candle")
+
+# 降采样点数上限：再多也超出任何屏幕的像素宽度
+_MAX_POINTS_CAP = 10000
+
+# API 响应压缩：仅压缩这些 mimetype，且体积超过阈值才压（小响应压缩得不偿失）
+_GZIP_MIMETYPES = {"application/json", "application/vnd.apache.arrow.stream"}
+_GZIP_MIN_BYTES = 1024
+_GZIP_LEVEL = 5
+_ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
 
 # Map raw pandas_ta column names → webview/JS friendly keys.
 # Bollinger 列 (BBL_20_2.0_2.0 / BBM / BBU) 因 pandas_ta 后缀重复，按前缀匹配。
@@ -78,6 +97,63 @@ def _df_to_records(df) -> list[dict]:
     return df.to_dict(orient="records")
 
 
+def _df_to_columns(df) -> dict:
+    """
+    Columnar JSON：{"dates": [...], "columns": {name: [...]}}。
+    每列一个数组、日期只出现一次，避免逐行重复 ~30 个 key 字符串；NaN → null。
+    """
+    columns = {}
+    for name in df.columns:
+        values = df[name]
+        if values.dtype.kind == "f":
+            arr = values.to_numpy()
+            columns[name] = np.where(np.isnan(arr), None, arr).tolist()
+        else:
+            columns[name] = values.astype(object).where(values.notna(), None).tolist()
+    return {
+        "dates": df.index.strftime("%Y-%m-%d").tolist() if len(df) else [],
+        "columns": columns,
+    }
+
+
+def _data_version(*paths: Path) -> tuple[str, datetime | None]:
+    """
+    由源文件 mtime 派生 (etag_seed, last_modified)。文件重写（main.py 重跑）即失效；
+    缺失文件按 0 参与计算，保证「无数据」响应同样可被缓存。
+    """
+    mtimes = [data_io.file_mtime(p) for p in paths]
+    seed = "|".join(f"{p.name}:{m or 0:.6f}" for p, m in zip(paths, mtimes))
+    known = [m for m in mtimes if m is not None]
+    last_modified = datetime.fromtimestamp(max(known), tz=timezone.utc) if known else None
+    return seed, last_modified
+
+
+def _etag(seed: str, *parts: str) -> str:
+    return hashlib.sha1("|".join((seed, *parts)).encode("utf-8")).hexdigest()[:20]
+
+
+def _not_modified(etag: str, last_modified: datetime | None) -> bool:
+    """If-None-Match 优先；没有时才看 If-Modified-Since（HTTP 语义）。"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    ims = request.if_modified_since
+    if ims is not None and last_modified is not None:
+        return last_modified.replace(microsecond=0) <= ims
+    return False
+
+
+def _with_validators(resp: Response, etag: str, last_modified: datetime | None) -> Response:
+    resp.set_etag(etag, weak=True)  # weak：gzip 与未压缩表示共享同一 ETag
+    if last_modified is not None:
+        resp.last_modified = last_modified
+    resp.headers["Cache-Control"] = "no-cache"  # 允许缓存，但每次用 ETag 重新验证
+    return resp
+
+
+def _not_modified_response(etag: str, last_modified: datetime | None) -> Response:
+    return _with_validators(Response(status=304), etag, last_modified)
+
+
 def _build_position_meta_html(position: dict | None, generation_date: str | None) -> Markup | None:
     """Compose the sample-style position meta line for the chart page sticky head."""
     if not position:
@@ -103,12 +179,33 @@ def _build_position_meta_html(position: dict | None, generation_date: str | None
     return Markup(f' {sep} '.join(parts))
 
 
-def create_app() -> Flask:
+def create_app(warm: bool = False) -> Flask:
+    """warm=True 时后台线程预热数据缓存（见 data_io.warm_caches），不阻塞启动。"""
     app = Flask(
         __name__,
         template_folder=str(Path(__file__).parent / "templates"),
         static_folder=str(Path(__file__).parent / "static"),
     )
+    if warm:
+        threading.Thread(target=data_io.warm_caches, name="webview-warmup", daemon=True).start()
+
+    @app.after_request
+    def gzip_api_response(resp: Response):
+        if (
+            resp.status_code != 200
+            or resp.direct_passthrough
+            or resp.mimetype not in _GZIP_MIMETYPES
+            or "Content-Encoding" in resp.headers
+            or "gzip" not in request.headers.get("Accept-Encoding", "").lower()
+        ):
+            return resp
+        data = resp.get_data()
+        if len(data) < _GZIP_MIN_BYTES:
+            return resp
+        resp.set_data(gzip.compress(data, compresslevel=_GZIP_LEVEL))
+        resp.headers["Content-Encoding"] = "gzip"
+        resp.vary.add("Accept-Encoding")
+        return resp
 
     @app.context_processor
     def inject_globals():
@@ -118,13 +215,15 @@ def create_app() -> Flask:
 
     @app.route("/")
     def index():
+        risk = data_io.load_portfolio_summary() or {}
         return render_template(
             "index.html",
             active_nav="home",
             reports=data_io.list_reports(),
             tickers=data_io.list_tickers(),
             positions=data_io.load_positions(),
-            summary=(data_io.load_portfolio_summary() or {}).get("portfolio_summary"),
+            summary=risk.get("portfolio_summary"),
+            concentration=risk.get("risk_concentration"),
             parse_date=data_io.parse_report_date,
         )
 
@@ -149,8 +248,7 @@ def create_app() -> Flask:
                     break
         if current is None:
             current = files[0]
-        md_text = data_io.read_report_md(current)
-        html_body = data_io.render_markdown(md_text)
+        html_body = data_io.load_report_html(current)
         return render_template(
             "reports.html",
             active_nav="reports",
@@ -160,6 +258,32 @@ def create_app() -> Flask:
             parse_date=data_io.parse_report_date,
         )
 
+    @app.route("/search")
+    def search():
+        """报告全文检索：q（空格分隔，AND）+ ticker / from / to 过滤。format=json 或 Accept: JSON 时返回 JSON。"""
+        q = (request.args.get("q") or "").strip()
+        ticker = request.args.get("ticker") or None
+        date_from = request.args.get("from") or None
+        date_to = request.args.get("to") or None
+        limit = min(request.args.get("limit", 20, type=int), 100)
+        started = time.perf_counter()
+        hits = report_index.search(q, ticker=ticker, date_from=date_from, date_to=date_to, limit=limit) if q else []
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if request.args.get("format") == "json" or request.accept_mimetypes.best == "application/json":
+            return jsonify({"q": q, "ticker": ticker, "from": date_from, "to": date_to,
+                            "elapsed_ms": round(elapsed_ms, 2), "hits": hits})
+        return render_template(
+            "search.html",
+            active_nav="search",
+            q=q,
+            ticker=ticker,
+            date_from=date_from,
+            date_to=date_to,
+            tickers=data_io.list_tickers(),
+            hits=hits,
+            elapsed_ms=elapsed_ms,
+        )
+
     @app.route("/charts")
     def charts_index():
         tickers = data_io.list_tickers()
@@ -181,17 +305,8 @@ def create_app() -> Flask:
         payload = data_io.load_payload(ticker)
         trend = signals.format_trend(payload, timeframe="daily")
 
-        stage1 = data_io.load_stage1_full(ticker)
-        if stage1 is None:
-            stage1_html = None
-            stage1_source = None
-            stage1_title = None
-        else:
-            md_text, src_path = stage1
-            title, _, body = data_io.split_stage1_head(md_text)
-            stage1_title = title
-            stage1_html = data_io.render_markdown(body)
-            stage1_source = src_path.name
+        stage1 = data_io.load_stage1_html(ticker)
+        stage1_title, stage1_html, stage1_source = stage1 if stage1 else (None, None, None)
 
         position = data_io.get_position(ticker)
         generation_date = (payload or {}).get("meta", {}).get("generation_date")
@@ -209,20 +324,67 @@ def create_app() -> Flask:
             position_meta_html=position_meta_html,
         )
 
-    @app.route("/api/ohlcv/<ticker>")
-    def api_ohlcv(ticker: str):
-        if ticker not in data_io.list_tickers():
-            return jsonify({"error": "unknown ticker"}), 404
+    def _ohlcv_args() -> tuple[str, str, "pd.Timestamp | None", "pd.Timestamp | None"]:
         rng = request.args.get("range", "1Y")
         if rng not in VALID_RANGES:
             rng = "1Y"
         tf = request.args.get("tf", "daily")
         if tf not in VALID_TFS:
             tf = "daily"
-
+        return rng, tf, _parse_date_arg("start"), _parse_date_arg("end")
+
+    def _parse_date_arg(name: str) -> "pd.Timestamp | None":
+        raw = request.args.get(name)
+        if not raw:
+            return None
+        try:
+            return pd.Timestamp(raw[:10])  # Plotly relayout 给的是 "YYYY-MM-DD HH:MM:SS.ffff"
+        except ValueError:
+            return None
+
+    def _ohlcv_frame(ticker: str, rng: str, tf: str, start=None, end=None) -> tuple["pd.DataFrame", list]:
+        """range 切片 → [start, end] 视窗。返回 (视窗 df, range 全量的 [首日, 末日])。"""
         df = data_io.load_technical(ticker, tf)
         df = _slice_range(df, rng)
-        df = _normalize_technical_columns(df)
+        extent = [df.index.min().strftime("%Y-%m-%d"), df.index.max().strftime("%Y-%m-%d")] if len(df) else []
+        if start is not None:
+            df = df.loc[df.index >= start]
+        if end is not None:
+            df = df.loc[df.index <= end]
+        return _normalize_technical_columns(df), extent
+
+    @app.route("/api/ohlcv/<ticker>")
+    def api_ohlcv(ticker: str):
+        """
+        OHLCV + 指标。默认 format=columns（共享 dates 数组 + 每列一个数组）；
+        format=rows 为旧版逐行对象（兼容外部脚本）。ETag/Last-Modified 取自 parquet 与交易流水的 mtime，
+        未变化时直接 304，不读 parquet。
+
+        视窗参数：start/end（YYYY-MM-DD，在 range 内再截取）+ max_points（超出则降采样；
+        mode=line 用 LTTB，mode=candle 用 OHLC 分桶）。前端先按图表宽度拉粗粒度全貌，缩放后按视窗细化。
+        """
+        if ticker not in data_io.list_tickers():
+            return jsonify({"error": "unknown ticker"}), 404
+        rng, tf, start, end = _ohlcv_args()
+        fmt = request.args.get("format", "columns")
+        if fmt not in VALID_FORMATS:
+            fmt = "columns"
+        max_points = request.args.get("max_points", type=int)
+        if max_points is not None:
+            max_points = min(max(max_points, 3), _MAX_POINTS_CAP)
+        mode = request.args.get("mode", "line")
+        if mode not in VALID_MODES:
+            mode = "line"
+        method = "ohlc" if mode == "candle" else "lttb"
+
+        seed, last_modified = _data_version(data_io.technical_path(ticker, tf), data_io.trades_path())
+        etag = _etag(seed, "ohlcv", ticker, rng, tf, fmt, str(start), str(end),
+                     str(max_points), method if max_points else "")
+        if _not_modified(etag, last_modified):
+            return _not_modified_response(etag, last_modified)
+
+        df, extent = _ohlcv_frame(ticker, rng, tf, start, end)
+        source_length = len(df)
 
         ma_periods = _DEFAULT_MA_PERIODS
         if df.empty:
@@ -233,16 +395,61 @@ def create_app() -> Flask:
                 start=df.index.min().to_pydatetime(),
                 end=df.index.max().to_pydatetime(),
             )
-        return jsonify(
-            {
-                "ticker": ticker,
-                "range": rng,
-                "timeframe": tf,
-                "ma_periods": ma_periods,
-                "rows": _df_to_records(df),
-                "trades": trades,
-            }
-        )
+        downsampled = None
+        if max_points is not None and source_length > max_points:
+            df = downsample.downsample(df, max_points, method)
+            downsampled = method
+        body = {
+            "ticker": ticker,
+            "range": rng,
+            "timeframe": tf,
+            "format": fmt,
+            "ma_periods": ma_periods,
+            "extent": extent,
+            "source_length": source_length,
+            "downsampled": downsampled,
+            "trades": trades,
+        }
+        if fmt == "rows":
+            body["rows"] = _df_to_records(df)
+        else:
+            body["length"] = len(df)
+            body.update(_df_to_columns(df))
+        return _with_validators(jsonify(body), etag, last_modified)
+
+    @app.route("/api/ohlcv/<ticker>/arrow")
+    def api_ohlcv_arrow(ticker: str):
+        """
+        同一切片（支持 start/end，不降采样）的 Arrow IPC stream（notebook: pa.ipc.open_stream(resp.content).read_all()，
+        前端: apache-arrow 的 tableFromIPC）。列缓冲可零拷贝映射为 numpy / TypedArray；
+        ticker/range/timeframe/ma_periods 写在 schema metadata 里。
+        """
+        if ticker not in data_io.list_tickers():
+            return jsonify({"error": "unknown ticker"}), 404
+        try:
+            import pyarrow as pa
+        except ImportError:
+            return jsonify({"error": "pyarrow not installed"}), 501
+        rng, tf, start, end = _ohlcv_args()
+
+        seed, last_modified = _data_version(data_io.technical_path(ticker, tf))
+        etag = _etag(seed, "ohlcv.arrow", ticker, rng, tf, str(start), str(end))
+        if _not_modified(etag, last_modified):
+            return _not_modified_response(etag, last_modified)
+
+        df, _ = _ohlcv_frame(ticker, rng, tf, start, end)
+        table = pa.Table.from_pandas(df.reset_index() if not df.empty else df, preserve_index=False)
+        table = table.replace_schema_metadata({
+            "ticker": ticker,
+            "range": rng,
+            "timeframe": tf,
+            "ma_periods": ",".join(str(p) for p in _DEFAULT_MA_PERIODS),
+        })
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        resp = Response(sink.getvalue(), mimetype=_ARROW_MIMETYPE)
+        return _with_validators(resp, etag, last_modified)
 
     @app.route("/api/pe/<ticker>")
     def api_pe(ticker: str):
@@ -259,30 +466,37 @@ def create_app() -> Flask:
         if sliced.empty:
             return jsonify({"available": False, "ticker": ticker, "range": rng, "rows": [], "summary": {}})
 
-        rows = [
-            {
-                "date": d.strftime("%Y-%m-%d"),
-                "close": float(c) if pd.notna(c) else None,
-                "ttm_eps": float(e) if pd.notna(e) else None,
-                "pe": float(p) if pd.notna(p) else None,
-            }
-            for d, c, e, p in sliced[["Close", "EPS_TTM", "PE_TTM"]].itertuples()
-        ]
-        arr = sliced["PE_TTM"].to_numpy(dtype=float)
-        cur_pe = float(arr[-1])
+        # 分位带由 derived_writer 预计算（valuation_bands）：这里只切片 + 序列化
+        bands = {f"p{q}": band_column("PE_TTM", f"P{q}", rng) for q in VALUATION_BAND_QUANTILES}
+        pctl_col = band_column("PE_TTM", "PCTL", rng)
+        frame = sliced[["Close", "EPS_TTM", "PE_TTM", *bands.values()]].astype(float)
+        frame = frame.rename(columns={"Close": "close", "EPS_TTM": "ttm_eps", "PE_TTM": "pe",
+                                      **{col: key for key, col in bands.items()}})
+        frame.index = frame.index.strftime("%Y-%m-%d")
+        rows = frame.reset_index(names="date").replace({np.nan: None}).to_dict(orient="records")
+
+        def _opt(v) -> float | None:
+            return float(v) if pd.notna(v) else None
+
+        last = sliced.iloc[-1]
+        cur_pe = float(last["PE_TTM"])
+        # 与分位带同一窗口的样本（截至最后一个有效 PE 日，向前 N 个交易日）：用于 min/max 与情景分位
+        window_rows = VALUATION_BAND_WINDOWS.get(rng)
+        history = full.loc[:sliced.index[-1], "PE_TTM"]
+        # np.sort 返回新数组：pandas 3 的 to_numpy 可能给出只读视图，原地 sort 会抛 ValueError
+        sample = np.sort((history.iloc[-window_rows:] if window_rows else history).dropna().to_numpy(dtype=float))
         summary = {
             "current": cur_pe,
-            "percentile": float((arr <= cur_pe).mean() * 100.0),
-            "p25": float(np.percentile(arr, 25)),
-            "p50": float(np.percentile(arr, 50)),
-            "p75": float(np.percentile(arr, 75)),
-            "min": float(arr.min()),
-            "max": float(arr.max()),
-            "count": int(arr.size),
+            "percentile": _opt(last[pctl_col]),
+            "p25": _opt(last[bands["p25"]]),
+            "p50": _opt(last[bands["p50"]]),
+            "p75": _opt(last[bands["p75"]]),
+            "min": float(sample[0]),
+            "max": float(sample[-1]),
+            "count": int(sample.size),
         }
 
         # === 当前快照对比（自算 vs yfinance）===
-        last = sliced.iloc[-1]
         current_price = float(last["Close"])
         our_eps_ttm = float(last["EPS_TTM"]) if pd.notna(last["EPS_TTM"]) else None
         info = data_io.load_company_info(ticker)
@@ -292,9 +506,10 @@ def create_app() -> Flask:
         yf_eps = float(yf_eps) if yf_eps else None
 
         def _percentile_of(pe_value: float | None) -> float | None:
+            # sample 已排序：二分查找 ≤ pe_value 的个数，代替逐次全量比较
             if pe_value is None or not np.isfinite(pe_value) or pe_value <= 0:
                 return None
-            return float((arr <= pe_value).mean() * 100.0)
+            return float(np.searchsorted(sample, pe_value, side="right") / sample.size * 100.0)
 
         current = {
             "price": current_price,
@@ -322,8 +537,11 @@ def create_app() -> Flask:
 
         # === 反向目标表：历史 P10/P25/P50/P75/P90 PE → 对应目标价 ===
         targets = []
-        for label, pct_q in [("P10", 10), ("P25", 25), ("P50", 50), ("P75", 75), ("P90", 90)]:
-            target_pe = float(np.percentile(arr, pct_q))
+        for pct_q in VALUATION_BAND_QUANTILES:
+            label = f"P{pct_q}"
+            target_pe = _opt(last[bands[f"p{pct_q}"]])
+            if target_pe is None:
+                continue
             req_price = target_pe * our_eps_ttm if our_eps_ttm and our_eps_ttm > 0 else None
             pct_change = ((req_price - current_price) / current_price * 100.0) if req_price else None
             targets.append({
@@ -357,7 +575,11 @@ def create_app() -> Flask:
     @app.route("/admin/clear-cache", methods=["POST", "GET"])
     def clear_cache():
         data_io.clear_caches()
-        return jsonify({"ok": True})
+        return jsonify({"ok": True, "cache": data_io.cache_stats()})
+
+    @app.route("/admin/cache-stats")
+    def cache_stats():
+        return jsonify(data_io.cache_stats())
 
     return app
 
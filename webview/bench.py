@@ -0,0 +1,108 @@
+"""
+webview/bench.py
+================
+测量「首次打开个股图表」的延迟：对每个 ticker 模拟浏览器首屏的并发请求
+（/charts/<t> 页面 + /api/ohlcv + /api/signals + /api/pe），记录整组完成时间与各端点耗时，
+输出 p50 / p95 / max。每个 ticker 只测一次，即每次都是该 ticker 的冷启动首载。
+
+对照方法（服务器需在每轮之前重启，保证缓存为空）：
+    python -m webview.serve --no-warm   &  python -m webview.bench --label cold
+    python -m webview.serve             &  python -m webview.bench --label warm --wait 30
+
+只依赖标准库，可对任何正在运行的 Web Viewer 实例测量。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+_ENDPOINTS = {
+    "page": "/charts/{t}",
+    "ohlcv": "/api/ohlcv/{t}?range=1Y&tf=daily&mode=line&max_points=750",
+    "signals": "/api/signals/{t}?tf=daily",
+    "pe": "/api/pe/{t}?range=1Y",
+}
+
+
+def _get(url: str, timeout: float) -> float:
+    started = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        resp.read()
+    return time.perf_counter() - started
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    k = (len(ordered) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _discover_tickers(base: str, timeout: float) -> list[str]:
+    # /charts 页面的 ticker 下拉框：<option value="0700.HK"
+    with urllib.request.urlopen(f"{base}/charts", timeout=timeout) as resp:
+        html = resp.read().decode("utf-8", errors="replace")
+    return sorted(set(re.findall(r'<option[^>]*value="([^"]+)"', html)))
+
+
+def first_load_latency(base: str, tickers: list[str], timeout: float = 60.0) -> dict:
+    """每个 ticker 并发发出首屏 4 个请求，返回 {ticker: {endpoint: 秒, "total": 秒}}。"""
+    results: dict[str, dict] = {}
+    with ThreadPoolExecutor(max_workers=len(_ENDPOINTS)) as pool:
+        for t in tickers:
+            started = time.perf_counter()
+            futures = {
+                name: pool.submit(_get, base + path.format(t=quote(t)), timeout)
+                for name, path in _ENDPOINTS.items()
+            }
+            timings = {name: f.result() for name, f in futures.items()}
+            timings["total"] = time.perf_counter() - started
+            results[t] = timings
+    return results
+
+
+def summarize(results: dict) -> dict:
+    out = {}
+    for key in [*_ENDPOINTS, "total"]:
+        values = [r[key] for r in results.values()]
+        out[key] = {
+            "p50_ms": round(statistics.median(values) * 1000, 1),
+            "p95_ms": round(_percentile(values, 0.95) * 1000, 1),
+            "max_ms": round(max(values) * 1000, 1),
+        }
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Web Viewer 首次图表加载延迟基准")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--tickers", nargs="*", help="默认从 /charts 页面发现全部 ticker")
+    parser.add_argument("--wait", type=float, default=0.0, help="开始前等待秒数（留给后台预热）")
+    parser.add_argument("--label", default="run", help="结果标签（如 cold / warm）")
+    parser.add_argument("--out", help="把明细与汇总追加写入该 JSONL 文件")
+    args = parser.parse_args()
+
+    base = args.url.rstrip("/")
+    if args.wait:
+        time.sleep(args.wait)
+    tickers = args.tickers or _discover_tickers(base, 60.0)
+    results = first_load_latency(base, tickers)
+    summary = summarize(results)
+
+    print(f"[{args.label}] {len(tickers)} tickers, first chart load")
+    print(f"{'endpoint':<10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for key, row in summary.items():
+        print(f"{key:<10}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['max_ms']:>10}")
+    if args.out:
+        with open(args.out, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"label": args.label, "url": base, "summary": summary,
+                                "results": results}, ensure_ascii=False) + "\n")
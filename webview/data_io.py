@@ -2,11 +2,11 @@ from __future__ import annotations
 
 import json
 import re
+import time
 from datetime import datetime
-from functools import lru_cache
 from pathlib import Path
 
-import markdown as md
+import numpy as np
 import pandas as pd
 
 from config import (
@@ -17,13 +17,22 @@ from config import (
     LATEST_DIR,
     OHLCV_DIR,
     PORTFOLIO_DIR,
-    SENTIMENT_MASTER_PARQUET,
+    SENTIMENT_ARCHIVE_DIR,
     TRANSACTIONS_DIR,
+    WEBVIEW_CACHE_MAX_BYTES,
 )
+from processors.arrow_mirror import arrow_path, read_frame
+from processors.valuation_bands import add_valuation_bands, band_column
+from webview import report_index
+from webview.file_cache import FileCache, file_cached
 
 REPORT_GLOB = "CLAUDE_staged_*.md"
 
+# 所有加载器共用一个按字节计的缓存；条目随源文件 (mtime, size) 变化自动失效
+CACHE = FileCache(WEBVIEW_CACHE_MAX_BYTES)
 
+
+@file_cached(CACHE, lambda: [FINAL_REPORTS_DIR])
 def list_reports() -> list[Path]:
     files = sorted(FINAL_REPORTS_DIR.glob(REPORT_GLOB), reverse=True)
     return [p for p in files if p.is_file()]
@@ -33,7 +42,9 @@ def read_report_md(path: Path) -> str:
     return path.read_text(encoding="utf-8")
 
 
-def render_markdown(md_text: str) -> str:
+def _render_markdown(md_text: str) -> str:
+    import markdown as md  # 只有报告首次渲染（report_index 缓存未命中）才需要
+
     return md.markdown(
         md_text,
         extensions=["tables", "fenced_code", "toc", "sane_lists"],
@@ -41,6 +52,17 @@ def render_markdown(md_text: str) -> str:
     )
 
 
+def render_markdown(md_text: str, source: Path | None = None) -> str:
+    """渲染结果按文本 sha256 持久化在 report_index 里：同一份报告只渲染一次（跨重启）；source 为来源文件。"""
+    return report_index.render_cached(md_text, _render_markdown, source)
+
+
+@file_cached(CACHE, lambda path: [path])
+def load_report_html(path: Path) -> str:
+    return render_markdown(read_report_md(path), path)
+
+
+@file_cached(CACHE, lambda: [OHLCV_DIR])
 def list_tickers() -> list[str]:
     out: list[str] = []
     for p in sorted(OHLCV_DIR.glob("*_daily.csv")):
@@ -51,7 +73,7 @@ def list_tickers() -> list[str]:
     return out
 
 
-@lru_cache(maxsize=64)
+@file_cached(CACHE, lambda ticker: [OHLCV_DIR / f"{ticker}_daily.csv"])
 def load_ohlcv(ticker: str) -> pd.DataFrame:
     """Raw daily OHLCV — kept for transactions filtering only. Webview chart 走 load_technical。"""
     path = OHLCV_DIR / f"{ticker}_daily.csv"
@@ -66,32 +88,59 @@ def load_ohlcv(ticker: str) -> pd.DataFrame:
     return df[keep].astype(float)
 
 
-@lru_cache(maxsize=64)
+def technical_path(ticker: str, tf: str = "daily") -> Path:
+    return DERIVED_TECHNICAL_DIR / f"{ticker}_{tf}.parquet"
+
+
+def trades_path() -> Path:
+    return TRANSACTIONS_DIR / "transactions_master.csv"
+
+
+def file_mtime(path: Path) -> float | None:
+    """mtime（秒，float）；文件不存在返回 None。用于 API 的 ETag / Last-Modified。"""
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return None
+
+
+def _derived_deps(path: Path) -> list[Path]:
+    return [path, arrow_path(path)]
+
+
+@file_cached(CACHE, lambda ticker, tf="daily": _derived_deps(technical_path(ticker, tf)))
 def load_technical(ticker: str, tf: str = "daily") -> pd.DataFrame:
-    """Read derived/technical/<ticker>_<tf>.parquet。返回空 DataFrame 表示数据缺失。"""
-    path = DERIVED_TECHNICAL_DIR / f"{ticker}_{tf}.parquet"
-    if not path.exists():
-        return pd.DataFrame()
-    return pd.read_parquet(path)
+    """Read derived/technical/<ticker>_<tf>.parquet（优先内存映射 .arrow 镜像）。返回空 DataFrame 表示数据缺失。"""
+    return read_frame(technical_path(ticker, tf))
 
 
-@lru_cache(maxsize=64)
+def valuation_path(ticker: str) -> Path:
+    return DERIVED_VALUATION_DIR / f"{ticker}_daily.parquet"
+
+
+@file_cached(CACHE, lambda ticker: _derived_deps(valuation_path(ticker)))
 def load_valuation(ticker: str) -> pd.DataFrame:
-    """Read derived/valuation/<ticker>_daily.parquet (Close, PE_TTM, PB, PS_TTM, ...)."""
-    path = DERIVED_VALUATION_DIR / f"{ticker}_daily.parquet"
-    if not path.exists():
-        return pd.DataFrame()
-    return pd.read_parquet(path)
+    """Read derived/valuation/<ticker>_daily.parquet (Close, PE_TTM, PB, PS_TTM, 分位带 ...)."""
+    df = read_frame(valuation_path(ticker))
+    # 旧版 parquet（分位带上线前写入）没有分位带列：内存里补算一次，随缓存复用，下次 main.py 重跑即落盘
+    if "PE_TTM" in df.columns and band_column("PE_TTM", "PCTL", "All") not in df.columns:
+        df = add_valuation_bands(df)
+    return df
+
+
+def _sentiment_parts(ticker: str) -> list[Path]:
+    return sorted(SENTIMENT_ARCHIVE_DIR.glob(f"ticker={ticker}/month=*/part-*.parquet"))
+
 
+@file_cached(CACHE, _sentiment_parts)
+def load_sentiment_master(ticker: str) -> pd.DataFrame:
+    """单个 ticker 的舆情归档：只读 ticker=<t> 分区（derived_writer.load_sentiment_archive），不做全量加载。"""
+    from processors.derived_writer import load_sentiment_archive  # 只有读舆情时才需要派生层的写入依赖
 
-@lru_cache(maxsize=1)
-def load_sentiment_master() -> pd.DataFrame:
-    if not SENTIMENT_MASTER_PARQUET.exists():
-        return pd.DataFrame()
-    return pd.read_parquet(SENTIMENT_MASTER_PARQUET)
+    return load_sentiment_archive(ticker)
 
 
-@lru_cache(maxsize=64)
+@file_cached(CACHE, lambda ticker: [FINANCIALS_DIR / f"{ticker}_info.json"])
 def load_company_info(ticker: str) -> dict:
     """yfinance info.json 直读 — 用于 trailingPE/trailingEps 等当前快照字段比对。"""
     path = FINANCIALS_DIR / f"{ticker}_info.json"
@@ -103,7 +152,7 @@ def load_company_info(ticker: str) -> dict:
         return {}
 
 
-@lru_cache(maxsize=64)
+@file_cached(CACHE, lambda ticker: [LATEST_DIR / f"{ticker}_LLM_Payload.json"])
 def load_payload(ticker: str) -> dict | None:
     path = LATEST_DIR / f"{ticker}_LLM_Payload.json"
     if not path.exists():
@@ -114,24 +163,33 @@ def load_payload(ticker: str) -> dict | None:
         return None
 
 
+@file_cached(CACHE, lambda: [LATEST_DIR])
+def _web_prompt_dirs() -> list[Path]:
+    return sorted(LATEST_DIR.glob("web_prompts_*"), reverse=True)
+
+
+# 各 web_prompts_* 目录自身的 mtime：报告生成阶段才创建 stages/，不会改动 LATEST_DIR 的 mtime
+@file_cached(CACHE, lambda: [LATEST_DIR, *_web_prompt_dirs()])
 def find_latest_stages_dir() -> Path | None:
-    candidates = sorted(LATEST_DIR.glob("web_prompts_*"), reverse=True)
-    for d in candidates:
+    for d in _web_prompt_dirs():
         stages = d / "stages"
         if stages.is_dir():
             return stages
     return None
 
 
-def load_stage1_full(ticker: str) -> tuple[str, Path] | None:
-    """Return (markdown_text, source_path) for the ticker's stage1_<TICKER>_full.md, or None."""
+def _stage1_path(ticker: str) -> Path | None:
     stages = find_latest_stages_dir()
     if stages is None:
         return None
     # Ticker like "0700.HK" -> filename uses "0700_HK"
-    safe = ticker.replace(".", "_")
-    path = stages / f"stage1_{safe}_full.md"
-    if not path.exists():
+    return stages / f"stage1_{ticker.replace('.', '_')}_full.md"
+
+
+def load_stage1_full(ticker: str) -> tuple[str, Path] | None:
+    """Return (markdown_text, source_path) for the ticker's stage1_<TICKER>_full.md, or None."""
+    path = _stage1_path(ticker)
+    if path is None or not path.exists():
         return None
     try:
         return path.read_text(encoding="utf-8"), path
@@ -139,6 +197,17 @@ def load_stage1_full(ticker: str) -> tuple[str, Path] | None:
         return None
 
 
+@file_cached(CACHE, lambda ticker: [p for p in [_stage1_path(ticker)] if p is not None])
+def load_stage1_html(ticker: str) -> tuple[str | None, str, str] | None:
+    """(title, rendered_html, source_filename) for the chart page; markdown 渲染结果随文件缓存。"""
+    stage1 = load_stage1_full(ticker)
+    if stage1 is None:
+        return None
+    md_text, src_path = stage1
+    title, _, body = split_stage1_head(md_text)
+    return title, render_markdown(body, src_path), src_path.name
+
+
 def parse_report_date(filename: str) -> str:
     stem = Path(filename).stem
     digits = "".join(ch for ch in stem if ch.isdigit())
@@ -163,13 +232,25 @@ def _normalize_symbol(raw) -> str | None:
     return f"{n:04d}.HK"
 
 
-@lru_cache(maxsize=1)
+@file_cached(CACHE, lambda: [PORTFOLIO_DIR])
+def _latest_positions_file() -> Path | None:
+    files = sorted(PORTFOLIO_DIR.glob("current_positions_*.csv"), reverse=True)
+    return files[0] if files else None
+
+
+def _positions_deps() -> list[Path]:
+    # 目录 mtime 捕获新一天的快照；最新文件本身的签名捕获同日重写
+    latest = _latest_positions_file()
+    return [PORTFOLIO_DIR] + ([latest] if latest else [])
+
+
+@file_cached(CACHE, _positions_deps)
 def load_positions() -> list[dict]:
     """Load most recent current_positions_*.csv, normalize symbols, return list of dicts."""
-    files = sorted(PORTFOLIO_DIR.glob("current_positions_*.csv"), reverse=True)
-    if not files:
+    latest = _latest_positions_file()
+    if latest is None:
         return []
-    df = pd.read_csv(files[0])
+    df = pd.read_csv(latest)
     out: list[dict] = []
     for _, row in df.iterrows():
         sym = _normalize_symbol(row.get("Symbol"))
@@ -203,9 +284,9 @@ def get_position(ticker: str) -> dict | None:
     return None
 
 
-@lru_cache(maxsize=1)
+@file_cached(CACHE, lambda: [trades_path()])
 def load_all_trades() -> pd.DataFrame:
-    path = TRANSACTIONS_DIR / "transactions_master.csv"
+    path = trades_path()
     if not path.exists():
         return pd.DataFrame(columns=["ticker", "Time", "Action", "Quantity", "Price", "amount", "Realized_PnL"])
     df = pd.read_csv(path, parse_dates=["Time"])
@@ -215,11 +296,21 @@ def load_all_trades() -> pd.DataFrame:
     return df
 
 
-def get_trades(ticker: str, start=None, end=None) -> list[dict]:
+@file_cached(CACHE, lambda: [trades_path()])
+def _trade_index() -> dict[str, np.ndarray]:
+    """ticker → load_all_trades() 中的行号（按时间有序）。只存行号，不复制 DataFrame。"""
     df = load_all_trades()
     if df.empty:
+        return {}
+    return {t: np.asarray(rows) for t, rows in df.groupby("ticker", sort=False).indices.items()}
+
+
+def get_trades(ticker: str, start=None, end=None) -> list[dict]:
+    df = load_all_trades()
+    rows = _trade_index().get(ticker)
+    if df.empty or rows is None:
         return []
-    df = df[df["ticker"] == ticker]
+    df = df.iloc[rows]
     if start is not None:
         df = df[df["Time"] >= pd.Timestamp(start)]
     if end is not None:
@@ -238,7 +329,7 @@ def get_trades(ticker: str, start=None, end=None) -> list[dict]:
     return out
 
 
-@lru_cache(maxsize=1)
+@file_cached(CACHE, lambda: [LATEST_DIR / "portfolio_risk.json"])
 def load_portfolio_summary() -> dict | None:
     path = LATEST_DIR / "portfolio_risk.json"
     if not path.exists():
@@ -251,10 +342,10 @@ def load_portfolio_summary() -> dict | None:
 
 def latest_data_date() -> str | None:
     """Date of newest portfolio snapshot (proxy for 'latest data refresh')."""
-    files = sorted(PORTFOLIO_DIR.glob("current_positions_*.csv"), reverse=True)
-    if not files:
+    latest = _latest_positions_file()
+    if latest is None:
         return None
-    digits = "".join(ch for ch in files[0].stem if ch.isdigit())
+    digits = "".join(ch for ch in latest.stem if ch.isdigit())
     if len(digits) == 8:
         try:
             return datetime.strptime(digits, "%Y%m%d").strftime("%Y-%m-%d")
@@ -289,13 +380,48 @@ def split_stage1_head(md_text: str) -> tuple[str | None, str | None, str]:
     return title, meta, body
 
 
+def warm_caches(tickers: list[str] | None = None, log=print) -> dict:
+    """
+    预热：逐 ticker 读取全部周期的技术面、估值、payload 与渲染后的 stage1 HTML，
+    让首个请求不再承担冷读 parquet / 解析 JSON / 渲染 markdown 的开销。单个 ticker 失败不影响其余。
+    """
+    started = time.perf_counter()
+    tickers = list_tickers() if tickers is None else tickers
+    failed: list[str] = []
+    try:
+        report_index.update_index(render=_render_markdown)  # 新报告入索引并预渲染
+    except Exception as e:  # noqa: BLE001
+        log(f"   ⚠️ 报告索引更新失败: {e}")
+    for path in list_reports()[:1]:
+        load_report_html(path)
+    load_positions()
+    load_all_trades()
+    load_portfolio_summary()
+    for ticker in tickers:
+        try:
+            for tf in ("daily", "weekly", "monthly"):
+                load_technical(ticker, tf)
+            load_valuation(ticker)
+            load_payload(ticker)
+            load_stage1_html(ticker)
+        except Exception as e:  # noqa: BLE001 — 预热是尽力而为
+            failed.append(ticker)
+            log(f"   ⚠️ 预热 {ticker} 失败: {e}")
+    summary = {
+        "tickers": len(tickers),
+        "failed": failed,
+        "seconds": round(time.perf_counter() - started, 2),
+        **CACHE.stats(),
+    }
+    log(f"🔥 Web Viewer 缓存预热完成: {summary['tickers']} 只标的, "
+        f"{summary['bytes'] / 1e6:.1f} MB, 耗时 {summary['seconds']}s")
+    return summary
+
+
 def clear_caches() -> None:
-    load_ohlcv.cache_clear()
-    load_technical.cache_clear()
-    load_valuation.cache_clear()
-    load_sentiment_master.cache_clear()
-    load_company_info.cache_clear()
-    load_payload.cache_clear()
-    load_positions.cache_clear()
-    load_portfolio_summary.cache_clear()
-    load_all_trades.cache_clear()
+    """手动清空全部缓存。正常情况下无需调用：条目会随源文件变化自动失效。"""
+    CACHE.invalidate()
+
+
+def cache_stats() -> dict:
+    return CACHE.stats()
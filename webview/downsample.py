@@ -0,0 +1,87 @@
+"""
+webview/downsample.py
+=====================
+图表降采样：15 年日线 ≈ 3,700 根 K 棒，而图表宽度只有 ~1,500 像素，多余的点只增加
+传输体积和 Plotly 渲染时间。两种方法：
+
+  lttb  Largest-Triangle-Three-Buckets，用于折线：每个桶保留与相邻桶构成三角形面积
+        最大的那根，视觉上保留尖峰/深谷。其余列（均线、指标）取同一行，保持对齐。
+  ohlc  固定桶聚合，用于 K 线：Open=首、High=max、Low=min、Close=末，
+        高低点不会被抹掉；指标列取桶内最后一个有效值。
+
+两种方法下 Volume 均按桶求和，总成交量不变。
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+METHODS = ("lttb", "ohlc")
+
+_SUM_COLUMNS = ("Volume",)
+
+
+def lttb_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """返回被保留点的行号（升序，首尾必选）。x 取行号：交易日等间距。"""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # n_out-2 个内部桶：[edges[i], edges[i+1])；首点 0 与末点 n-1 单独成桶
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    out = np.empty(n_out, dtype=int)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo = hi
+        nhi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def _sum_between(values: pd.Series, starts: np.ndarray) -> np.ndarray:
+    """按 [starts[i], starts[i+1]) 分段求和（NaN 当 0）。"""
+    return np.add.reduceat(values.fillna(0).to_numpy(dtype=float), starts)
+
+
+def lttb(df: pd.DataFrame, n_out: int, column: str = "Close") -> pd.DataFrame:
+    if len(df) <= n_out or column not in df.columns:
+        return df
+    # NaN 会让面积比较失效：前后填充仅用于选点，输出仍是原值
+    y = df[column].ffill().bfill().to_numpy(dtype=float)
+    idx = lttb_indices(y, n_out)
+    out = df.iloc[idx].copy()
+    for col in _SUM_COLUMNS:
+        if col in df.columns:
+            # 成交量归到被选中的点：覆盖从它到下一个选中点之前的全部 K 棒（idx[0] 恒为 0）
+            out[col] = _sum_between(df[col], idx)
+    return out
+
+
+def ohlc(df: pd.DataFrame, n_out: int) -> pd.DataFrame:
+    n = len(df)
+    if n <= n_out or n_out < 1:
+        return df
+    bucket = (np.arange(n) * n_out) // n
+    agg = {col: "last" for col in df.columns}
+    agg.update({k: v for k, v in (("Open", "first"), ("High", "max"), ("Low", "min")) if k in df.columns})
+    agg.update({col: "sum" for col in _SUM_COLUMNS if col in df.columns})
+    out = df.groupby(bucket, sort=True).agg(agg)
+    # 桶的日期取桶内最后一根：最新一根 K 棒与未降采样时对齐
+    ends = np.r_[np.flatnonzero(np.diff(bucket)), n - 1]
+    out.index = df.index[ends]
+    return out[df.columns]
+
+
+def downsample(df: pd.DataFrame, max_points: int, method: str = "lttb") -> pd.DataFrame:
+    if method == "ohlc":
+        return ohlc(df, max_points)
+    return lttb(df, max_points)
@@ -0,0 +1,130 @@
+"""
+webview/file_cache.py
+=====================
+文件变更感知的进程内缓存（data_io 各加载器共用）。
+
+每个缓存条目记录其源文件（或目录）的 (mtime_ns, size) 签名；每次访问先 stat 一遍
+依赖路径（微秒级），签名不变直接返回，变了才重新加载该条目 —— main.py 重跑后
+viewer 自动看到新数据，无需手动 /admin/clear-cache。
+
+依赖为目录时，签名取目录自身的 mtime：目录内增删文件（含原子 rename 写入）即失效，
+适合 list_tickers / list_reports 这类「只关心文件清单」的加载器，避免每次请求 glob。
+
+总内存按字节计（DataFrame 取 memory_usage(deep=True)，其余对象递归估算），
+超过 WEBVIEW_CACHE_MAX_BYTES 时按 LRU 逐出；单个条目大于上限时不缓存。
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+from collections import OrderedDict
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+Signature = tuple
+
+
+def _stat_signature(paths: Iterable[Path]) -> Signature:
+    sig = []
+    for p in paths:
+        try:
+            st = p.stat()
+            sig.append((str(p), st.st_mtime_ns, st.st_size))
+        except OSError:
+            sig.append((str(p), None, None))  # 文件缺失也是一种状态：出现后即失效
+    return tuple(sig)
+
+
+def sizeof(obj: Any) -> int:
+    """估算对象占用字节数。DataFrame/Series 用 pandas 自带的 deep 统计。"""
+    if hasattr(obj, "memory_usage") and hasattr(obj, "index"):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    if hasattr(obj, "nbytes"):  # numpy array
+        return int(obj.nbytes)
+    if isinstance(obj, (str, bytes)):
+        return sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(sizeof(k) + sizeof(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(sizeof(v) for v in obj)
+    return sys.getsizeof(obj)
+
+
+class FileCache:
+    """按字节上限的 LRU；条目 = key → (依赖签名, 值, 字节数)。线程安全（Flask threaded）。"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, tuple[Signature, Any, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple, paths: Iterable[Path], loader: Callable[[], Any]) -> Any:
+        sig = _stat_signature(paths)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == sig:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # 加载放在锁外：慢的 parquet 读取不阻塞其他 ticker 的命中
+        value = loader()
+        nbytes = sizeof(value)
+        with self._lock:
+            self._drop(key)
+            if nbytes <= self.max_bytes:
+                self._entries[key] = (sig, value, nbytes)
+                self._bytes += nbytes
+                while self._bytes > self.max_bytes:
+                    self._drop(next(iter(self._entries)))
+                    self.evictions += 1
+        return value
+
+    def _drop(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def invalidate(self, namespace: str | None = None) -> None:
+        """清空全部条目，或只清 key[0] == namespace 的条目（即某个加载函数）。"""
+        with self._lock:
+            for key in [k for k in self._entries if namespace is None or k[0] == namespace]:
+                self._drop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def file_cached(cache: FileCache, depends_on: Callable[..., Iterable[Path]]):
+    """
+    装饰器：用 depends_on(*args, **kwargs) 给出的路径签名缓存函数结果。
+    保留 fn.cache_clear()，与原 lru_cache 接口兼容。
+    """
+    def decorator(fn):
+        namespace = fn.__qualname__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (namespace, args, tuple(sorted(kwargs.items())))
+            return cache.get(key, depends_on(*args, **kwargs), lambda: fn(*args, **kwargs))
+
+        wrapper.cache_clear = lambda: cache.invalidate(namespace)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,363 @@
+"""
+webview/report_index.py
+=======================
+报告的 HTML 预渲染缓存 + 全文检索倒排索引（同一个 SQLite 文件，data/cache/report_index.sqlite）。
+
+1. 预渲染：render_cached(md_text, render, source) 以 markdown 文本的 sha256 为键持久化渲染结果，
+   同一份报告只渲染一次，重启 viewer 也不再重渲染（数万字的 CLAUDE_staged_*.md 渲染是页面最大开销）。
+   每个来源文件只保留最新一份渲染；update_index() 顺带清掉来源已不在索引里的渲染，缓存不会无限增长。
+
+2. 检索：索引 final_reports/CLAUDE_staged_*.md 与 latest/web_prompts_*/stages/stage1_*_full.md。
+   - 按标题 + 段落切块，每块记录所属 ticker（块所在章节标题里的 0700.HK 之类，否则取文件级 ticker）与日期；
+   - 分词：中文按字二元组（bigram），另在块末追加单字（unigram），英文/数字按词小写；
+     存入 FTS5（unicode61 只按空白切分预分好的词）；
+   - 查询：每个查询词转为其 bigram 的短语匹配（要求相邻，避免「腾讯」「控股」分散命中），
+     单字查询词（如「涨」）命中单字 token；词间 AND；
+     按 FTS5 bm25 排序，结果带高亮片段；
+   - 增量：update_index() 先比对 (mtime_ns, size)，变了再比 sha256，只重建变化文件的块，删除已消失的文件。
+
+公开接口：
+    render_cached(md_text, render, source=None)             -> str
+    update_index(render=None)                               -> dict   # {"indexed", "removed", "unchanged", "pruned"}
+    search(q, ticker=None, date_from=None, date_to=None, limit=20) -> list[dict]
+    tokenize(text, unigrams=False)                          -> list[str]
+
+CLI：
+    python -m webview.report_index --rebuild
+    python -m webview.report_index --search "回购 0700"
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import html
+import re
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from config import FINAL_REPORTS_DIR, LATEST_DIR, REPORT_INDEX_DB  # noqa: E402
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS docs (
+        path      TEXT PRIMARY KEY,
+        sha       TEXT NOT NULL,
+        mtime_ns  INTEGER NOT NULL,
+        size      INTEGER NOT NULL,
+        kind      TEXT NOT NULL,
+        ticker    TEXT,
+        date      TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rendered (
+        sha     TEXT PRIMARY KEY,
+        html    TEXT NOT NULL,
+        source  TEXT
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(
+        tokens,
+        path UNINDEXED, ticker UNINDEXED, date UNINDEXED, heading UNINDEXED, text UNINDEXED,
+        tokenize = 'unicode61'
+    )
+    """,
+)
+
+# 表结构 / 分词方式变更时递增：旧库整体重建（索引与渲染缓存都可再生）
+_SCHEMA_VERSION = 2
+
+# 两次增量扫描的最小间隔：/search 每次都会触发，避免高频请求反复 stat 全部文件
+_REFRESH_INTERVAL = 10.0
+_CHUNK_CHARS = 600
+_SNIPPET_RADIUS = 60
+
+_TOKEN_RE = re.compile(r"[一-鿿]+|[A-Za-z0-9]+")
+_TICKER_RE = re.compile(r"\b(\d{4,5}\.HK)\b", re.IGNORECASE)
+_HEADING_RE = re.compile(r"^#{1,4}\s+(.+?)\s*$")
+_STAGE1_RE = re.compile(r"stage1_(.+)_full$")
+_DATE_RE = re.compile(r"(\d{8})")
+
+
+def tokenize(text: str, unigrams: bool = False) -> list[str]:
+    """
+    中文连续字串 → 字 bigram（单字保留原字）；英文/数字 → 小写整词。
+    unigrams=True（建索引用）时把多字串里的每个单字追加在末尾：单字查询可命中，又不打断 bigram 短语的相邻关系。
+    """
+    tokens: list[str] = []
+    singles: list[str] = []
+    for m in _TOKEN_RE.finditer(text):
+        s = m.group().lower()
+        if "一" <= s[0] <= "鿿":
+            if len(s) == 1:
+                tokens.append(s)
+            else:
+                tokens.extend(s[i:i + 2] for i in range(len(s) - 1))
+                if unigrams:
+                    singles.extend(s)
+        else:
+            tokens.append(s)
+    return tokens + singles
+
+
+def _fts_query(q: str) -> str:
+    """每个空白分隔的查询词 → 其 token 的短语；词间隐式 AND。token 仅含字母数字/汉字，无需转义。"""
+    phrases = []
+    for term in q.split():
+        toks = tokenize(term)
+        if toks:
+            phrases.append('"' + " ".join(toks) + '"')
+    return " ".join(phrases)
+
+
+# ---------------------------------------------------------------------------
+# SQLite 连接（单进程多线程共享，写操作串行化；多 worker 进程靠 WAL + busy_timeout）
+# ---------------------------------------------------------------------------
+
+_conn: sqlite3.Connection | None = None
+_lock = threading.Lock()
+_last_refresh = 0.0
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        REPORT_INDEX_DB.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(REPORT_INDEX_DB, check_same_thread=False, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        if conn.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+            for table in ("docs", "rendered", "chunks"):
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        for stmt in _SCHEMA:
+            conn.execute(stmt)
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def render_cached(md_text: str, render: Callable[[str], str], source: Path | None = None) -> str:
+    """按文本 sha256 取持久化的渲染结果；未命中时渲染并落库。source 为来源文件：同一来源的旧渲染随之删除。"""
+    sha = hashlib.sha256(md_text.encode("utf-8")).hexdigest()
+    with _lock:
+        row = _db().execute("SELECT html FROM rendered WHERE sha = ?", (sha,)).fetchone()
+    if row is not None:
+        return row[0]
+    out = render(md_text)
+    with _lock:
+        if source is not None:
+            _db().execute("DELETE FROM rendered WHERE source = ?", (str(source),))
+        _db().execute("INSERT OR REPLACE INTO rendered VALUES (?, ?, ?)",
+                      (sha, out, str(source) if source is not None else None))
+        _db().commit()
+    return out
+
+
+# ---------------------------------------------------------------------------
+# 索引构建
+# ---------------------------------------------------------------------------
+
+def _candidate_files() -> list[tuple[Path, str]]:
+    files = [(p, "final") for p in FINAL_REPORTS_DIR.glob("CLAUDE_staged_*.md")]
+    files += [(p, "stage1") for p in LATEST_DIR.glob("web_prompts_*/stages/stage1_*_full.md")]
+    return files
+
+
+def _doc_meta(path: Path, kind: str) -> tuple[str | None, str | None]:
+    """(ticker, YYYY-MM-DD)。stage1 文件名含 ticker（0700_HK → 0700.HK），日期取 web_prompts_YYYYMMDD。"""
+    ticker = None
+    if kind == "stage1":
+        m = _STAGE1_RE.search(path.stem)
+        if m:
+            ticker = m.group(1).replace("_", ".")
+    source = path.name if kind == "final" else path.parent.parent.name
+    m = _DATE_RE.search(source)
+    date = f"{m.group(1)[:4]}-{m.group(1)[4:6]}-{m.group(1)[6:]}" if m else None
+    return ticker, date
+
+
+def _chunks(md_text: str, doc_ticker: str | None):
+    """按标题与空行切块，合并短段落到 ~_CHUNK_CHARS。产出 (heading, ticker, text)。"""
+    heading, section_ticker = "", doc_ticker
+    buf: list[str] = []
+
+    def flush():
+        text = "\n".join(buf).strip()
+        buf.clear()
+        if text:
+            yield heading, section_ticker, text
+
+    for para in re.split(r"\n\s*\n", md_text):
+        first = para.strip().splitlines()[0] if para.strip() else ""
+        h = _HEADING_RE.match(first)
+        if h:
+            yield from flush()
+            heading = h.group(1)
+            m = _TICKER_RE.search(heading)
+            if m:
+                section_ticker = m.group(1).upper()
+            elif first.startswith("# ") or first.startswith("## "):
+                section_ticker = doc_ticker  # 新的大章节且标题不含 ticker：回到文件级 ticker
+        buf.append(para)
+        if sum(len(b) for b in buf) >= _CHUNK_CHARS:
+            yield from flush()
+    yield from flush()
+
+
+def _index_file(conn: sqlite3.Connection, path: Path, kind: str, sha: str, st) -> None:
+    md_text = path.read_text(encoding="utf-8")
+    ticker, date = _doc_meta(path, kind)
+    conn.execute("DELETE FROM chunks WHERE path = ?", (str(path),))
+    conn.executemany(
+        "INSERT INTO chunks (tokens, path, ticker, date, heading, text) VALUES (?, ?, ?, ?, ?, ?)",
+        [(" ".join(tokenize(heading + "\n" + text, unigrams=True)), str(path), t, date, heading, text)
+         for heading, t, text in _chunks(md_text, ticker)],
+    )
+    conn.execute("INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                 (str(path), sha, st.st_mtime_ns, st.st_size, kind, ticker, date))
+
+
+def update_index(render: Callable[[str], str] | None = None) -> dict:
+    """
+    增量更新：(mtime, size) 未变的文件跳过；内容 sha 未变只刷新 stat；消失的文件删除其块。
+    有文件变化时顺带删除不再属于任何已索引文件的渲染缓存。
+    """
+    global _last_refresh
+    stats = {"indexed": 0, "removed": 0, "unchanged": 0, "pruned": 0}
+    files = _candidate_files()
+    with _lock:
+        conn = _db()
+        known = {row[0]: row[1:] for row in conn.execute("SELECT path, sha, mtime_ns, size FROM docs")}
+    for path, kind in files:
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        prev = known.get(str(path))
+        if prev is not None and prev[1] == st.st_mtime_ns and prev[2] == st.st_size:
+            stats["unchanged"] += 1
+            continue
+        sha = hashlib.sha256(path.read_bytes()).hexdigest()
+        with _lock:
+            if prev is not None and prev[0] == sha:
+                conn.execute("UPDATE docs SET mtime_ns = ?, size = ? WHERE path = ?",
+                             (st.st_mtime_ns, st.st_size, str(path)))
+                stats["unchanged"] += 1
+            else:
+                _index_file(conn, path, kind, sha, st)
+                stats["indexed"] += 1
+            conn.commit()
+        if render is not None and kind == "final" and (prev is None or prev[0] != sha):
+            # 新报告落地即预渲染，首次打开不再等待
+            render_cached(path.read_text(encoding="utf-8"), render, source=path)
+    gone = set(known) - {str(p) for p, _ in files}
+    if gone:
+        with _lock:
+            for p in gone:
+                conn.execute("DELETE FROM chunks WHERE path = ?", (p,))
+                conn.execute("DELETE FROM docs WHERE path = ?", (p,))
+            conn.commit()
+        stats["removed"] = len(gone)
+    if stats["indexed"] or stats["removed"]:
+        with _lock:
+            stats["pruned"] = conn.execute(
+                "DELETE FROM rendered WHERE "
+                "(source IS NULL AND sha NOT IN (SELECT sha FROM docs)) "
+                "OR (source IS NOT NULL AND source NOT IN (SELECT path FROM docs))"
+            ).rowcount
+            conn.commit()
+    _last_refresh = time.monotonic()
+    return stats
+
+
+def _ensure_fresh() -> None:
+    if time.monotonic() - _last_refresh >= _REFRESH_INTERVAL:
+        update_index()
+
+
+# ---------------------------------------------------------------------------
+# 查询
+# ---------------------------------------------------------------------------
+
+def _snippet(text: str, terms: list[str]) -> str:
+    """以第一个命中词为中心截取 ±_SNIPPET_RADIUS 字，HTML 转义后用 <mark> 高亮全部查询词。"""
+    lower = text.lower()
+    hits = [lower.find(t.lower()) for t in terms if t and lower.find(t.lower()) >= 0]
+    center = min(hits) if hits else 0
+    start = max(0, center - _SNIPPET_RADIUS)
+    end = min(len(text), center + _SNIPPET_RADIUS * 2)
+    out = html.escape(text[start:end].replace("\n", " "))
+    for t in sorted({t for t in terms if t}, key=len, reverse=True):
+        out = re.sub(re.escape(html.escape(t)), lambda m: f"<mark>{m.group()}</mark>", out, flags=re.IGNORECASE)
+    return ("…" if start > 0 else "") + out + ("…" if end < len(text) else "")
+
+
+def search(q: str, ticker: str | None = None, date_from: str | None = None,
+           date_to: str | None = None, limit: int = 20) -> list[dict]:
+    """bm25 排序的块级结果。ticker 精确匹配（块级），date_from/date_to 为 YYYY-MM-DD 闭区间。"""
+    match = _fts_query(q)
+    if not match:
+        return []
+    _ensure_fresh()
+    sql = ("SELECT c.path, c.ticker, c.date, c.heading, c.text, bm25(chunks) AS score, d.kind "
+           "FROM chunks c JOIN docs d ON d.path = c.path WHERE chunks MATCH ?")
+    params: list = [match]
+    if ticker:
+        sql += " AND c.ticker = ?"
+        params.append(ticker.upper())
+    if date_from:
+        sql += " AND c.date >= ?"
+        params.append(date_from)
+    if date_to:
+        sql += " AND c.date <= ?"
+        params.append(date_to)
+    sql += " ORDER BY score LIMIT ?"
+    params.append(limit)
+    with _lock:
+        rows = _db().execute(sql, params).fetchall()
+    terms = q.split()
+    return [
+        {
+            "file": Path(path).name,
+            "kind": kind,
+            "ticker": t,
+            "date": date,
+            "heading": heading,
+            "snippet": _snippet(text, terms),
+            "score": round(-score, 3),  # bm25() 越小越相关，取反便于阅读
+        }
+        for path, t, date, heading, text, score, kind in rows
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="报告全文索引")
+    parser.add_argument("--rebuild", action="store_true", help="清空后全量重建")
+    parser.add_argument("--search", metavar="Q")
+    parser.add_argument("--ticker")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        with _lock:
+            _db().execute("DELETE FROM chunks")
+            _db().execute("DELETE FROM docs")
+            _db().commit()
+    started = time.perf_counter()
+    print(f"📚 索引更新: {update_index()} ({time.perf_counter() - started:.2f}s)")
+    if args.search:
+        started = time.perf_counter()
+        hits = search(args.search, ticker=args.ticker)
+        print(f"🔎 {len(hits)} 条结果 ({(time.perf_counter() - started) * 1000:.1f} ms)")
+        for h in hits:
+            print(f"  [{h['score']:.2f}] {h['date']} {h['ticker'] or '-'} {h['file']} § {h['heading']}")
+            print(f"      {re.sub('</?mark>', '', h['snippet'])}")
@@ -0,0 +1,88 @@
+"""
+webview/serve.py
+================
+生产模式启动 Web Viewer（main.py 第六阶段也走这里）。
+
+服务器按可用性选择：
+    workers > 1 且 gunicorn 可用（POSIX） → gunicorn 多进程 × gthread 线程
+    waitress 可用                          → waitress 多线程（Windows 也可用）
+    否则                                   → werkzeug threaded（Flask 自带，至少不再单线程）
+
+warm=True 时每个 worker 启动后在后台线程预热缓存（data_io.warm_caches）。
+多 worker 下派生时序通过 .arrow 镜像 memory-map 读取，各进程共享 OS page cache，
+不会每个进程各持一份完整 DataFrame 副本。
+
+Usage:
+    python -m webview.serve                       # 默认 127.0.0.1:5000, 8 线程, 预热
+    python -m webview.serve --workers 4           # gunicorn 4 进程
+    python -m webview.serve --no-warm             # 关闭预热（基准对照）
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from config import WEBVIEW_HOST, WEBVIEW_PORT, WEBVIEW_THREADS, WEBVIEW_WORKERS  # noqa: E402
+from webview.app import create_app  # noqa: E402
+
+
+def _serve_gunicorn(host: str, port: int, workers: int, threads: int, warm: bool) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class _App(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("preload_app", False)  # 每个 worker 自建 app → 各自预热
+
+        def load(self):
+            return create_app(warm=warm)
+
+    print(f"🌐 Web Viewer (gunicorn {workers} workers × {threads} threads): http://{host}:{port}")
+    _App().run()
+
+
+def serve(
+    host: str = WEBVIEW_HOST,
+    port: int = WEBVIEW_PORT,
+    threads: int = WEBVIEW_THREADS,
+    workers: int = WEBVIEW_WORKERS,
+    warm: bool = True,
+) -> None:
+    """阻塞运行 Web Viewer，直到 Ctrl-C。"""
+    if workers > 1 and os.name == "posix":
+        try:
+            _serve_gunicorn(host, port, workers, threads, warm)
+            return
+        except ImportError:
+            print("   ⚠️ 未安装 gunicorn，多进程模式不可用，改用单进程多线程")
+
+    app = create_app(warm=warm)
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        print(f"🌐 Web Viewer (werkzeug threaded): http://{host}:{port}")
+        app.run(host=host, port=port, debug=False, threaded=True, use_reloader=False)
+        return
+    print(f"🌐 Web Viewer (waitress × {threads} threads): http://{host}:{port}")
+    waitress_serve(app, host=host, port=port, threads=threads)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Web Viewer 生产模式启动")
+    parser.add_argument("--host", default=WEBVIEW_HOST)
+    parser.add_argument("--port", type=int, default=WEBVIEW_PORT)
+    parser.add_argument("--threads", type=int, default=WEBVIEW_THREADS, help="每个进程的处理线程数")
+    parser.add_argument("--workers", type=int, default=WEBVIEW_WORKERS, help="进程数（>1 需要 gunicorn，仅 POSIX）")
+    parser.add_argument("--no-warm", action="store_true", help="启动时不预热数据缓存")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.threads, args.workers, warm=not args.no_warm)
@@ -5,13 +5,52 @@ import { render, renderPE } from './plot.js';
 import { state } from './state.js';
 import { renderTrend } from './trend.js';
 
+// Points requested per chart: ~1 per 2px for lines, ~1 per 5px for candles
+// (narrower candles are unreadable anyway). The server downsamples above this.
+function maxPoints() {
+  const el = document.getElementById('chart');
+  const width = (el && el.clientWidth) || 1500;
+  return Math.max(100, Math.round(width / (state.mode === 'candle' ? 5 : 2)));
+}
+
+function ohlcvUrl() {
+  const params = new URLSearchParams({
+    range: state.range,
+    tf: state.tf,
+    mode: state.mode,
+    max_points: String(maxPoints()),
+  });
+  if (state.window) {
+    params.set('start', state.window.start);
+    params.set('end', state.window.end);
+  }
+  return `/api/ohlcv/${encodeURIComponent(state.ticker)}?${params}`;
+}
+
+function applyOhlcv(data) {
+  state.series = {
+    dates: data.dates || [],
+    columns: data.columns || {},
+    length: data.length || 0,
+    sourceLength: data.source_length || 0,
+    downsampled: data.downsampled || null,
+  };
+  state.trades = data.trades || [];
+  if (Array.isArray(data.ma_periods) && data.ma_periods.length) {
+    state.maPeriods = data.ma_periods;
+  }
+}
+
+// Bumped per OHLCV request so a slow response for an old viewport is dropped.
+let ohlcvSeq = 0;
+
 export async function fetchData() {
   if (!state.ticker) return;
   setStatus('加载中…');
+  const seq = ++ohlcvSeq;
   try {
-    const qs = `range=${encodeURIComponent(state.range)}&tf=${encodeURIComponent(state.tf)}`;
     const requests = [
-      fetch(`/api/ohlcv/${encodeURIComponent(state.ticker)}?${qs}`),
+      fetch(ohlcvUrl()),
       fetch(`/api/signals/${encodeURIComponent(state.ticker)}?tf=${encodeURIComponent(state.tf)}`),
     ];
     if (state.showPE) {
@@ -24,12 +63,10 @@ export async function fetchData() {
 
     if (!ohlcvRes.ok) throw new Error('OHLCV HTTP ' + ohlcvRes.status);
     const data = await ohlcvRes.json();
-    state.rows = data.rows || [];
-    state.trades = data.trades || [];
-    if (Array.isArray(data.ma_periods) && data.ma_periods.length) {
-      state.maPeriods = data.ma_periods;
+    if (seq === ohlcvSeq) {
+      applyOhlcv(data);
+      render();
     }
-    render();
 
     if (signalsRes.ok) {
       const trend = await signalsRes.json();
@@ -60,6 +97,22 @@ export async function fetchData() {
   }
 }
 
+// Viewport refinement: refetch only OHLCV for state.window at full chart resolution.
+export async function fetchWindow() {
+  if (!state.ticker) return;
+  const seq = ++ohlcvSeq;
+  try {
+    const res = await fetch(ohlcvUrl());
+    if (!res.ok) throw new Error('OHLCV HTTP ' + res.status);
+    const data = await res.json();
+    if (seq !== ohlcvSeq) return;
+    applyOhlcv(data);
+    render();
+  } catch (e) {
+    setStatus('加载失败：' + e.message);
+  }
+}
+
 export async function fetchPE() {
   if (!state.ticker) return;
   try {
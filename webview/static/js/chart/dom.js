@@ -9,9 +9,11 @@ export function escapeHtml(s) {
     .replace(/'/g, '&#39;');
 }
 
-// Extract one column from an array of row objects, normalizing undefined → null.
-export function col(rows, key) {
-  return rows.map((r) => (r[key] === null || r[key] === undefined ? null : r[key]));
+// Column accessor for the columnar OHLCV payload ({dates, columns, length}).
+// A column the server did not send comes back as an all-null array.
+export function col(series, key) {
+  if (key === 'Date') return series.dates;
+  return series.columns[key] || new Array(series.length).fill(null);
 }
 
 export function setStatus(msg) {
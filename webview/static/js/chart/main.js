@@ -1,6 +1,6 @@
 // Entry point: read window.__TICKER__, wire toolbar events, kick off first fetch.
-import { fetchData, fetchPE } from './api.js';
-import { render, resize, renderPE } from './plot.js';
+import { fetchData, fetchPE, fetchWindow } from './api.js';
+import { render, resize, renderPE, setRelayoutHandler } from './plot.js';
 import { state } from './state.js';
 
 function exclusiveActivate(group, btn) {
@@ -39,15 +39,44 @@ function togglePE() {
   }
 }
 
+// Zoom/pan → refetch the visible window at full resolution; double-click
+// (autorange) → back to the coarse whole-range view. Debounced so a drag
+// issues one request.
+let zoomTimer = null;
+
+function onRelayout(ev) {
+  let next;
+  if (ev['xaxis.autorange']) {
+    next = null;
+  } else if (ev['xaxis.range[0]'] != null && ev['xaxis.range[1]'] != null) {
+    next = { start: String(ev['xaxis.range[0]']).slice(0, 10), end: String(ev['xaxis.range[1]']).slice(0, 10) };
+  } else if (Array.isArray(ev['xaxis.range'])) {
+    next = { start: String(ev['xaxis.range'][0]).slice(0, 10), end: String(ev['xaxis.range'][1]).slice(0, 10) };
+  } else {
+    return;  // y-axis / legend / shape changes don't affect the data window
+  }
+  clearTimeout(zoomTimer);
+  zoomTimer = setTimeout(() => {
+    state.window = next;
+    fetchWindow();
+  }, 250);
+}
+
+function resetWindowAndFetch() {
+  state.window = null;
+  fetchData();
+}
+
 function init() {
   state.ticker = window.__TICKER__;
   if (!state.ticker) return;
 
-  // Server-side change (refetch)
-  wireButtonGroup('#tf-buttons', 'tf', 'tf');
-  wireButtonGroup('#range-buttons', 'range', 'range');
-  // Client-only change (just re-render existing rows)
-  wireButtonGroup('#mode-buttons', 'mode', 'mode', { onChange: render });
+  // Server-side change (refetch); a new tf/range drops any zoom window
+  wireButtonGroup('#tf-buttons', 'tf', 'tf', { onChange: resetWindowAndFetch });
+  wireButtonGroup('#range-buttons', 'range', 'range', { onChange: resetWindowAndFetch });
+  // Mode picks the downsampling method (LTTB vs OHLC buckets), so it refetches too
+  wireButtonGroup('#mode-buttons', 'mode', 'mode', { onChange: fetchWindow });
+  setRelayoutHandler(onRelayout);
 
   wireCheckbox('bb-toggle', 'showBB');
   wireCheckbox('ma-toggle', 'showMA');
@@ -56,7 +85,7 @@ function init() {
   window.addEventListener('resize', resize);
   // Re-paint chart when theme toggles so colors match the new palette.
   document.addEventListener('themechange', () => {
-    if (state.rows.length) render();
+    if (state.series.length) render();
     if (state.showPE && state.peRows.length) renderPE();
   });
 
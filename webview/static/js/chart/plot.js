@@ -80,10 +80,10 @@ function pushTradeTrace(traces, items, label, color, hoverFontColor, includePnl)
 }
 
 function buildTraces(C) {
-  const rows = state.rows;
-  if (!rows.length) return [];
-  const dates = col(rows, 'Date');
-  const close = col(rows, 'Close');
+  const series = state.series;
+  if (!series.length) return [];
+  const dates = col(series, 'Date');
+  const close = col(series, 'Close');
   const traces = [];
 
   // --- Price (line OR candlestick) ---
@@ -96,9 +96,9 @@ function buildTraces(C) {
   } else {
     traces.push({
       x: dates,
-      open: col(rows, 'Open'),
-      high: col(rows, 'High'),
-      low: col(rows, 'Low'),
+      open: col(series, 'Open'),
+      high: col(series, 'High'),
+      low: col(series, 'Low'),
       close: close,
       type: 'candlestick',
       name: 'OHLC',
@@ -112,9 +112,9 @@ function buildTraces(C) {
   if (state.showMA) {
     state.maPeriods.forEach((p, i) => {
       const key = `ma${p}`;
-      if (rows.some((r) => r[key] != null)) {
+      if (col(series, key).some((v) => v != null)) {
         traces.push({
-          x: dates, y: col(rows, key), type: 'scatter', mode: 'lines',
+          x: dates, y: col(series, key), type: 'scatter', mode: 'lines',
           name: `MA${p}`, line: { color: maColors[i % maColors.length], width: 1.1 },
           hovertemplate: `MA${p} %{y:.2f}<extra></extra>`,
         });
@@ -125,12 +125,12 @@ function buildTraces(C) {
   // --- Bollinger Bands ---
   if (state.showBB) {
     traces.push({
-      x: dates, y: col(rows, 'bb_upper'), type: 'scatter', mode: 'lines',
+      x: dates, y: col(series, 'bb_upper'), type: 'scatter', mode: 'lines',
       name: 'BB Upper', line: { color: C.fg2, width: 1, dash: 'dot' },
       hovertemplate: 'BB Upper %{y:.2f}<extra></extra>',
     });
     traces.push({
-      x: dates, y: col(rows, 'bb_lower'), type: 'scatter', mode: 'lines',
+      x: dates, y: col(series, 'bb_lower'), type: 'scatter', mode: 'lines',
       name: 'BB Lower', line: { color: C.fg2, width: 1, dash: 'dot' },
       fill: 'tonexty', fillcolor: 'rgba(150,150,150,0.06)',
       hovertemplate: 'BB Lower %{y:.2f}<extra></extra>',
@@ -138,13 +138,13 @@ function buildTraces(C) {
   }
 
   // --- Volume (Chinese convention: red up / green down) ---
-  const volColors = rows.map((r, i) => {
-    const prev = i > 0 ? rows[i - 1].Close : null;
-    if (prev == null || r.Close == null) return C.fg2;
-    return r.Close >= prev ? C.upSoft || C.up : C.downSoft || C.down;
+  const volColors = close.map((c, i) => {
+    const prev = i > 0 ? close[i - 1] : null;
+    if (prev == null || c == null) return C.fg2;
+    return c >= prev ? C.upSoft || C.up : C.downSoft || C.down;
   });
   traces.push({
-    x: dates, y: col(rows, 'Volume'), type: 'bar',
+    x: dates, y: col(series, 'Volume'), type: 'bar',
     name: 'Volume', marker: { color: volColors },
     yaxis: 'y2', xaxis: 'x',
     hovertemplate: 'Vol %{y:,.0f}<extra></extra>',
@@ -152,38 +152,38 @@ function buildTraces(C) {
 
   // --- MACD (DIF + signal + histogram) ---
   traces.push({
-    x: dates, y: col(rows, 'macd'), type: 'scatter', mode: 'lines',
+    x: dates, y: col(series, 'macd'), type: 'scatter', mode: 'lines',
     name: 'MACD', line: { color: C.info, width: 1 }, yaxis: 'y3',
   });
   traces.push({
-    x: dates, y: col(rows, 'macd_signal'), type: 'scatter', mode: 'lines',
+    x: dates, y: col(series, 'macd_signal'), type: 'scatter', mode: 'lines',
     name: 'Signal', line: { color: C.accent, width: 1 }, yaxis: 'y3',
   });
-  const histColors = col(rows, 'macd_hist').map((v) =>
+  const histColors = col(series, 'macd_hist').map((v) =>
     v == null ? C.fg2 : v >= 0 ? C.up : C.down
   );
   traces.push({
-    x: dates, y: col(rows, 'macd_hist'), type: 'bar',
+    x: dates, y: col(series, 'macd_hist'), type: 'bar',
     name: 'Hist', marker: { color: histColors }, yaxis: 'y3',
   });
 
   // --- RSI(14) ---
   traces.push({
-    x: dates, y: col(rows, 'rsi'), type: 'scatter', mode: 'lines',
+    x: dates, y: col(series, 'rsi'), type: 'scatter', mode: 'lines',
     name: 'RSI(14)', line: { color: '#bd93f9', width: 1 }, yaxis: 'y4',
   });
 
   // --- KDJ(9,3,3) ---
   traces.push({
-    x: dates, y: col(rows, 'k'), type: 'scatter', mode: 'lines',
+    x: dates, y: col(series, 'k'), type: 'scatter', mode: 'lines',
     name: 'K', line: { color: '#f1c47b', width: 1 }, yaxis: 'y5',
   });
   traces.push({
-    x: dates, y: col(rows, 'd'), type: 'scatter', mode: 'lines',
+    x: dates, y: col(series, 'd'), type: 'scatter', mode: 'lines',
     name: 'D', line: { color: '#8be9fd', width: 1 }, yaxis: 'y5',
   });
   traces.push({
-    x: dates, y: col(rows, 'j'), type: 'scatter', mode: 'lines',
+    x: dates, y: col(series, 'j'), type: 'scatter', mode: 'lines',
     name: 'J', line: { color: '#ff79c6', width: 1 }, yaxis: 'y5',
   });
 
@@ -204,6 +204,8 @@ function buildTraces(C) {
 function buildLayout(C) {
   return {
     autosize: true,
+    // Keep the user's zoom across re-renders with refined (windowed) data.
+    uirevision: `${state.ticker}|${state.tf}|${state.range}`,
     margin: { l: 56, r: 24, t: 16, b: 32 },
     hovermode: 'x unified',
     paper_bgcolor: C.bg0,
@@ -250,25 +252,42 @@ function buildLayout(C) {
   };
 }
 
+let relayoutHandler = null;
+let relayoutWired = false;
+
+// main.js registers the zoom → refetch handler; attached after the first plot.
+export function setRelayoutHandler(fn) {
+  relayoutHandler = fn;
+}
+
 export function render() {
   const chartEl = document.getElementById('chart');
   if (!chartEl) return;
-  if (!state.rows.length) {
+  if (!state.series.length) {
     Plotly.purge(chartEl);
+    relayoutWired = false;
     setStatus('暂无数据');
     return;
   }
   const C = themeColors();
   Plotly.react(chartEl, buildTraces(C), buildLayout(C), { responsive: true, displaylogo: false });
+  if (relayoutHandler && !relayoutWired) {
+    chartEl.on('plotly_relayout', relayoutHandler);
+    relayoutWired = true;
+  }
   const tfLabel = TF_LABELS[state.tf] || state.tf;
-  const last = state.rows[state.rows.length - 1];
-  const lastClose = last && last.Close != null ? last.Close.toFixed(2) : '—';
-  setStatus(`${tfLabel} · ${state.rows.length} 个 K 棒 · 区间 ${state.range} · ${state.mode === 'line' ? '折线' : 'K 线'} · 最新收盘 ${lastClose}`);
+  const closes = col(state.series, 'Close');
+  const last = closes[closes.length - 1];
+  const lastClose = last != null ? last.toFixed(2) : '—';
+  const bars = state.series.downsampled
+    ? `${state.series.length}/${state.series.sourceLength} 个 K 棒（降采样）`
+    : `${state.series.length} 个 K 棒`;
+  setStatus(`${tfLabel} · ${bars} · 区间 ${state.range} · ${state.mode === 'line' ? '折线' : 'K 线'} · 最新收盘 ${lastClose}`);
 }
 
 export function resize() {
   const chartEl = document.getElementById('chart');
-  if (state.rows.length && chartEl) Plotly.Plots.resize(chartEl);
+  if (state.series.length && chartEl) Plotly.Plots.resize(chartEl);
   const peEl = document.getElementById('pe-chart');
   if (state.showPE && state.peRows.length && peEl) Plotly.Plots.resize(peEl);
 }
@@ -375,23 +394,33 @@ export function renderPE() {
   const pes = state.peRows.map((r) => r.pe);
   const s = state.peSummary || {};
 
-  const traces = [{
-    x: dates, y: pes, type: 'scatter', mode: 'lines',
-    name: 'PE(TTM)', line: { color: C.accent, width: 1.4 },
-    hovertemplate: '%{x|%Y-%m-%d}<br>PE %{y:.2f}<extra></extra>',
-    fill: 'tozeroy', fillcolor: 'rgba(150,150,150,0.04)',
-  }];
+  // Historical percentile bands (rolling window = selected range, precomputed
+  // server-side): P10–P90 outer fill, P25–P75 inner fill, P50 dotted median.
+  const band = (k) => state.peRows.map((r) => (r[k] == null ? null : r[k]));
+  const bandLine = (k, name, fill, fillcolor, dash) => ({
+    x: dates, y: band(k), type: 'scatter', mode: 'lines', name,
+    line: { color: C.fg2, width: dash ? 1 : 0, dash: dash || 'solid' },
+    fill: fill || 'none', fillcolor, connectgaps: false,
+    hovertemplate: `${name} %{y:.2f}<extra></extra>`,
+  });
+  const traces = [
+    bandLine('p10', 'P10'),
+    bandLine('p90', 'P90', 'tonexty', 'rgba(150,150,150,0.06)'),
+    bandLine('p25', 'P25'),
+    bandLine('p75', 'P75', 'tonexty', 'rgba(150,150,150,0.10)'),
+    bandLine('p50', 'P50', null, null, 'dot'),
+    {
+      x: dates, y: pes, type: 'scatter', mode: 'lines',
+      name: 'PE(TTM)', line: { color: C.accent, width: 1.4 },
+      hovertemplate: '%{x|%Y-%m-%d}<br>PE %{y:.2f}<extra></extra>',
+    },
+  ];
 
   const shapes = [];
   const annotations = [];
   ['p25', 'p50', 'p75'].forEach((k, i) => {
     if (s[k] == null) return;
     const colors = [C.up, C.fg2, C.down];
-    shapes.push({
-      type: 'line', xref: 'paper', x0: 0, x1: 1, yref: 'y',
-      y0: s[k], y1: s[k],
-      line: { color: colors[i], width: 1, dash: 'dot' },
-    });
     annotations.push({
       xref: 'paper', x: 1, xanchor: 'right',
       yref: 'y', y: s[k], yanchor: 'bottom',
@@ -8,7 +8,8 @@ export const state = {
   showBB: true,
   showMA: true,
   showPE: false,
-  rows: [],
+  series: { dates: [], columns: {}, length: 0, sourceLength: 0, downsampled: null },  // columnar OHLCV + indicators
+  window: null,     // {start, end} after a zoom; null = whole range
   trades: [],
   maPeriods: [20, 60, 250],
   peRows: [],